@@ -5,3 +5,5 @@ class ErrorCode(Enum):
     NoError = 0
     UnknownError = 1000
     InvalidProduct = 1001
+    Throttled = 1002
+    NotAuthorised = 1003
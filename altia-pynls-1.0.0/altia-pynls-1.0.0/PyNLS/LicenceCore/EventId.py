@@ -15,6 +15,8 @@ class EventId(Enum):
     SeatNotTaken = 1014
     TakeSeatError = 1015
     ConnectionInfoError = 1016
+    SeatsReleased = 1017
+    AdminRequestRefused = 1018
 
     NumberOfSeatsError = 1020
     SeatRefreshedError = 1021
@@ -27,12 +29,18 @@ class EventId(Enum):
     LicenceVerificationError = 1034
     LicenceNotActiveMessage = 1035
     LicenceUploadError = 1036
+    LicenceBundleBuilt = 1037
+    LicenceBundleRejected = 1038
 
     InvalidProduct = 1040
 
     DataFolderCreated = 1050
     LicenceFolderCreated = 1051
     DatabaseSchemaCreated = 1052
+    DatabaseSchemaUpgraded = 1053
+    StaleSeatsDeleted = 1054
+    DatabaseVacuumed = 1055
+    DatabaseSnapshotRestored = 1056
 
     GetConnectionsSQLError = 1060
     GetLicenceDetailsSQLError = 1061
@@ -47,6 +55,38 @@ class EventId(Enum):
     CreateDatabaseSQLError = 1070
     DeleteStaleSeatSQLError = 1071
     ZeroMQError = 1072
+    ReleaseSeatsSQLError = 1073
+    DatabaseSnapshotSQLError = 1074
+
+    InvalidRequest = 1080
+    RequestError = 1081
+    QueryBudgetExceeded = 1082
+    NameLookupError = 1083
+    SeatJournalError = 1084
+    UsageRollupError = 1085
 
     ServerVersion = 1090
     WebServerAddress = 1091
+
+    SeatSnapshotWritten = 1100
+    SeatSnapshotRestored = 1101
+    SeatSnapshotRejected = 1102
+
+    ReplicationStarted = 1110
+    ReplicationSnapshot = 1111
+    ReplicationStandbyDropped = 1112
+    ReplicationPrimaryLost = 1113
+    ReplicationOutOfSequence = 1114
+    ReplicationTakeover = 1115
+
+    SeatCoordinatorStarted = 1120
+    SeatCoordinatorError = 1121
+    SeatQuotaReclaimed = 1122
+    SeatPoolError = 1123
+    SeatQuotaCut = 1124
+
+    ClientConnectionLost = 1130
+    ClientConnectionRestored = 1131
+    ClientSeatLost = 1132
+    ClientSeatRetaken = 1133
+    ClientRequestError = 1134
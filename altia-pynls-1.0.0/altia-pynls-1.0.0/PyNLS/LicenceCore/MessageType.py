@@ -57,6 +57,34 @@ class MessageType(Enum):
     If the web server is not enabled, this will be empty string.
     """
 
+    Batch = 10
+    """
+    Take, refresh or release seats message sent from a client.
+    Each item is performed in one transaction and has its own reply item.
+    """
+
+    QueryEvents = 11
+    """
+    Query the recent events of the server, an administrative message.
+    Optionally filtered by the comma separated event ids in Content, the product
+    in Licence.Product and the user in Body[0], the reply has one event per line.
+    """
+
+    ReleaseSeats = 12
+    """
+    Release every seat matching the product in Licence.Product and the user, host and IP
+    in Body[0], or expire the seats not refreshed since the ISO time, or for the number of
+    minutes by the server's clock, in Content, an administrative message. The reply has a
+    line per product: the product and the number of seats released.
+    """
+
+    WaitSeat = 13
+    """
+    Take seat message sent from a client that waits in the seat wait queue, for up to the
+    seconds in Content, to be granted a seat if none is free, rather than polling with
+    TakeSeat. Replied to like TakeSeat, a denial has the place in the queue in Comments.
+    """
+
     Kill = -1
     """
     Used to signal to the server to shutdown the sockets.
@@ -0,0 +1,34 @@
+"""
+Capacity planning with the discrete-event simulator: the denial probability,
+stale seat occupancy and database write rate of a population sharing a
+product, for a range of heartbeats and seat counts.
+
+Run from the package root with:
+    python -m PyNLS.LicenceCore.benchmarks.bench_capacity [days] [users] [crash rate] [network delay]
+"""
+import sys
+from PyNLS.LicenceCore.clsCapacitySimulator import CapacitySimulator, Population
+
+
+def main(argv: list) -> None:
+    days = float(argv[1]) if len(argv) > 1 else 7
+    users = int(argv[2]) if len(argv) > 2 else 200
+    crashRate = float(argv[3]) if len(argv) > 3 else 0.05
+    networkDelay = float(argv[4]) if len(argv) > 4 else 1.0
+    # Each idle user starts a four hour session about every eight hours...
+    population = Population('user', 'Product', users, 0.125, 4 * 3600, crashRate, networkDelay)
+    print('%8s %8s %10s %10s %10s %10s %10s %10s' % ('seats', 'heartbeat', 'denied %', 'in use', 'stale',
+                                                     'late', 'writes/s', 'seconds'))
+    for seats in (users // 4, users // 3, users // 2):
+        for heartBeat in (60, 300, 900):
+            simulator = CapacitySimulator({'Product': seats}, [population], heartBeat, seed=1)
+            result = simulator.Run(days * 86400)
+            simulator.Close()
+            product = result.Products['Product']
+            print('%8d %8d %10.1f %10.1f %10.2f %10d %10.3f %10.2f' % (
+                seats, heartBeat, product.DenialProbability * 100, product.MeanSeatsInUse, product.MeanStaleSeats,
+                product.LateRefreshes, result.DatabaseWriteRate, result.ElapsedTime))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,85 @@
+"""
+Throughput curve of concurrent seat operations through the licence manager.
+
+Each thread repeatedly takes, refreshes and releases seats, spread over a
+number of products, so the lock stripes of different products run in parallel.
+
+Run from the package root with:
+    python -m PyNLS.LicenceCore.benchmarks.bench_concurrency [products] [operations]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from PyNLS.LicenceCore.benchmarks.common import CreateManager
+from PyNLS.LicenceCore.clsLicenceManager import LicenceManager
+from PyNLS.LicenceCore.clsMemoryStorage import MemoryStorage
+
+ThreadCounts = [1, 2, 4, 8, 16, 32]
+
+
+def CreateBackendManager(backend: str, products: int, seats: int) -> LicenceManager:
+    """
+    Creates a licence manager, in the current folder, with a licence for each product.
+
+    :param backend: One of 'sqlite', 'sqlite-memory' or 'memory'.
+    :param products: The number of products to licence.
+    :param seats: The number of seats of each product.
+    :returns: The licence manager.
+    """
+    return CreateManager(seats, ['product' + str(p) for p in range(products)],
+                         MemoryStorage() if backend == 'memory' else None,
+                         inMemory=backend == 'sqlite-memory', snapshotInterval=0)
+
+
+def Throughput(manager: LicenceManager, threads: int, products: int, operations: int) -> float:
+    """
+    Runs take, refresh and release cycles on the specified number of threads.
+
+    :returns: The seat operations per second over all threads.
+    """
+    barrier = threading.Barrier(threads + 1)
+
+    def Worker(index):
+        barrier.wait()
+        for i in range(operations):
+            product = 'product' + str((index + i) % products)
+            user = 'user' + str(index)
+            ipAddress = '10.0.' + str(index) + '.1'
+            manager.TakeSeat(product, ipAddress, user, 'host')
+            manager.RefreshSeat(product, ipAddress, user, 'host')
+            manager.ReleaseSeat(product, ipAddress, user)
+
+    workers = [threading.Thread(target=Worker, args=(t,)) for t in range(threads)]
+    for w in workers:
+        w.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    return threads * operations * 3 / elapsed
+
+
+def main(argv: list) -> None:
+    products = int(argv[1]) if len(argv) > 1 else 8
+    operations = int(argv[2]) if len(argv) > 2 else 200
+    cwd = os.getcwd()
+    print('%-14s' % 'backend' + ''.join('%10s' % (str(t) + ' thr') for t in ThreadCounts) + '   (ops/s)')
+    with tempfile.TemporaryDirectory() as folder:
+        try:
+            for backend in ('sqlite', 'sqlite-memory', 'memory'):
+                # Each backend gets its own data folder...
+                os.mkdir(os.path.join(folder, backend))
+                os.chdir(os.path.join(folder, backend))
+                manager = CreateBackendManager(backend, products, max(ThreadCounts))
+                row = [Throughput(manager, t, products, operations) for t in ThreadCounts]
+                manager.Shutdown()
+                print('%-14s' % backend + ''.join('%10.0f' % r for r in row))
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,74 @@
+"""
+Benchmark of licence loading at startup, the licence files against a compiled licence bundle.
+
+Run from the package root with:
+    python -m PyNLS.LicenceCore.benchmarks.bench_licences [licences] [products]
+"""
+import base64
+import os
+import sys
+import tempfile
+import time
+from xml.etree import ElementTree
+from Crypto.Hash import SHA1
+from Crypto.PublicKey import RSA
+from Crypto.Signature import pkcs1_15
+from PyNLS.LicenceCore.clsLicenceManager import LicenceManager
+from PyNLS.LicenceCore.clsMemoryStorage import MemoryStorage
+from PyNLS.LicenceCore.clsUtils import Utils
+
+
+def WriteLicences(folder: str, licences: int, products: int) -> None:
+    """
+    Writes a public key to the working folder and the specified number of signed licence files to the folder.
+    """
+    key = RSA.generate(2048)
+    with open('public_key.pem', 'wb') as file:
+        file.write(key.publickey().export_key())
+    signer = pkcs1_15.new(key)
+    for i in range(licences):
+        lic = ElementTree.Element('Licence1')
+        for tag, text in (('Company', 'Altia'), ('Product', 'product' + str(i % products)), ('Customer', 'Customer'),
+                          ('Reference', None), ('Reseller', None), ('NumberOfSeats', '10'), ('StartDate', None),
+                          ('ExpiryDate', None), ('TimeStamp', str(i + 1)), ('Code', ''), ('Comments', None)):
+            ElementTree.SubElement(lic, tag).text = text
+        Utils.enforce_licence_newline(lic)
+        digest = SHA1.new(ElementTree.tostring(lic, encoding='utf-8', method='xml', xml_declaration=False))
+        lic.find('Code').text = base64.b64encode(signer.sign(digest)).decode('ascii')
+        ElementTree.ElementTree(lic).write(os.path.join(folder, 'licence' + str(i) + '.nls1'), encoding='utf-8')
+
+
+def TimedLoad(useBundle: bool, doubleValidation: bool) -> float:
+    """
+    Returns the seconds taken by a new licence manager to load the licences.
+    """
+    manager = LicenceManager('Licences', '', None, storage=MemoryStorage())
+    manager.UseLicenceBundle = useBundle
+    manager.DoubleValidation = doubleValidation
+    start = time.perf_counter()
+    manager.LoadLicences()
+    elapsed = time.perf_counter() - start
+    manager.Shutdown()
+    return elapsed
+
+
+def main(argv: list) -> None:
+    licences = int(argv[1]) if len(argv) > 1 else 10000
+    products = int(argv[2]) if len(argv) > 2 else 100
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)
+        try:
+            os.mkdir('Licences')
+            WriteLicences('Licences', licences, products)
+            print('%-32s %10s' % ('startup (' + str(licences) + ' licences)', 'seconds'))
+            print('%-32s %10.3f' % ('xml', TimedLoad(False, True)))
+            print('%-32s %10.3f' % ('xml, building bundle', TimedLoad(True, True)))
+            print('%-32s %10.3f' % ('bundle, verified lazily', TimedLoad(True, True)))
+            print('%-32s %10.3f' % ('bundle, verified in bulk', TimedLoad(True, False)))
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
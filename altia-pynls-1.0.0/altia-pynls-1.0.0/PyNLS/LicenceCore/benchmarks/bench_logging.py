@@ -0,0 +1,110 @@
+"""
+Benchmark of request latency with file logging, written on the request thread
+against the non-blocking log pipeline, at INFO and DEBUG, on a fast disk and
+on a disk stalling for 10 ms every 100 writes, as when the log is on a network
+share or the disk is busy.
+
+Run from the package root with:
+    python -m PyNLS.LicenceCore.benchmarks.bench_logging [requests]
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+from PyNLS.LicenceCore.benchmarks.common import CreateManager
+from PyNLS.LicenceCore.clsLogPipeline import LogPipeline
+from PyNLS.LicenceCore.clsMessage_pb2 import Message
+from PyNLS.LicenceCore.clsRequestHandler import RequestHandler
+from PyNLS.LicenceCore.clsSqliteStorage import SqliteStorage
+from PyNLS.LicenceCore.MessageType import MessageType
+
+
+class StallingStream:
+    """
+    Wraps the stream of a log file, stalling every StallEvery writes.
+    """
+    StallEvery = 100
+    StallTime = 0.01
+
+    def __init__(self, stream):
+        self.m_Stream = stream
+        self.m_Writes = 0
+
+    def write(self, text: str) -> int:
+        self.m_Writes += 1
+        if self.m_Writes % self.StallEvery == 0:
+            time.sleep(self.StallTime)
+        return self.m_Stream.write(text)
+
+    def __getattr__(self, name: str):
+        return getattr(self.m_Stream, name)
+
+
+def Request(messageType: MessageType, user: str) -> bytes:
+    """
+    Returns a serialized seat request of the user.
+    """
+    message = Message()
+    message.Type = messageType.value
+    message.Licence.Product = 'Product'
+    message.Body.add(User=user, Host='host', IP='10.0.0.1')
+    return message.SerializeToString()
+
+
+def Latencies(folder: str, requests: int) -> list:
+    """
+    Returns the latency, in microseconds, of each of the take, refresh and release requests.
+    """
+    manager = CreateManager(requests, storage=SqliteStorage(os.path.join(folder, 'bench.db3'), True, 0))
+    handler = RequestHandler(manager, '1.0.0')
+    latencies = []
+    for messageType in (MessageType.TakeSeat, MessageType.RefreshSeat, MessageType.ReleaseSeat):
+        for i in range(requests):
+            data = Request(messageType, 'user' + str(i))
+            start = time.perf_counter()
+            handler.Handle(data)
+            latencies.append((time.perf_counter() - start) * 1000000)
+    manager.Shutdown()
+    return latencies
+
+
+def main(argv: list) -> None:
+    requests = int(argv[1]) if len(argv) > 1 else 1000
+    print('%-30s %10s %10s %10s' % ('logging', 'mean us', 'p99 us', 'max us'))
+    for stall in (False, True):
+        for level in (logging.INFO, logging.DEBUG):
+            for pipelined in (False, True):
+                Report(requests, level, pipelined, stall)
+
+
+def Report(requests: int, level: int, pipelined: bool, stall: bool) -> None:
+    """
+    Prints the request latencies logging to a file at the level, through the pipeline or on the request thread.
+    """
+    root = logging.getLogger()
+    root.setLevel(level)
+    with tempfile.TemporaryDirectory() as folder:
+        fileName = os.path.join(folder, 'nls.log')
+        if pipelined:
+            pipeline = LogPipeline(fileName, level=level)
+            handler = pipeline.m_FileHandler
+        else:
+            handler = logging.FileHandler(fileName, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(asctime)s\t%(levelname)s\t%(threadName)s\t%(message)s'))
+            root.addHandler(handler)
+        if stall:
+            handler.stream = StallingStream(handler.stream)
+        latencies = sorted(Latencies(folder, requests))
+        if pipelined:
+            pipeline.Close()
+        else:
+            root.removeHandler(handler)
+            handler.close()
+    name = logging.getLevelName(level) + (', pipeline' if pipelined else ', file') + (', stalling' if stall else '')
+    print('%-30s %10.0f %10.0f %10.0f' % (name, sum(latencies) / len(latencies),
+                                         latencies[int(len(latencies) * 0.99)], latencies[-1]))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
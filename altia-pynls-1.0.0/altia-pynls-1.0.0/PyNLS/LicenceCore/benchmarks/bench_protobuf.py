@@ -0,0 +1,199 @@
+"""
+Benchmark harness for encoding and decoding the request and reply of each message type.
+
+Each protobuf backend is benchmarked in its own process, as the backend is
+chosen when protobuf is first imported. A backend that is not installed, or
+cannot load the generated message module, is reported as unavailable.
+
+Run from the package root with:
+    python -m PyNLS.LicenceCore.benchmarks.bench_protobuf [count] [connections]
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+Backends = ('python', 'upb', 'cpp')
+
+
+def Samples(connections: int) -> dict:
+    """
+    Returns a representative request of each message type and a function
+    building its reply into a message, as the request handler does.
+
+    :param connections: The number of user records in a QueryConnections reply.
+    :returns: A dictionary of message type name to (request, reply builder).
+    """
+    from PyNLS.LicenceCore.clsMessage_pb2 import Message
+    from PyNLS.LicenceCore.MessageType import MessageType
+
+    rows = [('user' + str(i), 'host' + str(i), '10.0.0.' + str(i % 250),
+             '2021-03-05 12:00:00.000001', '2021-03-05 12:05:00.000001') for i in range(connections)]
+
+    def Request(messageType, product='Product'):
+        message = Message()
+        message.Type = messageType.value
+        message.Licence.Product = product
+        if messageType in (MessageType.TakeSeat, MessageType.ReleaseSeat, MessageType.RefreshSeat):
+            message.Body.add(User='user', Host='host', IP='10.0.0.1')
+        return message
+
+    def Reply(content, heartBeat=False):
+        def Build(message):
+            message.Type = MessageType.Reply.value
+            message.Content = content
+            if heartBeat:
+                message.HeartBeat.FromSeconds(300)
+        return Build
+
+    def Connections(message):
+        message.Type = MessageType.Reply.value
+        for user, host, ip, logonTime, updateTime in rows:
+            message.Body.add(User=user, Host=host, IP=ip, LogonTime=logonTime, UpdateTime=updateTime)
+        message.Content = str(len(rows))
+
+    def ConnectionsExtended(message):
+        # A user record built per row then copied into the body...
+        records = []
+        for user, host, ip, logonTime, updateTime in rows:
+            record = Message.UserRecordStruct()
+            record.User = user
+            record.Host = host
+            record.IP = ip
+            record.LogonTime = logonTime
+            record.UpdateTime = updateTime
+            records.append(record)
+        message.Type = MessageType.Reply.value
+        message.Body.extend(records)
+        message.Content = str(len(records))
+
+    def Licence(message):
+        message.Type = MessageType.Reply.value
+        message.Licence.Company = 'Altia'
+        message.Licence.Product = 'Product'
+        message.Licence.Customer = 'Customer'
+        message.Licence.NumberOfSeats = 50
+
+    def Batch(message):
+        message.Type = MessageType.Reply.value
+        for i in range(10):
+            item = message.Items.add()
+            item.Type = MessageType.Reply.value
+            item.Licence.Product = 'product' + str(i)
+            item.Content = 'True'
+            item.HeartBeat.FromSeconds(300)
+        message.Content = '10'
+        message.HeartBeat.FromSeconds(300)
+
+    batch = Request(MessageType.Batch, '')
+    for i in range(10):
+        batch.Items.add().CopyFrom(Request(MessageType.RefreshSeat, 'product' + str(i)))
+    return {
+        MessageType.TakeSeat.name: (Request(MessageType.TakeSeat), Reply('True', True)),
+        MessageType.RefreshSeat.name: (Request(MessageType.RefreshSeat), Reply('True', True)),
+        MessageType.ReleaseSeat.name: (Request(MessageType.ReleaseSeat), Reply('True')),
+        MessageType.QueryConnections.name: (Request(MessageType.QueryConnections), Connections),
+        MessageType.QueryConnections.name + '-extend': (Request(MessageType.QueryConnections), ConnectionsExtended),
+        MessageType.NumberOfSeats.name: (Request(MessageType.NumberOfSeats), Reply('50')),
+        MessageType.ServerVersion.name: (Request(MessageType.ServerVersion, ''), Reply('1.0.0')),
+        MessageType.QueryLicence.name: (Request(MessageType.QueryLicence), Licence),
+        MessageType.Batch.name: (batch, Batch),
+    }
+
+
+def Timed(operation, count: int) -> float:
+    """
+    Runs the operation count times and returns the microseconds per operation.
+    """
+    start = time.perf_counter()
+    for _ in range(count):
+        operation()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def BenchmarkBackend(count: int, connections: int) -> dict:
+    """
+    Times a request decode, and a reply build and encode, as the server performs them,
+    with a new message per call and with a cleared, reused message, for each message type.
+
+    :param count: The number of times each operation is run.
+    :param connections: The number of user records in a QueryConnections reply.
+    :returns: The backend in use and, per message type, the timings in microseconds.
+    """
+    from google.protobuf.internal import api_implementation
+    from PyNLS.LicenceCore.clsMessage_pb2 import Message
+
+    results = {}
+    for name, (request, build) in Samples(connections).items():
+        data = request.SerializeToString()
+        reused = Message()
+        built = Message()
+
+        def DecodeNew():
+            Message().ParseFromString(data)
+
+        def DecodeReused():
+            reused.ParseFromString(data)
+
+        def EncodeNew():
+            message = Message()
+            build(message)
+            message.SerializeToString()
+
+        def EncodeReused():
+            built.Clear()
+            build(built)
+            built.SerializeToString()
+
+        results[name] = {
+            'decode': Timed(DecodeNew, count),
+            'decode-reused': Timed(DecodeReused, count),
+            'encode': Timed(EncodeNew, count),
+            'encode-reused': Timed(EncodeReused, count),
+        }
+    return {'backend': api_implementation.Type(), 'results': results}
+
+
+def RunBackend(backend: str, count: int, connections: int) -> dict:
+    """
+    Benchmarks a protobuf backend in a child process.
+
+    :returns: The benchmark results, or None with the reason if the backend is unavailable.
+    """
+    env = dict(os.environ, PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION=backend)
+    process = subprocess.run([sys.executable, '-m', __spec__.name, '--child', str(count), str(connections)],
+                             env=env, capture_output=True, text=True)
+    if process.returncode != 0:
+        lines = process.stderr.strip().splitlines()
+        return {'backend': backend, 'error': lines[-1] if lines else 'exit code ' + str(process.returncode)}
+    return json.loads(process.stdout)
+
+
+def main(argv: list) -> None:
+    if len(argv) > 1 and argv[1] == '--child':
+        print(json.dumps(BenchmarkBackend(int(argv[2]), int(argv[3]))))
+        return
+    count = int(argv[1]) if len(argv) > 1 else 2000
+    connections = int(argv[2]) if len(argv) > 2 else 100
+    seen = set()
+    for backend in Backends:
+        run = RunBackend(backend, count, connections)
+        if 'error' in run:
+            print(backend + ': unavailable (' + run['error'] + ')\n')
+            continue
+        # An unknown backend falls back to the default one...
+        if run['backend'] in seen:
+            print(backend + ': unavailable (fell back to ' + run['backend'] + ')\n')
+            continue
+        seen.add(run['backend'])
+        print(run['backend'] + ' (us per message)')
+        print('%-22s %10s %14s %10s %14s' % ('type', 'decode', 'decode-reused', 'encode', 'encode-reused'))
+        for name, r in run['results'].items():
+            print('%-22s %10.2f %14.2f %10.2f %14.2f' % (
+                name, r['decode'], r['decode-reused'], r['encode'], r['encode-reused']))
+        print()
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,99 @@
+"""
+Benchmark harness for the replication lag of a warm standby under seat load.
+
+The primary runs in its own process, taking and refreshing seats from a number
+of threads as fast as it can, while a standby in this process follows it.
+
+Run from the package root with:
+    python -m PyNLS.LicenceCore.benchmarks.bench_replication [users] [operations]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+from PyNLS.LicenceCore.benchmarks.common import CreateManager
+from PyNLS.LicenceCore.clsReplicationPrimary import ReplicationPrimary
+from PyNLS.LicenceCore.clsReplicationStandby import ReplicationStandby
+
+ThreadCounts = (1, 4)
+
+
+def RunPrimary(folder: str, users: int, operations: int, threads: int, messages, start) -> None:
+    """
+    Runs the primary, reporting its port, then the load's operations per second and last sequence.
+    """
+    manager = CreateManager(users, folder=folder)
+    primary = ReplicationPrimary(manager.Storage, 'tcp://127.0.0.1:0', manager.Clock)
+    manager.Replication = primary
+    primary.Start()
+    messages.put(primary.Port)
+    start.wait()
+
+    def Worker(index):
+        for i in range(operations):
+            user = (index * operations + i) % users
+            ipAddress = '10.0.' + str(user // 250) + '.' + str(user % 250)
+            if i % 2 == 0:
+                manager.TakeSeat('Product', ipAddress, 'user' + str(user), 'host')
+            else:
+                manager.RefreshSeat('Product', ipAddress, 'user' + str(user), 'host')
+
+    workers = [threading.Thread(target=Worker, args=(t,)) for t in range(threads)]
+    begin = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    messages.put((threads * operations / (time.perf_counter() - begin), primary.Sequence))
+    time.sleep(60)
+
+
+def Measure(folder: str, users: int, operations: int, threads: int) -> tuple:
+    """
+    Runs a primary under load with a standby following it.
+
+    :returns: The primary's operations per second, and the standby's average and maximum lag in milliseconds.
+    """
+    context = multiprocessing.get_context('spawn')
+    messages = context.Queue()
+    start = context.Event()
+    process = context.Process(target=RunPrimary, daemon=True,
+                              args=(os.path.join(folder, 'primary'), users, operations, threads, messages, start))
+    process.start()
+    try:
+        port = messages.get(timeout=60)
+        standby = ReplicationStandby(CreateManager(users, folder=os.path.join(folder, 'standby')),
+                                     'tcp://127.0.0.1:' + str(port))
+        standby.Start()
+        while not standby.Synced:
+            time.sleep(0.01)
+        start.set()
+        rate, sequence = messages.get(timeout=600)
+        while standby.Sequence < sequence:
+            time.sleep(0.01)
+        standby.Takeover()
+        return rate, standby.AverageLag * 1000, standby.MaximumLag * 1000
+    finally:
+        process.kill()
+        process.join()
+
+
+def main(argv: list) -> None:
+    users = int(argv[1]) if len(argv) > 1 else 1000
+    operations = int(argv[2]) if len(argv) > 2 else 5000
+    cwd = os.getcwd()
+    print('%-8s %12s %14s %14s' % ('threads', 'ops/s', 'avg lag (ms)', 'max lag (ms)'))
+    with tempfile.TemporaryDirectory() as folder:
+        try:
+            for threads in ThreadCounts:
+                run = os.path.join(folder, str(threads))
+                rate, average, maximum = Measure(run, users, operations, threads)
+                print('%-8d %12.0f %14.2f %14.2f' % (threads, rate, average, maximum))
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,106 @@
+"""
+Benchmark harness for the licence manager storage backends.
+
+Run from the package root with:
+    python -m PyNLS.LicenceCore.benchmarks.bench_storage [products] [users]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from PyNLS.LicenceCore.benchmarks.common import CreateLicences
+from PyNLS.LicenceCore.clsLicenceManager import LicenceSeatStructure
+from PyNLS.LicenceCore.clsMemoryStorage import MemoryStorage
+from PyNLS.LicenceCore.clsSqliteStorage import SqliteStorage
+
+
+def Backends(folder: str) -> dict:
+    """
+    Returns a factory for each storage backend to benchmark.
+
+    :param folder: The folder to create database files in.
+    :returns: A dictionary of backend name to storage factory.
+    """
+    return {
+        'sqlite': lambda: SqliteStorage(os.path.join(folder, 'bench.db3')),
+        'sqlite-memory': lambda: SqliteStorage(os.path.join(folder, 'bench-memory.db3'), True, 0),
+        'memory': lambda: MemoryStorage(),
+    }
+
+
+def Timed(operation, count: int) -> float:
+    """
+    Runs the operation for each index up to count and returns the operations per second.
+    """
+    start = time.perf_counter()
+    for i in range(count):
+        operation(i)
+    elapsed = time.perf_counter() - start
+    return count / elapsed if elapsed > 0 else float('inf')
+
+
+def BenchmarkStorage(storage, products: int, users: int) -> dict:
+    """
+    Runs take, refresh, count, list, release and reap against the storage.
+
+    :param storage: An unopened storage.
+    :param products: The number of products to licence.
+    :param users: The number of users taking a seat of every product.
+    :returns: A dictionary of operation name to operations per second.
+    """
+    storage.Open()
+    names = ['product' + str(p) for p in range(products)]
+    storage.LoadLicences(CreateLicences(names, users))
+    seats = {name: [LicenceSeatStructure(lic.Id, lic.NumberOfSeats, True) for lic in storage.GetLicences(name)]
+             for name in names}
+    now = datetime.now()
+    expiry = now + timedelta(seconds=330)
+    count = products * users
+
+    def Take(i):
+        name = names[i % products]
+        storage.TakeSeat(name, '10.0.' + str(i // 250) + '.' + str(i % 250), 'user' + str(i), 'host', seats[name], now, expiry)
+
+    def Refresh(i):
+        storage.RefreshSeat(names[i % products], '10.0.' + str(i // 250) + '.' + str(i % 250), 'user' + str(i), 'host', now, expiry)
+
+    def Count(i):
+        storage.CountSeats(names[i % products], now)
+
+    def Connections(i):
+        storage.GetConnections(names[i % products], now)
+
+    def Release(i):
+        storage.ReleaseSeat(names[i % products], '10.0.' + str(i // 250) + '.' + str(i % 250), 'user' + str(i))
+
+    results = {
+        'take': Timed(Take, count),
+        'refresh': Timed(Refresh, count),
+        'count': Timed(Count, count),
+        'connections': Timed(Connections, min(count, 200)),
+        'release': Timed(Release, count),
+    }
+    for i in range(count):
+        storage.RefreshSeat(names[i % products], str(i), 'user' + str(i), 'host', now, now - timedelta(seconds=1))
+    start = time.perf_counter()
+    storage.DeleteStaleSeats(now)
+    results['reap'] = count / (time.perf_counter() - start)
+    storage.Close()
+    return results
+
+
+def main(argv: list) -> None:
+    products = int(argv[1]) if len(argv) > 1 else 10
+    users = int(argv[2]) if len(argv) > 2 else 50
+    with tempfile.TemporaryDirectory() as folder:
+        print('%-14s %12s %12s %12s %12s %12s %12s' % ('backend', 'take/s', 'refresh/s', 'count/s',
+                                                      'list/s', 'release/s', 'reap/s'))
+        for name, factory in Backends(folder).items():
+            r = BenchmarkStorage(factory(), products, users)
+            print('%-14s %12.0f %12.0f %12.0f %12.0f %12.0f %12.0f' % (
+                name, r['take'], r['refresh'], r['count'], r['connections'], r['release'], r['reap']))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
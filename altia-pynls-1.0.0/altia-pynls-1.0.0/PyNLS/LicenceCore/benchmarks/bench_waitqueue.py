@@ -0,0 +1,106 @@
+"""
+Request volume at saturation: clients polling with TakeSeat against clients
+waiting in the seat wait queue with WaitSeat.
+
+More clients than seats each take a seat, hold it for a while and release it,
+through the request handler. A polling client asks again every poll interval
+until it is given a seat, a queued client is notified when a seat is freed for
+it. Reported are the seat requests per session and the mean time to a seat.
+
+Run from the package root with:
+    python -m PyNLS.LicenceCore.benchmarks.bench_waitqueue [seconds] [clients] [seats] [poll interval]
+"""
+import logging
+import random
+import sys
+import threading
+import time
+from PyNLS.LicenceCore.benchmarks.common import CreateManager
+from PyNLS.LicenceCore.clsMessage_pb2 import Message
+from PyNLS.LicenceCore.clsRequestHandler import RequestHandler
+from PyNLS.LicenceCore.clsSeatWaitQueue import SeatWaitQueue
+from PyNLS.LicenceCore.MessageType import MessageType
+
+HoldTime = 0.1
+
+
+def CreateHandler(seats: int, waitQueue: bool) -> RequestHandler:
+    """
+    Creates a request handler of a licence manager licensing the seats of one product.
+
+    :param seats: The number of seats of the product.
+    :param waitQueue: True to queue denied clients, otherwise false.
+    :returns: The request handler.
+    """
+    manager = CreateManager(seats)
+    if waitQueue:
+        manager.WaitQueue = SeatWaitQueue()
+    return RequestHandler(manager, '1.0.0')
+
+
+def Client(handler: RequestHandler, number: int, waitQueue: bool, pollInterval: float, endTime: float,
+           counters: list, lock: threading.Lock) -> None:
+    """
+    Takes, holds and releases a seat until the end time, counting the requests, sessions and time to a seat.
+    """
+    messageType = MessageType.WaitSeat if waitQueue else MessageType.TakeSeat
+    take = Message()
+    take.Type = messageType.value
+    take.Licence.Product = 'Product'
+    take.Body.add(User='user' + str(number), Host='host' + str(number), IP='10.0.0.' + str(number % 256))
+    take.Content = str(RequestHandler.MaximumWait) if waitQueue else ''
+    release = Message()
+    release.CopyFrom(take)
+    release.Type = MessageType.ReleaseSeat.value
+    take, release = take.SerializeToString(), release.SerializeToString()
+    requests = sessions = 0
+    waited = 0.0
+    while time.perf_counter() < endTime:
+        start = time.perf_counter()
+        while True:
+            requests += 1
+            if Message.FromString(handler.Handle(take)).Content == 'True':
+                break
+            if time.perf_counter() >= endTime:
+                break
+            if not waitQueue:
+                time.sleep(pollInterval)
+        if time.perf_counter() >= endTime:
+            break
+        waited += time.perf_counter() - start
+        sessions += 1
+        time.sleep(random.uniform(0.5, 1.5) * HoldTime)
+        requests += 1
+        handler.Handle(release)
+    with lock:
+        counters[0] += requests
+        counters[1] += sessions
+        counters[2] += waited
+
+
+def main(argv: list) -> None:
+    seconds = float(argv[1]) if len(argv) > 1 else 5
+    clients = int(argv[2]) if len(argv) > 2 else 32
+    seats = int(argv[3]) if len(argv) > 3 else 8
+    pollInterval = float(argv[4]) if len(argv) > 4 else 0.01
+    logging.getLogger().setLevel(logging.WARNING)
+    print('%8s %10s %10s %12s %12s' % ('mode', 'requests', 'sessions', 'requests/s', 'wait ms'))
+    for waitQueue in (False, True):
+        handler = CreateHandler(seats, waitQueue)
+        counters = [0, 0, 0.0]
+        lock = threading.Lock()
+        endTime = time.perf_counter() + seconds
+        threads = [threading.Thread(target=Client, args=(handler, n, waitQueue, pollInterval, endTime, counters, lock))
+                   for n in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        handler.Manager.Shutdown()
+        requests, sessions, waited = counters
+        print('%8s %10d %10d %12.1f %12.1f' % ('queue' if waitQueue else 'poll', requests, sessions,
+                                               requests / seconds, waited / sessions * 1000 if sessions else 0.0))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
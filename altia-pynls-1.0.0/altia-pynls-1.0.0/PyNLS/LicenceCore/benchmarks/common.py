@@ -0,0 +1,42 @@
+"""
+Set up shared by the benchmarks: licences and licence managers to run them against.
+"""
+import os
+from PyNLS.LicenceCore.clsLicenceManager import LicenceManager
+from PyNLS.LicenceCore.clsMemoryStorage import MemoryStorage
+from PyNLS.LicenceCore.clsStorage import LicenceRecord
+
+
+def CreateLicences(products: list, seats: int) -> list:
+    """
+    Returns a licence record for each product, as loaded from a licence file.
+
+    :param products: The names of the products to licence.
+    :param seats: The number of seats of each product.
+    :returns: The licence records.
+    """
+    return [LicenceRecord(None, 'Altia', product, 'Customer', None, None, seats, None, None, p + 1, 'code', 1, None)
+            for p, product in enumerate(products)]
+
+
+def CreateManager(seats: int, products: list = ('Product',), storage=None, folder: str = None,
+                  **kwargs) -> LicenceManager:
+    """
+    Creates a licence manager, with a licence for each product, in memory unless another storage is given.
+
+    :param seats: The number of seats of each product.
+    :param products: The names of the products to licence.
+    :param storage: The storage seats are kept in, None for in memory.
+    :param folder: The folder to run the manager in, by default the current folder.
+    :param kwargs: Further arguments of the licence manager, e.g. inMemory and snapshotInterval.
+    :returns: The licence manager.
+    """
+    if folder is not None:
+        os.makedirs(folder, exist_ok=True)
+        os.chdir(folder)
+    if storage is None and 'inMemory' not in kwargs:
+        storage = MemoryStorage()
+    manager = LicenceManager('', '', None, storage=storage, **kwargs)
+    manager.DoubleValidation = False
+    manager.Storage.LoadLicences(CreateLicences(products, seats))
+    return manager
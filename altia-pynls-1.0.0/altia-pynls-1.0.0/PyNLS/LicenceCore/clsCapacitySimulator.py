@@ -0,0 +1,278 @@
+from .clsLicenceManager import LicenceManager
+from .clsMemoryStorage import MemoryStorage
+from .clsStorage import LicenceRecord, Storage
+from .clsClock import SimulatedClock
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple
+import itertools
+import logging
+import random
+import heapq
+import time
+
+
+class Population(NamedTuple):
+    """
+    A synthetic population of users of a product, times in seconds.
+    Each idle user starts a session ArrivalRate times an hour on average, a session
+    lasts SessionLength on average, a CrashRate fraction of sessions end without
+    releasing their seat and every request reaches the server after NetworkDelay
+    on average.
+    """
+    Name: str
+    Product: str
+    Users: int
+    ArrivalRate: float
+    SessionLength: float
+    CrashRate: float = 0.0
+    NetworkDelay: float = 0.0
+
+
+class ProductResult(NamedTuple):
+    """
+    The seat usage of a product over a simulation. Stale seats are held by
+    sessions that have ended without releasing them, until they expire, and
+    late refreshes reached the server after their seat had expired.
+    """
+    Product: str
+    Seats: int
+    Requests: int
+    Denials: int
+    DenialProbability: float
+    MeanSeatsInUse: float
+    MaximumSeatsInUse: int
+    MeanStaleSeats: float
+    LateRefreshes: int
+
+
+class SimulationResult(NamedTuple):
+    """
+    The outcome of a simulation, DatabaseWriteRate in seat writes per second of simulated time.
+    """
+    SimulatedTime: float
+    ElapsedTime: float
+    DatabaseWrites: int
+    DatabaseWriteRate: float
+    Products: Dict[str, ProductResult]
+
+
+class CapacitySimulator:
+    """
+    Discrete-event simulator of a licence server, for choosing the heartbeat,
+    fudge factor and seat counts. Synthetic populations take, refresh and release
+    seats of a real licence manager, driven by a simulated clock, so days of
+    activity are simulated in seconds. Sessions arrive as a Poisson process and
+    last an exponentially distributed time, as does the network delay of each
+    request. The seats in use are sampled every SampleInterval.
+    """
+    SampleInterval = 60.0
+
+    m_HeartBeat = 300
+    m_FudgeFactor = LicenceManager.FudgeFactor
+    m_Writes = 0
+
+    @property
+    def Manager(self) -> LicenceManager:
+        """
+        Gets the licence manager the populations take seats of.
+
+        :returns: The licence manager.
+        """
+        return self.m_Manager
+
+    @property
+    def Clock(self) -> SimulatedClock:
+        """
+        Gets the simulated clock of the licence manager.
+
+        :returns: The simulated clock.
+        """
+        return self.m_Clock
+
+    def __init__(self, seats: Dict[str, int], populations: List[Population], heartBeat: int = 300,
+                 fudgeFactor: int = LicenceManager.FudgeFactor, seed: int = None, storage: Storage = None):
+        """
+        Initializes a licence manager licensing the specified seats of each product, with no seats taken.
+
+        :param seats: A dictionary of product name to its number of seats.
+        :param populations: The populations of users taking seats.
+        :param heartBeat: The heartbeat, in seconds, clients refresh their seat at.
+        :param fudgeFactor: The time, in seconds, a seat is kept after its heartbeat is missed.
+        :param seed: The seed of the random numbers, for a repeatable simulation.
+        :param storage: The storage of the licence manager, by default an in memory storage.
+        """
+        if heartBeat <= 0:
+            raise ValueError
+        self.m_Seats = dict(seats)
+        self.m_HeartBeat = heartBeat
+        self.m_FudgeFactor = fudgeFactor
+        self.m_Random = random.Random(seed)
+        self.m_Clock = SimulatedClock(datetime(2000, 1, 1))
+        self.m_Manager = LicenceManager('', '', None, storage=storage or MemoryStorage(), clock=self.m_Clock)
+        self.m_Manager.DoubleValidation = False
+        self.m_Manager.HeartBeat = heartBeat
+        self.m_Manager.FudgeFactor = fudgeFactor
+        self.m_Manager.Storage.LoadLicences([
+            LicenceRecord(None, 'Simulation', product, 'Simulation', None, None, count, None, None, 1, 'code', 1, None)
+            for product, count in self.m_Seats.items()
+        ])
+        self.m_Events = []
+        self.m_Sequence = itertools.count()
+        self.m_Idle: Dict[str, List[SimulatedSession]] = {}
+        self.m_Sessions: Dict[str, SimulatedSession] = {}
+        for number, population in enumerate(populations):
+            if population.Product not in self.m_Seats:
+                raise ValueError('Population \'' + population.Name + '\' uses an unlicensed product')
+            sessions = [SimulatedSession(population, number, i) for i in range(population.Users)]
+            self.m_Idle[population.Name] = sessions
+            self.m_Sessions.update((session.UserName, session) for session in sessions)
+            self.Schedule(self.NextArrival(population, len(sessions)), SimulatedSession.Arrive, population)
+        self.Schedule(0.0, SimulatedSession.Sample, None)
+        # Requests, denials, samples, seats in use, most seats in use, stale seats, late refreshes...
+        self.m_Counters = {product: [0, 0, 0, 0, 0, 0, 0] for product in self.m_Seats}
+        self.m_Writes = 0
+
+    def Run(self, duration: float) -> SimulationResult:
+        """
+        Simulates the populations for the specified time, carrying on from the end of the previous run.
+        The outcome covers every run so far.
+
+        :param duration: The time, in seconds, to simulate.
+        :returns: The outcome of the simulation.
+        """
+        start = time.perf_counter()
+        endTime = self.m_Clock.Monotonic() + duration
+        heartBeat = timedelta(seconds=self.m_HeartBeat)
+        staleAfter = self.m_HeartBeat + self.m_FudgeFactor
+        root = logging.getLogger()
+        level = root.level
+        # Every seat request is logged, which would take longer than the seat logic...
+        root.setLevel(logging.WARNING)
+        try:
+            while self.m_Events and self.m_Events[0][0] < endTime:
+                eventTime, _, kind, subject = heapq.heappop(self.m_Events)
+                self.SetTime(eventTime)
+                if kind == SimulatedSession.Sample:
+                    self.Sample()
+                    self.Schedule(eventTime + self.SampleInterval, kind, None)
+                elif kind == SimulatedSession.Arrive:
+                    population = subject
+                    idle = self.m_Idle[population.Name]
+                    if idle:
+                        session = idle.pop(self.m_Random.randrange(len(idle)))
+                        counters = self.m_Counters[population.Product]
+                        counters[0] += 1
+                        if self.m_Manager.TakeSeat(population.Product, session.IpAddress, session.UserName,
+                                                   session.Host, heartBeat):
+                            self.m_Writes += 1
+                            session.Active = True
+                            session.Generation += 1
+                            session.Crashed = self.m_Random.random() < population.CrashRate
+                            session.ExpiryTime = eventTime + staleAfter
+                            subject = (session, session.Generation)
+                            self.Schedule(eventTime + self.Exponential(population.SessionLength),
+                                          SimulatedSession.End, subject)
+                            self.Schedule(eventTime + self.m_HeartBeat + self.Exponential(population.NetworkDelay),
+                                          SimulatedSession.Refresh, subject)
+                        else:
+                            counters[1] += 1
+                            idle.append(session)
+                    self.Schedule(eventTime + self.NextArrival(population, len(idle)), kind, population)
+                elif kind == SimulatedSession.Refresh:
+                    session, generation = subject
+                    # The refreshes of an ended session stop, it may have started a new session since...
+                    if not session.Active or session.Generation != generation:
+                        continue
+                    if eventTime > session.ExpiryTime:
+                        self.m_Counters[session.Population.Product][6] += 1
+                    self.m_Manager.RefreshSeat(session.Population.Product, session.IpAddress, session.UserName,
+                                               session.Host, heartBeat)
+                    self.m_Writes += 1
+                    session.ExpiryTime = eventTime + staleAfter
+                    self.Schedule(eventTime + self.m_HeartBeat + self.Exponential(session.Population.NetworkDelay),
+                                  kind, subject)
+                elif kind == SimulatedSession.End:
+                    session = subject[0]
+                    session.Active = False
+                    # A crashed client leaves its seat to go stale...
+                    if not session.Crashed:
+                        self.m_Manager.ReleaseSeat(session.Population.Product, session.IpAddress, session.UserName)
+                        self.m_Writes += 1
+                    self.m_Idle[session.Population.Name].append(session)
+            self.SetTime(endTime)
+        finally:
+            root.setLevel(level)
+        simulatedTime = self.m_Clock.Monotonic()
+        products = {}
+        for product, (requests, denials, samples, inUse, maximum, stale, late) in self.m_Counters.items():
+            products[product] = ProductResult(product, self.m_Seats[product], requests, denials,
+                                              denials / requests if requests else 0.0,
+                                              inUse / samples if samples else 0.0, maximum,
+                                              stale / samples if samples else 0.0, late)
+        return SimulationResult(simulatedTime, time.perf_counter() - start, self.m_Writes,
+                                self.m_Writes / simulatedTime if simulatedTime else 0.0, products)
+
+    def Sample(self) -> None:
+        """
+        Counts the seats in use of each product, and the stale seats among them.
+        """
+        nowTime = self.m_Clock.Now()
+        for product, counters in self.m_Counters.items():
+            connections = self.m_Manager.Storage.GetConnections(product, nowTime)
+            counters[2] += 1
+            counters[3] += len(connections)
+            counters[4] = max(counters[4], len(connections))
+            counters[5] += sum(1 for c in connections if not self.m_Sessions[c.UserName].Active)
+
+    def SetTime(self, eventTime: float) -> None:
+        """
+        Moves the simulated clock forward to the time of an event.
+        """
+        self.m_Clock.Advance(max(0.0, eventTime - self.m_Clock.Monotonic()))
+
+    def Schedule(self, eventTime: float, kind: int, subject) -> None:
+        """
+        Adds an event to the event queue, events at the same time happen in the order they were scheduled.
+        """
+        heapq.heappush(self.m_Events, (eventTime, next(self.m_Sequence), kind, subject))
+
+    def NextArrival(self, population: Population, idleUsers: int) -> float:
+        """
+        Returns the time, in seconds, until the next session of the population starts.
+        """
+        rate = population.ArrivalRate * max(idleUsers, 1) / 3600.0
+        return self.m_Random.expovariate(rate) if rate > 0 else float('inf')
+
+    def Exponential(self, mean: float) -> float:
+        """
+        Returns an exponentially distributed time, in seconds, with the specified mean, 0 if the mean is 0.
+        """
+        return self.m_Random.expovariate(1.0 / mean) if mean > 0 else 0.0
+
+    def Close(self) -> None:
+        """
+        Shuts the licence manager down.
+        """
+        self.m_Manager.Shutdown()
+
+
+# Private SimulatedSession (helper) class
+
+class SimulatedSession:
+    """
+    A simulated user of a population and its current session.
+    """
+    Sample = 0
+    Arrive = 1
+    Refresh = 2
+    End = 3
+
+    def __init__(self, population: Population, number: int, index: int):
+        self.Population = population
+        self.UserName = population.Name + str(index)
+        self.Host = 'host-' + self.UserName
+        self.IpAddress = '10.%d.%d.%d' % (number % 256, index // 256 % 256, index % 256)
+        self.Active = False
+        self.Crashed = False
+        self.Generation = 0
+        self.ExpiryTime = 0.0
@@ -0,0 +1,123 @@
+from datetime import date, datetime, timedelta
+import threading
+import time
+
+
+class Clock:
+    """
+    The time source of the licence manager and configuration.
+
+    Now returns the current local date and time, cached for a tick of the
+    resolution, so the several reads of a request, and of every licence checked
+    for its date window, cost an attribute read rather than a system call and
+    agree with each other. Monotonic returns a monotonic time, in seconds, for
+    measuring intervals, and is not affected by changes to the system clock.
+
+    A SimulatedClock can be given in place of the clock, so time dependent
+    behaviour can be driven in tests and benchmarks without waiting.
+    """
+    DefaultResolution = 0.01
+
+    @property
+    def Resolution(self) -> float:
+        """
+        Gets the time, in seconds, the current date and time is cached for.
+
+        :returns: The resolution of the clock, 0 if the time is not cached.
+        """
+        return self.m_Resolution
+
+    def __init__(self, resolution: float = DefaultResolution):
+        """
+        Initializes the clock.
+
+        :param resolution: The time, in seconds, the current date and time is cached for, 0 to not cache it.
+        """
+        self.m_Resolution = resolution
+        # The tick is replaced as a whole, so a reader never sees the time of one tick with the end of another...
+        self.m_Tick = (float('-inf'), datetime.now())
+
+    def Now(self) -> datetime:
+        """
+        Returns the current local date and time, as of the start of the current tick.
+
+        :returns: The current date and time.
+        """
+        monotonic = time.perf_counter()
+        tickEnd, nowTime = self.m_Tick
+        if monotonic < tickEnd:
+            return nowTime
+        nowTime = datetime.now()
+        self.m_Tick = (monotonic + self.m_Resolution, nowTime)
+        return nowTime
+
+    def Today(self) -> date:
+        """
+        Returns the current local date.
+
+        :returns: The current date.
+        """
+        return self.Now().date()
+
+    def Time(self) -> float:
+        """
+        Returns the current time, in seconds since the epoch, as of the start of the current tick.
+
+        :returns: The current time.
+        """
+        return self.Now().timestamp()
+
+    def Monotonic(self) -> float:
+        """
+        Returns a monotonic time, in seconds, for measuring intervals, at the highest resolution available.
+
+        :returns: The monotonic time.
+        """
+        return time.perf_counter()
+
+
+class SimulatedClock(Clock):
+    """
+    A clock that only moves when advanced, for tests and benchmarks. The
+    monotonic time advances with the date and time, from 0.
+    """
+    def __init__(self, start: datetime = None):
+        """
+        Initializes the clock at the specified date and time.
+
+        :param start: The date and time the clock starts at, by default the current date and time.
+        """
+        super().__init__(0)
+        self.m_Lock = threading.Lock()
+        self.m_Start = start if start is not None else datetime.now()
+        self.m_Now = self.m_Start
+        self.m_Monotonic = 0.0
+
+    def Now(self) -> datetime:
+        return self.m_Now
+
+    def Monotonic(self) -> float:
+        return self.m_Monotonic
+
+    def Advance(self, seconds: float) -> datetime:
+        """
+        Moves the clock forward.
+
+        :param seconds: The time, in seconds, to move the clock forward by.
+        :returns: The new date and time of the clock.
+        """
+        if seconds < 0:
+            raise ValueError
+        with self.m_Lock:
+            # The time is kept from the start rather than added to, so rounding does not build up...
+            self.m_Monotonic += seconds
+            self.m_Now = self.m_Start + timedelta(seconds=self.m_Monotonic)
+            return self.m_Now
+
+    def Set(self, value: datetime) -> None:
+        """
+        Moves the clock to the specified date and time, the monotonic time is moved by the same amount.
+
+        :param value: The date and time to move the clock to, not before its current date and time.
+        """
+        self.Advance((value - self.m_Now).total_seconds())
@@ -1,6 +1,10 @@
 import os
 from xml.etree import ElementTree
 from datetime import datetime, timedelta
+from .clsRateLimiter import RateLimit
+from .clsClock import Clock
+from .MessageType import MessageType
+from typing import Dict
 
 
 class Config:
@@ -23,6 +27,7 @@ class Config:
     HighPort = 65535
     DefaultReloadTime = '02:30:00'
 
+    m_AdminSecret = ''
     m_LicenceFolder = ''
     m_DataFolder = ''
     m_LicenceServerPort = DefaultLicenceServerPort
@@ -30,13 +35,126 @@ class Config:
     m_ReloadTime = DefaultReloadTime
     m_NumberOfThreads = 5
     m_HeartBeat = 300
+    m_MaximumHeartBeat = 0
+    m_InMemoryDatabase = False
+    m_LicenceBundle = False
+    m_LogFile = ''
+    m_SnapshotInterval = 60
     m_EnableWebServer = False
     m_MaximumLogFileSize = 10000
     m_NumberOfLogs = 10
     m_Password = ''
+    m_ClaimWindow = 0
+    m_CoordinatorAddress = ''
+    m_CoordinatorPort = 0
+    m_PrimaryAddress = ''
+    m_RateLimits = {}
+    m_RecentEvents = 4096
+    m_ReplicationPort = 0
+    m_SeatJournal = False
+    m_SlowQueryThreshold = 0
+    m_UsageRollup = False
+    m_WarmRestart = False
+    m_Clock = Clock()
     m_UserName = ''
     m_ePassword = ''
 
+    @property
+    def AdminSecret(self) -> str:
+        """
+        Gets the secret administrative requests (QueryEvents, ReleaseSeats and Kill) must carry.
+        The default value is empty, administrative requests are refused.
+
+        :returns: The secret administrative requests must carry.
+        """
+        return self.m_AdminSecret
+
+    @AdminSecret.setter
+    def AdminSecret(self, value) -> None:
+        """
+        Sets the secret administrative requests must carry, empty to refuse administrative requests.
+
+        :param value: The secret administrative requests must carry.
+        """
+        self.m_AdminSecret = value if value else ''
+
+    @property
+    def Clock(self) -> Clock:
+        """
+        Gets the time source the licence manager and the next licence reload are timed by.
+
+        :returns: The clock.
+        """
+        return self.m_Clock
+
+    @Clock.setter
+    def Clock(self, value: Clock) -> None:
+        """
+        Sets the time source, e.g. a simulated clock in tests.
+
+        :param value: The clock.
+        """
+        self.m_Clock = value
+
+    @property
+    def ClaimWindow(self) -> int:
+        """
+        Gets the time, in seconds, a seat freed for a client waiting in the seat wait queue is reserved for it.
+        The default value is 0, denied clients are not queued.
+
+        :returns: The claim window in seconds.
+        """
+        return self.m_ClaimWindow
+
+    @ClaimWindow.setter
+    def ClaimWindow(self, value) -> None:
+        """
+        Sets the time, in seconds, a seat freed for a waiting client is reserved for it, 0 to not queue clients.
+
+        :param value: The claim window in seconds.
+        """
+        if value >= 0:
+            self.m_ClaimWindow = value
+
+    @property
+    def CoordinatorAddress(self) -> str:
+        """
+        Gets the address of the seat pool coordinator this server leases its quota of seats from,
+        e.g. tcp://coordinator:3183. Empty if this server is not a seat pool node.
+
+        :returns: The address of the seat pool coordinator.
+        """
+        return self.m_CoordinatorAddress
+
+    @CoordinatorAddress.setter
+    def CoordinatorAddress(self, value) -> None:
+        """
+        Sets the address of the seat pool coordinator this server leases its quota of seats from.
+
+        :param value: The address of the seat pool coordinator.
+        """
+        self.m_CoordinatorAddress = value if value else ''
+
+    @property
+    def CoordinatorPort(self) -> int:
+        """
+        Gets the port seat pool nodes lease their quota of seats from this server on.
+        The default value is 0, this server is not a seat pool coordinator.
+
+        :returns: The port seat pool nodes connect to.
+        """
+        return self.m_CoordinatorPort
+
+    @CoordinatorPort.setter
+    def CoordinatorPort(self, value) -> None:
+        """
+        Sets the port seat pool nodes lease their quota of seats from this server on, 0 to not coordinate.
+
+        :param value: The port seat pool nodes connect to.
+        """
+        if value == 0 or self.LowPort <= value <= self.HighPort:
+            self.m_CoordinatorPort = value
+
     @property
     def DataFolder(self) -> str:
         """
@@ -94,6 +212,45 @@ class Config:
         if value > 0:
             self.m_HeartBeat = value
 
+    @property
+    def InMemoryDatabase(self) -> bool:
+        """
+        Gets a value to indicate if the seat store is held in memory.
+        When true seats are snapshotted to the data file every SnapshotInterval,
+        up to one interval of heartbeats may be lost if the service stops abruptly.
+
+        :returns: If the seat store is held in memory
+        """
+        return self.m_InMemoryDatabase
+
+    @InMemoryDatabase.setter
+    def InMemoryDatabase(self, value) -> None:
+        """
+        Sets if the seat store is held in memory
+
+        :param value: True to hold the seat store in memory, otherwise false
+        """
+        self.m_InMemoryDatabase = value
+
+    @property
+    def LicenceBundle(self) -> bool:
+        """
+        Gets a value to indicate if licences are loaded from a compiled licence bundle in the data folder,
+        rebuilt whenever the licence folder changes.
+
+        :returns: If licences are loaded from a licence bundle
+        """
+        return self.m_LicenceBundle
+
+    @LicenceBundle.setter
+    def LicenceBundle(self, value) -> None:
+        """
+        Sets if licences are loaded from a compiled licence bundle
+
+        :param value: True to load licences from a licence bundle, otherwise false
+        """
+        self.m_LicenceBundle = value
+
     @property
     def LicenceFolder(self) -> str:
         """
@@ -112,6 +269,45 @@ class Config:
         """
         self.m_LicenceFolder = value
 
+    @property
+    def LogFile(self) -> str:
+        """
+        Gets the name of the log file, written in the data folder and rotated using MaximumLogFileSize
+        and NumberOfLogs. Empty if the log is not written to a file.
+
+        :returns: The name of the log file.
+        """
+        return self.m_LogFile
+
+    @LogFile.setter
+    def LogFile(self, value) -> None:
+        """
+        Sets the name of the log file, empty to not write the log to a file.
+
+        :param value: The name of the log file.
+        """
+        self.m_LogFile = value if value else ''
+
+    @property
+    def MaximumHeartBeat(self) -> int:
+        """
+        Gets the longest heartbeat, in seconds, the server may advertise to clients when
+        seat writes load the database. 0, or a value not above HeartBeat, keeps the heartbeat fixed.
+
+        :returns: The longest heartbeat the server may advertise.
+        """
+        return self.m_MaximumHeartBeat
+
+    @MaximumHeartBeat.setter
+    def MaximumHeartBeat(self, value) -> None:
+        """
+        Sets the longest heartbeat, in seconds, the server may advertise to clients
+
+        :param value: The longest heartbeat the server may advertise.
+        """
+        if value >= 0:
+            self.m_MaximumHeartBeat = value
+
     @property
     def MaximumLogFileSize(self) -> int:
         """
@@ -185,6 +381,86 @@ class Config:
         """
         self.m_LicenceServerPort = value
 
+    @property
+    def PrimaryAddress(self) -> str:
+        """
+        Gets the replication address of the primary server this server is a warm standby for,
+        e.g. tcp://primary:3182. Empty if this server is not a standby.
+
+        :returns: The replication address of the primary server.
+        """
+        return self.m_PrimaryAddress
+
+    @PrimaryAddress.setter
+    def PrimaryAddress(self, value) -> None:
+        """
+        Sets the replication address of the primary server this server is a warm standby for.
+
+        :param value: The replication address of the primary server.
+        """
+        self.m_PrimaryAddress = value if value else ''
+
+    @property
+    def RateLimits(self) -> Dict[MessageType, RateLimit]:
+        """
+        Gets the limit each client (IP Address and user) is held to for each limited message type.
+        The default value is empty, requests are not limited.
+
+        :returns: A dictionary of message type to its limit.
+        """
+        return self.m_RateLimits
+
+    @RateLimits.setter
+    def RateLimits(self, value: Dict[MessageType, RateLimit]) -> None:
+        """
+        Sets the limit each client is held to for each limited message type,
+        limits without a positive rate and burst are ignored.
+
+        :param value: A dictionary of message type to its limit.
+        """
+        self.m_RateLimits = {messageType: limit for messageType, limit in (value or {}).items()
+                             if limit.Rate > 0 and limit.Burst >= 1}
+
+    @property
+    def RecentEvents(self) -> int:
+        """
+        Gets the number of recent events kept in memory, queryable at runtime.
+        The default value is 4096, 0 if recent events are not kept.
+
+        :returns: The number of recent events kept.
+        """
+        return self.m_RecentEvents
+
+    @RecentEvents.setter
+    def RecentEvents(self, value) -> None:
+        """
+        Sets the number of recent events kept in memory, 0 to not keep recent events.
+
+        :param value: The number of recent events kept.
+        """
+        if 0 <= value <= 65536:
+            self.m_RecentEvents = value
+
+    @property
+    def ReplicationPort(self) -> int:
+        """
+        Gets the port standby servers follow this server's seat changes on.
+        The default value is 0, seat changes are not replicated.
+
+        :returns: The port seat changes are replicated on.
+        """
+        return self.m_ReplicationPort
+
+    @ReplicationPort.setter
+    def ReplicationPort(self, value) -> None:
+        """
+        Sets the port standby servers follow this server's seat changes on, 0 to not replicate.
+
+        :param value: The port seat changes are replicated on.
+        """
+        if value == 0 or self.LowPort <= value <= self.HighPort:
+            self.m_ReplicationPort = value
+
     @property
     def ReloadTime(self) -> str:
         """
@@ -203,6 +479,103 @@ class Config:
         """
         self.m_ReloadTime = value
 
+    @property
+    def SeatJournal(self) -> bool:
+        """
+        Gets a value to indicate if seat events are recorded to the binary seat journal.
+        The journal is rotated using MaximumLogFileSize and NumberOfLogs.
+
+        :returns: If seat events are recorded to the seat journal
+        """
+        return self.m_SeatJournal
+
+    @SeatJournal.setter
+    def SeatJournal(self, value) -> None:
+        """
+        Sets if seat events are recorded to the binary seat journal
+
+        :param value: True to record seat events, otherwise false
+        """
+        self.m_SeatJournal = value
+
+    @property
+    def SlowQueryThreshold(self) -> int:
+        """
+        Gets the time, in milliseconds, above which an SQL statement is written to the slow query log.
+        The default value is 0, statements are not profiled.
+
+        :returns: The slow query threshold in milliseconds.
+        """
+        return self.m_SlowQueryThreshold
+
+    @SlowQueryThreshold.setter
+    def SlowQueryThreshold(self, value) -> None:
+        """
+        Sets the time, in milliseconds, above which an SQL statement is written to the slow query log, 0 to not profile.
+
+        :param value: The slow query threshold in milliseconds.
+        """
+        if value >= 0:
+            self.m_SlowQueryThreshold = value
+
+    @property
+    def SnapshotInterval(self) -> int:
+        """
+        Gets the interval, in seconds, between snapshots of the in memory seat store
+        The default value is 60
+
+        :returns: The interval between snapshots of the in memory seat store.
+        """
+        return self.m_SnapshotInterval
+
+    @SnapshotInterval.setter
+    def SnapshotInterval(self, value) -> None:
+        """
+        Sets the interval, in seconds, between snapshots of the in memory seat store
+        The default value is 60
+
+        :param value: The interval between snapshots of the in memory seat store.
+        """
+        if value > 0:
+            self.m_SnapshotInterval = value
+
+    @property
+    def UsageRollup(self) -> bool:
+        """
+        Gets a value to indicate if seat usage is sampled every minute into the usage rollups.
+
+        :returns: If seat usage is sampled into the usage rollups
+        """
+        return self.m_UsageRollup
+
+    @UsageRollup.setter
+    def UsageRollup(self, value) -> None:
+        """
+        Sets if seat usage is sampled every minute into the usage rollups
+
+        :param value: True to sample seat usage, otherwise false
+        """
+        self.m_UsageRollup = value
+
+    @property
+    def WarmRestart(self) -> bool:
+        """
+        Gets a value to indicate if live seats are written to a seat snapshot on shutdown
+        and restored from it on startup, if the licences have not changed.
+
+        :returns: If seats are kept across a restart
+        """
+        return self.m_WarmRestart
+
+    @WarmRestart.setter
+    def WarmRestart(self, value) -> None:
+        """
+        Sets if live seats are kept across a restart
+
+        :param value: True to keep seats across a restart, otherwise false
+        """
+        self.m_WarmRestart = value
+
     @property
     def WebServerPort(self) -> int:
         """
@@ -285,8 +658,8 @@ class Config:
         """
         dummy_time = datetime.strptime(self.m_ReloadTime, "%H:%M:%S")
         reload_time = timedelta(hours=dummy_time.hour, minutes=dummy_time.minute)
-        nextCheck = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) + reload_time
-        dateNow = datetime.now()
+        dateNow = self.m_Clock.Now()
+        nextCheck = dateNow.replace(hour=0, minute=0, second=0, microsecond=0) + reload_time
         if nextCheck < dateNow:
             nextCheck += timedelta(days=1)
         return nextCheck - dateNow
@@ -301,12 +674,28 @@ class Config:
             raise ValueError
         config_file = ElementTree.ElementTree()
         config_content = ElementTree.Element('licence_server_config')
+        AdminSecret = ElementTree.SubElement(config_content, 'adminsecret')
+        AdminSecret.text = self.AdminSecret
+        ClaimWindow = ElementTree.SubElement(config_content, 'claimwindow')
+        ClaimWindow.text = str(self.ClaimWindow)
+        CoordinatorAddress = ElementTree.SubElement(config_content, 'coordinatoraddress')
+        CoordinatorAddress.text = self.CoordinatorAddress
+        CoordinatorPort = ElementTree.SubElement(config_content, 'coordinatorport')
+        CoordinatorPort.text = str(self.CoordinatorPort)
         DataFolder = ElementTree.SubElement(config_content, 'datafolder')
         DataFolder.text = self.DataFolder
         HeartBeat = ElementTree.SubElement(config_content, 'heartbeat')
         HeartBeat.text = self.HeartBeat
+        InMemoryDatabase = ElementTree.SubElement(config_content, 'inmemorydatabase')
+        InMemoryDatabase.text = 'true' if self.InMemoryDatabase else 'false'
+        LicenceBundle = ElementTree.SubElement(config_content, 'licencebundle')
+        LicenceBundle.text = 'true' if self.LicenceBundle else 'false'
         LicenceFolder = ElementTree.SubElement(config_content, 'licencefolder')
         LicenceFolder.text = self.LicenceFolder
+        LogFile = ElementTree.SubElement(config_content, 'logfile')
+        LogFile.text = self.LogFile
+        MaximumHeartBeat = ElementTree.SubElement(config_content, 'maximumheartbeat')
+        MaximumHeartBeat.text = str(self.MaximumHeartBeat)
         MaximumLogFileSize = ElementTree.SubElement(config_content, 'maximumlogfilesize')
         MaximumLogFileSize.text = self.MaximumLogFileSize
         NumberOfLogs = ElementTree.SubElement(config_content, 'numberoflogs')
@@ -315,8 +704,28 @@ class Config:
         NumberOfThreads.text = self.NumberOfThreads
         LicenceServerPort = ElementTree.SubElement(config_content, 'port')
         LicenceServerPort.text = self.LicenceServerPort
+        PrimaryAddress = ElementTree.SubElement(config_content, 'primaryaddress')
+        PrimaryAddress.text = self.PrimaryAddress
+        RateLimits = ElementTree.SubElement(config_content, 'ratelimits')
+        for messageType, limit in self.RateLimits.items():
+            ElementTree.SubElement(RateLimits, 'ratelimit', type=messageType.name,
+                                   rate=str(limit.Rate), burst=str(limit.Burst))
+        RecentEvents = ElementTree.SubElement(config_content, 'recentevents')
+        RecentEvents.text = str(self.RecentEvents)
         ReloadTime = ElementTree.SubElement(config_content, 'reloadtime')
         ReloadTime.text = self.ReloadTime
+        ReplicationPort = ElementTree.SubElement(config_content, 'replicationport')
+        ReplicationPort.text = str(self.ReplicationPort)
+        SeatJournal = ElementTree.SubElement(config_content, 'seatjournal')
+        SeatJournal.text = 'true' if self.SeatJournal else 'false'
+        SlowQueryThreshold = ElementTree.SubElement(config_content, 'slowquerythreshold')
+        SlowQueryThreshold.text = str(self.SlowQueryThreshold)
+        SnapshotInterval = ElementTree.SubElement(config_content, 'snapshotinterval')
+        SnapshotInterval.text = str(self.SnapshotInterval)
+        UsageRollup = ElementTree.SubElement(config_content, 'usagerollup')
+        UsageRollup.text = 'true' if self.UsageRollup else 'false'
+        WarmRestart = ElementTree.SubElement(config_content, 'warmrestart')
+        WarmRestart.text = 'true' if self.WarmRestart else 'false'
         WebServerPort = ElementTree.SubElement(config_content, 'webserverport')
         WebServerPort.text = self.WebServerPort
         EnableWebServer = ElementTree.SubElement(config_content, 'enablewebserver')
@@ -341,12 +750,28 @@ class Config:
         try:
             if os.path.isfile(os.path.join(os.getcwd(), fileName)) and (fileName.endswith('.xml')):
                 config_content = ElementTree.parse(os.path.join(os.getcwd(), fileName)).getroot()
+                if config_content.find('adminsecret') is not None:
+                    self.AdminSecret = config_content.find('adminsecret').text
+                if config_content.find('claimwindow') is not None:
+                    self.ClaimWindow = int(config_content.find('claimwindow').text)
+                if config_content.find('coordinatoraddress') is not None:
+                    self.CoordinatorAddress = config_content.find('coordinatoraddress').text
+                if config_content.find('coordinatorport') is not None:
+                    self.CoordinatorPort = int(config_content.find('coordinatorport').text)
                 if config_content.find('datafolder') is not None:
                     self.DataFolder = config_content.find('datafolder').text
                 if config_content.find('heartbeat') is not None:
                     self.HeartBeat = int(config_content.find('heartbeat').text)
+                if config_content.find('inmemorydatabase') is not None:
+                    self.InMemoryDatabase = (config_content.find('inmemorydatabase').text == 'true')
+                if config_content.find('licencebundle') is not None:
+                    self.LicenceBundle = (config_content.find('licencebundle').text == 'true')
                 if config_content.find('licencefolder') is not None:
                     self.LicenceFolder = config_content.find('licencefolder').text
+                if config_content.find('logfile') is not None:
+                    self.LogFile = config_content.find('logfile').text
+                if config_content.find('maximumheartbeat') is not None:
+                    self.MaximumHeartBeat = int(config_content.find('maximumheartbeat').text)
                 if config_content.find('maximumlogfilesize') is not None:
                     self.MaximumLogFileSize = int(config_content.find('maximumlogfilesize').text)
                 if config_content.find('numberoflogs') is not None:
@@ -355,8 +780,31 @@ class Config:
                     self.NumberOfThreads = int(config_content.find('numberofthreads').text)
                 if config_content.find('port') is not None:
                     self.LicenceServerPort = int(config_content.find('port').text)
+                if config_content.find('primaryaddress') is not None:
+                    self.PrimaryAddress = config_content.find('primaryaddress').text
+                if config_content.find('ratelimits') is not None:
+                    limits = {}
+                    for element in config_content.find('ratelimits').findall('ratelimit'):
+                        if element.get('type') in MessageType.__members__:
+                            limits[MessageType[element.get('type')]] = RateLimit(float(element.get('rate', 0)),
+                                                                                 int(element.get('burst', 0)))
+                    self.RateLimits = limits
+                if config_content.find('recentevents') is not None:
+                    self.RecentEvents = int(config_content.find('recentevents').text)
                 if config_content.find('reloadtime') is not None:
                     self.ReloadTime = config_content.find('reloadtime').text
+                if config_content.find('replicationport') is not None:
+                    self.ReplicationPort = int(config_content.find('replicationport').text)
+                if config_content.find('seatjournal') is not None:
+                    self.SeatJournal = (config_content.find('seatjournal').text == 'true')
+                if config_content.find('slowquerythreshold') is not None:
+                    self.SlowQueryThreshold = int(config_content.find('slowquerythreshold').text)
+                if config_content.find('snapshotinterval') is not None:
+                    self.SnapshotInterval = int(config_content.find('snapshotinterval').text)
+                if config_content.find('usagerollup') is not None:
+                    self.UsageRollup = (config_content.find('usagerollup').text == 'true')
+                if config_content.find('warmrestart') is not None:
+                    self.WarmRestart = (config_content.find('warmrestart').text == 'true')
                 if config_content.find('webserverport') is not None:
                     self.WebServerPort = int(config_content.find('webserverport').text)
                 if config_content.find('enablewebserver') is not None:
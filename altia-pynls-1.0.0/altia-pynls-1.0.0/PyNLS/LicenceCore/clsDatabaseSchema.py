@@ -16,31 +16,157 @@ class DatabaseSchema:
         sql_string += Database.SqlFieldUserName + " VARCHAR(128) NOT NULL, "
         sql_string += Database.SqlFieldLogonTime + " DATETIME NOT NULL, "
         sql_string += Database.SqlFieldUpdateTime + " DATETIME NOT NULL, "
-        sql_string += Database.SqlFieldProduct + " VARCHAR(32) NOT NULL, "
+        sql_string += Database.SqlFieldExpiryTime + " DATETIME NOT NULL, "
+        sql_string += Database.SqlTableProduct + Database.SqlFieldForeignKeyId + " INTEGER NOT NULL, "
         sql_string += Database.SqlTableLicence + Database.SqlFieldForeignKeyId + " INTEGER NULL, "
+        sql_string += "FOREIGN KEY(" + Database.SqlTableProduct + Database.SqlFieldForeignKeyId + ") REFERENCES "
+        sql_string += Database.SqlTableProduct + "(" + Database.SqlFieldId + "), "
         sql_string += "FOREIGN KEY(" + Database.SqlTableLicence + Database.SqlFieldForeignKeyId + ") REFERENCES "
         sql_string += Database.SqlTableLicence + "(" + Database.SqlFieldId + ") ON DELETE CASCADE"
         sql_string += "); "
 
         # Indexes
-        sql_string += "CREATE UNIQUE INDEX idx_" + Database.SqlTableConnection + "_" + Database.SqlFieldProduct + "_"
-        sql_string += Database.SqlFieldUserName + "_" + Database.SqlFieldIpAddress + " ON "
+        sql_string += "CREATE UNIQUE INDEX idx_" + Database.SqlTableConnection + "_" + Database.SqlTableProduct
+        sql_string += Database.SqlFieldForeignKeyId + "_" + Database.SqlFieldUserName + "_" + Database.SqlFieldIpAddress + " ON "
         sql_string += Database.SqlTableConnection + "("
-        sql_string += Database.SqlFieldProduct + " COLLATE NOCASE, "
+        sql_string += Database.SqlTableProduct + Database.SqlFieldForeignKeyId + ", "
         sql_string += Database.SqlFieldUserName + ", "
         sql_string += Database.SqlFieldIpAddress + "); "
 
-        sql_string += "CREATE INDEX idx_" + Database.SqlTableConnection + "_" + Database.SqlFieldProduct + "_"
-        sql_string += Database.SqlFieldUpdateTime + " ON "
+        sql_string += DatabaseSchema.GetConnectionExpiryIndexes()
+        return sql_string
+
+    @staticmethod
+    def GetConnectionExpiryIndexes() -> str:
+        """
+        Returns an SQL statement to create the connection table indexes used to find live seats.
+
+        :returns: An SQL statement to create the connection expiry indexes.
+        """
+        sql_string = "CREATE INDEX IF NOT EXISTS idx_" + Database.SqlTableConnection + "_" + Database.SqlTableProduct
+        sql_string += Database.SqlFieldForeignKeyId + "_" + Database.SqlFieldExpiryTime + " ON "
         sql_string += Database.SqlTableConnection + "("
-        sql_string += Database.SqlFieldProduct + " COLLATE NOCASE, "
-        sql_string += Database.SqlFieldUpdateTime + "); "
+        sql_string += Database.SqlTableProduct + Database.SqlFieldForeignKeyId + ", "
+        sql_string += Database.SqlFieldExpiryTime + "); "
 
-        sql_string += "CREATE INDEX idx_" + Database.SqlTableConnection + "_" + Database.SqlTableLicence
-        sql_string += Database.SqlFieldForeignKeyId + "_" + Database.SqlFieldUpdateTime + " ON "
+        sql_string += "CREATE INDEX IF NOT EXISTS idx_" + Database.SqlTableConnection + "_" + Database.SqlTableLicence
+        sql_string += Database.SqlFieldForeignKeyId + "_" + Database.SqlFieldExpiryTime + " ON "
         sql_string += Database.SqlTableConnection + "("
         sql_string += Database.SqlTableLicence + Database.SqlFieldForeignKeyId + ", "
-        sql_string += Database.SqlFieldUpdateTime + "); "
+        sql_string += Database.SqlFieldExpiryTime + "); "
+        return sql_string
+
+    @staticmethod
+    def GetConnectionExpiryUpgrade() -> str:
+        """
+        Returns an SQL statement to add the expiry time to a connection table created
+        before seats carried their own heartbeat. Existing seats get an empty expiry
+        time, so are stale and removed when stale seats are next deleted. Such a table
+        also predates the product table, so its expiry indexes are created when the
+        product upgrade that follows rebuilds it.
+
+        :returns: An SQL statement to upgrade the connection database table.
+        """
+        sql_string = "ALTER TABLE " + Database.SqlTableConnection + " "
+        sql_string += "ADD COLUMN " + Database.SqlFieldExpiryTime + " DATETIME NOT NULL DEFAULT ''; "
+        sql_string += "DROP INDEX IF EXISTS idx_" + Database.SqlTableConnection + "_" + Database.SqlFieldProduct + "_"
+        sql_string += Database.SqlFieldUpdateTime + "; "
+        sql_string += "DROP INDEX IF EXISTS idx_" + Database.SqlTableConnection + "_" + Database.SqlTableLicence
+        sql_string += Database.SqlFieldForeignKeyId + "_" + Database.SqlFieldUpdateTime + "; "
+        return sql_string
+
+    @staticmethod
+    def GetConnectionProductUpgrade() -> str:
+        """
+        Returns an SQL statement to rebuild a connection table created before the product
+        table, replacing the product name of each seat with the id of the product.
+        SQLite cannot drop a column, so the seats are copied to a new table.
+
+        :returns: An SQL statement to upgrade the connection database table.
+        """
+        productId = Database.SqlTableProduct + Database.SqlFieldForeignKeyId
+        licenceId = Database.SqlTableLicence + Database.SqlFieldForeignKeyId
+        oldTable = Database.SqlTableConnection + "_old"
+        columns = ", ".join([Database.SqlFieldId, Database.SqlFieldIpAddress, Database.SqlFieldMachineName,
+                             Database.SqlFieldUserName, Database.SqlFieldLogonTime, Database.SqlFieldUpdateTime,
+                             Database.SqlFieldExpiryTime])
+
+        sql_string = "BEGIN; "
+        sql_string += DatabaseSchema.GetProductInsert(Database.SqlTableConnection)
+        sql_string += "ALTER TABLE " + Database.SqlTableConnection + " RENAME TO " + oldTable + "; "
+        # Index names are global, drop the old ones before the new table creates its own...
+        sql_string += "DROP INDEX IF EXISTS idx_" + Database.SqlTableConnection + "_" + Database.SqlFieldProduct + "_"
+        sql_string += Database.SqlFieldUserName + "_" + Database.SqlFieldIpAddress + "; "
+        sql_string += "DROP INDEX IF EXISTS idx_" + Database.SqlTableConnection + "_" + Database.SqlFieldProduct + "_"
+        sql_string += Database.SqlFieldExpiryTime + "; "
+        sql_string += "DROP INDEX IF EXISTS idx_" + Database.SqlTableConnection + "_" + licenceId + "_"
+        sql_string += Database.SqlFieldExpiryTime + "; "
+        sql_string += DatabaseSchema.GetConnectionSchema()
+        sql_string += "INSERT INTO " + Database.SqlTableConnection + "(" + columns + ", " + productId + ", " + licenceId + ") "
+        sql_string += "SELECT " + columns + ", "
+        sql_string += "(SELECT " + Database.SqlFieldId + " FROM " + Database.SqlTableProduct + " "
+        sql_string += "WHERE " + Database.SqlFieldName + " = lower(" + oldTable + "." + Database.SqlFieldProduct + ")), "
+        sql_string += licenceId + " "
+        sql_string += "FROM " + oldTable + "; "
+        sql_string += "DROP TABLE " + oldTable + "; "
+        sql_string += "COMMIT; "
+        return sql_string
+
+    @staticmethod
+    def GetLicenceProductUpgrade() -> str:
+        """
+        Returns an SQL statement to add the product id to a licence table created before the product table.
+
+        :returns: An SQL statement to upgrade the licence database table.
+        """
+        productId = Database.SqlTableProduct + Database.SqlFieldForeignKeyId
+
+        sql_string = "BEGIN; "
+        sql_string += DatabaseSchema.GetProductInsert(Database.SqlTableLicence)
+        sql_string += "ALTER TABLE " + Database.SqlTableLicence + " "
+        sql_string += "ADD COLUMN " + productId + " INTEGER NULL REFERENCES "
+        sql_string += Database.SqlTableProduct + "(" + Database.SqlFieldId + "); "
+        sql_string += "UPDATE " + Database.SqlTableLicence + " "
+        sql_string += "SET " + productId + " = "
+        sql_string += "(SELECT " + Database.SqlFieldId + " FROM " + Database.SqlTableProduct + " "
+        sql_string += "WHERE " + Database.SqlFieldName + " = lower(" + Database.SqlTableLicence + "."
+        sql_string += Database.SqlFieldProduct + ")); "
+        sql_string += "DROP INDEX IF EXISTS idx_" + Database.SqlTableLicence + "_" + Database.SqlFieldProduct + "_"
+        sql_string += Database.SqlFieldTimeStamp + "; "
+        sql_string += DatabaseSchema.GetLicenceProductIndex()
+        sql_string += "COMMIT; "
+        return sql_string
+
+    @staticmethod
+    def GetProductInsert(tableName: str) -> str:
+        """
+        Returns an SQL statement to add the products named in a table to the product table.
+
+        :param tableName: The table with a product name column.
+        :returns: An SQL statement to add the missing products.
+        """
+        sql_string = "INSERT OR IGNORE INTO " + Database.SqlTableProduct + "(" + Database.SqlFieldName + ") "
+        sql_string += "SELECT DISTINCT lower(" + Database.SqlFieldProduct + ") FROM " + tableName + "; "
+        return sql_string
+
+    @staticmethod
+    def GetProductSchema() -> str:
+        """
+        Returns an SQL statement to create the product database table, if it does not exist.
+        A product is named in lower case, so the licences and seats of a product, whatever
+        the case of its name, reference it by the same id.
+
+        :returns: An SQL statement to create the product database table.
+        """
+        sql_string = "CREATE TABLE IF NOT EXISTS " + Database.SqlTableProduct + "("
+        sql_string += Database.SqlFieldId + " INTEGER PRIMARY KEY, "
+        sql_string += Database.SqlFieldName + " VARCHAR(32) NOT NULL"
+        sql_string += "); "
+
+        # Indexes
+        sql_string += "CREATE UNIQUE INDEX IF NOT EXISTS idx_" + Database.SqlTableProduct + "_" + Database.SqlFieldName
+        sql_string += " ON " + Database.SqlTableProduct + "("
+        sql_string += Database.SqlFieldName + "); "
         return sql_string
 
     @staticmethod
@@ -64,18 +190,18 @@ class DatabaseSchema:
         sql_string += Database.SqlFieldTimeStamp + " INTEGER NOT NULL, "
         sql_string += Database.SqlFieldCode + " VARCHAR(256) NOT NULL, "
         sql_string += Database.SqlFieldVersion + " INTEGER NOT NULL, "
-        sql_string += Database.SqlFieldNotes + " TEXT); "
+        sql_string += Database.SqlFieldNotes + " TEXT, "
+        sql_string += Database.SqlTableProduct + Database.SqlFieldForeignKeyId + " INTEGER NULL, "
+        sql_string += "FOREIGN KEY(" + Database.SqlTableProduct + Database.SqlFieldForeignKeyId + ") REFERENCES "
+        sql_string += Database.SqlTableProduct + "(" + Database.SqlFieldId + ")"
+        sql_string += "); "
 
         # Indexes
         sql_string += "CREATE UNIQUE INDEX idx_" + Database.SqlTableLicence + "_" + Database.SqlFieldTimeStamp + " ON "
         sql_string += Database.SqlTableLicence + "("
         sql_string += Database.SqlFieldTimeStamp + "); "
 
-        sql_string += "CREATE INDEX idx_" + Database.SqlTableLicence + "_" + Database.SqlFieldProduct + "_"
-        sql_string += Database.SqlFieldTimeStamp + " ON "
-        sql_string += Database.SqlTableLicence + "("
-        sql_string += Database.SqlFieldProduct + " COLLATE NOCASE, "
-        sql_string += Database.SqlFieldTimeStamp + " DESC); "
+        sql_string += DatabaseSchema.GetLicenceProductIndex()
 
         sql_string += "CREATE INDEX idx_" + Database.SqlTableLicence + "_" + Database.SqlFieldExpiryDate + " ON "
         sql_string += Database.SqlTableLicence + "("
@@ -86,6 +212,20 @@ class DatabaseSchema:
         sql_string += Database.SqlFieldStartDate + "); "
         return sql_string
 
+    @staticmethod
+    def GetLicenceProductIndex() -> str:
+        """
+        Returns an SQL statement to create the licence table index used to find the licences of a product.
+
+        :returns: An SQL statement to create the licence product index.
+        """
+        sql_string = "CREATE INDEX idx_" + Database.SqlTableLicence + "_" + Database.SqlTableProduct
+        sql_string += Database.SqlFieldForeignKeyId + "_" + Database.SqlFieldTimeStamp + " ON "
+        sql_string += Database.SqlTableLicence + "("
+        sql_string += Database.SqlTableProduct + Database.SqlFieldForeignKeyId + ", "
+        sql_string += Database.SqlFieldTimeStamp + " DESC); "
+        return sql_string
+
     @staticmethod
     def GetSiteLogSchema() -> str:
         """
@@ -102,18 +242,42 @@ class DatabaseSchema:
         sql_string += "); "
         return sql_string
 
+    @staticmethod
+    def GetUsageSchema(tableName: str) -> str:
+        """
+        Returns an SQL statement to create a usage rollup database table.
+
+        :param tableName: The name of the rollup table (one per tier).
+        :returns: An SQL statement to create the usage rollup database table.
+        """
+        sql_string = "CREATE TABLE IF NOT EXISTS " + tableName + "("
+        sql_string += Database.SqlFieldProduct + " VARCHAR(32) NOT NULL, "
+        sql_string += Database.SqlFieldBucket + " INTEGER NOT NULL, "
+        sql_string += Database.SqlFieldPeak + " INTEGER NOT NULL, "
+        sql_string += Database.SqlFieldTotal + " INTEGER NOT NULL, "
+        sql_string += Database.SqlFieldSamples + " INTEGER NOT NULL, "
+        sql_string += Database.SqlFieldDenials + " INTEGER NOT NULL, "
+        sql_string += "PRIMARY KEY(" + Database.SqlFieldProduct + ", " + Database.SqlFieldBucket + ")"
+        sql_string += ") WITHOUT ROWID; "
+        return sql_string
+
 
 class Database:
     ParameterChar = "$"
     Version = 1
     ReleaseDate = "04/Sep/2014 16:44"  # TODO check
     FileName = "Data.db3"
+    UsageFileName = "Usage.db3"
     ParameterLoggingSeparator = ", "
 
     # Tables
     SqlTableLicence = "licence"
     SqlTableConnection = "connection"
+    SqlTableProduct = "product"
     SqlTableSiteLog = "site_log"
+    SqlTableUsageMinute = "usage_minute"
+    SqlTableUsageHour = "usage_hour"
+    SqlTableUsageDay = "usage_day"
 
     # Misc Fields
     SqlFieldNotes = "notes"
@@ -122,6 +286,9 @@ class Database:
     SqlFieldProduct = "product"
     SqlFieldVersion = "version"
 
+    # Product Fields
+    SqlFieldName = "name"
+
     # Site Log Fields
     SqlFieldInstallDate = "install_date"
     SqlFieldReleaseDate = "release_date"
@@ -143,3 +310,11 @@ class Database:
     SqlFieldUserName = "user"
     SqlFieldLogonTime = "logon_time"
     SqlFieldUpdateTime = "update_time"
+    SqlFieldExpiryTime = "expiry_time"
+
+    # Usage Fields
+    SqlFieldBucket = "bucket"
+    SqlFieldPeak = "peak"
+    SqlFieldTotal = "total"
+    SqlFieldSamples = "samples"
+    SqlFieldDenials = "denials"
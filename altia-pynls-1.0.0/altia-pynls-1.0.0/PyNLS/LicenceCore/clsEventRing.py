@@ -0,0 +1,180 @@
+from typing import Iterable, List, NamedTuple
+from .EventId import EventId
+from array import array
+import threading
+import logging
+import time
+
+
+class RecentEvent(NamedTuple):
+    """
+    An event recorded in the recent events ring, the time in seconds since the epoch.
+    """
+    Time: float
+    EventId: EventId
+    Product: str
+    UserName: str
+    IpAddress: str
+
+
+class EventRing:
+    """
+    Fixed size, in memory ring of the most recent events of the server, such as
+    seats taken, refused and released or SQL errors, that can be queried at
+    runtime without reading the log.
+
+    The ring is preallocated, the times and event ids are held in typed arrays
+    and the strings by reference, so recording an event only overwrites the
+    oldest slot under a lock and allocates nothing. Once the ring is full the
+    oldest event is overwritten. Log records tagged with an event id, e.g. by
+    extra={'EventId': EventId.X}, are recorded too once the ring is attached to
+    a logger.
+    """
+    DefaultCapacity = 4096
+
+    @property
+    def Capacity(self) -> int:
+        """
+        Gets the number of events the ring holds.
+
+        :returns: The capacity of the ring.
+        """
+        return len(self.m_Times)
+
+    @property
+    def Count(self) -> int:
+        """
+        Gets the number of events recorded, including the events overwritten.
+
+        :returns: The number of events recorded.
+        """
+        return self.m_Count
+
+    def __init__(self, capacity: int = DefaultCapacity):
+        """
+        Initializes an empty ring.
+
+        :param capacity: The number of events the ring holds.
+        """
+        if capacity <= 0:
+            raise ValueError
+        self.m_Lock = threading.Lock()
+        self.m_Times = array('d', bytes(8 * capacity))
+        self.m_EventIds = array('H', bytes(2 * capacity))
+        self.m_Products: List[str] = [''] * capacity
+        self.m_UserNames: List[str] = [''] * capacity
+        self.m_IpAddresses: List[str] = [''] * capacity
+        self.m_Count = 0
+        self.m_Handler = None
+
+    def Record(self, eventId: EventId, product: str = '', userName: str = '', ipAddress: str = '') -> None:
+        """
+        Records an event, overwriting the oldest event once the ring is full.
+
+        :param eventId: The id of the event.
+        :param product: The product of the event, if any.
+        :param userName: The user name of the event, if any.
+        :param ipAddress: The IP address of the event, if any.
+        """
+        nowTime = time.time()
+        with self.m_Lock:
+            index = self.m_Count % len(self.m_Times)
+            self.m_Times[index] = nowTime
+            self.m_EventIds[index] = eventId.value
+            self.m_Products[index] = product
+            self.m_UserNames[index] = userName
+            self.m_IpAddresses[index] = ipAddress
+            self.m_Count += 1
+
+    def Query(self, eventIds: Iterable[EventId] = None, product: str = None, userName: str = None,
+              limit: int = None) -> List[RecentEvent]:
+        """
+        Returns the recent events, newest first, matching every specified filter.
+
+        :param eventIds: The ids of the events to return, all events if None.
+        :param product: The product of the events to return, not case sensitive, all products if None.
+        :param userName: The user name of the events to return, all users if None.
+        :param limit: The most events to return, all matching events if None.
+        :returns: The list of matching events.
+        """
+        ids = None if eventIds is None else {eventId.value for eventId in eventIds}
+        product = None if product is None else product.lower()
+        capacity = len(self.m_Times)
+        with self.m_Lock:
+            count = self.m_Count
+            indexes = [i % capacity for i in range(count - 1, max(count - capacity, 0) - 1, -1)]
+            rows = [(self.m_Times[i], self.m_EventIds[i], self.m_Products[i], self.m_UserNames[i],
+                     self.m_IpAddresses[i]) for i in indexes]
+        events = []
+        for row in rows:
+            if ids is not None and row[1] not in ids:
+                continue
+            if product is not None and row[2].lower() != product:
+                continue
+            if userName is not None and row[3] != userName:
+                continue
+            events.append(RecentEvent(row[0], EventId(row[1]), row[2], row[3], row[4]))
+            if limit is not None and len(events) >= limit:
+                break
+        return events
+
+    def Clear(self) -> None:
+        """
+        Forgets every recorded event.
+        """
+        with self.m_Lock:
+            self.m_Count = 0
+
+    def Attach(self, logger: logging.Logger = None) -> None:
+        """
+        Records the log records of the logger tagged with an event id.
+
+        :param logger: The logger to record the events of, by default the root logger.
+        """
+        self.Detach()
+        self.m_Handler = EventRingHandler(self, logger or logging.getLogger())
+        self.m_Handler.Logger.addHandler(self.m_Handler)
+
+    def Detach(self) -> None:
+        """
+        Stops recording the log records of the logger the ring is attached to.
+        """
+        if self.m_Handler is not None:
+            self.m_Handler.Logger.removeHandler(self.m_Handler)
+            self.m_Handler = None
+
+    @staticmethod
+    def Format(events: Iterable[RecentEvent]) -> str:
+        """
+        Returns the events one per line, tab separated: time, event id, event name, product, user name and IP address.
+
+        :param events: The events to format.
+        :returns: The formatted events.
+        """
+        return '\n'.join(time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(event.Time)) +
+                         '.%03d' % (event.Time * 1000 % 1000) + '\t' + str(event.EventId.value) + '\t' +
+                         event.EventId.name + '\t' + event.Product + '\t' + event.UserName + '\t' + event.IpAddress
+                         for event in events)
+
+
+# Private EventRingHandler (helper) class
+
+class EventRingHandler(logging.Handler):
+    """
+    Records the log records tagged with an event id in a ring, other records are ignored.
+    """
+    def __init__(self, ring: EventRing, logger: logging.Logger):
+        super().__init__()
+        self.Ring = ring
+        self.Logger = logger
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        # No formatting or handler lock is needed, the ring has its own lock...
+        eventId = getattr(record, 'EventId', None)
+        if isinstance(eventId, EventId):
+            self.Ring.Record(eventId, getattr(record, 'Product', ''), getattr(record, 'UserName', ''),
+                             getattr(record, 'IpAddress', ''))
+        return True
+
+    def emit(self, record: logging.LogRecord) -> None:
+        pass
@@ -0,0 +1,164 @@
+from .clsClock import Clock
+from datetime import timedelta
+import threading
+import math
+
+
+class HeartBeatAdvisor:
+    """
+    Recommends the heartbeat clients should refresh their seats at, from the measured seat write load.
+
+    Every seat write (take, refresh and release) is timed. Once per measurement interval,
+    the fraction of time spent writing (the database utilisation) is compared with the
+    target. Refresh load falls in proportion to the heartbeat, so the heartbeat is scaled
+    by the ratio of utilisation to target. The step is damped with a square root, and the
+    heartbeat is kept between the configured heartbeat and the maximum heartbeat.
+    """
+    m_HeartBeat = 300.0
+    m_MaximumHeartBeat = 0.0
+    m_TargetUtilisation = 0.5
+    m_Interval = 10.0
+
+    @property
+    def HeartBeat(self) -> float:
+        """
+        Gets the configured heartbeat, in seconds, the recommendation never goes below.
+
+        :returns: The configured heartbeat.
+        """
+        return self.m_HeartBeat
+
+    @HeartBeat.setter
+    def HeartBeat(self, value: float) -> None:
+        """
+        Sets the configured heartbeat, in seconds, the recommendation never goes below.
+
+        :param value: The configured heartbeat.
+        """
+        with self.m_Lock:
+            self.m_HeartBeat = float(value)
+            self.m_Recommended = self.Clamp(self.m_Recommended)
+
+    @property
+    def MaximumHeartBeat(self) -> float:
+        """
+        Gets the longest heartbeat, in seconds, that can be recommended.
+        A maximum at or below the configured heartbeat disables adaptation.
+
+        :returns: The maximum heartbeat.
+        """
+        return self.m_MaximumHeartBeat
+
+    @MaximumHeartBeat.setter
+    def MaximumHeartBeat(self, value: float) -> None:
+        """
+        Sets the longest heartbeat, in seconds, that can be recommended.
+
+        :param value: The maximum heartbeat.
+        """
+        with self.m_Lock:
+            self.m_MaximumHeartBeat = float(value)
+            self.m_Recommended = self.Clamp(self.m_Recommended)
+
+    @property
+    def Clock(self) -> Clock:
+        """
+        Gets the time source writes are timed by when recorded without a time.
+
+        :returns: The clock.
+        """
+        return self.m_Clock
+
+    @Clock.setter
+    def Clock(self, value: Clock) -> None:
+        """
+        Sets the time source, e.g. a simulated clock, starting a new measurement interval.
+
+        :param value: The clock.
+        """
+        with self.m_Lock:
+            self.m_Clock = value
+            self.m_Start = value.Monotonic()
+            self.m_Writes = 0
+            self.m_Busy = 0.0
+
+    @property
+    def Recommended(self) -> timedelta:
+        """
+        Gets the heartbeat to advertise to clients.
+
+        :returns: The recommended heartbeat.
+        """
+        return timedelta(seconds=self.m_Recommended)
+
+    @property
+    def Utilisation(self) -> float:
+        """
+        Gets the fraction of time spent writing seats over the last measurement interval.
+
+        :returns: The database utilisation.
+        """
+        return self.m_Utilisation
+
+    @property
+    def WriteRate(self) -> float:
+        """
+        Gets the seat writes per second over the last measurement interval.
+
+        :returns: The seat write rate.
+        """
+        return self.m_WriteRate
+
+    def __init__(self, heartBeat: float = 300, maximumHeartBeat: float = 0,
+                 targetUtilisation: float = 0.5, interval: float = 10, clock: Clock = None):
+        """
+        Initializes the advisor, recommending the configured heartbeat until load is measured.
+
+        :param heartBeat: The configured heartbeat, in seconds.
+        :param maximumHeartBeat: The longest heartbeat, in seconds, that can be recommended.
+        :param targetUtilisation: The fraction of time seat writes should keep the database busy.
+        :param interval: The measurement interval, in seconds.
+        :param clock: The time source writes are timed by, by default the system clock.
+        """
+        self.m_Lock = threading.Lock()
+        self.m_HeartBeat = float(heartBeat)
+        self.m_MaximumHeartBeat = float(maximumHeartBeat)
+        self.m_TargetUtilisation = targetUtilisation
+        self.m_Interval = interval
+        self.m_Recommended = self.m_HeartBeat
+        self.m_Utilisation = 0.0
+        self.m_WriteRate = 0.0
+        self.m_Clock = clock or Clock()
+        self.m_Start = self.m_Clock.Monotonic()
+        self.m_Writes = 0
+        self.m_Busy = 0.0
+
+    def Record(self, duration: float, now: float = None) -> None:
+        """
+        Records a seat write, recalculating the recommendation at the end of each interval.
+
+        :param duration: The time, in seconds, the write took.
+        :param now: The monotonic time of the write, by default the current time of the clock.
+        """
+        if now is None:
+            now = self.m_Clock.Monotonic()
+        with self.m_Lock:
+            self.m_Writes += 1
+            self.m_Busy += duration
+            elapsed = now - self.m_Start
+            if elapsed < self.m_Interval:
+                return
+            self.m_Utilisation = self.m_Busy / elapsed
+            self.m_WriteRate = self.m_Writes / elapsed
+            self.m_Start = now
+            self.m_Writes = 0
+            self.m_Busy = 0.0
+            # Guard against an idle interval collapsing the step to zero...
+            ratio = max(self.m_Utilisation, 0.01 * self.m_TargetUtilisation) / self.m_TargetUtilisation
+            self.m_Recommended = self.Clamp(self.m_Recommended * math.sqrt(ratio))
+
+    def Clamp(self, heartBeat: float) -> float:
+        """
+        Returns the heartbeat kept between the configured and maximum heartbeat.
+        """
+        return min(max(heartBeat, self.m_HeartBeat), max(self.m_MaximumHeartBeat, self.m_HeartBeat))
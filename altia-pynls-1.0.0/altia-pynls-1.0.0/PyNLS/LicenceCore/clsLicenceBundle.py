@@ -0,0 +1,234 @@
+from .clsStorage import LicenceRecord
+from .EventId import EventId
+from typing import Dict, List, Optional
+import hashlib
+import logging
+import struct
+import bisect
+import mmap
+import zlib
+import os
+
+
+class LicenceBundle:
+    """
+    Compiled bundle (.nlsb) of the verified licences of a licence folder,
+    read at startup instead of parsing and verifying each .nls1 file.
+
+    The file is a header (magic, version, fingerprint of the licence folder,
+    CRC32 of the body and the number of records and index entries) followed
+    by fixed size records (timestamp, number of seats, version and the offset
+    of each text field, the original signature included, in the string table),
+    an index by product (offset of the lower case product name, first record
+    and number of records), sorted by product name, and the string table of
+    length prefixed UTF-8 strings. Records are sorted by product and latest
+    timestamp first, so the licences of a product are found by a binary search
+    of the index without decoding any other record.
+
+    The bundle is memory-mapped, it is only trusted if it is intact and its
+    fingerprint matches the licence folder, otherwise it must be rebuilt.
+    """
+    Magic = b'NLSB'
+    Version = 1
+    Extension = '.nlsb'
+    DefaultFileName = 'Licences' + Extension
+    LicenceExtension = '.nls1'
+    HeaderFormat = struct.Struct('<4sH32sIII')
+    RecordFormat = struct.Struct('<qii9I')
+    IndexFormat = struct.Struct('<III')
+    LengthFormat = struct.Struct('<I')
+    NoString = 0xFFFFFFFF
+
+    m_FileName = ""
+
+    @property
+    def FileName(self) -> str:
+        """
+        Gets the path of the bundle file.
+
+        :returns: The path of the bundle file.
+        """
+        return self.m_FileName
+
+    @property
+    def Count(self) -> int:
+        """
+        Gets the number of licences in the bundle.
+
+        :returns: The number of licences.
+        """
+        return self.m_RecordCount
+
+    def __init__(self, fileName: str):
+        """
+        Memory-maps the specified bundle, use Open to check it may be trusted first.
+
+        :param fileName: The path of the bundle file.
+        """
+        self.m_FileName = fileName
+        self.m_File = open(fileName, 'rb')
+        self.m_View = mmap.mmap(self.m_File.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, fingerprint, crc, recordCount, indexCount = LicenceBundle.HeaderFormat.unpack_from(self.m_View, 0)
+        self.m_Magic = magic
+        self.m_Version = version
+        self.m_Fingerprint = fingerprint
+        self.m_Crc = crc
+        self.m_RecordCount = recordCount
+        self.m_IndexCount = indexCount
+        self.m_RecordsOffset = self.HeaderFormat.size
+        self.m_IndexOffset = self.m_RecordsOffset + recordCount * self.RecordFormat.size
+        self.m_StringsOffset = self.m_IndexOffset + indexCount * self.IndexFormat.size
+        self.m_Products: List[str] = []
+
+    @staticmethod
+    def Open(fileName: str, fingerprint: bytes) -> Optional['LicenceBundle']:
+        """
+        Memory-maps the specified bundle if it is intact and was built from the licence folder with the fingerprint.
+
+        :param fileName: The path of the bundle file.
+        :param fingerprint: The fingerprint of the licence folder, see Fingerprint.
+        :returns: The bundle, or None if there is no bundle to trust.
+        """
+        if not os.path.isfile(fileName) or os.path.getsize(fileName) < LicenceBundle.HeaderFormat.size:
+            return None
+        bundle = LicenceBundle(fileName)
+        if bundle.m_Magic != LicenceBundle.Magic or bundle.m_Version != LicenceBundle.Version:
+            logging.warning('Licence bundle: \'' + fileName + '\' not recognised.',
+                            extra={'EventId': EventId.LicenceBundleRejected})
+        elif bundle.m_Fingerprint != fingerprint:
+            logging.info('Licence bundle: \'' + fileName + '\' is out of date.',
+                         extra={'EventId': EventId.LicenceBundleRejected})
+        elif zlib.crc32(bundle.m_View[LicenceBundle.HeaderFormat.size:]) != bundle.m_Crc:
+            logging.warning('Licence bundle: \'' + fileName + '\' is corrupt.',
+                            extra={'EventId': EventId.LicenceBundleRejected})
+        else:
+            bundle.m_Products = [bundle.ReadString(bundle.ReadIndex(i)[0]) for i in range(bundle.m_IndexCount)]
+            return bundle
+        bundle.Close()
+        return None
+
+    def Close(self) -> None:
+        """
+        Unmaps and closes the bundle.
+        """
+        self.m_View.close()
+        self.m_File.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.Close()
+
+    def GetLicences(self, product: str) -> List[LicenceRecord]:
+        """
+        Returns the licences of the specified product, latest timestamp first.
+
+        :param product: The name of the product, matched case insensitively.
+        :returns: The licences of the product, without an id.
+        """
+        product = product.lower()
+        i = bisect.bisect_left(self.m_Products, product)
+        if i == len(self.m_Products) or self.m_Products[i] != product:
+            return []
+        _, first, count = self.ReadIndex(i)
+        return [self.ReadRecord(r) for r in range(first, first + count)]
+
+    def GetAllLicences(self) -> List[LicenceRecord]:
+        """
+        Returns every licence in the bundle.
+
+        :returns: The licences, without an id.
+        """
+        return [self.ReadRecord(r) for r in range(self.m_RecordCount)]
+
+    def ReadIndex(self, i: int) -> tuple:
+        """
+        Returns the index entry (product name offset, first record, number of records) at the specified position.
+        """
+        return LicenceBundle.IndexFormat.unpack_from(self.m_View, self.m_IndexOffset + i * self.IndexFormat.size)
+
+    def ReadRecord(self, r: int) -> LicenceRecord:
+        """
+        Decodes the record at the specified position.
+        """
+        fields = LicenceBundle.RecordFormat.unpack_from(self.m_View, self.m_RecordsOffset + r * self.RecordFormat.size)
+        timeStamp, numberOfSeats, version = fields[:3]
+        company, product, customer, reference, reseller, startDate, expiryDate, code, notes = \
+            [self.ReadString(offset) for offset in fields[3:]]
+        return LicenceRecord(None, company, product, customer, reference, reseller, numberOfSeats,
+                             startDate, expiryDate, timeStamp, code, version, notes)
+
+    def ReadString(self, offset: int) -> Optional[str]:
+        """
+        Reads the string at the specified offset in the string table, None for NoString.
+        """
+        if offset == self.NoString:
+            return None
+        offset += self.m_StringsOffset
+        length, = LicenceBundle.LengthFormat.unpack_from(self.m_View, offset)
+        offset += self.LengthFormat.size
+        return self.m_View[offset:offset + length].decode('utf-8')
+
+    @staticmethod
+    def Write(fileName: str, fingerprint: bytes, licences: List[LicenceRecord]) -> None:
+        """
+        Builds a bundle of the specified verified licences, replacing the previous one only once it is complete.
+
+        :param fileName: The path of the bundle file.
+        :param fingerprint: The fingerprint of the licence folder the licences were read from.
+        :param licences: The verified licences.
+        """
+        licences = sorted(licences, key=lambda lic: (lic.Product.lower(), -int(lic.TimeStamp)))
+        strings = bytearray()
+        offsets: Dict[str, int] = {}
+
+        def AddString(text) -> int:
+            if text is None:
+                return LicenceBundle.NoString
+            if text not in offsets:
+                data = text.encode('utf-8')
+                offsets[text] = len(strings)
+                strings.extend(LicenceBundle.LengthFormat.pack(len(data)))
+                strings.extend(data)
+            return offsets[text]
+
+        records = bytearray()
+        index = bytearray()
+        first = 0
+        for r, lic in enumerate(licences):
+            records += LicenceBundle.RecordFormat.pack(
+                int(lic.TimeStamp), int(lic.NumberOfSeats), int(lic.Version),
+                *[AddString(text) for text in (lic.Company, lic.Product, lic.Customer, lic.Reference, lic.Reseller,
+                                               lic.StartDate, lic.ExpiryDate, lic.Code, lic.Notes)])
+            if r + 1 == len(licences) or licences[r + 1].Product.lower() != lic.Product.lower():
+                index += LicenceBundle.IndexFormat.pack(AddString(lic.Product.lower()), first, r + 1 - first)
+                first = r + 1
+        body = records + index + strings
+        header = LicenceBundle.HeaderFormat.pack(LicenceBundle.Magic, LicenceBundle.Version, fingerprint,
+                                                 zlib.crc32(body), len(licences), len(index) // LicenceBundle.IndexFormat.size)
+        temporaryName = fileName + '.tmp'
+        with open(temporaryName, 'wb') as file:
+            file.write(header)
+            file.write(body)
+        os.replace(temporaryName, fileName)
+        logging.info('Built licence bundle of ' + str(len(licences)) + ' licence(s): \'' + fileName + '\'',
+                     extra={'EventId': EventId.LicenceBundleBuilt})
+
+    @staticmethod
+    def Fingerprint(folder: str) -> bytes:
+        """
+        Returns the fingerprint of the licence files in the specified folder, their names,
+        sizes and modification times, which changes whenever a licence file is added,
+        removed or replaced.
+
+        :param folder: The licence folder.
+        :returns: The 32 byte fingerprint.
+        """
+        fingerprint = hashlib.sha256()
+        for filename in sorted(os.listdir(folder)):
+            if not filename.endswith(LicenceBundle.LicenceExtension):
+                continue
+            stat = os.stat(os.path.join(folder, filename))
+            fingerprint.update((filename + ':' + str(stat.st_size) + ':' + str(stat.st_mtime_ns) + ';').encode('utf-8'))
+        return fingerprint.digest()
@@ -0,0 +1,730 @@
+from .clsInvalidProductException import InvalidProductException
+from .clsLicenceClientException import LicenceClientException
+from .clsMessage_pb2 import Message
+from zmq.utils.monitor import recv_monitor_message
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from datetime import datetime, timedelta
+from .MessageType import MessageType
+from .ErrorCode import ErrorCode
+from typing import Callable, Dict, List, Tuple, Union
+from .clsUtils import Utils
+from .EventId import EventId
+import itertools
+import threading
+import logging
+import random
+import heapq
+import queue
+import time
+import zmq
+
+
+class LicenceClient:
+    """
+    Client for the network licence server.
+
+    A single DEALER connection is kept open and shared by every request, requests
+    are pipelined, each tagged with an id the server echoes back in its reply
+    envelope. One background thread refreshes every held seat, spreading the
+    refreshes across the heartbeat interval, and re-takes the held seats when the
+    connection to the server is re-established, e.g. after a server restart.
+    The id the server gives each taken seat is sent back with its refreshes and
+    release, so the server finds the seat by its primary key.
+    """
+    Jitter = 0.5
+    """
+    The fraction of the heartbeat over which the first refresh of a seat is spread
+    """
+    PollInterval = 100
+
+    m_Address = ""
+    m_UserName = ""
+    m_Host = ""
+    m_IpAddress = ""
+    m_HeartBeat = 300
+    m_Timeout = 10.0
+    m_Running = False
+
+    OnSeatLost: Callable[[str], None] = None
+    """
+    Called with the product name when a held seat could not be re-taken
+    """
+
+    @property
+    def Address(self) -> str:
+        """
+        Gets the address of the licence server, e.g. tcp://server:3180.
+
+        :returns: The address of the licence server.
+        """
+        return self.m_Address
+
+    @property
+    def HeartBeat(self) -> int:
+        """
+        Gets the interval, in seconds, held seats are refreshed at when the
+        server does not advertise one.
+
+        :returns: The default heartbeat interval.
+        """
+        return self.m_HeartBeat
+
+    @property
+    def HeldSeats(self) -> List[str]:
+        """
+        Gets the products the client holds a seat for.
+
+        :returns: The products the client holds a seat for.
+        """
+        with self.m_Condition:
+            return list(self.m_Seats)
+
+    def __init__(self, address: str, userName: str = None, host: str = None, ipAddress: str = None,
+                 heartBeat: int = 300, timeout: float = 10.0, context: zmq.Context = None, adminSecret: str = None):
+        """
+        Initializes the client, call Connect before making requests.
+
+        :param address: The address of the licence server, e.g. tcp://server:3180.
+        :param userName: The user name seats are taken for, by default the logged in user.
+        :param host: The host seats are taken for, by default the local host name.
+        :param ipAddress: The IP Address seats are taken for, by default the local IP Address.
+        :param heartBeat: The interval, in seconds, to refresh seats at unless the server advertises one.
+        :param timeout: The time, in seconds, to wait for a reply.
+        :param context: The ZeroMQ context, by default the shared instance.
+        :param adminSecret: The admin secret of the server, sent with administrative requests.
+        """
+        self.m_Address = address
+        self.m_UserName = userName or Utils.GetUserName()
+        self.m_Host = host or Utils.GetHostName()
+        self.m_IpAddress = ipAddress or Utils.GetIPAddress()
+        self.m_HeartBeat = heartBeat
+        self.m_Timeout = timeout
+        self.m_Context = context or zmq.Context.instance()
+        self.m_AdminSecret = adminSecret or ''
+        self.m_Outgoing = queue.SimpleQueue()
+        self.m_Pending: Dict[int, Tuple[Future, float]] = {}
+        self.m_PendingLock = threading.Lock()
+        self.m_RequestIds = itertools.count(1)
+        self.m_WakeAddress = 'inproc://licenceclient-' + str(id(self))
+        self.m_WakeLock = threading.Lock()
+        self.m_Wake = None
+        self.m_Condition = threading.Condition()
+        self.m_Seats: Dict[str, Tuple[int, float]] = {}
+        self.m_SeatIds: Dict[str, int] = {}
+        self.m_Schedule: List[Tuple[float, int, str]] = []
+        self.m_Generation = 0
+        self.m_Retake = False
+        self.m_IoThread = None
+        self.m_SchedulerThread = None
+
+    def __enter__(self):
+        self.Connect()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.Close()
+
+    def Connect(self) -> None:
+        """
+        Opens the connection to the server and starts the heartbeat scheduler.
+        """
+        if self.m_Running:
+            return
+        self.m_Running = True
+        receiver = self.m_Context.socket(zmq.PAIR)
+        receiver.bind(self.m_WakeAddress)
+        self.m_Wake = self.m_Context.socket(zmq.PAIR)
+        self.m_Wake.connect(self.m_WakeAddress)
+        self.m_IoThread = threading.Thread(target=self.IoLoop, args=(receiver,), name='LicenceClientIO', daemon=True)
+        self.m_IoThread.start()
+        self.m_SchedulerThread = threading.Thread(target=self.SchedulerLoop, name='LicenceClientHeartBeat', daemon=True)
+        self.m_SchedulerThread.start()
+
+    def Close(self, release: bool = True) -> None:
+        """
+        Stops the heartbeat scheduler and closes the connection to the server.
+
+        :param release: True to release every held seat first.
+        """
+        if not self.m_Running:
+            return
+        if release:
+            for product in self.HeldSeats:
+                try:
+                    self.ReleaseSeat(product)
+                except Exception as ex:
+                    logging.warning('Release of \'' + product + '\' failed on close: ' + str(ex),
+                                    extra={'EventId': EventId.ClientRequestError})
+        with self.m_Condition:
+            self.m_Running = False
+            self.m_Condition.notify_all()
+        self.WakeIo()
+        self.m_IoThread.join()
+        self.m_SchedulerThread.join()
+        self.m_Wake.close(linger=0)
+        self.m_Wake = None
+
+    # Requests
+
+    def Request(self, message: Message) -> Future:
+        """
+        Sends a request without waiting for the reply.
+
+        :param message: The request message.
+        :returns: A future resolved with the reply message.
+        """
+        if not self.m_Running:
+            raise LicenceClientException('Licence client is not connected.')
+        future = Future()
+        requestId = next(self.m_RequestIds)
+        with self.m_PendingLock:
+            # Checked again under the lock, the I/O thread may have failed the pending requests for the last time...
+            if not self.m_Running:
+                raise LicenceClientException('Licence client is not connected.')
+            self.m_Pending[requestId] = (future, time.monotonic())
+        self.m_Outgoing.put((requestId, message.SerializeToString()))
+        self.WakeIo()
+        return future
+
+    def Wait(self, future: Future) -> Message:
+        """
+        Waits for the reply to a request, at most the timeout.
+
+        :param future: The future of the request.
+        :returns: The reply message.
+        """
+        try:
+            return future.result(timeout=self.m_Timeout)
+        except FutureTimeoutError:
+            raise LicenceClientException('Licence server request timed out.')
+
+    def Call(self, messageType: MessageType, product: str = "") -> Message:
+        """
+        Sends a request and waits for the reply.
+
+        :param messageType: The type of request.
+        :param product: The name of the product, if any.
+        :returns: The reply message.
+        """
+        reply = self.Wait(self.Request(self.CreateMessage(messageType, product)))
+        LicenceClient.CheckReply(reply)
+        return reply
+
+    def TakeSeat(self, product: str) -> bool:
+        """
+        Takes a seat for the product, a taken seat is refreshed until released.
+
+        :param product: The name of the product.
+        :returns: True if the seat is taken, otherwise false.
+        """
+        reply = self.Call(MessageType.TakeSeat, product)
+        taken = reply.Content == str(True)
+        if taken:
+            self.Hold(product, LicenceClient.GetHeartBeat(reply), reply.SeatId)
+        return taken
+
+    def WaitSeat(self, product: str, timeout: float) -> bool:
+        """
+        Takes a seat for the product or, if none is free, waits in the seat wait queue of the server
+        to be granted one, rather than polling with TakeSeat. A taken seat is refreshed until released.
+
+        :param product: The name of the product.
+        :param timeout: The longest time, in seconds, to wait for a seat.
+        :returns: True if the seat is taken, otherwise false.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            message = self.CreateMessage(MessageType.WaitSeat, product)
+            message.Content = str(max(0.0, deadline - time.monotonic()))
+            reply = self.Wait(self.Request(message))
+            LicenceClient.CheckReply(reply)
+            if reply.Content == str(True):
+                self.Hold(product, LicenceClient.GetHeartBeat(reply), reply.SeatId)
+                return True
+            # The server waits at most a short time per request, ask again to keep the place in the queue,
+            # unless the server does not queue clients...
+            if not reply.Comments or time.monotonic() >= deadline:
+                return False
+
+    def ReleaseSeat(self, product: str) -> bool:
+        """
+        Releases the seat for the product and stops refreshing it.
+
+        :param product: The name of the product.
+        :returns: True if the seat is released, otherwise false.
+        """
+        message = self.CreateMessage(MessageType.ReleaseSeat, product)
+        self.Drop(product)
+        reply = self.Wait(self.Request(message))
+        LicenceClient.CheckReply(reply)
+        return reply.Content == str(True)
+
+    def RefreshSeat(self, product: str) -> bool:
+        """
+        Refreshes the seat for the product now.
+
+        :param product: The name of the product.
+        :returns: True if the seat is refreshed, otherwise false.
+        """
+        reply = self.Call(MessageType.RefreshSeat, product)
+        self.Identify(product, reply.SeatId)
+        return reply.Content == str(True)
+
+    def Batch(self, operations: List[Tuple[MessageType, str]]) -> List[bool]:
+        """
+        Takes, refreshes and releases seats in one request, performed by the server in one transaction.
+        Taken seats are refreshed until released, released seats stop being refreshed.
+
+        :param operations: The type (TakeSeat, RefreshSeat or ReleaseSeat) and product of each seat request.
+        :returns: For each operation, true if the seat is taken, refreshed or released, false if not or if the server could not perform it.
+        """
+        message = self.CreateBatch(operations)
+        for messageType, product in operations:
+            if messageType == MessageType.ReleaseSeat:
+                self.Drop(product)
+        reply = self.Wait(self.Request(message))
+        LicenceClient.CheckReply(reply)
+        results = []
+        for (messageType, product), item in zip(operations, reply.Items):
+            done = item.Code == ErrorCode.NoError.value and item.Content == str(True)
+            if item.Code != ErrorCode.NoError.value:
+                logging.warning('Batch ' + messageType.name + ' of \'' + product + '\' failed: ' + item.Comments,
+                                extra={'EventId': EventId.ClientRequestError})
+            if done and messageType == MessageType.TakeSeat:
+                self.Hold(product, LicenceClient.GetHeartBeat(item), item.SeatId)
+            elif done and messageType == MessageType.RefreshSeat:
+                self.Identify(product, item.SeatId)
+            results.append(done)
+        return results
+
+    def QueryConnections(self, product: str) -> List[Message.UserRecordStruct]:
+        """
+        Returns the live seats of the product.
+
+        :param product: The name of the product.
+        :returns: The user records of the live seats.
+        """
+        return list(self.Call(MessageType.QueryConnections, product).Body)
+
+    def NumberOfSeats(self, product: str) -> int:
+        """
+        Returns the total number of seats of the product.
+
+        :param product: The name of the product.
+        :returns: The total number of seats.
+        """
+        return int(self.Call(MessageType.NumberOfSeats, product).Content)
+
+    def ServerVersion(self) -> str:
+        """
+        Returns the version of the server.
+
+        :returns: The version of the server.
+        """
+        return self.Call(MessageType.ServerVersion).Content
+
+    def QueryProducts(self) -> List[str]:
+        """
+        Returns the licensed products.
+
+        :returns: The names of the licensed products.
+        """
+        content = self.Call(MessageType.QueryProducts).Content
+        return content.split('\n') if content else []
+
+    def QueryLicence(self, product: str) -> Message.LicenceStruct:
+        """
+        Returns the licence details of the product.
+
+        :param product: The name of the product.
+        :returns: The licence details.
+        """
+        return self.Call(MessageType.QueryLicence, product).Licence
+
+    def WebServerAddress(self) -> str:
+        """
+        Returns the web server address, empty if the web server is not enabled.
+
+        :returns: The web server address.
+        """
+        return self.Call(MessageType.WebServerAddress).Content
+
+    def ReleaseSeats(self, product: str = None, host: str = None, ipAddress: str = None,
+                     userName: str = None) -> Dict[str, int]:
+        """
+        Releases every seat matching all of the specified filters, an administrative request.
+
+        :param product: The name of the product to release the seats for, None for every product.
+        :param host: The host to release the seats for, None for every host.
+        :param ipAddress: The IP Address to release the seats for, None for every IP Address.
+        :param userName: The user name to release the seats for, None for every user.
+        :returns: A dictionary of product name to the number of its seats released.
+        """
+        message = self.CreateMessage(MessageType.ReleaseSeats, product)
+        message.Body.add(User=userName or '', Host=host or '', IP=ipAddress or '')
+        return LicenceClient.GetCounts(self.Wait(self.Request(message)))
+
+    def ExpireSeats(self, olderThan: Union[datetime, timedelta], product: str = None) -> Dict[str, int]:
+        """
+        Releases every seat not refreshed since the specified time, an administrative request.
+
+        :param olderThan: Seats not refreshed since this time, in the server's local time, are released,
+                          or for this long, by the server's clock.
+        :param product: The name of the product to expire the seats for, None for every product.
+        :returns: A dictionary of product name to the number of its seats released.
+        """
+        message = self.CreateMessage(MessageType.ReleaseSeats, product)
+        if isinstance(olderThan, timedelta):
+            message.Content = repr(olderThan.total_seconds() / 60)
+        else:
+            message.Content = olderThan.isoformat()
+        return LicenceClient.GetCounts(self.Wait(self.Request(message)))
+
+    def CreateMessage(self, messageType: MessageType, product: str = "") -> Message:
+        """
+        Creates a request message, seat requests carry the user record of this client,
+        refreshes and releases the id of the seat, if held, and administrative requests the admin secret.
+
+        :param messageType: The type of request.
+        :param product: The name of the product, if any.
+        :returns: The request message.
+        """
+        message = Message()
+        message.Type = messageType.value
+        if product:
+            message.Licence.Product = product
+        if messageType in (MessageType.TakeSeat, MessageType.ReleaseSeat, MessageType.RefreshSeat,
+                           MessageType.WaitSeat):
+            user = message.Body.add()
+            user.User = self.m_UserName
+            user.Host = self.m_Host
+            user.IP = self.m_IpAddress
+        if messageType in (MessageType.ReleaseSeat, MessageType.RefreshSeat):
+            with self.m_Condition:
+                message.SeatId = self.m_SeatIds.get(product, 0)
+        if messageType in (MessageType.QueryEvents, MessageType.ReleaseSeats, MessageType.Kill):
+            message.Comments = self.m_AdminSecret
+        return message
+
+    def CreateBatch(self, operations: List[Tuple[MessageType, str]]) -> Message:
+        """
+        Creates a batch request message with an item for each seat request.
+
+        :param operations: The type and product of each seat request.
+        :returns: The request message.
+        """
+        message = Message()
+        message.Type = MessageType.Batch.value
+        for messageType, product in operations:
+            message.Items.add().CopyFrom(self.CreateMessage(messageType, product))
+        return message
+
+    @staticmethod
+    def CheckReply(reply: Message) -> None:
+        """
+        Raises an exception if the reply reports an error.
+        """
+        if reply.Code == ErrorCode.InvalidProduct.value:
+            raise InvalidProductException(reply.Comments)
+        if reply.Code != ErrorCode.NoError.value:
+            raise LicenceClientException(reply.Comments)
+
+    @staticmethod
+    def GetCounts(reply: Message) -> Dict[str, int]:
+        """
+        Returns the count of each product in a reply, one tab separated product and count per line.
+        """
+        LicenceClient.CheckReply(reply)
+        counts = {}
+        for line in reply.Content.split('\n') if reply.Content else []:
+            name, count = line.rsplit('\t', 1)
+            counts[name] = int(count)
+        return counts
+
+    @staticmethod
+    def GetHeartBeat(reply: Message) -> float:
+        """
+        Returns the heartbeat, in seconds, advertised in a reply, 0 if none.
+        """
+        if not reply.HasField('HeartBeat'):
+            return 0
+        return reply.HeartBeat.ToTimedelta().total_seconds()
+
+    # Connection
+
+    def WakeIo(self) -> None:
+        """
+        Wakes the IO thread to send queued requests.
+        """
+        with self.m_WakeLock:
+            if self.m_Wake is not None:
+                try:
+                    self.m_Wake.send(b'', zmq.NOBLOCK)
+                except zmq.Again:
+                    # The IO thread is already awake...
+                    pass
+
+    def IoLoop(self, receiver: zmq.Socket) -> None:
+        """
+        Owns the server connection, sends queued requests, matches replies to
+        requests and watches the connection for reconnects.
+        """
+        socket = self.m_Context.socket(zmq.DEALER)
+        socket.setsockopt(zmq.LINGER, 0)
+        monitor = socket.get_monitor_socket(zmq.EVENT_CONNECTED | zmq.EVENT_DISCONNECTED)
+        socket.connect(self.m_Address)
+        poller = zmq.Poller()
+        poller.register(socket, zmq.POLLIN)
+        poller.register(receiver, zmq.POLLIN)
+        poller.register(monitor, zmq.POLLIN)
+        connected = False
+        try:
+            while self.m_Running:
+                events = dict(poller.poll(self.PollInterval))
+                if receiver in events:
+                    while receiver.poll(0):
+                        receiver.recv()
+                if monitor in events:
+                    while monitor.poll(0):
+                        event = recv_monitor_message(monitor)['event']
+                        if event == zmq.EVENT_DISCONNECTED:
+                            logging.warning('Licence server connection lost: ' + self.m_Address,
+                                            extra={'EventId': EventId.ClientConnectionLost})
+                            # Replies in flight on the dropped connection are lost...
+                            self.FailPending('Licence server connection lost.')
+                        elif event == zmq.EVENT_CONNECTED:
+                            if connected:
+                                logging.info('Licence server connection restored: ' + self.m_Address,
+                                             extra={'EventId': EventId.ClientConnectionRestored})
+                                self.RequestRetake()
+                            connected = True
+                while True:
+                    try:
+                        requestId, payload = self.m_Outgoing.get_nowait()
+                    except queue.Empty:
+                        break
+                    socket.send_multipart([requestId.to_bytes(8, 'little'), b'', payload])
+                if socket in events:
+                    while True:
+                        try:
+                            frames = socket.recv_multipart(zmq.NOBLOCK)
+                        except zmq.Again:
+                            break
+                        self.Receive(frames)
+                self.ExpirePending()
+        finally:
+            self.FailPending('Licence client closed.')
+            socket.disable_monitor()
+            monitor.close(linger=0)
+            socket.close(linger=0)
+            receiver.close(linger=0)
+
+    def Receive(self, frames: List[bytes]) -> None:
+        """
+        Resolves the request a reply belongs to.
+        """
+        if len(frames) != 3:
+            logging.warning('Unexpected licence server reply of ' + str(len(frames)) + ' frames.',
+                            extra={'EventId': EventId.ClientRequestError})
+            return
+        with self.m_PendingLock:
+            pending = self.m_Pending.pop(int.from_bytes(frames[0], 'little'), None)
+        if pending is None:
+            return
+        reply = Message()
+        try:
+            reply.ParseFromString(frames[2])
+        except Exception as ex:
+            pending[0].set_exception(LicenceClientException('Invalid reply message: ' + str(ex)))
+            return
+        pending[0].set_result(reply)
+
+    def ExpirePending(self) -> None:
+        """
+        Fails requests that have not been answered within the timeout.
+        """
+        expiry = time.monotonic() - self.m_Timeout
+        with self.m_PendingLock:
+            expired = [requestId for requestId, (_, sent) in self.m_Pending.items() if sent < expiry]
+            futures = [self.m_Pending.pop(requestId)[0] for requestId in expired]
+        for future in futures:
+            future.set_exception(LicenceClientException('Licence server request timed out.'))
+
+    def FailPending(self, message: str) -> None:
+        """
+        Fails every request waiting for a reply.
+        """
+        with self.m_PendingLock:
+            futures = [future for future, _ in self.m_Pending.values()]
+            self.m_Pending.clear()
+        for future in futures:
+            future.set_exception(LicenceClientException(message))
+
+    # Heartbeat scheduler
+
+    def Hold(self, product: str, heartBeat: float = 0, seatId: int = 0) -> None:
+        """
+        Adds a seat to the heartbeat schedule, its first refresh is spread over
+        the last part of the interval so seats taken together refresh apart.
+
+        :param product: The name of the product.
+        :param heartBeat: The interval, in seconds, advertised by the server, 0 for the default.
+        :param seatId: The id of the seat given by the server, 0 if not given.
+        """
+        interval = heartBeat if heartBeat > 0 else self.m_HeartBeat
+        with self.m_Condition:
+            self.m_Generation += 1
+            self.m_Seats[product] = (self.m_Generation, interval)
+            self.m_SeatIds[product] = seatId
+            due = time.monotonic() + interval * random.uniform(1 - self.Jitter, 1)
+            heapq.heappush(self.m_Schedule, (due, self.m_Generation, product))
+            self.m_Condition.notify()
+
+    def Retune(self, product: str, heartBeat: float) -> None:
+        """
+        Sets the interval a held seat is refreshed at from the heartbeat the
+        server advertised, taking effect from the refresh after next.
+
+        :param product: The name of the product.
+        :param heartBeat: The interval, in seconds, advertised by the server.
+        """
+        with self.m_Condition:
+            seat = self.m_Seats.get(product)
+            if seat is not None:
+                self.m_Seats[product] = (seat[0], heartBeat)
+
+    def Identify(self, product: str, seatId: int) -> None:
+        """
+        Records the id the server gave a held seat in the reply to a refresh or re-take,
+        it changes if the seat was re-created.
+
+        :param product: The name of the product.
+        :param seatId: The id of the seat given by the server, 0 if not given.
+        """
+        with self.m_Condition:
+            if seatId and product in self.m_Seats:
+                self.m_SeatIds[product] = seatId
+
+    def Drop(self, product: str) -> None:
+        """
+        Removes a seat from the heartbeat schedule.
+        """
+        with self.m_Condition:
+            self.m_Seats.pop(product, None)
+            self.m_SeatIds.pop(product, None)
+
+    def RequestRetake(self) -> None:
+        """
+        Asks the scheduler to re-take every held seat.
+        """
+        with self.m_Condition:
+            self.m_Retake = True
+            self.m_Condition.notify()
+
+    def SchedulerLoop(self) -> None:
+        """
+        Sends a refresh for each seat as it falls due and re-takes seats when requested.
+        """
+        while True:
+            retake = []
+            due = []
+            with self.m_Condition:
+                while self.m_Running and not self.m_Retake and \
+                        (not self.m_Schedule or self.m_Schedule[0][0] > time.monotonic()):
+                    self.m_Condition.wait(self.m_Schedule[0][0] - time.monotonic() if self.m_Schedule else None)
+                if not self.m_Running:
+                    return
+                if self.m_Retake:
+                    self.m_Retake = False
+                    retake = list(self.m_Seats)
+                now = time.monotonic()
+                while self.m_Schedule and self.m_Schedule[0][0] <= now:
+                    when, generation, product = heapq.heappop(self.m_Schedule)
+                    seat = self.m_Seats.get(product)
+                    # The seat was released, or re-held with a new schedule...
+                    if seat is None or seat[0] != generation:
+                        continue
+                    due.append(product)
+                    # After a stall, e.g. a suspended machine, refresh once and not once per missed interval...
+                    heapq.heappush(self.m_Schedule, (max(when, now) + seat[1], generation, product))
+            if retake:
+                self.Retake(retake)
+            if not due:
+                continue
+            # Seats falling due together are refreshed in one batch...
+            if len(due) == 1:
+                message = self.CreateMessage(MessageType.RefreshSeat, due[0])
+            else:
+                message = self.CreateBatch([(MessageType.RefreshSeat, product) for product in due])
+            try:
+                future = self.Request(message)
+            except LicenceClientException:
+                return
+            future.add_done_callback(lambda f, p=due: self.RefreshDone(p, f))
+
+    def RefreshDone(self, products: List[str], future: Future) -> None:
+        """
+        Checks the reply to a scheduled refresh, or to a batch of scheduled refreshes.
+        """
+        try:
+            reply = future.result()
+            if len(products) > 1:
+                LicenceClient.CheckReply(reply)
+        except Exception as ex:
+            logging.warning('Refresh of \'' + '\', \''.join(products) + '\' failed: ' + str(ex),
+                            extra={'EventId': EventId.ClientRequestError})
+            return
+        items = list(reply.Items) if len(products) > 1 else [reply]
+        for product, item in zip(products, items):
+            try:
+                LicenceClient.CheckReply(item)
+            except InvalidProductException:
+                self.Lost(product)
+                continue
+            except Exception as ex:
+                logging.warning('Refresh of \'' + product + '\' failed: ' + str(ex),
+                                extra={'EventId': EventId.ClientRequestError})
+                continue
+            self.Identify(product, item.SeatId)
+            heartBeat = LicenceClient.GetHeartBeat(item)
+            if heartBeat > 0:
+                self.Retune(product, heartBeat)
+
+    def Retake(self, products: List[str]) -> None:
+        """
+        Re-takes held seats, pipelined, after the server connection is restored.
+        A seat the server no longer grants is dropped and reported through OnSeatLost.
+
+        :param products: The names of the products to re-take.
+        """
+        futures = []
+        for product in products:
+            try:
+                futures.append((product, self.Request(self.CreateMessage(MessageType.TakeSeat, product))))
+            except LicenceClientException:
+                return
+        for product, future in futures:
+            try:
+                reply = self.Wait(future)
+                LicenceClient.CheckReply(reply)
+            except InvalidProductException:
+                self.Lost(product)
+                continue
+            except Exception as ex:
+                logging.warning('Re-take of \'' + product + '\' failed: ' + str(ex),
+                                extra={'EventId': EventId.ClientRequestError})
+                continue
+            if reply.Content != str(True):
+                self.Lost(product)
+            else:
+                self.Identify(product, reply.SeatId)
+                logging.info('Re-took seat for \'' + product + '\'.', extra={'EventId': EventId.ClientSeatRetaken})
+
+    def Lost(self, product: str) -> None:
+        """
+        Drops a held seat the server no longer grants.
+        """
+        self.Drop(product)
+        logging.warning('Seat for \'' + product + '\' lost.', extra={'EventId': EventId.ClientSeatLost})
+        if self.OnSeatLost is not None:
+            self.OnSeatLost(product)
@@ -0,0 +1,7 @@
+class LicenceClientException(Exception):
+    """
+    Raised when a licence server request fails or is not answered
+    """
+    def __init__(self, message="Licence server request failed"):
+        self.message = message
+        super().__init__(self.message)
@@ -1,28 +1,70 @@
 from .clsInvalidProductException import InvalidProductException
-from .clsDatabaseSchema import Database, DatabaseSchema
+from .clsHeartBeatAdvisor import HeartBeatAdvisor
+from .clsClock import Clock
+from .clsConfig import Config
+from .clsStorage import Storage, LicenceRecord, SeatOperation
+from .clsSeatJournal import SeatJournal
+from .clsEventRing import EventRing
+from .clsLogPipeline import LogPipeline
+from .clsSeatWaitQueue import SeatWaitQueue
+from .clsSeatSnapshot import SeatSnapshot, SnapshotSeat
+from .clsReplicationPrimary import ReplicationPrimary
+from .clsSqliteStorage import SqliteStorage
+from .clsUsageRollup import UsageRollup
+from .clsQueryProfiler import QueryProfiler
+from .clsDatabaseSchema import Database
 from datetime import timedelta, date, datetime
 from .clsLicenceReader import LicenceReader
+from .clsLicenceBundle import LicenceBundle
 from .clsMessage_pb2 import Message
+from contextlib import ExitStack, nullcontext
 from xml.etree import ElementTree
+from .MessageType import MessageType
+from .EventId import EventId
 from .clsUtils import Utils
-from typing import List
+from typing import TYPE_CHECKING, Dict, List, Tuple
+import threading
+import hashlib
 import logging
 import sqlite3
 import os
 
+if TYPE_CHECKING:
+    from .clsReplicationStandby import ReplicationStandby
+    from .clsSeatCoordinator import SeatCoordinator
+    from .clsSeatPoolNode import SeatPoolNode
+
+
 class LicenceManager:
     """
     Class to manage network licences.
     """
     WildCard = "*"
     FudgeFactor = 30
+    LockStripes = 64
+    OfferInterval = 1.0
 
     m_LicenceFolder = ""
     m_DataFolder = ""
     m_HeartBeat = timedelta(seconds=300)
     m_DoubleValidation = True
+    m_UseLicenceBundle = False
     m_EncryptDatabase = False
     m_WebServerUri = ""
+    m_Journal = None
+    m_RecentEvents = None
+    m_LogPipeline = None
+    m_WaitQueue = None
+    m_Replication = None
+    m_Standby = None
+    m_SeatPool = None
+    m_Coordinator = None
+    m_QueryProfiler = None
+    m_UsageRollup = None
+    m_SeatSnapshot = None
+    m_HeartBeatAdvisor = None
+    m_PublicKey = None
+    m_Clock = Clock()
 
     @property
     def DataFile(self) -> str:
@@ -57,6 +99,25 @@ class LicenceManager:
         """
         self.m_DoubleValidation = value
 
+    @property
+    def UseLicenceBundle(self) -> bool:
+        """
+        Gets a value to indicate if licences are loaded from a compiled licence bundle,
+        rebuilt from the licence files whenever the licence folder changes.
+
+        :returns: If licences are loaded from a licence bundle.
+        """
+        return self.m_UseLicenceBundle
+
+    @UseLicenceBundle.setter
+    def UseLicenceBundle(self, value: bool) -> None:
+        """
+        Sets if licences are loaded from a compiled licence bundle.
+
+        :param value: True to load licences from a licence bundle, otherwise false.
+        """
+        self.m_UseLicenceBundle = value
+
     @property
     def EncryptDatabase(self) -> bool:
         """
@@ -94,6 +155,266 @@ class LicenceManager:
         :param value: The time after which a licence is considered stale.
         """
         self.m_HeartBeat = timedelta(seconds=value)
+        self.m_HeartBeatAdvisor.HeartBeat = value
+
+    @property
+    def HeartBeatAdvisor(self) -> HeartBeatAdvisor:
+        """
+        Gets the advisor recommending the heartbeat advertised to clients from the seat write load.
+
+        :returns: The heartbeat advisor.
+        """
+        return self.m_HeartBeatAdvisor
+
+    @property
+    def MaximumHeartBeat(self) -> timedelta:
+        """
+        Gets the longest heartbeat that can be advertised to clients under load.
+        A maximum at or below HeartBeat keeps the advertised heartbeat fixed.
+
+        :returns: The longest heartbeat that can be advertised.
+        """
+        return timedelta(seconds=self.m_HeartBeatAdvisor.MaximumHeartBeat)
+
+    @MaximumHeartBeat.setter
+    def MaximumHeartBeat(self, value: int) -> None:
+        """
+        Sets the longest heartbeat that can be advertised to clients under load.
+
+        :param value: The longest heartbeat, in seconds, that can be advertised.
+        """
+        self.m_HeartBeatAdvisor.MaximumHeartBeat = value
+
+    @property
+    def RecommendedHeartBeat(self) -> timedelta:
+        """
+        Gets the heartbeat currently advertised to clients taking or refreshing a seat.
+
+        :returns: The recommended heartbeat.
+        """
+        return self.m_HeartBeatAdvisor.Recommended
+
+    @property
+    def Clock(self) -> Clock:
+        """
+        Gets the time source seats are timed and licence date windows are tested by.
+
+        :returns: The clock.
+        """
+        return self.m_Clock
+
+    @Clock.setter
+    def Clock(self, value: Clock) -> None:
+        """
+        Sets the time source, e.g. a simulated clock in tests and benchmarks.
+
+        :param value: The clock.
+        """
+        self.m_Clock = value
+        self.m_HeartBeatAdvisor.Clock = value
+
+    @property
+    def Journal(self) -> SeatJournal:
+        """
+        Gets the journal seat events are recorded to, None if seat events are not journaled.
+
+        :returns: The seat event journal.
+        """
+        return self.m_Journal
+
+    @Journal.setter
+    def Journal(self, value: SeatJournal) -> None:
+        """
+        Sets the journal seat events are recorded to, the journal is closed on Shutdown.
+
+        :param value: The seat event journal, or None to stop journaling seat events.
+        """
+        self.m_Journal = value
+
+    @property
+    def RecentEvents(self) -> EventRing:
+        """
+        Gets the ring the most recent seat events are recorded in, None if recent events are not kept.
+
+        :returns: The recent events ring.
+        """
+        return self.m_RecentEvents
+
+    @RecentEvents.setter
+    def RecentEvents(self, value: EventRing) -> None:
+        """
+        Sets the ring the most recent seat events are recorded in, the ring is detached from the log on Shutdown.
+
+        :param value: The recent events ring, or None to stop keeping recent events.
+        """
+        self.m_RecentEvents = value
+
+    @property
+    def LogPipeline(self) -> LogPipeline:
+        """
+        Gets the pipeline the log is written to its log file by, None if the log is not written to a file.
+
+        :returns: The log pipeline.
+        """
+        return self.m_LogPipeline
+
+    @LogPipeline.setter
+    def LogPipeline(self, value: LogPipeline) -> None:
+        """
+        Sets the pipeline the log is written to its log file by, the pipeline is closed on Shutdown.
+
+        :param value: The log pipeline, or None to not close a pipeline on Shutdown.
+        """
+        self.m_LogPipeline = value
+
+    @property
+    def WaitQueue(self) -> SeatWaitQueue:
+        """
+        Gets the queue clients denied a seat wait in to be granted one, None if denied clients are not queued.
+
+        :returns: The seat wait queue.
+        """
+        return self.m_WaitQueue
+
+    @WaitQueue.setter
+    def WaitQueue(self, value: SeatWaitQueue) -> None:
+        """
+        Sets the queue clients denied a seat wait in to be granted one.
+
+        :param value: The seat wait queue, or None to not queue denied clients.
+        """
+        self.m_WaitQueue = value
+
+    @property
+    def Replication(self) -> ReplicationPrimary:
+        """
+        Gets the primary seat changes are shipped to standby servers by, None if seats are not replicated.
+
+        :returns: The replication primary.
+        """
+        return self.m_Replication
+
+    @Replication.setter
+    def Replication(self, value: ReplicationPrimary) -> None:
+        """
+        Sets the primary seat changes are shipped to standby servers by, the primary is closed on Shutdown.
+
+        :param value: The replication primary, or None to stop replicating seats.
+        """
+        self.m_Replication = value
+
+    @property
+    def Standby(self) -> 'ReplicationStandby':
+        """
+        Gets the standby the seat changes of a primary server are followed into this manager by,
+        None if this server is not a warm standby.
+
+        :returns: The replication standby.
+        """
+        return self.m_Standby
+
+    @Standby.setter
+    def Standby(self, value: 'ReplicationStandby') -> None:
+        """
+        Sets the standby the seat changes of a primary server are followed by, the standby is closed on Shutdown.
+
+        :param value: The replication standby, or None to not follow a primary server.
+        """
+        self.m_Standby = value
+
+    @property
+    def SeatPool(self) -> 'SeatPoolNode':
+        """
+        Gets the node of the seat pool this manager takes seats against a leased quota of, None if not pooled.
+
+        :returns: The seat pool node.
+        """
+        return self.m_SeatPool
+
+    @SeatPool.setter
+    def SeatPool(self, value: 'SeatPoolNode') -> None:
+        """
+        Sets the node of the seat pool seats are taken against a leased quota of, the node is closed on Shutdown.
+
+        :param value: The seat pool node, or None to take seats against every licensed seat.
+        """
+        self.m_SeatPool = value
+
+    @property
+    def Coordinator(self) -> 'SeatCoordinator':
+        """
+        Gets the coordinator seat pool nodes lease their quota of seats from, None if this server does not coordinate.
+
+        :returns: The seat coordinator.
+        """
+        return self.m_Coordinator
+
+    @Coordinator.setter
+    def Coordinator(self, value: 'SeatCoordinator') -> None:
+        """
+        Sets the coordinator seat pool nodes lease their quota of seats from, the coordinator is closed on Shutdown.
+
+        :param value: The seat coordinator, or None to not coordinate a seat pool.
+        """
+        self.m_Coordinator = value
+
+    @property
+    def SeatSnapshot(self) -> SeatSnapshot:
+        """
+        Gets the snapshot seats are kept in across a restart, None if seats are not kept.
+
+        :returns: The seat snapshot.
+        """
+        return self.m_SeatSnapshot
+
+    @SeatSnapshot.setter
+    def SeatSnapshot(self, value: SeatSnapshot) -> None:
+        """
+        Sets the snapshot seats are kept in across a restart, the snapshot is written on Shutdown.
+        Call RestoreSnapshot, once the licences are loaded, to restore it.
+
+        :param value: The seat snapshot, or None to not keep seats across a restart.
+        """
+        self.m_SeatSnapshot = value
+
+    @property
+    def QueryProfiler(self) -> QueryProfiler:
+        """
+        Gets the profiler the SQL statements of the storage are timed and counted by, None if not profiled.
+
+        :returns: The query profiler.
+        """
+        return self.m_QueryProfiler
+
+    @QueryProfiler.setter
+    def QueryProfiler(self, value: QueryProfiler) -> None:
+        """
+        Sets the profiler the SQL statements of the storage are timed and counted by,
+        only SQLite storage runs SQL statements.
+
+        :param value: The query profiler, or None to stop profiling statements.
+        """
+        self.m_QueryProfiler = value
+        if isinstance(self.m_Storage, SqliteStorage):
+            self.m_Storage.Profiler = value
+
+    @property
+    def UsageRollup(self) -> UsageRollup:
+        """
+        Gets the rollups seat usage is sampled into, None if seat usage is not sampled.
+
+        :returns: The usage rollups.
+        """
+        return self.m_UsageRollup
+
+    @UsageRollup.setter
+    def UsageRollup(self, value: UsageRollup) -> None:
+        """
+        Sets the rollups seat usage is sampled into, sampling is stopped on Shutdown.
+
+        :param value: The usage rollups, or None to not sample seat usage.
+        """
+        self.m_UsageRollup = value
 
     @property
     def LicenceFolder(self) -> str:
@@ -140,7 +461,18 @@ class LicenceManager:
         """
         self.m_WebServerUri = value
 
-    def __init__(self, licenceFolder: str, dataFolder: str, messageDelegate):
+    @property
+    def Storage(self) -> Storage:
+        """
+        Gets the storage holding the licences and seats.
+
+        :returns: The storage holding the licences and seats.
+        """
+        return self.m_Storage
+
+    def __init__(self, licenceFolder: str, dataFolder: str, messageDelegate,
+                 inMemory: bool = None, snapshotInterval: int = None, storage: Storage = None, clock: Clock = None,
+                 config: Config = None):
         """
         Initializes the licence manager class with the specified licence
         sub folder name, database sub folder name and error logging object.
@@ -150,7 +482,23 @@ class LicenceManager:
         :param licenceFolder: The name of the licence sub folder
         :param dataFolder: The name of the database sub folder
         :param messageDelegate: An error logging object
+        :param inMemory: True to hold the seat store in memory and snapshot it to the data file,
+                         by default InMemoryDatabase of the configuration, if any, otherwise false
+        :param snapshotInterval: The interval, in seconds, between snapshots when held in memory,
+                                 by default SnapshotInterval of the configuration, if any, otherwise 60
+        :param storage: The storage to use, if None an SQLite storage in the data folder is used
+        :param clock: The time source, by default the Clock of the configuration, if any, otherwise the system clock
+        :param config: The licence server configuration the heartbeat, licence bundle and optional services are
+                       built from, by default none are. With WarmRestart, call RestoreSnapshot once the licences are
+                       loaded, and with a PrimaryAddress, Standby.Start.
         """
+        if clock is None and config is not None:
+            clock = config.Clock
+        if clock is not None:
+            self.m_Clock = clock
+        if config is not None and config.RecentEvents > 0:
+            self.m_RecentEvents = EventRing(config.RecentEvents)
+            self.m_RecentEvents.Attach()
         self.m_LicenceFolder = licenceFolder
         self.m_DataFolder = dataFolder
         self.m_ErrorLogger = messageDelegate
@@ -158,18 +506,76 @@ class LicenceManager:
         if not self.m_DataFolder:
             if not os.path.exists(self.GetDataFolder()):
                 os.mkdir(self.GetDataFolder())
-                logging.info('Created data folder: \'' + self.GetDataFolder() + '\'')
+                logging.info('Created data folder: \'' + self.GetDataFolder() + '\'',
+                             extra={'EventId': EventId.DataFolderCreated})
 
         if not self.m_LicenceFolder:
             if not os.path.exists(self.GetLicenceFolder()):
                 os.mkdir(self.GetLicenceFolder())
-                logging.info('Created licence folder: \'' + self.GetLicenceFolder() + '\'')
+                logging.info('Created licence folder: \'' + self.GetLicenceFolder() + '\'',
+                             extra={'EventId': EventId.LicenceFolderCreated})
+
+        if config is not None and config.LogFile:
+            self.m_LogPipeline = LogPipeline.FromConfig(config, os.path.join(self.GetDataFolder(), config.LogFile))
+
+        if storage is None:
+            if inMemory is None:
+                inMemory = config.InMemoryDatabase if config is not None else False
+            if snapshotInterval is None:
+                snapshotInterval = config.SnapshotInterval if config is not None else 60
+            storage = SqliteStorage(self.GetConnectionString(), inMemory, snapshotInterval)
+        self.m_Storage = storage
+        self.m_DenialsLock = threading.Lock()
+        self.m_Denials: Dict[str, int] = {}
+        self.m_ProductLocks = [threading.Lock() for _ in range(self.LockStripes)]
+        self.m_HeartBeatAdvisor = HeartBeatAdvisor(self.m_HeartBeat.total_seconds(), clock=self.m_Clock)
+        self.m_VerifiedDigests = set()
+
+        if config is not None:
+            self.HeartBeat = config.HeartBeat
+            self.MaximumHeartBeat = config.MaximumHeartBeat
+            self.m_UseLicenceBundle = config.LicenceBundle
+            if config.SlowQueryThreshold > 0:
+                self.QueryProfiler = QueryProfiler(config.SlowQueryThreshold / 1000.0)
+            if config.SeatJournal:
+                self.m_Journal = SeatJournal.FromConfig(config, os.path.join(self.GetDataFolder(),
+                                                                             SeatJournal.DefaultFolder))
+            if config.ClaimWindow > 0:
+                self.m_WaitQueue = SeatWaitQueue(config.ClaimWindow, clock=self.m_Clock)
+            if config.WarmRestart:
+                # The key is kept beside rather than in the data folder...
+                self.m_SeatSnapshot = SeatSnapshot(
+                    os.path.join(self.GetDataFolder(), SeatSnapshot.DefaultFileName),
+                    SeatSnapshot.LoadKey(os.path.join(Utils.GetExecutingFilePath(), SeatSnapshot.DefaultKeyFileName)))
 
         self.CreateDatabase()
         self.DeleteStaleSeats()
         self.AnalyzeDatabase()
         self.VacuumDatabase()
 
+        if config is not None and config.UsageRollup:
+            self.m_UsageRollup = UsageRollup(os.path.join(self.GetDataFolder(), Database.UsageFileName),
+                                             self.SampleUsage, clock=self.m_Clock)
+            self.m_UsageRollup.Start()
+
+        if config is not None:
+            # The seat pool and standby services wrap the manager, so are imported once it is defined...
+            if config.ReplicationPort > 0:
+                self.m_Replication = ReplicationPrimary(self.m_Storage, 'tcp://*:' + str(config.ReplicationPort),
+                                                        self.m_Clock)
+                self.m_Replication.Start()
+            if config.PrimaryAddress:
+                from .clsReplicationStandby import ReplicationStandby
+                self.m_Standby = ReplicationStandby(self, config.PrimaryAddress)
+            if config.CoordinatorPort > 0:
+                from .clsSeatCoordinator import SeatCoordinator
+                self.m_Coordinator = SeatCoordinator(self, 'tcp://*:' + str(config.CoordinatorPort))
+                self.m_Coordinator.Start()
+            if config.CoordinatorAddress:
+                from .clsSeatPoolNode import SeatPoolNode
+                self.m_SeatPool = SeatPoolNode(self, config.CoordinatorAddress)
+                self.m_SeatPool.Start()
+
     def DecryptDatabase(self):
         """
         Decrypts the current database
@@ -185,190 +591,81 @@ class LicenceManager:
         """
         if not product:
             raise ValueError
-        sbSQL = ""
-
-        # Parameter queries in python require ? instead of $ as in .net
-        # It then takes an ordered list as 2nd arg in the execute call
-        sbSQL += "SELECT " + Database.SqlFieldUserName + ", " + Database.SqlFieldMachineName + ", "
-        sbSQL += Database.SqlFieldIpAddress + ", " + Database.SqlFieldLogonTime + ", "
-        sbSQL += Database.SqlFieldUpdateTime + " "
-        sbSQL += "FROM " + Database.SqlTableConnection + " "
-        sbSQL += "WHERE " + Database.SqlFieldProduct + " = "
-        sbSQL += "?" + " COLLATE NOCASE "
-        sbSQL += "AND " + Database.SqlFieldUpdateTime + " > "
-        sbSQL += "?" + ";"
-        sbParameters = Database.ParameterLoggingSeparator.join([
-            '0: ' + product.lower(),
-            '1: ' + str(self.GetStaleTime())
-        ])
-
         output_list = []
-        try:
-            # Create the connection with DataSource
-            connection = sqlite3.connect(self.GetConnectionString())
-            cursor = connection.cursor()
-            indexOfUserName = 0
-            indexOfMachineName = 1
-            indexOfIpAddress = 2
-            indexOfLogonTime = 3
-            indexOfUpdateTime = 4
-            for row in cursor.execute(sbSQL, (product.lower(), self.GetStaleTime())):
-                ml = Message.UserRecordStruct()
-                ml.User = row[indexOfUserName]
-                ml.Host = row[indexOfMachineName]
-                ml.IP = row[indexOfIpAddress]
-                ml.LogonTime = row[indexOfLogonTime]
-                ml.UpdateTime = row[indexOfUpdateTime]
-                output_list.append(ml)
-            connection.commit()
-        except Exception as ex:
-            logging.critical(str(ex))
-            logging.critical('GetConnections SQL Command: \'' + sbSQL + '\'')
-            logging.critical('GetConnections SQL Parameters: \'' + sbParameters + '\'')
-            raise ex
-        finally:
-            logging.debug('GetConnections SQL Command: \'' + sbSQL + '\'')
-            logging.debug('GetConnections SQL Parameters: \'' + sbParameters + '\'')
+        for record in self.m_Storage.GetConnections(product, self.m_Clock.Now()):
+            ml = Message.UserRecordStruct()
+            ml.User = record.UserName
+            ml.Host = record.Host
+            ml.IP = record.IpAddress
+            ml.LogonTime = record.LogonTime
+            ml.UpdateTime = record.UpdateTime
+            output_list.append(ml)
         return output_list
 
+    def WriteConnections(self, product: str, body) -> int:
+        """
+        Adds a user record for each connection of the specified product to a
+        message body, written in place from the storage rows.
+
+        :param product: The name of the product to get the connections for.
+        :param body: The repeated user record field to add the connections to.
+        :returns: The number of connections added.
+        """
+        if not product:
+            raise ValueError
+        rows = self.m_Storage.GetConnections(product, self.m_Clock.Now())
+        for record in rows:
+            body.add(User=record.UserName, Host=record.Host, IP=record.IpAddress,
+                     LogonTime=record.LogonTime, UpdateTime=record.UpdateTime)
+        return len(rows)
+
     def GetLicenceDetails(self, product: str) -> Message.LicenceStruct:
         if not product:
             raise ValueError
         messages = []
-        sbSQL = ""
-
-        # sbSQL += "SELECT * "
-
-        sbSQL += "SELECT " + Database.SqlFieldId + ", "
-        sbSQL += Database.SqlFieldCompany + ", "
-        sbSQL += Database.SqlFieldProduct + ", "
-        sbSQL += Database.SqlFieldCustomer + ", "
-        sbSQL += Database.SqlFieldReference + ", "
-        sbSQL += Database.SqlFieldReseller + ", "
-        sbSQL += Database.SqlFieldNumberOfSeats + ", "
-        sbSQL += Database.SqlFieldStartDate + ", "
-        sbSQL += Database.SqlFieldExpiryDate + ", "
-        sbSQL += Database.SqlFieldTimeStamp + ", "
-        sbSQL += Database.SqlFieldCode + ", "
-        sbSQL += Database.SqlFieldVersion + ", "
-        sbSQL += Database.SqlFieldNotes + " "
-        sbSQL += "FROM " + Database.SqlTableLicence + " "
-        sbSQL += "WHERE " + Database.SqlFieldProduct + " = "
-        sbSQL += "?" + "COLLATE NOCASE "
-        sbSQL += "ORDER BY " + Database.SqlFieldTimeStamp + " DESC;"
-
-        sbParameters = Database.ParameterLoggingSeparator.join([
-            '0: ' + product.lower()
-        ])
-
         ld = None
-        try:
-            connection = sqlite3.connect(self.GetConnectionString())
-            cursor = connection.cursor()
-            indexOfLicenceID = 0
-            indexOfCompany = 1
-            indexOfProduct = 2
-            indexOfCustomer = 3
-            indexOfReference = 4
-            indexOfReseller = 5
-            indexOfNumberOfSeats = 6
-            indexOfStartDate = 7
-            indexOfExpiryDate = 8
-            indexOfTimeStamp = 9
-            indexOfCode = 10
-            indexOfFieldVersion = 11
-            indexOfFieldNotes = 12
-
-            latestValidDate = date.min
-            latestDate = date.min
-            pl = ProductLicences()
-            for row in cursor.execute(sbSQL, (product.lower(),)):
-                # print("SQL 02")
-                # print(row)
-                lic = ElementTree.Element('Licence1')
-                Company = ElementTree.SubElement(lic, 'Company')
-                Company.text = row[indexOfCompany]
-                Product = ElementTree.SubElement(lic, 'Product')
-                Product.text = row[indexOfProduct]
-                Customer = ElementTree.SubElement(lic, 'Customer')
-                Customer.text = row[indexOfCustomer]
-                Reference = ElementTree.SubElement(lic, 'Reference')
-                if row[indexOfReference]:
-                    Reference.text = row[indexOfReference]
-                Reseller = ElementTree.SubElement(lic, 'Reseller')
-                if row[indexOfReseller]:
-                    Reseller.text = row[indexOfReseller]
-                NumberOfSeats = ElementTree.SubElement(lic, 'NumberOfSeats')
-                NumberOfSeats.text = str(row[indexOfNumberOfSeats])
-                StartDate = ElementTree.SubElement(lic, 'StartDate')
-                if row[indexOfStartDate]:
-                    StartDate.text = row[indexOfStartDate]
-                ExpiryDate = ElementTree.SubElement(lic, 'ExpiryDate')
-                if row[indexOfExpiryDate]:
-                    ExpiryDate.text = row[indexOfExpiryDate]
-                TimeStamp = ElementTree.SubElement(lic, 'TimeStamp')
-                TimeStamp.text = str(row[indexOfTimeStamp])
-                ValidationCode = ElementTree.SubElement(lic, 'Code')
-                ValidationCode.text = row[indexOfCode]
-                Comments = ElementTree.SubElement(lic, 'Comments')
-                if row[indexOfFieldNotes]:
-                    Comments.text = row[indexOfFieldNotes]
-
-                verified = True
-                if self.m_DoubleValidation:
-                    public_key_file = open(os.path.join(os.getcwd(), 'public_key.pem'))
-                    public_key = public_key_file.read()
-                    verified = LicenceReader.VerifyWithFile(public_key, lic)
-                    if verified:
-                        logging.debug('Licence with id: ' + str(row[indexOfLicenceID]) + ' verified.')
-                    else:
-                        logging.warning('Licence with id: ' + str(row[indexOfLicenceID]) + ' NOT VERIFIED.')
-                if verified:
-                    if ld is None:
-                        ld = Message.LicenceStruct()
-                        ld.Company = row[indexOfCompany]
-                        ld.Product = row[indexOfProduct]
-                        ld.Customer = row[indexOfCustomer]
-                        if row[indexOfReference]:
-                            ld.Ref = row[indexOfReference]
-                        if row[indexOfReseller]:
-                            ld.Reseller = row[indexOfReseller]
-                    # We will persist the latest expiry date, this
-                    # will only be used if all the licences expired...
-                    if row[indexOfExpiryDate] and datetime.strptime(row[indexOfExpiryDate], "%d/%b/%Y").date() > latestDate:
-                        latestDate = datetime.strptime(row[indexOfExpiryDate], "%d/%b/%Y").date()
-                    # We will test the licence is within the current time period...
-                    if not self.IsLicenceInDateWindow(lic, messages):
-                        logging.info('Licence with id: ' + str(row[indexOfLicenceID]) + ' is not active.')
+        latestValidDate = date.min
+        latestDate = date.min
+        pl = ProductLicences()
+        for record in self.m_Storage.GetLicences(product):
+            lic = self.LicenceToElement(record)
+            if self.IsLicenceVerified(record, lic):
+                if ld is None:
+                    ld = Message.LicenceStruct()
+                    ld.Company = record.Company
+                    ld.Product = record.Product
+                    ld.Customer = record.Customer
+                    if record.Reference:
+                        ld.Ref = record.Reference
+                    if record.Reseller:
+                        ld.Reseller = record.Reseller
+                # We will persist the latest expiry date, this
+                # will only be used if all the licences expired...
+                if record.ExpiryDate and datetime.strptime(record.ExpiryDate, "%d/%b/%Y").date() > latestDate:
+                    latestDate = datetime.strptime(record.ExpiryDate, "%d/%b/%Y").date()
+                # We will test the licence is within the current time period...
+                if not self.IsLicenceInDateWindow(lic, messages):
+                    logging.info('Licence with id: ' + str(record.Id) + ' is not active.',
+                                 extra={'EventId': EventId.LicenceNotActiveMessage})
+                else:
+                    # We will ensure only 1 perpetual licence is loaded...
+                    if record.ExpiryDate:
+                        pl.Add(LicenceSeatStructure(record.Id, record.NumberOfSeats, False))
+                        if datetime.strptime(record.ExpiryDate, "%d/%b/%Y").date() > latestValidDate:
+                            latestValidDate = datetime.strptime(record.ExpiryDate, "%d/%b/%Y").date()
                     else:
-                        # We will ensure only 1 perpetual licence is loaded...
-                        if row[indexOfExpiryDate]:
-                            pl.Add(LicenceSeatStructure(row[indexOfLicenceID], row[indexOfNumberOfSeats], False))
-                            if datetime.strptime(row[indexOfExpiryDate], "%d/%b/%Y").date() > latestValidDate:
-                                latestValidDate = datetime.strptime(row[indexOfExpiryDate], "%d/%b/%Y").date()
-                        else:
-                            if not pl.HasPerpetualLicence:
-                                pl.Add(LicenceSeatStructure(row[indexOfLicenceID], row[indexOfNumberOfSeats], True))
-            if ld is not None:
-                if not pl.HasPerpetualLicence and latestValidDate > date.min:
-                    dt = datetime.combine(latestValidDate, datetime.min.time())
-                    ld.Date.FromDatetime(dt)
-                ld.NumberOfSeats = pl.TotalSeats
-                # We have only expired licences...
-                if ld.NumberOfSeats == 0:
-                    dt = datetime.combine(latestDate, datetime.min.time())
-                    ld.Date.FromDatetime(dt)
-            connection.commit()
-        except Exception as ex:
-            logging.critical(str(ex))
-            logging.critical('GetLicenceDetails SQL Command: \'' + sbSQL + '\'')
-            logging.critical('GetLicenceDetails SQL Parameters: \'' + sbParameters + '\'')
-            raise ex
-        finally:
-            logging.debug('GetLicenceDetails SQL Command: \'' + sbSQL + '\'')
-            logging.debug('GetLicenceDetails SQL Parameters: \'' + sbParameters + '\'')
+                        if not pl.HasPerpetualLicence:
+                            pl.Add(LicenceSeatStructure(record.Id, record.NumberOfSeats, True))
         if ld is None:
             raise InvalidProductException('Invalid product: \'' + product + '\'')
+        if not pl.HasPerpetualLicence and latestValidDate > date.min:
+            dt = datetime.combine(latestValidDate, datetime.min.time())
+            ld.Date.FromDatetime(dt)
+        ld.NumberOfSeats = pl.TotalSeats
+        # We have only expired licences...
+        if ld.NumberOfSeats == 0:
+            dt = datetime.combine(latestDate, datetime.min.time())
+            ld.Date.FromDatetime(dt)
         return ld
 
     def GetProducts(self) -> List[str]:
@@ -377,165 +674,85 @@ class LicenceManager:
 
         :returns: An iterator for the products.
         """
-        sbSQL = ""
-        sbSQL += "SELECT " + Database.SqlFieldProduct + " "
-        sbSQL += "FROM " + Database.SqlTableLicence + " "
-        sbSQL += "GROUP BY " + Database.SqlFieldProduct + " "
-        sbSQL += "ORDER BY " + Database.SqlFieldProduct + " ASC;"
-
-        output_list = []
-        try:
-            connection = sqlite3.connect(self.GetConnectionString())
-            cursor = connection.cursor()
-            indexOfProduct = 0
-            for row in cursor.execute(sbSQL):
-                # print("SQL 03")
-                # print(row)
-                output_list.append(row[indexOfProduct])
-            connection.commit()
-        except Exception as ex:
-            logging.critical(str(ex))
-            logging.critical('GetProducts SQL Command: \'' + sbSQL + '\'')
-            raise
-        finally:
-            logging.debug('GetProducts SQL Command: \'' + sbSQL + '\'')
-        return output_list
+        return self.m_Storage.GetProducts()
 
     def LoadLicences(self):
         """
         Loads the licences from the licence folder into the database.
+        With a licence bundle, the licences are read from the bundle unless the
+        licence folder has changed since it was built, when it is rebuilt.
+        The licences of a bundle were verified when it was built, they are verified
+        again as they are used if double validation is enabled, otherwise now.
+        """
+        licences = None
+        bundleFile = os.path.join(self.GetDataFolder(), LicenceBundle.DefaultFileName)
+        if self.m_UseLicenceBundle:
+            # Taken before the files are read, a file changed while they are read rebuilds the bundle...
+            fingerprint = LicenceBundle.Fingerprint(self.GetLicenceFolder())
+            reader = LicenceReader()
+            if reader.ReadBundle(bundleFile, self.GetLicenceFolder()):
+                with reader.Bundle:
+                    licences = reader.Bundle.GetAllLicences()
+                logging.debug('Read ' + str(len(licences)) + ' licence(s) from: \'' + bundleFile + '\'')
+                if not self.m_DoubleValidation:
+                    licences = [lic for lic in licences if self.VerifyLicence(lic, self.LicenceToElement(lic))]
+        if licences is None:
+            licences = self.ReadLicenceFiles()
+            if self.m_UseLicenceBundle:
+                LicenceBundle.Write(bundleFile, fingerprint, licences)
+
+        count = self.m_Storage.LoadLicences(licences)
+        if count > 0:
+            logging.info(str(count) + ' licence(s) loaded into database.', extra={'EventId': EventId.LicenceLoad})
+        else:
+            logging.debug(str(count) + ' licence(s) loaded into database.')
+        logging.debug('Loaded licence(s).')
+
+    def ReadLicenceFiles(self) -> List[LicenceRecord]:
+        """
+        Reads and verifies the licence files of the licence folder, single licence and container files.
+
+        :returns: The verified licences.
         """
         licences = []
-        timestamps = []
+        public_key = None
 
         for filename in os.listdir(self.GetLicenceFolder()):
             if not filename.endswith('.nls1'):
                 continue
+            if public_key is None:
+                public_key = self.GetPublicKey()
             reader = LicenceReader()
-            reader.Read(filename)
-            public_key_file = open(os.path.join(os.getcwd(), 'public_key.pem'))
-            public_key = public_key_file.read()
-
-            if not reader.Verify(public_key):
-                logging.critical('Licence: \'' + filename + '\' NOT VERIFIED.')
-            else:
-                logging.debug('Licence: \'' + filename + '\' verified.')
-                if reader.Licence1:
-                    licences.append(reader.Licence1)
-                    timestamps.append(str(reader.Licence1.find('TimeStamp').text))
-
-        sbSQL = ""
-        sbSQL += "INSERT OR IGNORE INTO " + Database.SqlTableLicence + "( "
-        sbSQL += Database.SqlFieldCompany + ", "
-        sbSQL += Database.SqlFieldProduct + ", "
-        sbSQL += Database.SqlFieldCustomer + ", "
-        sbSQL += Database.SqlFieldReference + ", "
-        sbSQL += Database.SqlFieldReseller + ", "
-        sbSQL += Database.SqlFieldNumberOfSeats + ", "
-        sbSQL += Database.SqlFieldStartDate + ", "
-        sbSQL += Database.SqlFieldExpiryDate + ", "
-        sbSQL += Database.SqlFieldTimeStamp + ", "
-        sbSQL += Database.SqlFieldCode + ", "
-        sbSQL += Database.SqlFieldVersion + ", "
-        sbSQL += Database.SqlFieldNotes + ") "
-
-        sbSQL += "VALUES (" + "?" + ", "
-        sbSQL += "?" + ", "
-        sbSQL += "?" + ", "
-        sbSQL += "?" + ", "
-        sbSQL += "?" + ", "
-        sbSQL += "?" + ", "
-        sbSQL += "?" + ", "
-        sbSQL += "?" + ", "
-        sbSQL += "?" + ", "
-        sbSQL += "?" + ", "
-        sbSQL += "?" + ", "
-        sbSQL += "?" + ");"
-
-        sbParameters = ""
-
-        try:
-            connection = sqlite3.connect(self.GetConnectionString())
-            cursor = connection.cursor()
-            count = 0
-            for lic in licences:
-                Reference = None
-                if lic.find('Reference') is not None:
-                    Reference = lic.find('Reference').text
-                Reseller = None
-                if lic.find('Reseller') is not None:
-                    Reseller = lic.find('Reseller').text
-                StartDate = None
-                if lic.find('StartDate') is not None:
-                    StartDate = lic.find('StartDate').text
-                ExpiryDate = None
-                if lic.find('ExpiryDate') is not None:
-                    ExpiryDate = lic.find('ExpiryDate').text
-                Comments = None
-                if lic.find('Comments') is not None:
-                    Comments = lic.find('Comments').text
-                parameters = (
-                    lic.find('Company').text,
-                    lic.find('Product').text,
-                    lic.find('Customer').text,
-                    Reference,
-                    Reseller,
-                    lic.find('NumberOfSeats').text,
-                    StartDate,
-                    ExpiryDate,
-                    lic.find('TimeStamp').text,
-                    lic.find('Code').text,
-                    "1",
-                    Comments,
-                )
-                sbParameters = Database.ParameterLoggingSeparator.join([
-                    '0: ' + str(lic.find('Company').text),
-                    '1: ' + str(lic.find('Product').text),
-                    '2: ' + str(lic.find('Customer').text),
-                    '3: ' + str(Reference),
-                    '4: ' + str(Reseller),
-                    '5: ' + str(lic.find('NumberOfSeats').text),
-                    '6: ' + str(StartDate),
-                    '7: ' + str(ExpiryDate),
-                    '8: ' + str(lic.find('TimeStamp').text),
-                    '9: ' + str(lic.find('Code').text),
-                    '10: ' + "1",
-                    '11: ' + str(Comments)
-                ])
-                cursor.execute(sbSQL, parameters)
-                count += 1
-                logging.debug('LoadLicences SQL Command: \'' + sbSQL + '\'')
-                logging.debug('LoadLicences SQL Parameters: \'' + sbParameters + '\'')
-            if count > 0:
-                logging.info(str(count) + ' licence(s) loaded into database.')
-            else:
-                logging.debug(str(count) + ' licence(s) loaded into database.')
-            sbSQL = "DELETE FROM " + Database.SqlTableLicence
-            if len(timestamps) > 0:
-                sbSQL += " "
-                sbSQL += "WHERE " + Database.SqlFieldTimeStamp + " "
-                sbSQL += "NOT IN ("
-                sbSQL += ",".join(timestamps)
-                sbSQL += ")"
-            sbSQL += ";"
-            cursor.execute(sbSQL)
-            connection.commit()
-        except Exception as ex:
-            logging.critical(str(ex))
-            logging.critical('LoadLicences SQL Command: \'' + sbSQL + '\'')
-            logging.critical('LoadLicences SQL Parameters: \'' + sbParameters + '\'')
-            raise ex
-        logging.debug('Loaded licence(s).')
-
-    def RefreshSeat(self, product: str, ipAddress: str, userName: str, host: str):
+            try:
+                for lic in reader.ReadLicences(filename, self.GetLicenceFolder()):
+                    name = filename
+                    if lic.find('TimeStamp') is not None:
+                        name += ' (' + str(lic.find('TimeStamp').text) + ')'
+                    if not LicenceReader.VerifyWithFile(public_key, lic):
+                        logging.critical('Licence: \'' + name + '\' NOT VERIFIED.',
+                                         extra={'EventId': EventId.LicenceVerificationError})
+                    else:
+                        logging.debug('Licence: \'' + name + '\' verified.')
+                        licences.append(self.ElementToLicence(lic))
+            except ElementTree.ParseError as ex:
+                logging.critical('Licence file: \'' + filename + '\' is not valid XML: ' + str(ex),
+                                 extra={'EventId': EventId.LicenceVerificationError})
+        return licences
+
+    def RefreshSeat(self, product: str, ipAddress: str, userName: str, host: str, heartBeat: timedelta = None,
+                    seatId: int = None) -> int:
         """
         Sets the update time for the specified product, IP Address and
         user anme to the current time in the connection table.
+        In a seat pool, a refresh is counted against the node's quota, as it may revive an expired seat.
 
         :param product: The name of the product to update the time for.
         :param ipAddress: The IP Address to update the time for.
         :param userName: The user name to update the time for.
         :param host: The host to update the time for.
+        :param heartBeat: The heartbeat advertised to the client, by default the recommended heartbeat.
+        :param seatId: The id returned to the client when the seat was taken, None if not known.
+        :returns: The id of the seat if refreshed, 0 if the seat pool has no seat for it.
         """
         if not product:
             raise ValueError
@@ -545,85 +762,37 @@ class LicenceManager:
             raise ValueError
         if not host:
             raise ValueError
-
-        sbSQL = ""
-        sbSQL += "INSERT OR IGNORE INTO " + Database.SqlTableConnection + "( "
-        sbSQL += Database.SqlFieldProduct + ", "
-        sbSQL += Database.SqlFieldUserName + ", "
-        sbSQL += Database.SqlFieldIpAddress + ", "
-        sbSQL += Database.SqlFieldMachineName + ", "
-        sbSQL += Database.SqlFieldLogonTime + ", "
-        sbSQL += Database.SqlFieldUpdateTime + ") "
-
-        sbSQL += "VALUES (" + "?" + ", "
-        sbSQL += "?" + ", "
-        sbSQL += "?" + ", "
-        sbSQL += "?" + ", "
-        sbSQL += "?" + ", "
-        sbSQL += "?" + "); "
-        sbParameters = ""
-
-        sbSQL_2 = ""
-        sbSQL_2 += "UPDATE " + Database.SqlTableConnection + " "
-        sbSQL_2 += "SET " + Database.SqlFieldUpdateTime + " = "
-        sbSQL_2 += "?" + " "
-        sbSQL_2 += "WHERE " + Database.SqlFieldProduct + " = "
-        sbSQL_2 += "?" + " COLLATE NOCASE "
-        sbSQL_2 += "AND " + Database.SqlFieldUserName + " = "
-        sbSQL_2 += "?" + " "
-        sbSQL_2 += "AND " + Database.SqlFieldIpAddress + " = "
-        sbSQL_2 += "?" + ";"
-        sbParameters_2 = ""
-
-        try:
-            connection = sqlite3.connect(self.GetConnectionString())
-            cursor = connection.cursor()
-            nowTime = datetime.now()
-            parameters = (
-                product.lower(),
-                userName,
-                ipAddress,
-                host,
-                nowTime,
-                nowTime
-            )
-            sbParameters = Database.ParameterLoggingSeparator.join([
-                '0: ' + str(product.lower()),
-                '1: ' + str(userName),
-                '2: ' + str(ipAddress),
-                '3: ' + str(host),
-                '4: ' + str(nowTime),
-                '5: ' + str(nowTime)
-            ])
-            parameters_2 = (
-                nowTime,
-                product.lower(),
-                userName,
-                ipAddress
-            )
-            sbParameters_2 = Database.ParameterLoggingSeparator.join([
-                '0: ' + str(nowTime),
-                '1: ' + str(product.lower()),
-                '2: ' + str(userName),
-                '3: ' + str(ipAddress)
-            ])
-            cursor.execute(sbSQL, parameters)
-            cursor.execute(sbSQL_2, parameters_2)
-            connection.commit()
-        except Exception as ex:
-            logging.critical(str(ex))
-            logging.critical('RefreshSeat SQL Command: \'' + sbSQL + '\'')
-            logging.critical('RefreshSeat SQL Parameters: \'' + sbParameters + '\'')
-            logging.critical('RefreshSeat SQL Command 2: \'' + sbSQL_2 + '\'')
-            logging.critical('RefreshSeat SQL Parameters 2: \'' + sbParameters_2 + '\'')
-            raise ex
-        finally:
-            logging.debug('RefreshSeat SQL Command: \'' + sbSQL + '\'')
-            logging.debug('RefreshSeat SQL Parameters: \'' + sbParameters + '\'')
-            logging.debug('RefreshSeat SQL Command 2: \'' + sbSQL_2 + '\'')
-            logging.debug('RefreshSeat SQL Parameters 2: \'' + sbParameters_2 + '\'')
-
-    def ReleaseSeat(self, product: str, ipAddress: str, userName: str) -> bool:
+        if heartBeat is None:
+            heartBeat = self.RecommendedHeartBeat
+        licenceSeats = None
+        if self.m_SeatPool is not None:
+            licenceSeats = self.m_SeatPool.GetLicenceSeats(product)
+            if licenceSeats is None:
+                pl = self.GetProductLicences(product)
+                licenceSeats = []
+                if pl is not None:
+                    pl.Sort()
+                    licenceSeats = pl.LicenceSeats
+        with self.GetProductLock(product):
+            nowTime = self.m_Clock.Now()
+            start = self.m_Clock.Monotonic()
+            expiryTime = self.GetExpiryTime(nowTime, heartBeat)
+            if licenceSeats is None:
+                refreshed = self.m_Storage.RefreshSeat(product, ipAddress, userName, host, nowTime, expiryTime, seatId)
+            else:
+                refreshed = self.m_Storage.TakeSeat(product, ipAddress, userName, host,
+                                                    self.GetSeatLimit(product, licenceSeats), nowTime, expiryTime)
+            self.m_HeartBeatAdvisor.Record(self.m_Clock.Monotonic() - start)
+            if refreshed and self.m_Replication is not None:
+                self.m_Replication.Publish(MessageType.RefreshSeat, product, userName, ipAddress, host, nowTime, expiryTime)
+        eventId = EventId.SeatRefreshed if refreshed else EventId.SeatNotTaken
+        if self.m_Journal is not None:
+            self.m_Journal.Record(eventId, product, userName, ipAddress)
+        if self.m_RecentEvents is not None:
+            self.m_RecentEvents.Record(eventId, product, userName, ipAddress)
+        return refreshed
+
+    def ReleaseSeat(self, product: str, ipAddress: str, userName: str, seatId: int = None) -> bool:
         """
         Deletes the line in the connection table for the specified product,
         IP Address and user name.
@@ -631,6 +800,7 @@ class LicenceManager:
         :param product: The name of the product to delete the line for.
         :param ipAddress: The IP Address to delete the line for.
         :param userName: The user name to delete the line for.
+        :param seatId: The id returned to the client when the seat was taken, None if not known.
         :returns: True if the line is deleted, otherwise false.
         """
         if not product:
@@ -639,45 +809,200 @@ class LicenceManager:
             raise ValueError
         if not userName:
             raise ValueError
-
-        sbSQL = ""
-
-        # We will now delete any licences no longer in use...
-        sbSQL += "DELETE FROM " + Database.SqlTableConnection + " "
-        sbSQL += "WHERE " + Database.SqlFieldProduct + " = "
-        sbSQL += "?" + " COLLATE NOCASE "
-        sbSQL += "AND " + Database.SqlFieldUserName + " = "
-        sbSQL += "?" + " "
-        sbSQL += "AND " + Database.SqlFieldIpAddress + " = "
-        sbSQL += "?" + ";"
-
-        sbParameters = Database.ParameterLoggingSeparator.join([
-            '0: ' + str(product.lower()),
-            '1: ' + str(userName),
-            '2: ' + str(ipAddress)
-        ])
-
-        try:
-            connection = sqlite3.connect(self.GetConnectionString())
-            cursor = connection.cursor()
-            parameters = (
-                product.lower(),
-                userName,
-                ipAddress
-            )
-            cursor.execute(sbSQL, parameters)
-            connection.commit()
-        except Exception as ex:
-            logging.critical(str(ex))
-            logging.critical('ReleaseSeat SQL Command: \'' + sbSQL + '\'')
-            logging.critical('ReleaseSeat SQL Parameters: \'' + sbParameters + '\'')
-            raise ex
-        finally:
-            logging.debug('ReleaseSeat SQL Command: \'' + sbSQL + '\'')
-            logging.debug('ReleaseSeat SQL Parameters: \'' + sbParameters + '\'')
+        with self.GetProductLock(product):
+            start = self.m_Clock.Monotonic()
+            self.m_Storage.ReleaseSeat(product, ipAddress, userName, seatId)
+            self.m_HeartBeatAdvisor.Record(self.m_Clock.Monotonic() - start)
+            if self.m_Replication is not None:
+                self.m_Replication.Publish(MessageType.ReleaseSeat, product, userName, ipAddress)
+        if self.m_Journal is not None:
+            self.m_Journal.Record(EventId.SeatReleased, product, userName, ipAddress)
+        if self.m_RecentEvents is not None:
+            self.m_RecentEvents.Record(EventId.SeatReleased, product, userName, ipAddress)
+        if self.m_WaitQueue is not None:
+            self.OfferSeats(product)
         return True
 
-    def TakeSeat(self, product: str, ipAddress: str, userName: str, host: str) -> bool:
+    def ExecuteBatch(self, operations: List[SeatOperation], heartBeat: timedelta = None) -> List[int]:
+        """
+        Performs seat takes, refreshes and releases, in order, in one storage transaction.
+        A take of a product with no active licences is not performed and is not taken.
+
+        In a seat pool, takes and refreshes are counted against the node's quota, without borrowing more.
+
+        :param operations: The operations to perform, the licence seats of takes are filled in by the manager.
+        :param heartBeat: The heartbeat advertised to the client, by default the recommended heartbeat.
+        :returns: For each take or refresh, the id of the seat, 0 if not taken,
+                  and for each release, the number of seats deleted.
+        """
+        for op in operations:
+            if not op.Product or not op.IpAddress or not op.UserName:
+                raise ValueError
+            if op.Type != MessageType.ReleaseSeat and not op.Host:
+                raise ValueError
+        if heartBeat is None:
+            heartBeat = self.RecommendedHeartBeat
+
+        results = [0] * len(operations)
+        pending = []
+        indexes = []
+        licenceSeats = {}
+        for index, op in enumerate(operations):
+            if self.m_SeatPool is not None and op.Type == MessageType.RefreshSeat:
+                op = op._replace(Type=MessageType.TakeSeat)
+            if op.Type == MessageType.TakeSeat:
+                if op.Product.lower() not in licenceSeats:
+                    pl = self.GetProductLicences(op.Product)
+                    if pl is not None and pl.TotalSeats > 0:
+                        pl.Sort()
+                        licenceSeats[op.Product.lower()] = pl.LicenceSeats
+                    else:
+                        licenceSeats[op.Product.lower()] = None
+                if licenceSeats[op.Product.lower()] is None:
+                    continue
+                op = op._replace(LicenceSeats=licenceSeats[op.Product.lower()])
+            pending.append(op)
+            indexes.append(index)
+
+        if pending:
+            # Take the locks of every product in stripe order, so two batches
+            # cannot each hold a lock the other is waiting for...
+            stripes = sorted(set(hash(op.Product.lower()) % len(self.m_ProductLocks) for op in pending))
+            with ExitStack() as stack:
+                for stripe in stripes:
+                    stack.enter_context(self.m_ProductLocks[stripe])
+                nowTime = self.m_Clock.Now()
+                start = self.m_Clock.Monotonic()
+                expiryTime = self.GetExpiryTime(nowTime, heartBeat)
+                if self.m_SeatPool is not None:
+                    pending = [op._replace(LicenceSeats=self.GetSeatLimit(op.Product, op.LicenceSeats))
+                               if op.Type == MessageType.TakeSeat else op for op in pending]
+                done = self.m_Storage.ExecuteBatch(pending, nowTime, expiryTime)
+                self.m_HeartBeatAdvisor.Record(self.m_Clock.Monotonic() - start)
+                if self.m_Replication is not None:
+                    for index, op, result in zip(indexes, pending, done):
+                        if result or op.Type == MessageType.RefreshSeat:
+                            self.m_Replication.Publish(operations[index].Type, op.Product, op.UserName, op.IpAddress,
+                                                       op.Host, nowTime, expiryTime)
+            for index, result in zip(indexes, done):
+                results[index] = result
+
+        for op, result in zip(operations, results):
+            if op.Type == MessageType.TakeSeat:
+                if not result:
+                    with self.m_DenialsLock:
+                        self.m_Denials[op.Product.lower()] = self.m_Denials.get(op.Product.lower(), 0) + 1
+                eventId = EventId.SeatTaken if result else EventId.SeatNotTaken
+            elif op.Type == MessageType.RefreshSeat:
+                eventId = EventId.SeatRefreshed if result else EventId.SeatNotTaken
+            else:
+                eventId = EventId.SeatReleased
+            if self.m_Journal is not None:
+                self.m_Journal.Record(eventId, op.Product, op.UserName, op.IpAddress)
+            if self.m_RecentEvents is not None:
+                self.m_RecentEvents.Record(eventId, op.Product, op.UserName, op.IpAddress)
+        if self.m_WaitQueue is not None:
+            for product in {op.Product.lower() for op, result in zip(operations, results)
+                            if op.Type == MessageType.ReleaseSeat and result}:
+                self.OfferSeats(product)
+        return results
+
+    def ReleaseSeats(self, product: str = None, host: str = None, ipAddress: str = None,
+                     userName: str = None) -> Dict[str, int]:
+        """
+        Releases every seat matching all of the specified filters in one storage transaction,
+        e.g. every seat of a host after it is rebooted or of a user who has changed machines.
+
+        :param product: The name of the product to release the seats for, None for every product.
+        :param host: The host to release the seats for, None for every host.
+        :param ipAddress: The IP Address to release the seats for, None for every IP Address.
+        :param userName: The user name to release the seats for, None for every user.
+        :returns: A dictionary of product name to the number of its seats released.
+        """
+        if not (product or host or ipAddress or userName):
+            raise ValueError
+        return self.DeleteSeats(product or None, host or None, ipAddress or None, userName or None, None)
+
+    def ExpireSeats(self, olderThan: datetime, product: str = None) -> Dict[str, int]:
+        """
+        Releases every seat not refreshed since the specified time in one storage transaction.
+
+        :param olderThan: Seats not refreshed since this time are released.
+        :param product: The name of the product to expire the seats for, None for every product.
+        :returns: A dictionary of product name to the number of its seats released.
+        """
+        if olderThan is None:
+            raise ValueError
+        return self.DeleteSeats(product or None, None, None, None, olderThan)
+
+    def DeleteSeats(self, product: str, host: str, ipAddress: str, userName: str,
+                    updatedBefore: datetime) -> Dict[str, int]:
+        """
+        Deletes the matching seats under the locks of the products they may belong to,
+        journaling and replicating the release of each, see ReleaseSeats.
+        """
+        stripes = range(len(self.m_ProductLocks))
+        if product:
+            stripes = [hash(product.lower()) % len(self.m_ProductLocks)]
+        with ExitStack() as stack:
+            for stripe in stripes:
+                stack.enter_context(self.m_ProductLocks[stripe])
+            start = self.m_Clock.Monotonic()
+            released = self.m_Storage.ReleaseSeats(product, host, ipAddress, userName, updatedBefore)
+            self.m_HeartBeatAdvisor.Record(self.m_Clock.Monotonic() - start)
+            if self.m_Replication is not None:
+                for seat in released:
+                    self.m_Replication.Publish(MessageType.ReleaseSeat, seat.Product, seat.UserName, seat.IpAddress)
+        counts: Dict[str, int] = {}
+        for seat in released:
+            counts[seat.Product] = counts.get(seat.Product, 0) + 1
+            if self.m_Journal is not None:
+                self.m_Journal.Record(EventId.SeatReleased, seat.Product, seat.UserName, seat.IpAddress)
+            if self.m_RecentEvents is not None:
+                self.m_RecentEvents.Record(EventId.SeatReleased, seat.Product, seat.UserName, seat.IpAddress)
+        logging.info('Released ' + str(len(released)) + ' seat(s) for product: \'' + str(product) +
+                     '\', host: \'' + str(host) + '\', IP Address: \'' + str(ipAddress) + '\', user: \'' +
+                     str(userName) + '\', not refreshed since: \'' + str(updatedBefore) + '\'',
+                     extra={'EventId': EventId.SeatsReleased})
+        if self.m_WaitQueue is not None:
+            for product in counts:
+                self.OfferSeats(product)
+        return counts
+
+    def Shutdown(self) -> None:
+        """
+        Stops sampling seat usage, stops following the primary, writes the seat snapshot, returns the seat
+        pool quota, stops coordinating the seat pool and replicating seats, closes the storage, writing a final
+        snapshot if the seat store is held in memory, closes the seat event journal, detaches the recent events
+        ring from the log and closes the log pipeline.
+        """
+        if self.m_UsageRollup is not None:
+            self.m_UsageRollup.Stop()
+        if self.m_Standby is not None:
+            self.m_Standby.Close()
+            self.m_Standby = None
+        if self.m_SeatSnapshot is not None:
+            self.WriteSnapshot()
+        if self.m_SeatPool is not None:
+            self.m_SeatPool.Close()
+            self.m_SeatPool = None
+        if self.m_Coordinator is not None:
+            self.m_Coordinator.Close()
+            self.m_Coordinator = None
+        if self.m_Replication is not None:
+            self.m_Replication.Close()
+            self.m_Replication = None
+        self.m_Storage.Close()
+        if self.m_Journal is not None:
+            self.m_Journal.Close()
+            self.m_Journal = None
+        if self.m_RecentEvents is not None:
+            self.m_RecentEvents.Detach()
+        if self.m_LogPipeline is not None:
+            self.m_LogPipeline.Close()
+            self.m_LogPipeline = None
+
+    def TakeSeat(self, product: str, ipAddress: str, userName: str, host: str, heartBeat: timedelta = None) -> int:
         """
         Reads the number of licence seats available for the specified
         product, if a seat is available writes a line in the connection
@@ -687,7 +1012,8 @@ class LicenceManager:
         :param ipAddress: The IP Address to take the seat for.
         :param userName: The user name to take the seat for.
         :param host: The host to take the seat for.
-        :returns: True if the seat is taken, otherwise false.
+        :param heartBeat: The heartbeat advertised to the client, by default the recommended heartbeat.
+        :returns: The id of the seat if taken, otherwise 0.
         """
         if not product:
             raise ValueError
@@ -698,267 +1024,168 @@ class LicenceManager:
         if not host:
             raise ValueError
 
-        messages = []
-        sbSQL = ""
-        takenSeat = False
-        loggingCount = 1
-
-        # This replaced a SELECT *
-        sbSQL += "SELECT " + Database.SqlFieldId + ", "
-        sbSQL += Database.SqlFieldCompany + ", "
-        sbSQL += Database.SqlFieldProduct + ", "
-        sbSQL += Database.SqlFieldCustomer + ", "
-        sbSQL += Database.SqlFieldReference + ", "
-        sbSQL += Database.SqlFieldReseller + ", "
-        sbSQL += Database.SqlFieldNumberOfSeats + ", "
-        sbSQL += Database.SqlFieldStartDate + ", "
-        sbSQL += Database.SqlFieldExpiryDate + ", "
-        sbSQL += Database.SqlFieldTimeStamp + ", "
-        sbSQL += Database.SqlFieldCode + ", "
-        sbSQL += Database.SqlFieldVersion + ", "
-        sbSQL += Database.SqlFieldNotes + " "
-        sbSQL += "FROM " + Database.SqlTableLicence + " "
-        sbSQL += "WHERE " + Database.SqlFieldProduct + " = "
-        sbSQL += "?" + " COLLATE NOCASE "
-        # We will ensure that licences are read latest to earliest,
-        # to ensure that only the latest perpetual licence is used...
-        sbSQL += "ORDER BY " + Database.SqlFieldTimeStamp + " DESC;"
-
-        pl = ProductLicences()
-        try:
-            staleTime = self.GetStaleTime()
-            nowTime = datetime.now()
-            connection = sqlite3.connect(self.GetConnectionString())
-            cursor = connection.cursor()
-            parameters = (
-                product.lower(),
-            )
-            sbParameters = Database.ParameterLoggingSeparator.join([
-                '0: ' + str(product.lower())
-            ])
-            logging.debug('TakeSeat SQL Command #' + str(loggingCount) + ': \'' + sbSQL + '\'')
-            logging.debug('TakeSeat SQL Parameters #' + str(loggingCount) + ': \'' + sbParameters + '\'')
-            indexOfLicenceID = 0
-            indexOfCompany = 1
-            indexOfProduct = 2
-            indexOfCustomer = 3
-            indexOfReference = 4
-            indexOfReseller = 5
-            indexOfNumberOfSeats = 6
-            indexOfStartDate = 7
-            indexOfExpiryDate = 8
-            indexOfTimeStamp = 9
-            indexOfCode = 10
-            indexOfFieldVersion = 11
-            indexOfFieldNotes = 12
-            for row in cursor.execute(sbSQL, parameters):
-                lic = ElementTree.Element('Licence1')
-                Company = ElementTree.SubElement(lic, 'Company')
-                Company.text = row[indexOfCompany]
-                Product = ElementTree.SubElement(lic, 'Product')
-                Product.text = row[indexOfProduct]
-                Customer = ElementTree.SubElement(lic, 'Customer')
-                Customer.text = row[indexOfCustomer]
-                Reference = ElementTree.SubElement(lic, 'Reference')
-                if row[indexOfReference]:
-                    Reference.text = row[indexOfReference]
-                Reseller = ElementTree.SubElement(lic, 'Reseller')
-                if row[indexOfReseller]:
-                    Reseller.text = row[indexOfReseller]
-                NumberOfSeats = ElementTree.SubElement(lic, 'NumberOfSeats')
-                NumberOfSeats.text = str(row[indexOfNumberOfSeats])
-                StartDate = ElementTree.SubElement(lic, 'StartDate')
-                if row[indexOfStartDate]:
-                    StartDate.text = row[indexOfStartDate]
-                ExpiryDate = ElementTree.SubElement(lic, 'ExpiryDate')
-                if row[indexOfExpiryDate]:
-                    ExpiryDate.text = row[indexOfExpiryDate]
-                TimeStamp = ElementTree.SubElement(lic, 'TimeStamp')
-                TimeStamp.text = str(row[indexOfTimeStamp])
-                ValidationCode = ElementTree.SubElement(lic, 'Code')
-                ValidationCode.text = row[indexOfCode]
-                Comments = ElementTree.SubElement(lic, 'Comments')
-                if row[indexOfFieldNotes]:
-                    Comments.text = row[indexOfFieldNotes]
-
-                verified = True
-                if self.m_DoubleValidation:
-                    public_key_file = open(os.path.join(os.getcwd(), 'public_key.pem'))
-                    public_key = public_key_file.read()
-                    verified = LicenceReader.VerifyWithFile(public_key, lic)
-                    if verified:
-                        logging.debug('Licence with id: ' + str(row[indexOfLicenceID]) + ' verified.')
-                    else:
-                        logging.warning('Licence with id: ' + str(row[indexOfLicenceID]) + ' NOT VERIFIED.')
-                if verified:
-                    # We will test the licence is within the current time period...
-                    if not self.IsLicenceInDateWindow(lic, messages):
-                        logging.info('Licence with id: ' + str(row[indexOfLicenceID]) + ' is not active.')
-                    else:
-                        # We will ensure only 1 perpetual licence is loaded...
-                        if row[indexOfExpiryDate]:
-                            pl.Add(LicenceSeatStructure(row[indexOfLicenceID], row[indexOfNumberOfSeats], False))
-                        else:
-                            if not pl.HasPerpetualLicence:
-                                pl.Add(LicenceSeatStructure(row[indexOfLicenceID], row[indexOfNumberOfSeats], True))
-            if pl is not None:
-                pl.Sort()
-                # * shouldn't matter since it's a count?
-                sbSQL = "SELECT COUNT (*) "
-                sbSQL += "FROM " + Database.SqlTableConnection + " "
-                sbSQL += "WHERE ( " + Database.SqlFieldProduct + " = "
-                sbSQL += "?" + " COLLATE NOCASE "
-                sbSQL += "AND " + Database.SqlFieldUpdateTime + " > "
-                sbSQL += "?" + ") "
-                sbSQL += "AND NOT (" + Database.SqlFieldUserName + " = "
-                sbSQL += "?" + " "
-                sbSQL += "AND " + Database.SqlFieldIpAddress + " = "
-                sbSQL += "?" + ");"
-                parameters = (
-                    product.lower(),
-                    staleTime,
-                    userName,
-                    ipAddress
-                )
-                sbParameters = Database.ParameterLoggingSeparator.join([
-                    '0: ' + str(product.lower()),
-                    '1: ' + str(staleTime),
-                    '2: ' + str(userName),
-                    '3: ' + str(ipAddress)
-                ])
-                cursor.execute(sbSQL, parameters)
-                takenSeats = cursor.fetchone()[0]
-
-                loggingCount += 1
-                logging.debug('TakeSeat SQL Command #' + str(loggingCount) + ': \'' + sbSQL + '\'')
-                logging.debug('TakeSeat SQL Parameters #' + str(loggingCount) + ': \'' + sbParameters + '\'')
-
-                if takenSeats >= pl.TotalSeats:
-                    return False
-                licenceId = pl.LicenceSeats[0].LicenceID
-                if len(pl.LicenceSeats) > 1:
-                    sbSQL = "SELECT COUNT(*) "
-                    sbSQL += "FROM " + Database.SqlTableConnection + " "
-                    sbSQL += "WHERE (" + Database.SqlTableLicence + Database.SqlFieldForeignKeyId + " = "
-                    sbSQL += "?" + " "
-                    sbSQL += "AND " + Database.SqlFieldUpdateTime + " > "
-                    sbSQL += "?" + ") "
-                    sbSQL += "AND NOT (" + Database.SqlFieldUserName + " = "
-                    sbSQL += "?" + " "
-                    sbSQL += "AND " + Database.SqlFieldIpAddress + " = "
-                    sbSQL += "?" + ");"
-                    for ls in pl.LicenceSeats:
-                        parameters = (
-                            ls.LicenceID,
-                            staleTime,
-                            userName,
-                            ipAddress
-                        )
-                        sbParameters = Database.ParameterLoggingSeparator.join([
-                            '0: ' + str(ls.LicenceID),
-                            '1: ' + str(staleTime),
-                            '2: ' + str(userName),
-                            '3: ' + str(ipAddress)
-                        ])
-                        cursor.execute(sbSQL, parameters)
-                        takenSeats = cursor.fetchone()[0]
-
-                        loggingCount += 1
-                        logging.debug('TakeSeat SQL Command #' + str(loggingCount) + ': \'' + sbSQL + '\'')
-                        logging.debug('TakeSeat SQL Parameters #' + str(loggingCount) + ': \'' + sbParameters + '\'')
-
-                        if takenSeats < ls.Seats:
-                            licenceId = ls.LicenceID
-
-                # The following 2 commands are split from 1 command in .NET version
-                # Python sqlite3 does not support multiple statement in 1 execute
-                sbSQL = "INSERT OR IGNORE INTO " + Database.SqlTableConnection + "( "
-                sbSQL += Database.SqlFieldProduct + ", "
-                sbSQL += Database.SqlFieldUserName + ", "
-                sbSQL += Database.SqlFieldIpAddress + ", "
-                sbSQL += Database.SqlFieldMachineName + ", "
-                sbSQL += Database.SqlFieldLogonTime + ", "
-                sbSQL += Database.SqlFieldUpdateTime + ", "
-                sbSQL += Database.SqlTableLicence + Database.SqlFieldForeignKeyId + ") "
-
-                sbSQL += "VALUES (" + "?" + ", "
-                sbSQL += "?" + ", "
-                sbSQL += "?" + ", "
-                sbSQL += "?" + ", "
-                sbSQL += "?" + ", "
-                sbSQL += "?" + ", "
-                sbSQL += "?" + "); "
-                parameters = (
-                    product.lower(),
-                    userName,
-                    ipAddress,
-                    host,
-                    nowTime,
-                    nowTime,
-                    licenceId
-                )
-                sbParameters = Database.ParameterLoggingSeparator.join([
-                    '0: ' + str(product.lower()),
-                    '1: ' + str(userName),
-                    '2: ' + str(ipAddress),
-                    '3: ' + str(host),
-                    '4: ' + str(nowTime),
-                    '5: ' + str(nowTime),
-                    '6: ' + str(licenceId)
-                ])
-
-                loggingCount += 1
-                logging.debug('TakeSeat SQL Command #' + str(loggingCount) + ': \'' + sbSQL + '\'')
-                logging.debug('TakeSeat SQL Parameters #' + str(loggingCount) + ': \'' + sbParameters + '\'')
-
-                cursor.execute(sbSQL, parameters)
-
-                sbSQL = "UPDATE " + Database.SqlTableConnection + " "
-                sbSQL += "SET " + Database.SqlFieldMachineName + " = "
-                sbSQL += "?" + ", "
-                sbSQL += Database.SqlFieldUpdateTime + " = "
-                sbSQL += "?" + ", "
-                sbSQL += Database.SqlTableLicence + Database.SqlFieldForeignKeyId + " = "
-                sbSQL += "?" + " "
-                sbSQL += "WHERE " + Database.SqlFieldProduct + " = "
-                sbSQL += "?" + " COLLATE NOCASE "
-                sbSQL += "AND " + Database.SqlFieldUserName + " = "
-                sbSQL += "?" + " "
-                sbSQL += "AND " + Database.SqlFieldIpAddress + " = "
-                sbSQL += "?" + ";"
-
-                parameters = (
-                    host,
-                    nowTime,
-                    licenceId,
-                    product.lower(),
-                    userName,
-                    ipAddress
-                )
-                sbParameters = Database.ParameterLoggingSeparator.join([
-                    '0: ' + str(host),
-                    '1: ' + str(nowTime),
-                    '2: ' + str(licenceId),
-                    '3: ' + str(product.lower()),
-                    '4: ' + str(userName),
-                    '5: ' + str(ipAddress)
-                ])
-
-                # Logging number is given .1 to indicate it's a split command
-                logging.debug('TakeSeat SQL Command #' + str(loggingCount) + '.1: \'' + sbSQL + '\'')
-                logging.debug('TakeSeat SQL Parameters #' + str(loggingCount) + '.1: \'' + sbParameters + '\'')
-                cursor.execute(sbSQL, parameters)
-            connection.commit()
-            takenSeat = True
-        except Exception as ex:
-            logging.critical(str(ex))
-            logging.critical('TakeSeat SQL Command: \'' + sbSQL + '\'')
-            logging.critical('TakeSeat SQL Parameters: \'' + sbParameters + '\'')
-            raise ex
-        if pl is None:
-            raise InvalidProductException('Invalid product: \'' + product + '\'')
+        if heartBeat is None:
+            heartBeat = self.RecommendedHeartBeat
+        takenSeat = 0
+        pl = self.GetProductLicences(product)
+        # No active licences, there are no seats to take...
+        if pl is not None and pl.TotalSeats > 0:
+            pl.Sort()
+            for attempt in range(2):
+                # The count and insert must not interleave with another
+                # take, refresh or release of the same product...
+                with self.GetProductLock(product):
+                    nowTime = self.m_Clock.Now()
+                    start = self.m_Clock.Monotonic()
+                    expiryTime = self.GetExpiryTime(nowTime, heartBeat)
+                    # Seats freed for clients waiting in the queue are theirs to claim...
+                    waiting = self.m_WaitQueue is not None and self.m_WaitQueue.HasWaiters(product)
+                    licenceSeats = self.GetSeatLimit(product, pl.LicenceSeats)
+                    if waiting:
+                        licenceSeats = self.ReserveSeats(product, ipAddress, userName, licenceSeats, nowTime)
+                    takenSeat = self.m_Storage.TakeSeat(product, ipAddress, userName, host, licenceSeats,
+                                                        nowTime, expiryTime)
+                    if takenSeat and waiting:
+                        self.m_WaitQueue.Claim(product, userName, ipAddress)
+                    self.m_HeartBeatAdvisor.Record(self.m_Clock.Monotonic() - start)
+                    if takenSeat and self.m_Replication is not None:
+                        self.m_Replication.Publish(MessageType.TakeSeat, product, userName, ipAddress, host,
+                                                   nowTime, expiryTime)
+                # The node's quota is used up, borrow more from the seat pool, without
+                # holding the product lock across the round trip to the coordinator...
+                if takenSeat or attempt or self.m_SeatPool is None:
+                    break
+                if not self.m_SeatPool.Borrow(product, pl.TotalSeats):
+                    break
+        if not takenSeat:
+            with self.m_DenialsLock:
+                self.m_Denials[product.lower()] = self.m_Denials.get(product.lower(), 0) + 1
+        eventId = EventId.SeatTaken if takenSeat else EventId.SeatNotTaken
+        if self.m_Journal is not None:
+            self.m_Journal.Record(eventId, product, userName, ipAddress)
+        if self.m_RecentEvents is not None:
+            self.m_RecentEvents.Record(eventId, product, userName, ipAddress)
         return takenSeat
 
+    def WaitSeat(self, product: str, ipAddress: str, userName: str, host: str, heartBeat: timedelta = None,
+                 timeout: float = 0.0) -> Tuple[int, int]:
+        """
+        Takes a seat for the specified product or, if none is free, queues the client in the seat
+        wait queue and waits up to the timeout to be granted one. A client still waiting when the
+        timeout passes keeps its place in the queue as long as it asks again within the waiter
+        timeout of the queue. A client is not queued for a product without a licence, as no seat
+        of it will ever be granted.
+
+        :param product: The name of the product to take the seat for.
+        :param ipAddress: The IP Address to take the seat for.
+        :param userName: The user name to take the seat for.
+        :param host: The host to take the seat for.
+        :param heartBeat: The heartbeat advertised to the client, by default the recommended heartbeat.
+        :param timeout: The longest time, in seconds, to wait for a seat.
+        :returns: The id of the seat if taken, otherwise 0, and the place of the client in the queue, 0 if not queued.
+        """
+        takenSeat = self.TakeSeat(product, ipAddress, userName, host, heartBeat)
+        if takenSeat or self.m_WaitQueue is None:
+            return takenSeat, 0
+        pl = self.GetProductLicences(product)
+        if pl is None or pl.TotalSeats == 0:
+            return 0, 0
+        waiter = self.m_WaitQueue.Enqueue(product, userName, ipAddress)
+        self.OfferSeats(product)
+        remaining = timeout
+        while not self.m_WaitQueue.Wait(waiter, min(remaining, self.OfferInterval)):
+            remaining -= self.OfferInterval
+            if remaining <= 0:
+                return 0, self.m_WaitQueue.Position(waiter)
+            # A reservation lapsing frees its seat without a release, so offer the seats again...
+            self.OfferSeats(product)
+        takenSeat = self.TakeSeat(product, ipAddress, userName, host, heartBeat)
+        return takenSeat, 0 if takenSeat else self.m_WaitQueue.Position(waiter)
+
+    def OfferSeats(self, product: str) -> int:
+        """
+        Grants the free seats of the specified product to the clients waiting for it in
+        the seat wait queue, called when seats of the product are released or reaped.
+
+        :param product: The name of the product.
+        :returns: The number of seats granted.
+        """
+        if self.m_WaitQueue is None or not self.m_WaitQueue.HasWaiters(product):
+            return 0
+        pl = self.GetProductLicences(product)
+        if pl is None or pl.TotalSeats == 0:
+            return 0
+        pl.Sort()
+        with self.GetProductLock(product):
+            return self.GrantSeats(product, self.GetSeatLimit(product, pl.LicenceSeats), self.m_Clock.Now())
+
+    def SampleUsage(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Returns, for each product, the number of seats in use and the number
+        of seats denied since the last call. Used to feed the usage rollups.
+
+        :returns: A dictionary of product name to (seats in use, seats denied).
+        """
+        with self.m_DenialsLock:
+            denials = self.m_Denials
+            self.m_Denials = {}
+        nowTime = self.m_Clock.Now()
+        samples = {}
+        for product in self.m_Storage.GetProducts():
+            samples[product.lower()] = (self.m_Storage.CountSeats(product, nowTime), denials.pop(product.lower(), 0))
+        return samples
+
+    def WriteSnapshot(self) -> int:
+        """
+        Writes the live seats to the seat snapshot, stamped with the licence generation.
+        Called on Shutdown and when the server is killed.
+
+        :returns: The number of seats written, 0 if seats are not kept across a restart.
+        """
+        if self.m_SeatSnapshot is None:
+            return 0
+        nowTime = self.m_Clock.Now()
+        seats = []
+        for product in self.m_Storage.GetProducts():
+            for record in self.m_Storage.GetConnections(product, nowTime):
+                expiryTime = datetime.fromisoformat(str(record.ExpiryTime)).timestamp()
+                seats.append(SnapshotSeat(product, record.UserName, record.Host, record.IpAddress, expiryTime))
+        self.m_SeatSnapshot.Write(self.GetLicenceGeneration(), seats, set(self.m_VerifiedDigests), nowTime.timestamp())
+        return len(seats)
+
+    def RestoreSnapshot(self) -> bool:
+        """
+        Restores the seat snapshot, if it was written for the licences now loaded, and deletes it.
+        The seats are restored with their expiry time extended by the time the server was down,
+        so their clients have the heartbeat they were promised to refresh them in. The licences
+        verified before the restart are trusted without being verified again.
+
+        :returns: True if the snapshot was restored, otherwise false.
+        """
+        if self.m_SeatSnapshot is None:
+            return False
+        contents = self.m_SeatSnapshot.Read(self.GetLicenceGeneration())
+        self.m_SeatSnapshot.Delete()
+        if contents is None:
+            return False
+        self.m_VerifiedDigests.update(contents.Digests)
+        nowTime = self.m_Clock.Now()
+        downTime = max(0.0, nowTime.timestamp() - contents.Time)
+        restored = 0
+        for seat in contents.Seats:
+            pl = self.GetProductLicences(seat.Product)
+            if pl is None or pl.TotalSeats == 0:
+                continue
+            pl.Sort()
+            expiryTime = datetime.fromtimestamp(seat.ExpiryTime + downTime)
+            with self.GetProductLock(seat.Product):
+                if self.m_Storage.TakeSeat(seat.Product, seat.IpAddress, seat.UserName, seat.Host,
+                                           self.GetSeatLimit(seat.Product, pl.LicenceSeats), nowTime, expiryTime):
+                    restored += 1
+        logging.info('Restored ' + str(restored) + ' of ' + str(len(contents.Seats)) +
+                     ' seat(s) from the seat snapshot.', extra={'EventId': EventId.SeatSnapshotRestored})
+        return True
+
     def TotalSeats(self, product: str) -> int:
         """
         Returns the total number of licences for the specified product.
@@ -968,113 +1195,7 @@ class LicenceManager:
         """
         if not product:
             raise ValueError
-
-        messages = []
-        sbSQL = ""
-
-        # This replaced a SELECT *
-        sbSQL += "SELECT " + Database.SqlFieldId + ", "
-        sbSQL += Database.SqlFieldCompany + ", "
-        sbSQL += Database.SqlFieldProduct + ", "
-        sbSQL += Database.SqlFieldCustomer + ", "
-        sbSQL += Database.SqlFieldReference + ", "
-        sbSQL += Database.SqlFieldReseller + ", "
-        sbSQL += Database.SqlFieldNumberOfSeats + ", "
-        sbSQL += Database.SqlFieldStartDate + ", "
-        sbSQL += Database.SqlFieldExpiryDate + ", "
-        sbSQL += Database.SqlFieldTimeStamp + ", "
-        sbSQL += Database.SqlFieldCode + ", "
-        sbSQL += Database.SqlFieldVersion + ", "
-        sbSQL += Database.SqlFieldNotes + " "
-        sbSQL += "FROM " + Database.SqlTableLicence + " "
-        sbSQL += "WHERE " + Database.SqlFieldProduct + " = "
-        sbSQL += "?" + " COLLATE NOCASE "
-        sbSQL += "ORDER BY " + Database.SqlFieldTimeStamp + " DESC;"
-        parameters = (
-            product.lower(),
-        )
-        sbParameters = Database.ParameterLoggingSeparator.join([
-            '0: ' + str(product.lower())
-        ])
-
-        pl = None
-        try:
-            connection = sqlite3.connect(self.GetConnectionString())
-            cursor = connection.cursor()
-            indexOfLicenceID = 0
-            indexOfCompany = 1
-            indexOfProduct = 2
-            indexOfCustomer = 3
-            indexOfReference = 4
-            indexOfReseller = 5
-            indexOfNumberOfSeats = 6
-            indexOfStartDate = 7
-            indexOfExpiryDate = 8
-            indexOfTimeStamp = 9
-            indexOfCode = 10
-            indexOfFieldVersion = 11
-            indexOfFieldNotes = 12
-            for row in cursor.execute(sbSQL, parameters):
-                if pl is None:
-                    pl = ProductLicences()
-                lic = ElementTree.Element('Licence1')
-                Company = ElementTree.SubElement(lic, 'Company')
-                Company.text = row[indexOfCompany]
-                Product = ElementTree.SubElement(lic, 'Product')
-                Product.text = row[indexOfProduct]
-                Customer = ElementTree.SubElement(lic, 'Customer')
-                Customer.text = row[indexOfCustomer]
-                Reference = ElementTree.SubElement(lic, 'Reference')
-                if row[indexOfReference]:
-                    Reference.text = row[indexOfReference]
-                Reseller = ElementTree.SubElement(lic, 'Reseller')
-                if row[indexOfReseller]:
-                    Reseller.text = row[indexOfReseller]
-                NumberOfSeats = ElementTree.SubElement(lic, 'NumberOfSeats')
-                NumberOfSeats.text = str(row[indexOfNumberOfSeats])
-                StartDate = ElementTree.SubElement(lic, 'StartDate')
-                if row[indexOfStartDate]:
-                    StartDate.text = row[indexOfStartDate]
-                ExpiryDate = ElementTree.SubElement(lic, 'ExpiryDate')
-                if row[indexOfExpiryDate]:
-                    ExpiryDate.text = row[indexOfExpiryDate]
-                TimeStamp = ElementTree.SubElement(lic, 'TimeStamp')
-                TimeStamp.text = str(row[indexOfTimeStamp])
-                ValidationCode = ElementTree.SubElement(lic, 'Code')
-                ValidationCode.text = row[indexOfCode]
-                Comments = ElementTree.SubElement(lic, 'Comments')
-                if row[indexOfFieldNotes]:
-                    Comments.text = row[indexOfFieldNotes]
-
-                verified = True
-                if self.m_DoubleValidation:
-                    public_key_file = open(os.path.join(os.getcwd(), 'public_key.pem'))
-                    public_key = public_key_file.read()
-                    verified = LicenceReader.VerifyWithFile(public_key, lic)
-                    if verified:
-                        logging.debug('Licence with id: ' + str(row[indexOfLicenceID]) + ' verified.')
-                    else:
-                        logging.warning('Licence with id: ' + str(row[indexOfLicenceID]) + ' NOT VERIFIED.')
-                if verified:
-                    # We will test the licence is within the current time period...
-                    if not self.IsLicenceInDateWindow(lic, messages):
-                        logging.info('Licence with id: ' + str(row[indexOfLicenceID]) + ' is not active.')
-                    else:
-                        # We will ensure only 1 perpetual licence is loaded...
-                        if row[indexOfExpiryDate]:
-                            pl.Add(LicenceSeatStructure(row[indexOfLicenceID], row[indexOfNumberOfSeats], False))
-                        else:
-                            if not pl.HasPerpetualLicence:
-                                pl.Add(LicenceSeatStructure(row[indexOfLicenceID], row[indexOfNumberOfSeats], True))
-            connection.commit()
-        except Exception as ex:
-            logging.critical(str(ex))
-            logging.critical('TotalSeats SQL Command: \'' + sbSQL + '\'')
-            logging.critical('TotalSeats SQL Parameters: \'' + sbParameters + '\'')
-            raise ex
-        finally:
-            logging.debug('TotalSeats SQL Command: \'' + sbSQL + '\'')
-            logging.debug('TotalSeats SQL Parameters: \'' + sbParameters + '\'')
+        pl = self.GetProductLicences(product)
         if pl is None:
             raise InvalidProductException('Invalid product: \'' + product + '\'')
         return pl.TotalSeats
@@ -1091,110 +1212,174 @@ class LicenceManager:
         of the sqlite_stat1 table are not updated as the database changes so after
         making significant changes it might be prudent to rerun ANALYZE.
         """
-        commandText = "ANALYZE;"
-        try:
-            connection = sqlite3.connect(self.GetConnectionString())
-            cursor = connection.cursor()
-            cursor.execute(commandText)
-            connection.commit()
-        except Exception as ex:
-            logging.critical(str(ex))
-            logging.critical('AnalyzeDatabase SQL Command: \'' + commandText + '\'')
-            raise ex
-        finally:
-            logging.debug('AnalyzeDatabase SQL Command: \'' + commandText + '\'')
+        self.m_Storage.Analyze()
         logging.debug('Analyzed database.')
 
     def CreateDatabase(self):
         """
         Creates the licence manager database schema.
         """
-        sql_LicenceSchema = DatabaseSchema.GetLicenceSchema()
-        sql_ConnectionSchema = DatabaseSchema.GetConnectionSchema()
-        sql_SiteLogSchema = DatabaseSchema.GetSiteLogSchema()
-
-        sbSQL = ""
-        sbSQL += "INSERT INTO " + Database.SqlTableSiteLog + " "
-        sbSQL += "(" + Database.SqlFieldInstallDate + ", "
-        sbSQL += Database.SqlFieldVersion + ", "
-        sbSQL += Database.SqlFieldNotes + ", "
-        sbSQL += Database.SqlFieldReleaseDate + ") "
-        sbSQL += "VALUES (" + "?" + ", "
-        sbSQL += "?" + ", "
-        sbSQL += "?" + ", "
-        sbSQL += "?" + "); "
-        parameters = (
-            datetime.now(),
-            Database.Version,
-            "Version " + str(Database.Version) + " installed",
-            datetime.strptime(Database.ReleaseDate, "%d/%b/%Y %H:%M")
-        )
-        sbParameters = Database.ParameterLoggingSeparator.join([
-            '0: ' + str(datetime.now()),
-            '1: ' + str(Database.Version),
-            '2: ' + "Version " + str(Database.Version) + " installed",
-            '3: ' + str(datetime.strptime(Database.ReleaseDate, "%d/%b/%Y %H:%M"))
-        ])
-
-        try:
-            connection = sqlite3.connect(self.GetConnectionString())
-            cursor = connection.cursor()
-            try:
-                cursor.executescript(sql_LicenceSchema)
-            except sqlite3.OperationalError:
-                logging.debug('Table \'licence\' already exists')
-            try:
-                cursor.executescript(sql_ConnectionSchema)
-            except sqlite3.OperationalError:
-                logging.debug('Table \'connection\' already exists')
-            try:
-                cursor.executescript(sql_SiteLogSchema)
-                cursor.execute(sbSQL, parameters)
-            except sqlite3.OperationalError:
-                logging.debug('Table \'site_log\' already exists')
-            connection.commit()
-        except Exception as ex:
-            logging.critical(str(ex))
-            logging.critical('CreateDatabase SQL Command: \'' + sbSQL + '\'')
-            logging.critical('CreateDatabase SQL Parameters: \'' + sbParameters + '\'')
-            raise ex
-        finally:
-            logging.debug('CreateDatabase SQL Command 1: \'' + sql_LicenceSchema + '\'')
-            logging.debug('CreateDatabase SQL Command 2: \'' + sql_ConnectionSchema + '\'')
-            logging.debug('CreateDatabase SQL Command 3: \'' + sql_SiteLogSchema + '\'')
-            logging.debug('CreateDatabase SQL Command 4: \'' + sbSQL + '\'')
-            logging.debug('CreateDatabase SQL Parameters: \'' + sbParameters + '\'')
-        logging.info('Created database schema.')
+        self.m_Storage.Open()
+        logging.info('Created database schema.', extra={'EventId': EventId.DatabaseSchemaCreated})
 
     def DeleteStaleSeats(self):
         """
         Deletes all stale seats from the connection table.
         """
-        sbSQL = ""
-        sbSQL += "DELETE FROM " + Database.SqlTableConnection + " "
-        sbSQL += "WHERE " + Database.SqlFieldUpdateTime + " < "
-        sbSQL += "?" + ";"
-        parameters = (
-            self.GetStaleTime(),
+        self.m_Storage.DeleteStaleSeats(self.m_Clock.Now())
+        logging.info('Deleted stale seat(s)', extra={'EventId': EventId.StaleSeatsDeleted})
+        if self.m_WaitQueue is not None:
+            for product in self.m_WaitQueue.Products():
+                self.OfferSeats(product)
+
+    def ElementToLicence(self, value: ElementTree.Element) -> LicenceRecord:
+        """
+        Returns the specified licence XML as a storage record.
+
+        :param value: The licence to convert.
+        :returns: The licence as a storage record.
+        """
+        def Text(tag):
+            if value.find(tag) is not None:
+                return value.find(tag).text
+            return None
+        return LicenceRecord(
+            None,
+            Text('Company'),
+            Text('Product'),
+            Text('Customer'),
+            Text('Reference'),
+            Text('Reseller'),
+            int(Text('NumberOfSeats')),
+            Text('StartDate'),
+            Text('ExpiryDate'),
+            int(Text('TimeStamp')),
+            Text('Code'),
+            1,
+            Text('Comments')
         )
-        sbParameters = Database.ParameterLoggingSeparator.join([
-            '0: ' + str(self.GetStaleTime()),
-        ])
-
-        try:
-            connection = sqlite3.connect(self.GetConnectionString())
-            cursor = connection.cursor()
-            cursor.execute(sbSQL, parameters)
-            connection.commit()
-        except Exception as ex:
-            logging.critical(str(ex))
-            logging.critical('DeleteStaleSeats SQL Command: \'' + sbSQL + '\'')
-            logging.critical('DeleteStaleSeats SQL Parameters: \'' + sbParameters + '\'')
-            raise ex
-        finally:
-            logging.debug('DeleteStaleSeats SQL Command: \'' + sbSQL + '\'')
-            logging.debug('DeleteStaleSeats SQL Parameters: \'' + sbParameters + '\'')
-        logging.info('Deleted stale seat(s)')
+
+    def LicenceToElement(self, record: LicenceRecord) -> ElementTree.Element:
+        """
+        Returns the specified storage record as licence XML, as required to verify it.
+
+        :param record: The licence to convert.
+        :returns: The licence as XML.
+        """
+        lic = ElementTree.Element('Licence1')
+        Company = ElementTree.SubElement(lic, 'Company')
+        Company.text = record.Company
+        Product = ElementTree.SubElement(lic, 'Product')
+        Product.text = record.Product
+        Customer = ElementTree.SubElement(lic, 'Customer')
+        Customer.text = record.Customer
+        Reference = ElementTree.SubElement(lic, 'Reference')
+        if record.Reference:
+            Reference.text = record.Reference
+        Reseller = ElementTree.SubElement(lic, 'Reseller')
+        if record.Reseller:
+            Reseller.text = record.Reseller
+        NumberOfSeats = ElementTree.SubElement(lic, 'NumberOfSeats')
+        NumberOfSeats.text = str(record.NumberOfSeats)
+        StartDate = ElementTree.SubElement(lic, 'StartDate')
+        if record.StartDate:
+            StartDate.text = record.StartDate
+        ExpiryDate = ElementTree.SubElement(lic, 'ExpiryDate')
+        if record.ExpiryDate:
+            ExpiryDate.text = record.ExpiryDate
+        TimeStamp = ElementTree.SubElement(lic, 'TimeStamp')
+        TimeStamp.text = str(record.TimeStamp)
+        ValidationCode = ElementTree.SubElement(lic, 'Code')
+        ValidationCode.text = record.Code
+        Comments = ElementTree.SubElement(lic, 'Comments')
+        if record.Notes:
+            Comments.text = record.Notes
+        return lic
+
+    def IsLicenceVerified(self, record: LicenceRecord, lic: ElementTree.Element) -> bool:
+        """
+        Verifies a licence read from the storage, if double validation is enabled.
+
+        :param record: The licence read from the storage.
+        :param lic: The licence as XML.
+        :returns: True if the licence is verified or double validation is disabled, otherwise false.
+        """
+        if not self.m_DoubleValidation:
+            return True
+        return self.VerifyLicence(record, lic)
+
+    def VerifyLicence(self, record: LicenceRecord, lic: ElementTree.Element) -> bool:
+        """
+        Verifies a licence, whether or not double validation is enabled.
+
+        :param record: The licence.
+        :param lic: The licence as XML.
+        :returns: True if the licence is verified, otherwise false.
+        """
+        public_key = self.GetPublicKey()
+        # A licence verified once with the same key need not be verified again...
+        digest = hashlib.sha256(public_key.encode('utf-8') + ElementTree.tostring(lic)).digest()
+        if digest in self.m_VerifiedDigests:
+            return True
+        verified = LicenceReader.VerifyWithFile(public_key, lic)
+        if verified:
+            self.m_VerifiedDigests.add(digest)
+            logging.debug('Licence with id: ' + str(record.Id) + ' verified.')
+        else:
+            logging.warning('Licence with id: ' + str(record.Id) + ' NOT VERIFIED.',
+                            extra={'EventId': EventId.LicenceVerificationError})
+        return verified
+
+    def GetPublicKey(self) -> str:
+        """
+        Returns the public key licences are verified with, read from file once.
+
+        :returns: The public key.
+        """
+        if self.m_PublicKey is None:
+            with open(os.path.join(os.getcwd(), 'public_key.pem')) as public_key_file:
+                self.m_PublicKey = public_key_file.read()
+        return self.m_PublicKey
+
+    def GetProductLicences(self, product: str):
+        """
+        Returns the verified, active licences for the specified product.
+
+        :param product: The name of the product to get the licences for.
+        :returns: The product licences, or None if the product has no licences.
+        """
+        records = self.m_Storage.GetLicences(product)
+        if not records:
+            return None
+        pl = ProductLicences()
+        messages = []
+        for record in records:
+            lic = self.LicenceToElement(record)
+            if self.IsLicenceVerified(record, lic):
+                # We will test the licence is within the current time period...
+                if not self.IsLicenceInDateWindow(lic, messages):
+                    logging.info('Licence with id: ' + str(record.Id) + ' is not active.',
+                                 extra={'EventId': EventId.LicenceNotActiveMessage})
+                else:
+                    # We will ensure only 1 perpetual licence is loaded...
+                    if record.ExpiryDate:
+                        pl.Add(LicenceSeatStructure(record.Id, record.NumberOfSeats, False))
+                    else:
+                        if not pl.HasPerpetualLicence:
+                            pl.Add(LicenceSeatStructure(record.Id, record.NumberOfSeats, True))
+        return pl
+
+    def GetLicenceGeneration(self) -> bytes:
+        """
+        Returns the licence generation, a digest of the timestamp and code of every licence loaded.
+
+        :returns: The 32 byte licence generation.
+        """
+        generation = hashlib.sha256()
+        for product in self.m_Storage.GetProducts():
+            for record in self.m_Storage.GetLicences(product):
+                generation.update((str(record.TimeStamp) + ':' + record.Code + ';').encode('utf-8'))
+        return generation.digest()
 
     def GetConnectionString(self) -> str:
         """
@@ -1228,13 +1413,90 @@ class LicenceManager:
             return Utils.GetExecutingFilePath()
         return os.path.join(Utils.GetExecutingFilePath(), self.m_LicenceFolder)
 
-    def GetStaleTime(self) -> datetime:
+    def GetProductLock(self, product: str) -> threading.Lock:
+        """
+        Returns the lock serializing seat changes for the specified product.
+        Products are hashed onto a fixed number of lock stripes, so different
+        products rarely contend and the same product always shares a lock.
+
+        :param product: The name of the product.
+        :returns: The lock for the product.
+        """
+        return self.m_ProductLocks[hash(product.lower()) % len(self.m_ProductLocks)]
+
+    def MeasureQueries(self, name: str):
+        """
+        Returns a context manager counting the SQL statements of a high-level call, if profiled.
+
+        :param name: The name of the call, e.g. TakeSeat.
+        :returns: A context manager yielding the QueryMeasure of the call, or None if not profiled.
+        """
+        if self.m_QueryProfiler is None:
+            return nullcontext()
+        return self.m_QueryProfiler.Measure(name)
+
+    def GetSeatLimit(self, product: str, licenceSeats: list) -> list:
+        """
+        Returns the licences seats of the product may be taken against, cut down to the node's quota in a seat pool.
+
+        :param product: The name of the product.
+        :param licenceSeats: The active licences for the product, sorted.
+        :returns: The licences to take seats against.
+        """
+        if self.m_SeatPool is None:
+            return licenceSeats
+        return self.m_SeatPool.GetSeatLimit(product, licenceSeats)
+
+    def GrantSeats(self, product: str, licenceSeats: list, nowTime: datetime) -> int:
+        """
+        Grants the seats of the product neither taken nor reserved to the clients at the head
+        of the seat wait queue. Called under the product lock.
+
+        :param product: The name of the product.
+        :param licenceSeats: The licences to take seats against.
+        :param nowTime: The current time, seats expired by this time are free.
+        :returns: The number of seats granted.
+        """
+        free = (sum(ls.Seats for ls in licenceSeats) - self.m_Storage.CountSeats(product, nowTime) -
+                self.m_WaitQueue.Reserved(product))
+        return self.m_WaitQueue.Grant(product, free)
+
+    def ReserveSeats(self, product: str, ipAddress: str, userName: str, licenceSeats: list,
+                     nowTime: datetime) -> list:
+        """
+        Grants the free seats of the product to the clients waiting for it, then returns the licences
+        cut down by the seats reserved for clients other than the specified one. Called under the product lock.
+
+        :param product: The name of the product.
+        :param ipAddress: The IP Address of the client taking a seat.
+        :param userName: The user name of the client taking a seat.
+        :param licenceSeats: The licences to take seats against, sorted.
+        :param nowTime: The current time.
+        :returns: The licences the client may take a seat against.
+        """
+        self.GrantSeats(product, licenceSeats, nowTime)
+        reserved = self.m_WaitQueue.Reserved(product, userName, ipAddress)
+        if not reserved:
+            return licenceSeats
+        remaining = sum(ls.Seats for ls in licenceSeats) - reserved
+        limited = []
+        for ls in licenceSeats:
+            if remaining <= 0:
+                break
+            seats = min(ls.Seats, remaining)
+            limited.append(LicenceSeatStructure(ls.LicenceID, seats, ls.IsPerpetualLicence))
+            remaining -= seats
+        return limited
+
+    def GetExpiryTime(self, nowTime: datetime, heartBeat: timedelta) -> datetime:
         """
-        Returns a date and time that can be used to compare if seats have gone stale.
+        Returns the date and time a seat refreshed now goes stale, given the heartbeat advertised to its client.
 
-        :returns: A date and time that can be used to compare if seats have gone stale.
+        :param nowTime: The time the seat is taken or refreshed.
+        :param heartBeat: The heartbeat advertised to the client.
+        :returns: The date and time the seat goes stale unless refreshed.
         """
-        return datetime.now() - (self.m_HeartBeat + timedelta(seconds=self.FudgeFactor))
+        return nowTime + heartBeat + timedelta(seconds=self.FudgeFactor)
 
     def VacuumDatabase(self):
         """
@@ -1249,19 +1511,8 @@ class LicenceManager:
         from the copy. This eliminates free pages, aligns table data to be
         contiguous, and otherwise cleans up the database file structure.
         """
-        commandText = "VACUUM;"
-        try:
-            connection = sqlite3.connect(self.GetConnectionString())
-            cursor = connection.cursor()
-            cursor.execute(commandText)
-            connection.commit()
-        except Exception as ex:
-            logging.critical(str(ex))
-            logging.critical('VacuumDatabase SQL Command: \'' + commandText + '\'')
-            raise ex
-        finally:
-            logging.debug('VacuumDatabase SQL Command: \'' + commandText + '\'')
-        logging.info('Vacuumed database.')
+        self.m_Storage.Vacuum()
+        logging.info('Vacuumed database.', extra={'EventId': EventId.DatabaseVacuumed})
 
     def IsLicenceInDateWindow(self, value: ElementTree.Element, errorMessages: list) -> bool:
         """
@@ -1273,7 +1524,7 @@ class LicenceManager:
         """
         afterStartDate = True
         beforeExpiryDate = True
-        dateToday = datetime.now()
+        dateToday = self.m_Clock.Now()
         logging.debug('Current date for testing if licence is active: \'' + dateToday.strftime("%d/%b/%Y") + '\'')
         if not value.find('StartDate').text:
             logging.debug('Licence has no start date.')
@@ -1,11 +1,19 @@
 from xml.etree import ElementTree
 from .clsRSA import RSAVerify
+from .clsLicenceBundle import LicenceBundle
+from typing import Iterator
 import os
 
 
 class LicenceReader:
+    """
+    Reads licence files, a licence file holds a single Licence1 element or is a
+    container of many Licence1 elements under any root element.
+    """
     BaseExtension = ".nls"
+    LicenceTag = "Licence1"
     m_Licence1: ElementTree.Element
+    m_Bundle: LicenceBundle = None
 
     @property
     def Licence1(self) -> ElementTree.Element:
@@ -16,17 +24,67 @@ class LicenceReader:
         """
         return self.m_Licence1
 
-    def Read(self, fileName: str) -> None:
+    @property
+    def Bundle(self) -> LicenceBundle:
+        """
+        Gets the compiled licence bundle read, None if not read or out of date.
+
+        :returns: The licence bundle.
         """
-        Reads the licence from the specified fileName.
+        return self.m_Bundle
+
+    def Read(self, fileName: str, folder: str = None) -> None:
+        """
+        Reads the licence from the specified fileName, the first licence of a container file.
 
         :param fileName: The name of file containing the licence to read.
+        :param folder: The licence folder, by default the Licences sub folder of the working folder.
+        """
+        for lic in self.ReadLicences(fileName, folder):
+            self.m_Licence1 = lic
+            break
+
+    def ReadLicences(self, fileName: str, folder: str = None) -> Iterator[ElementTree.Element]:
+        """
+        Streams the licences of the specified file, one for a single licence file or every
+        licence of a container file. Each licence is cleared once the next is read, so
+        memory stays constant however many licences the file holds, the caller must be
+        done with a licence before reading the next.
+
+        :param fileName: The name of file containing the licences to read.
+        :param folder: The licence folder, by default the Licences sub folder of the working folder.
+        :returns: An iterator for the licences.
+        """
+        if folder is None:
+            folder = os.path.join(os.getcwd(), 'Licences')
+        path = os.path.join(folder, fileName)
+        if not os.path.isfile(path) or not fileName.endswith('.nls1'):
+            return
+        root = None
+        for event, elem in ElementTree.iterparse(path, events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = elem
+            elif elem.tag == self.LicenceTag:
+                # The white space after a licence in a container is not signed...
+                elem.tail = None
+                yield elem
+                # The licences read are dropped from a container...
+                if elem is not root:
+                    elem.clear()
+                    root.clear()
+
+    def ReadBundle(self, fileName: str, folder: str) -> bool:
+        """
+        Memory-maps the compiled licence bundle built from the specified licence folder,
+        if it is still up to date. The caller closes the bundle.
+
+        :param fileName: The path of the bundle file.
+        :param folder: The licence folder the bundle was built from.
+        :returns: True if the bundle was read, false if it is missing or must be rebuilt.
         """
-        try:
-            if os.path.isfile(os.path.join(os.getcwd(), 'Licences', fileName)) and (fileName.endswith('.nls1')):
-                self.m_Licence1 = ElementTree.parse(os.path.join(os.getcwd(), 'Licences', fileName)).getroot()
-        except FileNotFoundError:
-            raise FileNotFoundError("Licence file: " + fileName + " not found.")
+        self.m_Bundle = LicenceBundle.Open(fileName, LicenceBundle.Fingerprint(folder))
+        return self.m_Bundle is not None
 
     # This function is used only when generating licences and thus is not implemented here.
     def SetLicence(self, o) -> None:
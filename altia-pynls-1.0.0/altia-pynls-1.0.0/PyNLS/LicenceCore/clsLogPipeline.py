@@ -0,0 +1,148 @@
+from logging.handlers import QueueHandler, RotatingFileHandler
+from .EventId import EventId
+import threading
+import logging
+import queue
+import time
+import os
+
+
+class LogPipeline:
+    """
+    Non-blocking log pipeline. Records logged on any thread are put on a queue
+    by a QueueHandler and written to a size rotated log file by a writer thread,
+    so request threads never block on disk. The writer wakes at most every
+    WriteInterval, drains the queue and writes the records as one batch,
+    flushed once, so it rarely competes with request threads for the GIL.
+
+    A record is tagged with an event id by passing extra={'EventId': EventId.X},
+    each line of the log is tab separated: time, level, event id, event name,
+    thread and message, the event id is 0 for an untagged record.
+    """
+    WriteInterval = 0.05
+    Format = '%(asctime)s\t%(levelname)s\t%(EventNumber)d\t%(EventName)s\t%(threadName)s\t%(message)s'
+
+    m_FileName = ""
+    m_MaximumFileSize = 10000
+    m_NumberOfLogs = 10
+
+    @property
+    def FileName(self) -> str:
+        """
+        Gets the path of the log file.
+
+        :returns: The path of the log file.
+        """
+        return self.m_FileName
+
+    def __init__(self, fileName: str, maximumFileSize: int = 10000, numberOfLogs: int = 10,
+                 level: int = logging.INFO, logger: logging.Logger = None):
+        """
+        Starts logging the records of the logger to the log file.
+
+        :param fileName: The path of the log file.
+        :param maximumFileSize: The size, in KB, after which the log file is rotated.
+        :param numberOfLogs: The number of log files to keep, the log file included.
+        :param level: The lowest level of the records written, the level of the logger is left to the application.
+        :param logger: The logger to log the records of, by default the root logger.
+        """
+        self.m_FileName = fileName
+        self.m_MaximumFileSize = maximumFileSize
+        self.m_NumberOfLogs = max(2, numberOfLogs)
+        self.m_Logger = logger or logging.getLogger()
+        self.m_FileHandler = RotatingFileHandler(fileName, maxBytes=maximumFileSize * 1024,
+                                                 backupCount=self.m_NumberOfLogs - 1, encoding='utf-8')
+        self.m_FileHandler.setFormatter(EventFormatter(self.Format))
+        self.m_Size = os.path.getsize(fileName)
+        self.m_Queue = queue.SimpleQueue()
+        self.m_QueueHandler = EventQueueHandler(self.m_Queue)
+        # Records below the level are dropped before they are queued...
+        self.m_QueueHandler.setLevel(level)
+        self.m_Thread = threading.Thread(target=self.WriterLoop, name='LogPipeline', daemon=True)
+        self.m_Thread.start()
+        self.m_Logger.addHandler(self.m_QueueHandler)
+
+    @staticmethod
+    def FromConfig(config, fileName: str, level: int = logging.INFO) -> 'LogPipeline':
+        """
+        Starts logging the records of the root logger, rotated by the MaximumLogFileSize and NumberOfLogs of the config.
+
+        :param config: The licence server configuration.
+        :param fileName: The path of the log file.
+        :param level: The lowest level of the records written.
+        :returns: The log pipeline.
+        """
+        return LogPipeline(fileName, int(config.MaximumLogFileSize), int(config.NumberOfLogs), level)
+
+    def Close(self) -> None:
+        """
+        Writes every record queued so far and stops logging to the log file.
+        """
+        self.m_Logger.removeHandler(self.m_QueueHandler)
+        self.m_Queue.put(None)
+        self.m_Thread.join()
+        self.m_FileHandler.close()
+
+    def WriterLoop(self) -> None:
+        """
+        Writes queued records in batches until the pipeline is closed.
+        """
+        handler = self.m_FileHandler
+        running = True
+        while running:
+            batch = [self.m_Queue.get()]
+            if batch[0] is not None:
+                time.sleep(self.WriteInterval)
+            while True:
+                try:
+                    batch.append(self.m_Queue.get_nowait())
+                except queue.Empty:
+                    break
+            with handler.lock:
+                for record in batch:
+                    if record is None:
+                        running = False
+                        continue
+                    try:
+                        line = handler.format(record) + handler.terminator
+                        # The size is counted rather than asked of the file for every record, in the bytes
+                        # written, each newline as the line separator of the platform...
+                        size = len(line.encode(handler.encoding)) + line.count('\n') * (len(os.linesep) - 1)
+                        if self.m_Size + size > handler.maxBytes > 0:
+                            handler.doRollover()
+                            self.m_Size = 0
+                        handler.stream.write(line)
+                        self.m_Size += size
+                    except Exception:
+                        handler.handleError(record)
+                handler.stream.flush()
+
+
+# Private EventQueueHandler (helper) class
+
+class EventQueueHandler(QueueHandler):
+    """
+    Queues records as they are, the message is formatted by the writer thread.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The arguments are merged now, they may change once the caller returns...
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+# Private EventFormatter (helper) class
+
+class EventFormatter(logging.Formatter):
+    """
+    Formats the event id a record is tagged with, if any.
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        eventId = getattr(record, 'EventId', None)
+        if isinstance(eventId, EventId):
+            record.EventNumber = eventId.value
+            record.EventName = eventId.name
+        else:
+            record.EventNumber = 0
+            record.EventName = '-'
+        return super().format(record)
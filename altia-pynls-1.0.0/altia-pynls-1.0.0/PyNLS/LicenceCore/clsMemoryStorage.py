@@ -0,0 +1,284 @@
+from .clsStorage import Storage, LicenceRecord, ConnectionRecord, SeatOperation
+from datetime import datetime
+from typing import Dict, List, Tuple
+import threading
+
+
+class MemorySeat:
+    """
+    A mutable seat held by the memory storage.
+    """
+    __slots__ = ('Id', 'Host', 'LogonTime', 'UpdateTime', 'ExpiryTime', 'LicenceId')
+
+    def __init__(self, seatId: int, host: str, nowTime: datetime, expiryTime: datetime, licenceId):
+        self.Id = seatId
+        self.Host = host
+        self.LogonTime = nowTime
+        self.UpdateTime = nowTime
+        self.ExpiryTime = expiryTime
+        self.LicenceId = licenceId
+
+    def Copy(self) -> 'MemorySeat':
+        """
+        Returns a copy of the seat, as it is now.
+        """
+        seat = MemorySeat(self.Id, self.Host, self.LogonTime, self.ExpiryTime, self.LicenceId)
+        seat.UpdateTime = self.UpdateTime
+        return seat
+
+
+class MemoryStorage(Storage):
+    """
+    Storage held entirely in native dictionaries, nothing is persisted.
+    Seats are grouped by product and keyed by (user name, IP Address)
+    as in the unique index of the SQLite connection table. A seat is found
+    by its key in one dictionary lookup, so the seat id sent by a client is
+    returned to it but not needed to find its seat.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty storage.
+        """
+        self.m_Lock = threading.RLock()
+        self.m_Licences: Dict[int, LicenceRecord] = {}
+        self.m_Seats: Dict[str, Dict[Tuple[str, str], MemorySeat]] = {}
+        self.m_NextLicenceId = 1
+        self.m_NextSeatId = 1
+
+    def Open(self) -> None:
+        """
+        Nothing to create, the storage is ready when constructed.
+        """
+
+    def LoadLicences(self, licences: List[LicenceRecord]) -> int:
+        """
+        Adds the specified licences, ignoring any already loaded (by timestamp),
+        and removes any licence that is not in the specified list.
+
+        :param licences: The verified licences to load.
+        :returns: The number of licences processed.
+        """
+        with self.m_Lock:
+            timestamps = set()
+            for lic in licences:
+                timeStamp = int(lic.TimeStamp)
+                timestamps.add(timeStamp)
+                if timeStamp not in self.m_Licences:
+                    self.m_Licences[timeStamp] = lic._replace(
+                        Id=self.m_NextLicenceId, NumberOfSeats=int(lic.NumberOfSeats), TimeStamp=timeStamp)
+                    self.m_NextLicenceId += 1
+            for timeStamp in [t for t in self.m_Licences if t not in timestamps]:
+                del self.m_Licences[timeStamp]
+        return len(licences)
+
+    def GetLicences(self, product: str) -> List[LicenceRecord]:
+        """
+        Returns the licences for the specified product, latest timestamp first.
+
+        :param product: The name of the product to get the licences for.
+        :returns: The licences for the product.
+        """
+        product = product.lower()
+        with self.m_Lock:
+            licences = [lic for lic in self.m_Licences.values() if lic.Product.lower() == product]
+        licences.sort(key=lambda lic: lic.TimeStamp, reverse=True)
+        return licences
+
+    def GetProducts(self) -> List[str]:
+        """
+        Returns the names of the licensed products in ascending order.
+
+        :returns: The names of the licensed products.
+        """
+        with self.m_Lock:
+            return sorted(set(lic.Product for lic in self.m_Licences.values()))
+
+    def TakeSeat(self, product: str, ipAddress: str, userName: str, host: str,
+                 licenceSeats: list, nowTime: datetime, expiryTime: datetime) -> int:
+        """
+        Atomically counts the live seats for the product, excluding the caller's own
+        seat, and if one is free takes (or re-takes) the seat against a licence.
+
+        :param product: The name of the product to take the seat for.
+        :param ipAddress: The IP Address to take the seat for.
+        :param userName: The user name to take the seat for.
+        :param host: The host to take the seat for.
+        :param licenceSeats: The active licences for the product (LicenceSeatStructure), sorted.
+        :param nowTime: The time the seat is taken, seats expired by this time are not counted.
+        :param expiryTime: The time the seat expires unless refreshed.
+        :returns: The id of the seat if taken, otherwise 0.
+        """
+        key = (userName, ipAddress)
+        totalSeats = sum(ls.Seats for ls in licenceSeats)
+        with self.m_Lock:
+            seats = self.m_Seats.setdefault(product.lower(), {})
+            others = [seat for k, seat in seats.items() if k != key and seat.ExpiryTime > nowTime]
+            if len(others) >= totalSeats:
+                return 0
+            licenceId = licenceSeats[0].LicenceID
+            if len(licenceSeats) > 1:
+                for ls in licenceSeats:
+                    takenSeats = sum(1 for seat in others if seat.LicenceId == ls.LicenceID)
+                    if takenSeats < ls.Seats:
+                        licenceId = ls.LicenceID
+            seat = seats.get(key)
+            if seat is None:
+                seat = MemorySeat(self.m_NextSeatId, host, nowTime, expiryTime, licenceId)
+                seats[key] = seat
+                self.m_NextSeatId += 1
+            else:
+                seat.Host = host
+                seat.UpdateTime = nowTime
+                seat.ExpiryTime = expiryTime
+                seat.LicenceId = licenceId
+            return seat.Id
+
+    def RefreshSeat(self, product: str, ipAddress: str, userName: str, host: str,
+                    nowTime: datetime, expiryTime: datetime, seatId: int = None) -> int:
+        """
+        Sets the update and expiry time of the seat, creating the seat if it does not exist.
+
+        :param product: The name of the product to refresh the seat for.
+        :param ipAddress: The IP Address to refresh the seat for.
+        :param userName: The user name to refresh the seat for.
+        :param host: The host to refresh the seat for.
+        :param nowTime: The update time.
+        :param expiryTime: The time the seat expires unless refreshed again.
+        :param seatId: The id returned when the seat was taken, not needed to find the seat.
+        :returns: The id of the seat.
+        """
+        key = (userName, ipAddress)
+        with self.m_Lock:
+            seats = self.m_Seats.setdefault(product.lower(), {})
+            seat = seats.get(key)
+            if seat is None:
+                seat = MemorySeat(self.m_NextSeatId, host, nowTime, expiryTime, None)
+                seats[key] = seat
+                self.m_NextSeatId += 1
+            else:
+                seat.UpdateTime = nowTime
+                seat.ExpiryTime = expiryTime
+            return seat.Id
+
+    def ReleaseSeat(self, product: str, ipAddress: str, userName: str, seatId: int = None) -> int:
+        """
+        Deletes the seat.
+
+        :param product: The name of the product to release the seat for.
+        :param ipAddress: The IP Address to release the seat for.
+        :param userName: The user name to release the seat for.
+        :param seatId: The id returned when the seat was taken, not needed to find the seat.
+        :returns: The number of seats deleted.
+        """
+        with self.m_Lock:
+            seats = self.m_Seats.get(product.lower(), {})
+            return 1 if seats.pop((userName, ipAddress), None) is not None else 0
+
+    def ReleaseSeats(self, product: str = None, host: str = None, ipAddress: str = None, userName: str = None,
+                     updatedBefore: datetime = None) -> List[ConnectionRecord]:
+        """
+        Deletes every seat matching all of the specified filters.
+
+        :param product: The name of the product to release the seats for, None for every product.
+        :param host: The host to release the seats for, None for every host.
+        :param ipAddress: The IP Address to release the seats for, None for every IP Address.
+        :param userName: The user name to release the seats for, None for every user.
+        :param updatedBefore: Seats not refreshed since this time are released, None for every seat.
+        :returns: The seats deleted.
+        """
+        if product is None and host is None and ipAddress is None and userName is None and updatedBefore is None:
+            raise ValueError
+        released = []
+        with self.m_Lock:
+            for name, seats in self.m_Seats.items():
+                if product is not None and name != product.lower():
+                    continue
+                matched = [(key, seat) for key, seat in seats.items()
+                           if (userName is None or key[0] == userName) and
+                           (ipAddress is None or key[1] == ipAddress) and
+                           (host is None or seat.Host == host) and
+                           (updatedBefore is None or seat.UpdateTime < updatedBefore)]
+                for key, seat in matched:
+                    del seats[key]
+                    released.append(ConnectionRecord(seat.Id, name, key[0], seat.Host, key[1],
+                                                     str(seat.LogonTime), str(seat.UpdateTime), seat.LicenceId,
+                                                     str(seat.ExpiryTime)))
+        return released
+
+    def ExecuteBatch(self, operations: List[SeatOperation], nowTime: datetime, expiryTime: datetime) -> List[int]:
+        """
+        Performs the seat operations in order as one transaction. The seat each operation changes is
+        kept first, so if an operation fails the seats are put back as they were and the error raised.
+
+        :param operations: The takes, refreshes and releases to perform.
+        :param nowTime: The time of the operations, seats expired by this time are not counted.
+        :param expiryTime: The time taken and refreshed seats expire unless refreshed again.
+        :returns: For each take or refresh, the id of the seat, 0 if not taken,
+                  and for each release, the number of seats deleted.
+        """
+        with self.m_Lock:
+            nextSeatId = self.m_NextSeatId
+            undo = []
+            results = []
+            try:
+                for op in operations:
+                    product = op.Product.lower()
+                    key = (op.UserName, op.IpAddress)
+                    seat = self.m_Seats.get(product, {}).get(key)
+                    undo.append((product, key, seat.Copy() if seat is not None else None))
+                    results.extend(super().ExecuteBatch([op], nowTime, expiryTime))
+            except Exception:
+                for product, key, seat in reversed(undo):
+                    seats = self.m_Seats.setdefault(product, {})
+                    if seat is None:
+                        seats.pop(key, None)
+                    else:
+                        seats[key] = seat
+                self.m_NextSeatId = nextSeatId
+                raise
+            return results
+
+    def CountSeats(self, product: str, nowTime: datetime) -> int:
+        """
+        Returns the number of live seats for the product.
+
+        :param product: The name of the product to count the seats for.
+        :param nowTime: Seats expired by this time are not counted.
+        :returns: The number of live seats.
+        """
+        with self.m_Lock:
+            seats = self.m_Seats.get(product.lower(), {})
+            return sum(1 for seat in seats.values() if seat.ExpiryTime > nowTime)
+
+    def GetConnections(self, product: str, nowTime: datetime) -> List[ConnectionRecord]:
+        """
+        Returns the live seats for the product.
+
+        :param product: The name of the product to get the seats for.
+        :param nowTime: Seats expired by this time are not returned.
+        :returns: The live seats.
+        """
+        product = product.lower()
+        with self.m_Lock:
+            seats = self.m_Seats.get(product, {})
+            return [ConnectionRecord(seat.Id, product, k[0], seat.Host, k[1],
+                                     str(seat.LogonTime), str(seat.UpdateTime), seat.LicenceId,
+                                     str(seat.ExpiryTime))
+                    for k, seat in seats.items() if seat.ExpiryTime > nowTime]
+
+    def DeleteStaleSeats(self, nowTime: datetime) -> int:
+        """
+        Deletes all seats expired by the specified time.
+
+        :param nowTime: Seats expired by this time are deleted.
+        :returns: The number of seats deleted.
+        """
+        deleted = 0
+        with self.m_Lock:
+            for seats in self.m_Seats.values():
+                stale = [k for k, seat in seats.items() if seat.ExpiryTime < nowTime]
+                for k in stale:
+                    del seats[k]
+                deleted += len(stale)
+        return deleted
@@ -0,0 +1,236 @@
+from .EventId import EventId
+from contextlib import contextmanager
+from typing import Dict, List, NamedTuple
+import threading
+import logging
+import sqlite3
+import time
+
+
+class StatementStatistics(NamedTuple):
+    """
+    The executions of an SQL statement, times in seconds.
+    """
+    Count: int
+    TotalTime: float
+    MaximumTime: float
+
+
+class CallStatistics(NamedTuple):
+    """
+    The SQL statements run by the calls of a high-level operation.
+    """
+    Calls: int
+    Statements: int
+    MaximumStatements: int
+
+
+class QueryMeasure:
+    """
+    The SQL statements run, on the measuring thread, within a QueryProfiler.Measure block.
+    """
+    def __init__(self, name: str):
+        self.Name = name
+        self.Statements = 0
+        self.Time = 0.0
+        self.Sql: List[str] = []
+
+
+class QueryProfiler:
+    """
+    Times every SQL statement run by the storage of a licence manager.
+
+    A statement taking longer than the slow query threshold is written to the
+    slow query log with its parameters and EXPLAIN QUERY PLAN output. The
+    statements run by a high-level call, e.g. a TakeSeat request, are counted
+    within a Measure block, so a call running more statements than its budget,
+    such as a query per seat, is logged, and tests can assert on the count.
+    A statement is timed until its first row is ready.
+    """
+    m_SlowThreshold = 0.1
+
+    @property
+    def SlowThreshold(self) -> float:
+        """
+        Gets the time, in seconds, above which a statement is written to the slow query log.
+
+        :returns: The slow query threshold, 0 if no statement is logged.
+        """
+        return self.m_SlowThreshold
+
+    @property
+    def SlowQueries(self) -> int:
+        """
+        Gets the number of statements written to the slow query log.
+
+        :returns: The number of slow statements.
+        """
+        return self.m_SlowQueries
+
+    @property
+    def Statements(self) -> Dict[str, StatementStatistics]:
+        """
+        Gets the executions of each SQL statement run.
+
+        :returns: A dictionary of SQL statement to its statistics.
+        """
+        with self.m_Lock:
+            return {sql: StatementStatistics(*values) for sql, values in self.m_Statements.items()}
+
+    @property
+    def Calls(self) -> Dict[str, CallStatistics]:
+        """
+        Gets the statements run by each measured high-level call.
+
+        :returns: A dictionary of call name to its statistics.
+        """
+        with self.m_Lock:
+            return {name: CallStatistics(*values) for name, values in self.m_Calls.items()}
+
+    def __init__(self, slowThreshold: float = 0.1, fileName: str = None, budgets: Dict[str, int] = None):
+        """
+        Initializes the profiler.
+
+        :param slowThreshold: The time, in seconds, above which a statement is written to the slow query log,
+                              0 to not log slow statements.
+        :param fileName: The slow query log file, by default slow statements are logged to the root logger.
+        :param budgets: The most statements each named high-level call should run.
+        """
+        self.m_SlowThreshold = slowThreshold
+        self.m_Budgets = dict(budgets or {})
+        self.m_Lock = threading.Lock()
+        self.m_Local = threading.local()
+        self.m_Statements: Dict[str, list] = {}
+        self.m_Calls: Dict[str, list] = {}
+        self.m_SlowQueries = 0
+        self.m_Log = logging.getLogger()
+        if fileName:
+            self.m_Log = logging.getLogger('SlowQuery.' + fileName)
+            self.m_Log.propagate = False
+            self.m_Log.setLevel(logging.INFO)
+            if not self.m_Log.handlers:
+                handler = logging.FileHandler(fileName, encoding='utf-8')
+                handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+                self.m_Log.addHandler(handler)
+
+    @contextmanager
+    def Measure(self, name: str):
+        """
+        Counts the statements the calling thread runs within a with block, as a call of the named operation.
+
+        :param name: The name of the high-level call, e.g. TakeSeat.
+        :returns: A context manager yielding the QueryMeasure of the block.
+        """
+        measure = QueryMeasure(name)
+        measures = self.GetMeasures()
+        measures.append(measure)
+        try:
+            yield measure
+        finally:
+            measures.remove(measure)
+            with self.m_Lock:
+                values = self.m_Calls.setdefault(name, [0, 0, 0])
+                values[0] += 1
+                values[1] += measure.Statements
+                values[2] = max(values[2], measure.Statements)
+            budget = self.m_Budgets.get(name)
+            if budget is not None and measure.Statements > budget:
+                logging.warning(name + ' ran ' + str(measure.Statements) + ' SQL statements, its budget is ' +
+                                str(budget) + ': ' + ' | '.join(measure.Sql),
+                                extra={'EventId': EventId.QueryBudgetExceeded})
+
+    def GetMeasures(self) -> List[QueryMeasure]:
+        """
+        Returns the open measures of the calling thread.
+        """
+        local = self.m_Local
+        if not hasattr(local, 'Measures'):
+            local.Measures = []
+        return local.Measures
+
+    def Record(self, cursor: sqlite3.Cursor, sql: str, parameters, elapsed: float) -> None:
+        """
+        Records a statement run by a profiled cursor, logging it if it is slow.
+
+        :param cursor: The cursor the statement was run on, used to explain a slow statement.
+        :param sql: The SQL statement.
+        :param parameters: The parameters of the statement.
+        :param elapsed: The time, in seconds, the statement took.
+        """
+        for measure in self.GetMeasures():
+            measure.Statements += 1
+            measure.Time += elapsed
+            measure.Sql.append(sql)
+        with self.m_Lock:
+            values = self.m_Statements.setdefault(sql, [0, 0.0, 0.0])
+            values[0] += 1
+            values[1] += elapsed
+            values[2] = max(values[2], elapsed)
+        if 0 < self.m_SlowThreshold < elapsed:
+            with self.m_Lock:
+                self.m_SlowQueries += 1
+            self.m_Log.warning('Slow SQL statement (' + format(elapsed * 1000, '.1f') + ' ms): \'' + sql + '\'' +
+                               ' Parameters: \'' + str(parameters) + '\'' + QueryProfiler.Explain(cursor, sql, parameters))
+
+    @staticmethod
+    def Explain(cursor: sqlite3.Cursor, sql: str, parameters) -> str:
+        """
+        Returns the EXPLAIN QUERY PLAN output of a statement, one line per step, empty if it cannot be explained.
+        """
+        if (sql.split(None, 1) or [''])[0].upper() not in ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'WITH'):
+            return ''
+        try:
+            rows = sqlite3.Cursor.execute(cursor.connection.cursor(), 'EXPLAIN QUERY PLAN ' + sql, parameters)
+            return ''.join('\n    ' + str(row[-1]) for row in rows.fetchall())
+        except sqlite3.Error as ex:
+            return '\n    (no plan: ' + str(ex) + ')'
+
+# Private profiled connection and cursor (helper) classes
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """
+    A cursor timing each statement it runs for the profiler of its connection.
+    """
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            profiler = self.connection.Profiler
+            if profiler is not None:
+                profiler.Record(self, sql, parameters, time.perf_counter() - start)
+
+    def executemany(self, sql, parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, parameters)
+        finally:
+            profiler = self.connection.Profiler
+            if profiler is not None:
+                profiler.Record(self, sql, (), time.perf_counter() - start)
+
+    def executescript(self, script):
+        start = time.perf_counter()
+        try:
+            return super().executescript(script)
+        finally:
+            profiler = self.connection.Profiler
+            if profiler is not None:
+                profiler.Record(self, script, (), time.perf_counter() - start)
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """
+    A connection whose cursors are profiled while it has a profiler, plain cursors otherwise.
+    """
+    Profiler: QueryProfiler = None
+
+    def cursor(self, factory=sqlite3.Cursor):
+        if self.Profiler is not None and factory is sqlite3.Cursor:
+            factory = ProfiledCursor
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        # The built in shortcut runs the statement without going through the cursor's execute...
+        return self.cursor().execute(sql, parameters)
@@ -0,0 +1,134 @@
+from .MessageType import MessageType
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Tuple
+import threading
+import time
+
+
+class RateLimit(NamedTuple):
+    """
+    The requests of a message type a client may make, Rate per second on average
+    with bursts of up to Burst requests.
+    """
+    Rate: float
+    Burst: int
+
+
+class RateLimiter:
+    """
+    Admits or throttles client requests with a token bucket per message type for
+    each source IP Address and for each user, so one client looping on a request
+    cannot monopolise the worker threads or the storage. The IP Address is the
+    peer address of the connection, never one the client reports, which it could
+    vary at will.
+
+    A request is admitted only if both its IP Address and its user have a token
+    left, and then takes a token from each. A request without a peer IP Address
+    is limited by its user alone, rather than every such request sharing one
+    bucket. The user is named by the client, which can change it for every
+    request, so this only limits well behaved clients, a server that knows the
+    peer address must always pass it. A bucket refills at the rate of its limit
+    up to the burst. At most MaximumBuckets buckets, and throttled counts of as
+    many clients, are kept, the least recently used forgotten first, a bucket
+    so starting full again. Message types without a limit are always admitted.
+    """
+    MaximumBuckets = 100000
+
+    @property
+    def Limits(self) -> Dict[MessageType, RateLimit]:
+        """
+        Gets the limit of each limited message type.
+
+        :returns: A dictionary of message type to its limit.
+        """
+        return dict(self.m_Limits)
+
+    @property
+    def Throttled(self) -> Dict[str, int]:
+        """
+        Gets the number of requests throttled, for each message type.
+
+        :returns: A dictionary of message type name to the requests throttled.
+        """
+        with self.m_Lock:
+            return {messageType.name: count for messageType, count in self.m_Throttled.items()}
+
+    @property
+    def ThrottledClients(self) -> Dict[str, int]:
+        """
+        Gets the number of requests throttled, for each of the most recently throttled IP Addresses and users.
+
+        :returns: A dictionary of 'ip:' IP Address or 'user:' user name to the requests throttled.
+        """
+        with self.m_Lock:
+            return dict(self.m_ThrottledClients)
+
+    def __init__(self, limits: Dict[MessageType, RateLimit]):
+        """
+        Initializes the rate limiter.
+
+        :param limits: The limit of each message type to limit.
+        """
+        self.m_Limits = dict(limits)
+        self.m_Lock = threading.Lock()
+        self.m_Buckets: 'OrderedDict[Tuple[int, str], List[float]]' = OrderedDict()
+        self.m_Throttled: Dict[MessageType, int] = {}
+        self.m_ThrottledClients: 'OrderedDict[str, int]' = OrderedDict()
+
+    def Admit(self, messageType: MessageType, ipAddress: str, userName: str = '') -> bool:
+        """
+        Takes a token for the request from the buckets of its IP Address and user.
+
+        :param messageType: The type of the request.
+        :param ipAddress: The peer IP Address of the connection the request came from, empty only if not known.
+        :param userName: The user the request is made for, as named by the client, empty if not known.
+        :returns: True if the request is admitted, false if it is throttled.
+        """
+        limit = self.m_Limits.get(messageType)
+        if limit is None:
+            return True
+        now = time.monotonic()
+        keys = []
+        if ipAddress:
+            keys.append('ip:' + ipAddress)
+        if userName:
+            keys.append('user:' + userName)
+        with self.m_Lock:
+            buckets = [self.GetBucket(messageType, key, limit, now) for key in keys]
+            empty = [key for key, bucket in zip(keys, buckets) if bucket[0] < 1.0]
+            if empty:
+                self.m_Throttled[messageType] = self.m_Throttled.get(messageType, 0) + 1
+                for key in empty:
+                    self.CountThrottled(key)
+                return False
+            for bucket in buckets:
+                bucket[0] -= 1.0
+            return True
+
+    def CountThrottled(self, key: str) -> None:
+        """
+        Counts a request throttled for the IP Address or user. Called under the limiter lock.
+        """
+        count = self.m_ThrottledClients.pop(key, None)
+        if count is None and len(self.m_ThrottledClients) >= self.MaximumBuckets:
+            self.m_ThrottledClients.popitem(last=False)
+        self.m_ThrottledClients[key] = (count or 0) + 1
+
+    def GetBucket(self, messageType: MessageType, key: str, limit: RateLimit, now: float) -> List[float]:
+        """
+        Returns the bucket of the client for the message type, refilled to now.
+        Called under the limiter lock.
+
+        :returns: The bucket, a list of the tokens left and when it was last refilled.
+        """
+        bucket = self.m_Buckets.get((messageType.value, key))
+        if bucket is None:
+            if len(self.m_Buckets) >= self.MaximumBuckets:
+                self.m_Buckets.popitem(last=False)
+            bucket = [float(limit.Burst), now]
+            self.m_Buckets[(messageType.value, key)] = bucket
+        else:
+            self.m_Buckets.move_to_end((messageType.value, key))
+            bucket[0] = min(float(limit.Burst), bucket[0] + (now - bucket[1]) * limit.Rate)
+            bucket[1] = now
+        return bucket
@@ -0,0 +1,294 @@
+from .clsStorage import Storage
+from .clsClock import Clock
+from datetime import datetime
+from .MessageType import MessageType
+from .EventId import EventId
+from typing import Dict, List, NamedTuple, Tuple
+import threading
+import logging
+import struct
+import queue
+import time
+import zmq
+
+
+class SeatChange(NamedTuple):
+    """
+    A seat take, refresh or release shipped from the primary to its standbys.
+    Times are unix times, Time is when the primary made the change.
+    """
+    Sequence: int
+    Type: MessageType
+    Time: float
+    ExpiryTime: float
+    Product: str
+    UserName: str
+    IpAddress: str
+    Host: str
+
+
+class ReplicationPrimary:
+    """
+    Ships every seat change made by the licence manager to warm standby servers.
+
+    Standbys connect a DEALER socket to the primary's ROUTER socket and send SYNC.
+    The primary replies with a SNAPSHOT of every live seat, then streams each
+    change as a CHANGE message, numbered in the order made, and sends a HEARTBEAT
+    with the last sequence number once a second. Changes set the final state of
+    a seat, so applying a change already included in the snapshot is harmless.
+    A standby that sees a gap in the sequence, or hears nothing, sends SYNC again.
+    """
+    HeaderFormat = struct.Struct('<QbddH')
+    LengthFormat = struct.Struct('<H')
+    SequenceFormat = struct.Struct('<Q')
+    HeartBeatInterval = 1.0
+    HighWaterMark = 100000
+
+    Sync = b'SYNC'
+    Snapshot = b'SNAPSHOT'
+    Change = b'CHANGE'
+    HeartBeat = b'HEARTBEAT'
+
+    m_Address = ""
+    m_Port = 0
+
+    @property
+    def Port(self) -> int:
+        """
+        Gets the TCP port standbys connect to, available once started.
+
+        :returns: The port the primary is bound to.
+        """
+        return self.m_Port
+
+    @property
+    def Sequence(self) -> int:
+        """
+        Gets the sequence number of the last seat change published.
+
+        :returns: The last sequence number.
+        """
+        return self.m_Sequence
+
+    @property
+    def Shipped(self) -> int:
+        """
+        Gets the sequence number of the last seat change sent to the standbys.
+
+        :returns: The last sequence number shipped.
+        """
+        return self.m_Shipped
+
+    @property
+    def Standbys(self) -> int:
+        """
+        Gets the number of standbys being streamed to.
+
+        :returns: The number of standbys.
+        """
+        return len(self.m_Standbys)
+
+    def __init__(self, storage: Storage, address: str = 'tcp://*:0', clock: Clock = None):
+        """
+        Initializes the primary.
+
+        :param storage: The storage snapshots are read from.
+        :param address: The address to bind to, a port of 0 picks a free port.
+        :param clock: The time source seats are timed by, that of the licence manager, by default the system clock.
+        """
+        self.m_Storage = storage
+        self.m_Clock = clock or Clock()
+        self.m_Address = address
+        self.m_Sequence = 0
+        self.m_Shipped = 0
+        self.m_SequenceLock = threading.Lock()
+        self.m_Queue = queue.SimpleQueue()
+        self.m_Standbys: Dict[bytes, float] = {}
+        self.m_Context = None
+        self.m_Wake = None
+        self.m_WakeLock = threading.Lock()
+        self.m_Thread = None
+        self.m_Running = False
+
+    def Start(self) -> None:
+        """
+        Binds the primary and starts shipping changes on a background thread.
+        """
+        self.m_Context = zmq.Context()
+        router = self.m_Context.socket(zmq.ROUTER)
+        router.setsockopt(zmq.SNDHWM, self.HighWaterMark)
+        router.setsockopt(zmq.LINGER, 0)
+        # Report a standby that has gone rather than silently dropping its messages...
+        router.setsockopt(zmq.ROUTER_MANDATORY, 1)
+        if self.m_Address.endswith(':0'):
+            self.m_Port = router.bind_to_random_port(self.m_Address[:-2])
+        else:
+            router.bind(self.m_Address)
+            self.m_Port = int(self.m_Address.rsplit(':', 1)[1])
+        receiver = self.m_Context.socket(zmq.PAIR)
+        receiver.bind('inproc://replication-wake')
+        self.m_Wake = self.m_Context.socket(zmq.PAIR)
+        self.m_Wake.connect('inproc://replication-wake')
+        self.m_Running = True
+        self.m_Thread = threading.Thread(target=self.ShipLoop, args=(router, receiver),
+                                         name='ReplicationPrimary', daemon=True)
+        self.m_Thread.start()
+        logging.info('Replication primary listening on port ' + str(self.m_Port),
+                     extra={'EventId': EventId.ReplicationStarted})
+
+    def Close(self) -> None:
+        """
+        Ships any queued changes and stops the primary.
+        """
+        if not self.m_Running:
+            return
+        self.m_Running = False
+        self.WakeShipper()
+        self.m_Thread.join()
+        with self.m_WakeLock:
+            self.m_Wake.close(linger=0)
+            self.m_Wake = None
+        self.m_Context.term()
+
+    def Publish(self, messageType: MessageType, product: str, userName: str, ipAddress: str,
+                host: str = '', nowTime: datetime = None, expiryTime: datetime = None) -> None:
+        """
+        Queues a seat change to be shipped, called under the product lock so
+        changes to a seat are numbered in the order they were made.
+
+        :param messageType: TakeSeat, RefreshSeat or ReleaseSeat.
+        :param product: The name of the product.
+        :param userName: The user name of the seat.
+        :param ipAddress: The IP Address of the seat.
+        :param host: The host of the seat.
+        :param nowTime: The time of the change, by default now by the clock.
+        :param expiryTime: The time the seat expires, for takes and refreshes.
+        """
+        changeTime = nowTime.timestamp() if nowTime is not None else self.m_Clock.Time()
+        expiry = expiryTime.timestamp() if expiryTime is not None else 0.0
+        with self.m_SequenceLock:
+            self.m_Sequence += 1
+            self.m_Queue.put(SeatChange(self.m_Sequence, messageType, changeTime, expiry,
+                                        product.lower(), userName, ipAddress, host))
+        self.WakeShipper()
+
+    def WakeShipper(self) -> None:
+        """
+        Wakes the shipping thread to send queued changes.
+        """
+        with self.m_WakeLock:
+            if self.m_Wake is not None:
+                try:
+                    self.m_Wake.send(b'', zmq.NOBLOCK)
+                except zmq.Again:
+                    # Already woken...
+                    pass
+
+    def ShipLoop(self, router: zmq.Socket, receiver: zmq.Socket) -> None:
+        """
+        Sends snapshots to joining standbys, ships queued changes and heartbeats until closed.
+        """
+        poller = zmq.Poller()
+        poller.register(router, zmq.POLLIN)
+        poller.register(receiver, zmq.POLLIN)
+        lastHeartBeat = time.monotonic()
+        try:
+            while True:
+                events = dict(poller.poll(self.HeartBeatInterval * 1000))
+                if receiver in events:
+                    while receiver.poll(0):
+                        receiver.recv()
+                if router in events:
+                    while router.poll(0):
+                        frames = router.recv_multipart()
+                        if len(frames) >= 2 and frames[1] == self.Sync:
+                            self.SendSnapshot(router, frames[0])
+                self.ShipChanges(router)
+                if not self.m_Running:
+                    return
+                if time.monotonic() - lastHeartBeat >= self.HeartBeatInterval:
+                    lastHeartBeat = time.monotonic()
+                    sequence = ReplicationPrimary.SequenceFormat.pack(self.m_Shipped)
+                    for identity in list(self.m_Standbys):
+                        self.Send(router, [identity, self.HeartBeat, sequence])
+        finally:
+            router.close(linger=0)
+            receiver.close(linger=0)
+
+    def SendSnapshot(self, router: zmq.Socket, identity: bytes) -> None:
+        """
+        Sends every live seat to a joining standby and starts streaming changes to it.
+        """
+        # Changes made since the last one shipped are shipped after the snapshot, on top of it...
+        sequence = self.m_Shipped
+        now = self.m_Clock.Now()
+        payload = bytearray()
+        count = 0
+        for product in self.m_Storage.GetProducts():
+            for record in self.m_Storage.GetConnections(product, now):
+                expiry = datetime.fromisoformat(record.ExpiryTime).timestamp() if record.ExpiryTime else 0.0
+                update = datetime.fromisoformat(record.UpdateTime).timestamp()
+                payload += ReplicationPrimary.Encode(SeatChange(
+                    sequence, MessageType.TakeSeat, update, expiry,
+                    record.Product, record.UserName, record.IpAddress, record.Host))
+                count += 1
+        self.m_Standbys[identity] = time.monotonic()
+        self.Send(router, [identity, self.Snapshot, ReplicationPrimary.SequenceFormat.pack(sequence), bytes(payload)])
+        logging.info('Sent replication snapshot of ' + str(count) + ' seat(s) at sequence ' + str(sequence),
+                     extra={'EventId': EventId.ReplicationSnapshot})
+
+    def ShipChanges(self, router: zmq.Socket) -> None:
+        """
+        Sends every queued change to every standby.
+        """
+        while True:
+            try:
+                change = self.m_Queue.get_nowait()
+            except queue.Empty:
+                return
+            self.m_Shipped = change.Sequence
+            data = ReplicationPrimary.Encode(change)
+            for identity in list(self.m_Standbys):
+                self.Send(router, [identity, self.Change, data])
+
+    def Send(self, router: zmq.Socket, frames: List[bytes]) -> None:
+        """
+        Sends a message to a standby, forgetting the standby if it has gone.
+        """
+        try:
+            router.send_multipart(frames, zmq.NOBLOCK)
+        except zmq.Again:
+            # The standby is too far behind, it will see the gap and sync again...
+            self.m_Standbys.pop(frames[0], None)
+        except zmq.ZMQError as ex:
+            logging.warning('Replication standby dropped: ' + str(ex),
+                            extra={'EventId': EventId.ReplicationStandbyDropped})
+            self.m_Standbys.pop(frames[0], None)
+
+    @staticmethod
+    def Encode(change: SeatChange) -> bytes:
+        """
+        Returns a seat change encoded as a fixed size header and length prefixed UTF-8 strings.
+        """
+        strings = [value.encode('utf-8') for value in (change.Product, change.UserName, change.IpAddress, change.Host)]
+        data = bytearray(ReplicationPrimary.HeaderFormat.pack(
+            change.Sequence, change.Type.value, change.Time, change.ExpiryTime, len(strings)))
+        for value in strings:
+            data += ReplicationPrimary.LengthFormat.pack(len(value))
+            data += value
+        return bytes(data)
+
+    @staticmethod
+    def Decode(data: bytes, offset: int = 0) -> Tuple[SeatChange, int]:
+        """
+        Returns the seat change encoded at the offset, and the offset after it.
+        """
+        sequence, messageType, changeTime, expiry, count = ReplicationPrimary.HeaderFormat.unpack_from(data, offset)
+        offset += ReplicationPrimary.HeaderFormat.size
+        strings = []
+        for _ in range(count):
+            (length,) = ReplicationPrimary.LengthFormat.unpack_from(data, offset)
+            offset += ReplicationPrimary.LengthFormat.size
+            strings.append(data[offset:offset + length].decode('utf-8'))
+            offset += length
+        return SeatChange(sequence, MessageType(messageType), changeTime, expiry, *strings), offset
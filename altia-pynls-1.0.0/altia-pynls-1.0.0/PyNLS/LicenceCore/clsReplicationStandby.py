@@ -0,0 +1,280 @@
+from .clsReplicationPrimary import ReplicationPrimary, SeatChange
+from .clsLicenceManager import LicenceManager
+from datetime import datetime
+from .MessageType import MessageType
+from .EventId import EventId
+from typing import Callable
+import threading
+import logging
+import time
+import zmq
+
+
+class ReplicationStandby:
+    """
+    Follows the seat changes of a primary server into the storage of a warm
+    standby licence manager, so the standby can take over with every seat intact.
+
+    The standby joins with SYNC, replaces its seats with the primary's snapshot,
+    then applies each change as it arrives. A gap in the sequence, or hearing
+    nothing from the primary, starts a new SYNC. The primary is reported lost,
+    once, when nothing has been heard from it within the takeover timeout.
+    """
+    PollInterval = 100
+
+    m_PrimaryAddress = ""
+    m_TakeoverTimeout = 5.0
+
+    OnPrimaryLost: Callable[[], None] = None
+    """
+    Called when nothing has been heard from the primary within the takeover timeout
+    """
+
+    @property
+    def Manager(self) -> LicenceManager:
+        """
+        Gets the licence manager changes are applied to.
+
+        :returns: The licence manager.
+        """
+        return self.m_Manager
+
+    @property
+    def Sequence(self) -> int:
+        """
+        Gets the sequence number of the last change applied.
+
+        :returns: The last sequence number applied.
+        """
+        return self.m_Sequence
+
+    @property
+    def Synced(self) -> bool:
+        """
+        Gets a value to indicate if a snapshot has been applied and changes are being followed.
+
+        :returns: True if following the primary, otherwise false.
+        """
+        return self.m_Synced
+
+    @property
+    def Lag(self) -> float:
+        """
+        Gets the time, in seconds, between the primary making the last change and the standby applying it,
+        by the clocks of their licence managers.
+
+        :returns: The replication lag of the last change.
+        """
+        return self.m_Lag
+
+    @property
+    def MaximumLag(self) -> float:
+        """
+        Gets the longest replication lag, in seconds, of any change applied.
+
+        :returns: The maximum replication lag.
+        """
+        return self.m_MaximumLag
+
+    @property
+    def AverageLag(self) -> float:
+        """
+        Gets the mean replication lag, in seconds, of the changes applied.
+
+        :returns: The average replication lag.
+        """
+        return self.m_TotalLag / self.m_Changes if self.m_Changes else 0.0
+
+    @property
+    def Changes(self) -> int:
+        """
+        Gets the number of changes applied, excluding snapshots.
+
+        :returns: The number of changes applied.
+        """
+        return self.m_Changes
+
+    @property
+    def PrimaryAlive(self) -> bool:
+        """
+        Gets a value to indicate if the primary has been heard from within the takeover timeout.
+
+        :returns: True if the primary is alive, otherwise false.
+        """
+        return time.monotonic() - self.m_LastHeard < self.m_TakeoverTimeout
+
+    def __init__(self, manager: LicenceManager, primaryAddress: str, takeoverTimeout: float = 5.0):
+        """
+        Initializes the standby.
+
+        :param manager: The licence manager of the standby, changes are applied to its storage.
+        :param primaryAddress: The replication address of the primary, e.g. tcp://primary:3182.
+        :param takeoverTimeout: The time, in seconds, without hearing from the primary before it is reported lost.
+        """
+        self.m_Manager = manager
+        self.m_PrimaryAddress = primaryAddress
+        self.m_TakeoverTimeout = takeoverTimeout
+        self.m_Sequence = 0
+        self.m_Synced = False
+        self.m_Lag = 0.0
+        self.m_MaximumLag = 0.0
+        self.m_TotalLag = 0.0
+        self.m_Changes = 0
+        self.m_LicenceSeats = {}
+        self.m_LastHeard = time.monotonic()
+        self.m_Running = False
+        self.m_Thread = None
+
+    def Start(self) -> None:
+        """
+        Starts following the primary on a background thread.
+        """
+        self.m_Running = True
+        self.m_LastHeard = time.monotonic()
+        self.m_Thread = threading.Thread(target=self.FollowLoop, name='ReplicationStandby', daemon=True)
+        self.m_Thread.start()
+
+    def Takeover(self) -> None:
+        """
+        Stops following the primary, the standby manager then holds the last replicated seats.
+        """
+        self.Close()
+        logging.warning('Standby took over at sequence ' + str(self.m_Sequence) + '.',
+                        extra={'EventId': EventId.ReplicationTakeover})
+
+    def Close(self) -> None:
+        """
+        Stops following the primary, without taking over from it.
+        """
+        self.m_Running = False
+        if self.m_Thread is not None:
+            self.m_Thread.join()
+            self.m_Thread = None
+
+    def FollowLoop(self) -> None:
+        """
+        Applies snapshots and changes from the primary until taken over.
+        """
+        context = zmq.Context()
+        dealer = None
+        lost = False
+        try:
+            while self.m_Running:
+                if dealer is None:
+                    dealer = context.socket(zmq.DEALER)
+                    dealer.setsockopt(zmq.LINGER, 0)
+                    dealer.connect(self.m_PrimaryAddress)
+                    dealer.send(ReplicationPrimary.Sync)
+                    self.m_Synced = False
+                    syncTime = time.monotonic()
+                if dealer.poll(self.PollInterval):
+                    while dealer.poll(0):
+                        if not self.Receive(dealer.recv_multipart()):
+                            # Out of step with the primary, join again...
+                            dealer.close(linger=0)
+                            dealer = None
+                            break
+                    self.m_LastHeard = time.monotonic()
+                    lost = False
+                elif not self.PrimaryAlive:
+                    if not lost:
+                        lost = True
+                        logging.warning('Replication primary \'' + self.m_PrimaryAddress + '\' lost.',
+                                        extra={'EventId': EventId.ReplicationPrimaryLost})
+                        if self.OnPrimaryLost is not None:
+                            self.OnPrimaryLost()
+                    # The primary may be restarted, or a new standby may need a fresh snapshot...
+                    if time.monotonic() - syncTime >= self.m_TakeoverTimeout:
+                        dealer.close(linger=0)
+                        dealer = None
+        finally:
+            if dealer is not None:
+                dealer.close(linger=0)
+            context.term()
+
+    def Receive(self, frames) -> bool:
+        """
+        Applies a message from the primary.
+
+        :returns: False if the standby is out of step with the primary and must sync again.
+        """
+        kind = frames[0]
+        if kind == ReplicationPrimary.Snapshot:
+            (sequence,) = ReplicationPrimary.SequenceFormat.unpack(frames[1])
+            self.ApplySnapshot(sequence, frames[2])
+            return True
+        if not self.m_Synced:
+            return True
+        if kind == ReplicationPrimary.Change:
+            change, _ = ReplicationPrimary.Decode(frames[1])
+            if change.Sequence <= self.m_Sequence:
+                return True
+            if change.Sequence != self.m_Sequence + 1:
+                logging.warning('Replication gap after sequence ' + str(self.m_Sequence) + '.',
+                                extra={'EventId': EventId.ReplicationOutOfSequence})
+                return False
+            self.Apply(change)
+            self.m_Sequence = change.Sequence
+            self.m_Changes += 1
+            self.m_Lag = max(0.0, self.m_Manager.Clock.Time() - change.Time)
+            self.m_MaximumLag = max(self.m_MaximumLag, self.m_Lag)
+            self.m_TotalLag += self.m_Lag
+            return True
+        if kind == ReplicationPrimary.HeartBeat:
+            (sequence,) = ReplicationPrimary.SequenceFormat.unpack(frames[1])
+            if sequence > self.m_Sequence:
+                logging.warning('Replication behind the primary at sequence ' + str(self.m_Sequence) + '.',
+                                extra={'EventId': EventId.ReplicationOutOfSequence})
+                return False
+        return True
+
+    def ApplySnapshot(self, sequence: int, data: bytes) -> None:
+        """
+        Replaces every seat of the standby with the seats of a snapshot.
+        """
+        storage = self.m_Manager.Storage
+        self.m_LicenceSeats = {}
+        # Every seat expires before the end of time...
+        storage.DeleteStaleSeats(datetime.max)
+        offset = 0
+        count = 0
+        while offset < len(data):
+            change, offset = ReplicationPrimary.Decode(data, offset)
+            self.Apply(change)
+            count += 1
+        self.m_Sequence = sequence
+        self.m_Synced = True
+        logging.info('Applied replication snapshot of ' + str(count) + ' seat(s) at sequence ' + str(sequence),
+                     extra={'EventId': EventId.ReplicationSnapshot})
+
+    def Apply(self, change: SeatChange) -> None:
+        """
+        Applies a seat change to the storage of the standby.
+        A seat the primary granted is kept, even if the standby's own licences would refuse it.
+        """
+        storage = self.m_Manager.Storage
+        nowTime = datetime.fromtimestamp(change.Time)
+        expiryTime = datetime.fromtimestamp(change.ExpiryTime)
+        with self.m_Manager.GetProductLock(change.Product):
+            if change.Type == MessageType.ReleaseSeat:
+                storage.ReleaseSeat(change.Product, change.IpAddress, change.UserName)
+            elif change.Type == MessageType.TakeSeat:
+                # Verifying the licences of every take would hold the standby back...
+                if change.Product not in self.m_LicenceSeats:
+                    pl = self.m_Manager.GetProductLicences(change.Product)
+                    if pl is not None and pl.TotalSeats > 0:
+                        pl.Sort()
+                        self.m_LicenceSeats[change.Product] = pl.LicenceSeats
+                    else:
+                        self.m_LicenceSeats[change.Product] = None
+                licenceSeats = self.m_LicenceSeats[change.Product]
+                taken = False
+                if licenceSeats is not None:
+                    taken = storage.TakeSeat(change.Product, change.IpAddress, change.UserName, change.Host,
+                                             licenceSeats, nowTime, expiryTime)
+                if not taken:
+                    storage.RefreshSeat(change.Product, change.IpAddress, change.UserName, change.Host,
+                                        nowTime, expiryTime)
+            else:
+                storage.RefreshSeat(change.Product, change.IpAddress, change.UserName, change.Host,
+                                    nowTime, expiryTime)
@@ -0,0 +1,440 @@
+from .clsInvalidProductException import InvalidProductException
+from .clsLicenceManager import LicenceManager
+from .clsRateLimiter import RateLimiter
+from .clsEventRing import EventRing
+from .clsStorage import SeatOperation
+from .clsMessage_pb2 import Message
+from .MessageType import MessageType
+from .ErrorCode import ErrorCode
+from .EventId import EventId
+from datetime import datetime, timedelta
+from typing import Callable, Tuple
+import threading
+import logging
+import hmac
+
+
+class RequestHandler:
+    """
+    Decodes a client request message, performs it against the licence manager
+    and encodes the reply. Shared by every server worker thread.
+
+    A seat request carries the product in Licence.Product and the user, host and
+    IP Address of the client in Body[0]. The reply has type Reply, Code set to an
+    ErrorCode value and, for seat requests, Content set to 'True' or 'False'.
+    Take and refresh replies carry the heartbeat the client should refresh at,
+    the seat goes stale if not refreshed within it, and the id of the seat in
+    SeatId. A client sending the id back with its refreshes and release has its
+    seat found by primary key, a request without one by user and IP Address.
+
+    A Batch request carries seat requests in Items, performed in one transaction.
+    Its reply carries a reply item, in the same order, for each request item.
+
+    Each worker thread decodes into and encodes from its own request and reply
+    messages, cleared and reused for every request rather than allocated.
+
+    With a rate limiter, a request its client has made too often is refused
+    before it reaches the licence manager, with Code set to Throttled. Clients
+    are limited by the peer IP Address of their connection, never the one in the
+    request, and by the user in Body[0]. Batch items are limited as requests of
+    their own type, by the peer IP Address of the batch and the user in the item.
+    FromConfig builds the handler from the RateLimits and AdminSecret of Config.xml.
+
+    The administrative requests, QueryEvents, ReleaseSeats and Kill, must carry
+    the admin secret of the server in Comments, or are refused with Code set to
+    NotAuthorised. Without an admin secret they are always refused.
+
+    A QueryEvents request returns the recent events of the licence manager,
+    newest first, one per line, filtered by the comma separated event names or
+    numbers in Content, the product in Licence.Product and the user in Body[0].
+
+    A ReleaseSeats request releases every seat of the product, host, IP Address
+    or user in the request, or expires the seats not refreshed since the time in
+    Content, as one storage transaction. The time is an ISO time, or a number of
+    minutes before now by the clock of the licence manager, so the clock of the
+    administrator's host does not matter.
+
+    A WaitSeat request takes a seat like TakeSeat but, if none is free, waits
+    in the seat wait queue of the licence manager for up to the seconds in
+    Content, and at most MaximumWait, to be granted one. The wait holds a
+    worker thread, so MaximumWait is kept short, the client asks again to keep
+    its place in the queue.
+
+    A Kill request writes the seat snapshot, so the restarted server restores
+    its seats, then calls OnKill for the server to stop.
+    """
+    MaximumWait = 2.0
+    AdminTypes = (MessageType.QueryEvents.value, MessageType.ReleaseSeats.value, MessageType.Kill.value)
+
+    m_ServerVersion = ""
+    m_RateLimiter = None
+    m_AdminSecret = ""
+
+    OnKill: Callable[[], None] = None
+    """
+    Called after a Kill request has written the seat snapshot, to stop the server
+    """
+
+    @property
+    def Manager(self) -> LicenceManager:
+        """
+        Gets the licence manager requests are performed against.
+
+        :returns: The licence manager.
+        """
+        return self.m_Manager
+
+    @property
+    def RateLimiter(self) -> RateLimiter:
+        """
+        Gets the rate limiter requests are admitted by, None if requests are not limited.
+
+        :returns: The rate limiter.
+        """
+        return self.m_RateLimiter
+
+    def __init__(self, manager: LicenceManager, serverVersion: str = "", rateLimiter: RateLimiter = None,
+                 adminSecret: str = ""):
+        """
+        Initializes the request handler.
+
+        :param manager: The licence manager to perform requests against.
+        :param serverVersion: The version returned for ServerVersion requests.
+        :param rateLimiter: The rate limiter to admit requests by, by default requests are not limited.
+        :param adminSecret: The secret administrative requests must carry, by default they are refused.
+        """
+        self.m_Manager = manager
+        self.m_ServerVersion = serverVersion
+        self.m_RateLimiter = rateLimiter
+        self.m_AdminSecret = adminSecret or ""
+        self.m_Local = threading.local()
+        self.m_Handlers = {
+            MessageType.TakeSeat.value: self.TakeSeat,
+            MessageType.ReleaseSeat.value: self.ReleaseSeat,
+            MessageType.RefreshSeat.value: self.RefreshSeat,
+            MessageType.QueryConnections.value: self.QueryConnections,
+            MessageType.NumberOfSeats.value: self.NumberOfSeats,
+            MessageType.ServerVersion.value: self.ServerVersion,
+            MessageType.QueryProducts.value: self.QueryProducts,
+            MessageType.QueryLicence.value: self.QueryLicence,
+            MessageType.WebServerAddress.value: self.WebServerAddress,
+            MessageType.Batch.value: self.Batch,
+            MessageType.QueryEvents.value: self.QueryEvents,
+            MessageType.ReleaseSeats.value: self.ReleaseSeats,
+            MessageType.WaitSeat.value: self.WaitSeat,
+            MessageType.Kill.value: self.Kill,
+        }
+
+    @staticmethod
+    def FromConfig(manager: LicenceManager, serverVersion: str, config) -> 'RequestHandler':
+        """
+        Initializes a request handler held to the RateLimits, and requiring the AdminSecret, of the config.
+
+        :param manager: The licence manager to perform requests against.
+        :param serverVersion: The version returned for ServerVersion requests.
+        :param config: The licence server configuration.
+        :returns: The request handler.
+        """
+        rateLimiter = RateLimiter(config.RateLimits) if config.RateLimits else None
+        return RequestHandler(manager, serverVersion, rateLimiter, config.AdminSecret)
+
+    def Handle(self, data: bytes, ipAddress: str = None) -> bytes:
+        """
+        Performs an encoded request and returns the encoded reply.
+
+        :param data: The serialized request message.
+        :param ipAddress: The peer IP Address of the connection the request came from, if known.
+        :returns: The serialized reply message.
+        """
+        request, reply = self.GetMessages()
+        try:
+            request.ParseFromString(data)
+        except Exception as ex:
+            logging.error('Invalid request message: ' + str(ex), extra={'EventId': EventId.InvalidRequest})
+            reply.Clear()
+            reply.Type = MessageType.Reply.value
+            reply.Code = ErrorCode.UnknownError.value
+            reply.Comments = 'Invalid request message.'
+            return reply.SerializeToString()
+        return self.Dispatch(request, reply, ipAddress).SerializeToString()
+
+    def GetMessages(self) -> Tuple[Message, Message]:
+        """
+        Returns the request and reply messages of the calling worker thread, created on first use.
+        """
+        local = self.m_Local
+        if not hasattr(local, 'Request'):
+            local.Request = Message()
+            local.Reply = Message()
+        return local.Request, local.Reply
+
+    def Dispatch(self, request: Message, reply: Message = None, ipAddress: str = None) -> Message:
+        """
+        Performs a request and returns the reply.
+
+        :param request: The request message.
+        :param reply: The message to clear and write the reply into, by default a new message.
+        :param ipAddress: The peer IP Address of the connection the request came from, if known.
+        :returns: The reply message.
+        """
+        if reply is None:
+            reply = Message()
+        else:
+            reply.Clear()
+        reply.Type = MessageType.Reply.value
+        reply.Code = ErrorCode.NoError.value
+        handler = self.m_Handlers.get(request.Type)
+        if handler is None:
+            reply.Code = ErrorCode.UnknownError.value
+            reply.Comments = 'Unsupported message type: ' + str(request.Type)
+            return reply
+        if request.Type in self.AdminTypes and not self.Authorise(request, ipAddress):
+            reply.Code = ErrorCode.NotAuthorised.value
+            reply.Comments = 'Not authorised to make ' + MessageType(request.Type).name + ' requests.'
+            return reply
+        # Batch items are admitted by the peer IP Address of the batch...
+        self.m_Local.IPAddress = ipAddress or ''
+        if not self.Admit(request, ipAddress):
+            RequestHandler.Throttle(request, reply)
+            return reply
+        try:
+            with self.m_Manager.MeasureQueries(MessageType(request.Type).name):
+                handler(request, reply)
+        except InvalidProductException as ex:
+            reply.Code = ErrorCode.InvalidProduct.value
+            reply.Comments = str(ex)
+        except Exception as ex:
+            logging.error('Request ' + str(request.Type) + ' failed: ' + repr(ex),
+                          extra={'EventId': EventId.RequestError})
+            reply.Code = ErrorCode.UnknownError.value
+            reply.Comments = repr(ex)
+        return reply
+
+    def Authorise(self, request: Message, ipAddress: str = None) -> bool:
+        """
+        Returns true if the administrative request carries the admin secret in Comments.
+        """
+        if self.m_AdminSecret and hmac.compare_digest(request.Comments.encode(), self.m_AdminSecret.encode()):
+            return True
+        logging.warning('Refused ' + MessageType(request.Type).name + ' request from IP Address: \'' +
+                        str(ipAddress or '') + '\'', extra={'EventId': EventId.AdminRequestRefused})
+        return False
+
+    def Admit(self, request: Message, ipAddress: str = None) -> bool:
+        """
+        Returns true if the rate limiter admits the request from the peer IP Address,
+        its user read from Body[0] if present.
+        """
+        if self.m_RateLimiter is None:
+            return True
+        userName = request.Body[0].User if len(request.Body) > 0 else ''
+        return self.m_RateLimiter.Admit(MessageType(request.Type), ipAddress or '', userName)
+
+    @staticmethod
+    def Throttle(request: Message, reply: Message) -> None:
+        """
+        Writes the reply to a throttled request.
+        """
+        reply.Code = ErrorCode.Throttled.value
+        reply.Comments = 'Too many ' + MessageType(request.Type).name + ' requests, try again later.'
+        reply.Content = str(False)
+
+    @staticmethod
+    def GetUser(request: Message) -> Message.UserRecordStruct:
+        """
+        Returns the user record of a seat request.
+        """
+        if len(request.Body) == 0:
+            raise ValueError('Seat request has no user record.')
+        return request.Body[0]
+
+    def TakeSeat(self, request: Message, reply: Message) -> None:
+        """
+        Takes a seat for the user of the request.
+        """
+        user = RequestHandler.GetUser(request)
+        # The seat expires by the heartbeat the client is told to refresh at...
+        heartBeat = self.m_Manager.RecommendedHeartBeat
+        seatId = self.m_Manager.TakeSeat(request.Licence.Product, user.IP, user.User, user.Host, heartBeat)
+        reply.Content = str(seatId > 0)
+        reply.SeatId = seatId
+        reply.HeartBeat.FromTimedelta(heartBeat)
+
+    def ReleaseSeat(self, request: Message, reply: Message) -> None:
+        """
+        Releases the seat of the user of the request.
+        """
+        user = RequestHandler.GetUser(request)
+        reply.Content = str(self.m_Manager.ReleaseSeat(request.Licence.Product, user.IP, user.User,
+                                                       request.SeatId or None))
+
+    def RefreshSeat(self, request: Message, reply: Message) -> None:
+        """
+        Refreshes the seat of the user of the request.
+        """
+        user = RequestHandler.GetUser(request)
+        heartBeat = self.m_Manager.RecommendedHeartBeat
+        seatId = self.m_Manager.RefreshSeat(request.Licence.Product, user.IP, user.User, user.Host, heartBeat,
+                                            request.SeatId or None)
+        reply.Content = str(seatId > 0)
+        reply.SeatId = seatId
+        reply.HeartBeat.FromTimedelta(heartBeat)
+
+    def Batch(self, request: Message, reply: Message) -> None:
+        """
+        Takes, refreshes and releases the seats of the request items in one transaction.
+        An item that is not a seat request, lacks its product, user, IP Address or, other than for a release,
+        host, or is throttled, fails on its own, the other items are performed.
+        """
+        seatTypes = (MessageType.TakeSeat.value, MessageType.RefreshSeat.value, MessageType.ReleaseSeat.value)
+        operations = []
+        items = []
+        for item in request.Items:
+            itemReply = reply.Items.add()
+            itemReply.Type = MessageType.Reply.value
+            itemReply.Code = ErrorCode.NoError.value
+            itemReply.Licence.Product = item.Licence.Product
+            if item.Type not in seatTypes or len(item.Body) == 0:
+                itemReply.Code = ErrorCode.UnknownError.value
+                itemReply.Comments = 'Unsupported batch item: ' + str(item.Type)
+                itemReply.Content = str(False)
+                continue
+            user = item.Body[0]
+            # The manager refuses the whole batch for one incomplete item, so it is failed here...
+            if (not item.Licence.Product or not user.IP or not user.User or
+                    (item.Type != MessageType.ReleaseSeat.value and not user.Host)):
+                itemReply.Code = ErrorCode.UnknownError.value
+                itemReply.Comments = 'Incomplete batch item: ' + MessageType(item.Type).name
+                itemReply.Content = str(False)
+                continue
+            if not self.Admit(item, self.m_Local.IPAddress):
+                RequestHandler.Throttle(item, itemReply)
+                continue
+            operations.append(SeatOperation(MessageType(item.Type), item.Licence.Product, user.IP, user.User, user.Host,
+                                            SeatId=item.SeatId or None))
+            items.append(itemReply)
+        heartBeat = self.m_Manager.RecommendedHeartBeat
+        results = self.m_Manager.ExecuteBatch(operations, heartBeat)
+        for op, itemReply, result in zip(operations, items, results):
+            itemReply.Content = str(result > 0)
+            if op.Type != MessageType.ReleaseSeat:
+                itemReply.SeatId = result
+                itemReply.HeartBeat.FromTimedelta(heartBeat)
+        reply.Content = str(len(request.Items))
+        reply.HeartBeat.FromTimedelta(heartBeat)
+
+    def QueryConnections(self, request: Message, reply: Message) -> None:
+        """
+        Returns the live seats of the product in the reply body.
+        """
+        reply.Content = str(self.m_Manager.WriteConnections(request.Licence.Product, reply.Body))
+
+    def NumberOfSeats(self, request: Message, reply: Message) -> None:
+        """
+        Returns the total number of seats of the product.
+        """
+        reply.Content = str(self.m_Manager.TotalSeats(request.Licence.Product))
+
+    def ServerVersion(self, request: Message, reply: Message) -> None:
+        """
+        Returns the server version.
+        """
+        reply.Content = self.m_ServerVersion
+
+    def QueryProducts(self, request: Message, reply: Message) -> None:
+        """
+        Returns the licensed products, one per line.
+        """
+        reply.Content = '\n'.join(self.m_Manager.GetProducts())
+
+    def QueryLicence(self, request: Message, reply: Message) -> None:
+        """
+        Returns the licence details of the product.
+        """
+        reply.Licence.CopyFrom(self.m_Manager.GetLicenceDetails(request.Licence.Product))
+
+    def WebServerAddress(self, request: Message, reply: Message) -> None:
+        """
+        Returns the web server address, empty if the web server is not enabled.
+        """
+        reply.Content = self.m_Manager.WebServerUri
+
+    def QueryEvents(self, request: Message, reply: Message) -> None:
+        """
+        Returns the recent events matching the filters of the request, one per line.
+        """
+        ring = self.m_Manager.RecentEvents
+        if ring is None:
+            reply.Content = ''
+            return
+        eventIds = None
+        if request.Content:
+            try:
+                eventIds = [EventId(int(name)) if name.strip().isdigit() else EventId[name.strip()]
+                            for name in request.Content.split(',') if name.strip()]
+            except (KeyError, ValueError):
+                reply.Code = ErrorCode.UnknownError.value
+                reply.Comments = 'Unknown event id: ' + request.Content
+                return
+        userName = request.Body[0].User if len(request.Body) > 0 and request.Body[0].User else None
+        reply.Content = EventRing.Format(ring.Query(eventIds, request.Licence.Product or None, userName))
+
+    def ReleaseSeats(self, request: Message, reply: Message) -> None:
+        """
+        Releases the seats matching the filters of the request, or expires the seats not refreshed
+        since the time in Content, and returns the number released of each product, one per line.
+        """
+        user = request.Body[0] if len(request.Body) > 0 else None
+        product = request.Licence.Product or None
+        try:
+            if request.Content:
+                counts = self.m_Manager.ExpireSeats(self.GetExpiryTime(request.Content), product)
+            else:
+                counts = self.m_Manager.ReleaseSeats(product, user.Host if user else None,
+                                                     user.IP if user else None, user.User if user else None)
+        except ValueError:
+            reply.Code = ErrorCode.UnknownError.value
+            reply.Comments = 'No seats specified, or invalid time: ' + request.Content
+            return
+        reply.Content = '\n'.join(name + '\t' + str(count) for name, count in sorted(counts.items()))
+
+    def GetExpiryTime(self, content: str) -> datetime:
+        """
+        Returns the time seats not refreshed since are expired, from an ISO time or a number of minutes before now.
+
+        :raises ValueError: The content is neither a time nor a number of minutes.
+        """
+        try:
+            minutes = float(content)
+        except ValueError:
+            return datetime.fromisoformat(content)
+        if not 0 <= minutes < float('inf'):
+            raise ValueError
+        return self.m_Manager.Clock.Now() - timedelta(minutes=minutes)
+
+    def WaitSeat(self, request: Message, reply: Message) -> None:
+        """
+        Takes a seat for the user of the request, waiting in the seat wait queue to be granted one if none is free.
+        """
+        user = RequestHandler.GetUser(request)
+        heartBeat = self.m_Manager.RecommendedHeartBeat
+        try:
+            timeout = max(0.0, min(float(request.Content or 0), self.MaximumWait))
+        except ValueError:
+            timeout = 0.0
+        seatId, position = self.m_Manager.WaitSeat(request.Licence.Product, user.IP, user.User, user.Host,
+                                                   heartBeat, timeout)
+        reply.Content = str(seatId > 0)
+        reply.SeatId = seatId
+        reply.HeartBeat.FromTimedelta(heartBeat)
+        if position:
+            reply.Comments = 'Place in the seat wait queue: ' + str(position)
+
+    def Kill(self, request: Message, reply: Message) -> None:
+        """
+        Writes the seat snapshot and stops the server.
+        """
+        self.m_Manager.WriteSnapshot()
+        reply.Content = str(True)
+        if self.OnKill is not None:
+            self.OnKill()
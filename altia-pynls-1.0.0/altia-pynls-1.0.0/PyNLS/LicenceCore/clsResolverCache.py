@@ -0,0 +1,175 @@
+from .EventId import EventId
+from typing import Any, Callable, Dict, NamedTuple
+import threading
+import logging
+import time
+
+
+class LookupStatistics(NamedTuple):
+    """
+    The lookups of a cached name, times in seconds.
+    Hits are answered from the cache, Lookups are the calls of the resolver,
+    including background refreshes, and Failures the lookups that raised.
+    """
+    Hits: int
+    Lookups: int
+    Failures: int
+    TotalTime: float
+    MaximumTime: float
+
+
+class ResolverCache:
+    """
+    Time-to-live cache of the results of blocking lookups, such as name resolution
+    or the identity of the local computer, keyed by name.
+
+    Only the first lookup of a name blocks the caller. A result is kept for the
+    time to live, a lookup that raised OSError for the negative time to live, the
+    error being raised again until then. Once a result is older than the refresh
+    fraction of its time to live it is looked up again on a background thread,
+    and an expired result is still returned while it is looked up again, so the
+    request path does not block on name resolution once a name has been resolved.
+    A background lookup that fails keeps the previous result.
+    """
+    m_TimeToLive = 300.0
+    m_NegativeTimeToLive = 30.0
+    m_RefreshFraction = 0.8
+
+    @property
+    def TimeToLive(self) -> float:
+        """
+        Gets the time, in seconds, a result is kept.
+
+        :returns: The time to live.
+        """
+        return self.m_TimeToLive
+
+    @property
+    def NegativeTimeToLive(self) -> float:
+        """
+        Gets the time, in seconds, a failed lookup is kept.
+
+        :returns: The negative time to live.
+        """
+        return self.m_NegativeTimeToLive
+
+    @property
+    def Statistics(self) -> Dict[str, LookupStatistics]:
+        """
+        Gets the lookups of each cached name.
+
+        :returns: A dictionary of name to its statistics.
+        """
+        with self.m_Lock:
+            return {name: LookupStatistics(*values) for name, values in self.m_Statistics.items()}
+
+    def __init__(self, timeToLive: float = 300.0, negativeTimeToLive: float = 30.0, refreshFraction: float = 0.8):
+        """
+        Initializes an empty cache.
+
+        :param timeToLive: The time, in seconds, a result is kept.
+        :param negativeTimeToLive: The time, in seconds, a failed lookup is kept.
+        :param refreshFraction: The fraction of its time to live after which a result is refreshed in the background.
+        """
+        self.m_TimeToLive = timeToLive
+        self.m_NegativeTimeToLive = negativeTimeToLive
+        self.m_RefreshFraction = refreshFraction
+        self.m_Lock = threading.Lock()
+        self.m_Entries: Dict[str, CacheEntry] = {}
+        self.m_Statistics: Dict[str, list] = {}
+
+    def Get(self, name: str, resolver: Callable[[], Any]) -> Any:
+        """
+        Returns the cached result of the named lookup, looking it up if not cached.
+
+        :param name: The name of the lookup, e.g. the host name to resolve.
+        :param resolver: The blocking lookup, called without arguments.
+        :returns: The result of the lookup.
+        :raises OSError: The lookup failed, within the negative time to live.
+        """
+        nowTime = time.monotonic()
+        with self.m_Lock:
+            entry = self.m_Entries.get(name)
+            if entry is not None:
+                self.m_Statistics[name][0] += 1
+                if nowTime >= entry.RefreshTime and not entry.Refreshing:
+                    entry.Refreshing = True
+                    threading.Thread(target=self.Refresh, args=(name, resolver),
+                                     name='ResolverCache', daemon=True).start()
+        if entry is None:
+            entry = self.Lookup(name, resolver)
+        if entry.Error is not None:
+            raise entry.Error
+        return entry.Value
+
+    def Clear(self) -> None:
+        """
+        Forgets every cached result and the lookup statistics.
+        """
+        with self.m_Lock:
+            self.m_Entries = {}
+            self.m_Statistics = {}
+
+    def Refresh(self, name: str, resolver: Callable[[], Any]) -> None:
+        """
+        Looks up a cached name again on a background thread, keeping the previous result if the lookup fails.
+        """
+        try:
+            self.Lookup(name, resolver, True)
+        except Exception as ex:
+            logging.warning('Refreshing \'' + name + '\' failed: ' + repr(ex),
+                            extra={'EventId': EventId.NameLookupError})
+            with self.m_Lock:
+                entry = self.m_Entries.get(name)
+                if entry is not None:
+                    entry.Refreshing = False
+
+    def Lookup(self, name: str, resolver: Callable[[], Any], isRefresh: bool = False) -> 'CacheEntry':
+        """
+        Calls the resolver, timing it, and caches its result or the OSError it raised.
+        """
+        start = time.monotonic()
+        value = None
+        error = None
+        try:
+            value = resolver()
+        except OSError as ex:
+            error = ex
+        nowTime = time.monotonic()
+        elapsed = nowTime - start
+        with self.m_Lock:
+            statistics = self.m_Statistics.setdefault(name, [0, 0, 0, 0.0, 0.0])
+            statistics[1] += 1
+            statistics[3] += elapsed
+            statistics[4] = max(statistics[4], elapsed)
+            if error is not None:
+                statistics[2] += 1
+                previous = self.m_Entries.get(name)
+                # A refresh that failed keeps the result it was refreshing...
+                if isRefresh and previous is not None and previous.Error is None:
+                    previous.Refreshing = False
+                    previous.RefreshTime = nowTime + self.m_NegativeTimeToLive
+                    return previous
+                entry = CacheEntry(None, error, nowTime + self.m_NegativeTimeToLive)
+            else:
+                entry = CacheEntry(value, None, nowTime + self.m_TimeToLive * self.m_RefreshFraction)
+            self.m_Entries[name] = entry
+        if error is not None:
+            logging.warning('Lookup of \'' + name + '\' failed: ' + str(error),
+                            extra={'EventId': EventId.NameLookupError})
+        return entry
+
+
+# Private CacheEntry (helper) class
+
+class CacheEntry:
+    """
+    A cached result, or the error a lookup raised, and when it is looked up again.
+    """
+    __slots__ = ('Value', 'Error', 'RefreshTime', 'Refreshing')
+
+    def __init__(self, value, error, refreshTime: float):
+        self.Value = value
+        self.Error = error
+        self.RefreshTime = refreshTime
+        self.Refreshing = False
@@ -0,0 +1,216 @@
+from .clsInvalidProductException import InvalidProductException
+from .clsLicenceManager import LicenceManager
+from .EventId import EventId
+from typing import Dict
+import threading
+import json
+import logging
+import time
+import zmq
+
+
+class SeatCoordinator:
+    """
+    Shares the seats of each product between the nodes of a seat pool.
+
+    Each node holds a quota of seats, leased from the coordinator, and takes seats
+    locally against it. A node borrows (acquire) more quota when its quota is used
+    up, returns quota it no longer needs and renews its lease regularly. The quotas
+    granted for a product never exceed its licensed seats.
+
+    A node stops taking and refreshing seats once its own lease runs out, so the
+    quota of a node that stops renewing is only reclaimed after the lease time and
+    the seat horizon (the longest a seat can live without a refresh) have passed.
+    Likewise, after a restart the coordinator grants no new quota until that time
+    has passed, while the nodes re-register the quotas they hold when they renew.
+
+    Requests and replies are JSON objects sent over a ZeroMQ ROUTER socket.
+    """
+    PollInterval = 100
+
+    m_Address = ""
+    m_Port = 0
+    m_LeaseTime = 10.0
+    m_SeatHorizon = 0.0
+
+    @property
+    def Port(self) -> int:
+        """
+        Gets the TCP port nodes connect to, available once started.
+
+        :returns: The port the coordinator is bound to.
+        """
+        return self.m_Port
+
+    @property
+    def LeaseTime(self) -> float:
+        """
+        Gets the time, in seconds, a node's quota is leased for without a renewal.
+
+        :returns: The lease time.
+        """
+        return self.m_LeaseTime
+
+    @property
+    def PeakGranted(self) -> Dict[str, int]:
+        """
+        Gets the most quota granted at once for each product.
+
+        :returns: A dictionary of product name to the peak quota granted.
+        """
+        with self.m_Lock:
+            return dict(self.m_PeakGranted)
+
+    def __init__(self, manager: LicenceManager, address: str = 'tcp://*:0', leaseTime: float = 10.0,
+                 seatHorizon: float = None):
+        """
+        Initializes the coordinator.
+
+        :param manager: The licence manager the licensed seats of each product are read from.
+        :param address: The address to bind to, a port of 0 picks a free port.
+        :param leaseTime: The time, in seconds, a node's quota is leased for without a renewal.
+        :param seatHorizon: The longest, in seconds, a seat lives without a refresh, by default
+                            the maximum heartbeat of the manager plus its fudge factor.
+        """
+        self.m_Manager = manager
+        self.m_Address = address
+        self.m_LeaseTime = leaseTime
+        if seatHorizon is None:
+            seatHorizon = max(manager.HeartBeat, manager.MaximumHeartBeat).total_seconds() + LicenceManager.FudgeFactor
+        self.m_SeatHorizon = seatHorizon
+        self.m_Lock = threading.Lock()
+        self.m_Grants: Dict[str, Dict[str, int]] = {}
+        self.m_Leases: Dict[str, float] = {}
+        self.m_PeakGranted: Dict[str, int] = {}
+        self.m_GraceUntil = time.monotonic() + leaseTime + seatHorizon
+        self.m_Running = False
+        self.m_Thread = None
+
+    def Start(self, grace: bool = True) -> None:
+        """
+        Binds the coordinator and starts serving nodes on a background thread.
+
+        :param grace: False to grant quota at once, only safe when no node can hold quota from a previous run.
+        """
+        if not grace:
+            self.m_GraceUntil = 0.0
+        context = zmq.Context.instance()
+        router = context.socket(zmq.ROUTER)
+        router.setsockopt(zmq.LINGER, 0)
+        if self.m_Address.endswith(':0'):
+            self.m_Port = router.bind_to_random_port(self.m_Address[:-2])
+        else:
+            router.bind(self.m_Address)
+            self.m_Port = int(self.m_Address.rsplit(':', 1)[1])
+        self.m_Running = True
+        self.m_Thread = threading.Thread(target=self.ServeLoop, args=(router,), name='SeatCoordinator', daemon=True)
+        self.m_Thread.start()
+        logging.info('Seat coordinator listening on port ' + str(self.m_Port),
+                     extra={'EventId': EventId.SeatCoordinatorStarted})
+
+    def Close(self) -> None:
+        """
+        Stops serving nodes.
+        """
+        self.m_Running = False
+        if self.m_Thread is not None:
+            self.m_Thread.join()
+            self.m_Thread = None
+
+    def ServeLoop(self, router: zmq.Socket) -> None:
+        """
+        Answers node requests and reclaims expired leases until closed.
+        """
+        try:
+            while self.m_Running:
+                if router.poll(self.PollInterval):
+                    frames = router.recv_multipart()
+                    # Only a node's REQ socket sends the identity, empty delimiter and request...
+                    if len(frames) == 3 and frames[1] == b'':
+                        identity, empty, data = frames
+                        try:
+                            reply = self.Handle(json.loads(data))
+                        except Exception as ex:
+                            logging.error('Seat coordinator request failed: ' + repr(ex),
+                                          extra={'EventId': EventId.SeatCoordinatorError})
+                            reply = {'error': repr(ex)}
+                        router.send_multipart([identity, empty, json.dumps(reply).encode()])
+                self.ReclaimExpired()
+        finally:
+            router.close(linger=0)
+
+    def Handle(self, request: dict) -> dict:
+        """
+        Performs a node request.
+
+        :param request: The request, with op (acquire, return or renew) and node,
+                        plus product and count for acquire and return, or quotas for renew.
+        :returns: The reply, with the node's quota of the product, and the seats granted for acquire,
+                  or all its quotas for renew, and the lease time.
+        """
+        node = request['node']
+        with self.m_Lock:
+            self.m_Leases[node] = time.monotonic() + self.m_LeaseTime
+            grants = self.m_Grants.setdefault(node, {})
+            op = request['op']
+            if op == 'acquire':
+                product = request['product'].lower()
+                available = 0
+                if time.monotonic() >= self.m_GraceUntil:
+                    available = self.GetLimit(product) - self.GetGranted(product)
+                granted = max(0, min(int(request['count']), available))
+                grants[product] = grants.get(product, 0) + granted
+                self.UpdatePeak(product)
+                return {'quota': grants[product], 'granted': granted, 'lease': self.m_LeaseTime}
+            if op == 'return':
+                product = request['product'].lower()
+                grants[product] = max(0, grants.get(product, 0) - int(request['count']))
+                return {'quota': grants[product], 'lease': self.m_LeaseTime}
+            if op == 'renew':
+                for product, quota in request.get('quotas', {}).items():
+                    current = grants.get(product, 0)
+                    if quota < current:
+                        # A return was lost...
+                        grants[product] = quota
+                    elif quota > current:
+                        # The coordinator restarted, re-register the quota the node holds...
+                        grants[product] = current + max(0, min(quota - current,
+                                                               self.GetLimit(product) - self.GetGranted(product)))
+                        self.UpdatePeak(product)
+                return {'quotas': dict(grants), 'lease': self.m_LeaseTime}
+            raise ValueError('Unsupported seat pool request: ' + str(op))
+
+    def ReclaimExpired(self) -> None:
+        """
+        Reclaims the quota of every node whose lease, and any seat taken under it, has expired.
+        """
+        now = time.monotonic()
+        with self.m_Lock:
+            for node, expiry in list(self.m_Leases.items()):
+                if now >= expiry + self.m_SeatHorizon:
+                    grants = self.m_Grants.pop(node, {})
+                    del self.m_Leases[node]
+                    if any(grants.values()):
+                        logging.warning('Reclaimed seat quota of node \'' + node + '\': ' + str(grants),
+                                        extra={'EventId': EventId.SeatQuotaReclaimed})
+
+    def GetLimit(self, product: str) -> int:
+        """
+        Returns the licensed seats of the product, 0 if the product is not licensed.
+        """
+        try:
+            return self.m_Manager.TotalSeats(product)
+        except InvalidProductException:
+            return 0
+
+    def GetGranted(self, product: str) -> int:
+        """
+        Returns the quota of the product granted to every node.
+        """
+        return sum(grants.get(product, 0) for grants in self.m_Grants.values())
+
+    def UpdatePeak(self, product: str) -> None:
+        """
+        Records the quota granted for the product if it is the most granted at once.
+        """
+        self.m_PeakGranted[product] = max(self.m_PeakGranted.get(product, 0), self.GetGranted(product))
@@ -0,0 +1,274 @@
+from .EventId import EventId
+from typing import Dict, Iterator, List, NamedTuple
+import threading
+import logging
+import struct
+import queue
+import time
+import os
+
+
+class SeatEvent(NamedTuple):
+    """
+    A seat event read back from the journal.
+    """
+    Time: float
+    EventId: EventId
+    Product: str
+    UserName: str
+    IpAddress: str
+
+
+class SeatJournal:
+    """
+    Compact binary append-only journal of seat events.
+
+    Each segment is a pair of files, <n>.nlsj holds fixed size records
+    (unix time, event id, product id, user id, IP id) and <n>.nlsd holds the
+    strings the ids refer to, each as a length prefixed UTF-8 string in id order.
+    Every segment has its own dictionary so old segments can be deleted freely.
+    Events are queued by the caller and written by a background thread.
+    """
+    RecordFormat = struct.Struct('<dHIII')
+    LengthFormat = struct.Struct('<H')
+    RecordExtension = '.nlsj'
+    DictionaryExtension = '.nlsd'
+    DefaultFolder = 'Journal'
+    BatchSize = 1024
+
+    m_Folder = ""
+    m_MaximumFileSize = 10000 * 1024
+    m_NumberOfFiles = 10
+
+    @property
+    def Folder(self) -> str:
+        """
+        Gets the folder holding the journal segments.
+
+        :returns: The folder holding the journal segments.
+        """
+        return self.m_Folder
+
+    def __init__(self, folder: str, maximumFileSize: int = 10000 * 1024, numberOfFiles: int = 10):
+        """
+        Opens the journal in the specified folder, starting a new segment.
+
+        :param folder: The folder to hold the journal segments, created if missing.
+        :param maximumFileSize: The size, in bytes, after which a segment is rotated.
+        :param numberOfFiles: The number of segments to keep.
+        """
+        self.m_Folder = folder
+        self.m_MaximumFileSize = maximumFileSize
+        self.m_NumberOfFiles = max(1, numberOfFiles)
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        self.m_Queue = queue.SimpleQueue()
+        self.m_Segment = 0
+        segments = SeatJournal.GetSegments(folder)
+        if segments:
+            self.m_Segment = segments[-1]
+        self.m_RecordFile = None
+        self.m_DictionaryFile = None
+        self.m_Dictionary: Dict[str, int] = {}
+        self.m_Size = 0
+        self.NewSegment()
+        self.m_Thread = threading.Thread(target=self.WriterLoop, name='SeatJournal', daemon=True)
+        self.m_Thread.start()
+
+    @staticmethod
+    def FromConfig(config, folder: str) -> 'SeatJournal':
+        """
+        Opens the journal, rotated by the MaximumLogFileSize and NumberOfLogs of the config.
+
+        :param config: The licence server configuration.
+        :param folder: The folder to hold the journal segments.
+        :returns: The seat journal.
+        """
+        return SeatJournal(folder, int(config.MaximumLogFileSize) * 1024, int(config.NumberOfLogs))
+
+    def Record(self, eventId: EventId, product: str, userName: str, ipAddress: str) -> None:
+        """
+        Queues a seat event to be written, this never blocks on disk.
+
+        :param eventId: The seat event.
+        :param product: The name of the product.
+        :param userName: The user name.
+        :param ipAddress: The IP Address.
+        """
+        self.m_Queue.put((time.time(), eventId.value, product.lower(), userName, ipAddress))
+
+    def Flush(self) -> None:
+        """
+        Blocks until every event queued so far has been written.
+        """
+        done = threading.Event()
+        self.m_Queue.put(done)
+        done.wait()
+
+    def Close(self) -> None:
+        """
+        Writes any queued events and closes the journal.
+        """
+        self.m_Queue.put(None)
+        self.m_Thread.join()
+
+    def WriterLoop(self) -> None:
+        """
+        Writes queued events in batches until the journal is closed.
+        """
+        running = True
+        while running:
+            batch = [self.m_Queue.get()]
+            while len(batch) < self.BatchSize:
+                try:
+                    batch.append(self.m_Queue.get_nowait())
+                except queue.Empty:
+                    break
+            events = []
+            waiters = []
+            for item in batch:
+                if item is None:
+                    running = False
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    events.append(item)
+            try:
+                self.Write(events)
+            except Exception as ex:
+                logging.critical('SeatJournal write failed: ' + str(ex), extra={'EventId': EventId.SeatJournalError})
+            for waiter in waiters:
+                waiter.set()
+        self.m_RecordFile.close()
+        self.m_DictionaryFile.close()
+
+    def Write(self, events: List[tuple]) -> None:
+        """
+        Encodes and appends events to the current segment, rotating as required.
+        New strings join the dictionary only once written, if a write fails the
+        segment is abandoned for a new one, as its files may end part way through.
+
+        :param events: Tuples of (time, event id, product, user name, IP Address).
+        """
+        if not events:
+            return
+        records = bytearray()
+        strings = bytearray()
+        added: Dict[str, int] = {}
+        try:
+            for eventTime, eventId, product, userName, ipAddress in events:
+                if self.m_Size >= self.m_MaximumFileSize:
+                    self.WriteSegment(strings, records)
+                    records = bytearray()
+                    strings = bytearray()
+                    added = {}
+                    self.NewSegment()
+                ids = []
+                for value in (product, userName, ipAddress):
+                    index = self.m_Dictionary.get(value)
+                    if index is None:
+                        index = added.get(value)
+                    if index is None:
+                        index = len(self.m_Dictionary) + len(added)
+                        added[value] = index
+                        encoded = value.encode('utf-8')
+                        strings += self.LengthFormat.pack(len(encoded))
+                        strings += encoded
+                    ids.append(index)
+                records += self.RecordFormat.pack(eventTime, eventId, ids[0], ids[1], ids[2])
+                self.m_Size += self.RecordFormat.size
+            self.WriteSegment(strings, records)
+        except Exception:
+            self.NewSegment()
+            raise
+        self.m_Dictionary.update(added)
+
+    def WriteSegment(self, strings: bytearray, records: bytearray) -> None:
+        """
+        Appends dictionary entries then records to the current segment, the
+        dictionary is flushed first so records never refer to a missing string.
+        """
+        if strings:
+            self.m_DictionaryFile.write(strings)
+            self.m_DictionaryFile.flush()
+        if records:
+            self.m_RecordFile.write(records)
+            self.m_RecordFile.flush()
+
+    def NewSegment(self) -> None:
+        """
+        Closes the current segment, starts the next one and deletes the oldest
+        segments beyond the number of files to keep.
+        """
+        if self.m_RecordFile is not None:
+            self.m_RecordFile.close()
+            self.m_DictionaryFile.close()
+        self.m_Segment += 1
+        path = os.path.join(self.m_Folder, str(self.m_Segment))
+        self.m_RecordFile = open(path + self.RecordExtension, 'ab')
+        self.m_DictionaryFile = open(path + self.DictionaryExtension, 'ab')
+        self.m_Dictionary = {}
+        self.m_Size = 0
+        for segment in SeatJournal.GetSegments(self.m_Folder)[:-self.m_NumberOfFiles]:
+            for extension in (self.RecordExtension, self.DictionaryExtension):
+                try:
+                    os.remove(os.path.join(self.m_Folder, str(segment) + extension))
+                except OSError:
+                    pass
+
+    @staticmethod
+    def GetSegments(folder: str) -> List[int]:
+        """
+        Returns the segment numbers in the folder, oldest first.
+
+        :param folder: The folder holding the journal segments.
+        :returns: The segment numbers.
+        """
+        segments = []
+        for filename in os.listdir(folder):
+            name, extension = os.path.splitext(filename)
+            if extension == SeatJournal.RecordExtension and name.isdigit():
+                segments.append(int(name))
+        return sorted(segments)
+
+    @staticmethod
+    def ReadDictionary(path: str) -> List[str]:
+        """
+        Reads the strings of a segment dictionary in id order.
+
+        :param path: The dictionary file.
+        :returns: The strings, indexed by id.
+        """
+        strings = []
+        if not os.path.isfile(path):
+            return strings
+        with open(path, 'rb') as f:
+            data = f.read()
+        offset = 0
+        size = SeatJournal.LengthFormat.size
+        while offset + size <= len(data):
+            length = SeatJournal.LengthFormat.unpack_from(data, offset)[0]
+            offset += size
+            strings.append(data[offset:offset + length].decode('utf-8'))
+            offset += length
+        return strings
+
+    @staticmethod
+    def Replay(folder: str) -> Iterator[SeatEvent]:
+        """
+        Reads every seat event in the journal, oldest first.
+        A partially written record at the end of a segment is ignored.
+
+        :param folder: The folder holding the journal segments.
+        :returns: An iterator of the seat events.
+        """
+        events = {e.value: e for e in EventId}
+        size = SeatJournal.RecordFormat.size
+        for segment in SeatJournal.GetSegments(folder):
+            path = os.path.join(folder, str(segment))
+            strings = SeatJournal.ReadDictionary(path + SeatJournal.DictionaryExtension)
+            with open(path + SeatJournal.RecordExtension, 'rb') as f:
+                data = f.read()
+            data = data[:len(data) - len(data) % size]
+            for eventTime, eventId, product, userName, ipAddress in SeatJournal.RecordFormat.iter_unpack(data):
+                yield SeatEvent(eventTime, events[eventId], strings[product], strings[userName], strings[ipAddress])
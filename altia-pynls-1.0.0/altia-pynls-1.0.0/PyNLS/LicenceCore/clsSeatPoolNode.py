@@ -0,0 +1,278 @@
+from .clsLicenceManager import LicenceManager, LicenceSeatStructure
+from .EventId import EventId
+from typing import Dict, Optional
+import threading
+import logging
+import socket
+import json
+import time
+import os
+import zmq
+
+
+class SeatPoolNode:
+    """
+    Holds this node's quota of the seats of each product, leased from the
+    coordinator of a seat pool, so seat takes are served locally against it.
+
+    A take that finds the quota used up borrows more from the coordinator, and
+    the quota a node no longer needs beyond a few spare seats is returned. When the
+    coordinator has nothing to lend, takes are refused locally for a short back
+    off rather than every refusal crossing the network. Seats
+    are only taken or refreshed while the lease is valid, the lease running from
+    when the last renewal was sent. Quota shrinks locally, under the product lock,
+    before it is returned, so the seats in use on a node never exceed its quota.
+    Requests to the coordinator take turns on the request lock and are sent with
+    neither the node lock nor a product lock held, a slow coordinator then never
+    holds up seat takes against quota the node already has.
+    """
+    BorrowSize = 4
+    Spare = 2
+    BorrowBackOff = 0.25
+
+    m_CoordinatorAddress = ""
+    m_NodeId = ""
+    m_Timeout = 2.0
+
+    @property
+    def NodeId(self) -> str:
+        """
+        Gets the name the node is known by to the coordinator.
+
+        :returns: The node name.
+        """
+        return self.m_NodeId
+
+    @property
+    def LeaseValid(self) -> bool:
+        """
+        Gets a value to indicate if the node's quota is still leased.
+
+        :returns: True if seats may be taken against the quota, otherwise false.
+        """
+        return time.monotonic() < self.m_LeaseExpiry
+
+    @property
+    def Borrows(self) -> int:
+        """
+        Gets the number of times quota has been borrowed from the coordinator.
+
+        :returns: The number of borrows.
+        """
+        return self.m_Borrows
+
+    @property
+    def Returns(self) -> int:
+        """
+        Gets the number of times surplus quota has been returned to the coordinator.
+
+        :returns: The number of returns.
+        """
+        return self.m_Returns
+
+    def __init__(self, manager: LicenceManager, coordinatorAddress: str, nodeId: str = None, timeout: float = 2.0):
+        """
+        Initializes the node.
+
+        :param manager: The licence manager of the node, seats are taken from its storage.
+        :param coordinatorAddress: The address of the coordinator, e.g. tcp://coordinator:3183.
+        :param nodeId: The name the node is known by to the coordinator, by default the host name and process id.
+        :param timeout: The time, in seconds, to wait for the coordinator to reply.
+        """
+        self.m_Manager = manager
+        self.m_CoordinatorAddress = coordinatorAddress
+        self.m_NodeId = nodeId or socket.gethostname() + ':' + str(os.getpid())
+        self.m_Timeout = timeout
+        self.m_Lock = threading.Lock()
+        self.m_RequestLock = threading.Lock()
+        self.m_Quotas: Dict[str, int] = {}
+        self.m_LicenceSeats: Dict[str, list] = {}
+        self.m_BorrowAfter: Dict[str, float] = {}
+        self.m_LeaseTime = 0.0
+        self.m_LeaseExpiry = 0.0
+        self.m_Borrows = 0
+        self.m_Returns = 0
+        self.m_Socket = None
+        self.m_Running = False
+        self.m_Stop = threading.Event()
+        self.m_Thread = None
+
+    def Start(self) -> None:
+        """
+        Registers with the coordinator and starts renewing the lease on a background thread.
+        """
+        self.Renew()
+        self.m_Running = True
+        self.m_Stop.clear()
+        self.m_Thread = threading.Thread(target=self.RenewLoop, name='SeatPoolNode', daemon=True)
+        self.m_Thread.start()
+
+    def Close(self) -> None:
+        """
+        Stops renewing the lease and returns the quota of every product to the coordinator.
+        """
+        self.m_Running = False
+        self.m_Stop.set()
+        if self.m_Thread is not None:
+            self.m_Thread.join()
+            self.m_Thread = None
+        with self.m_RequestLock:
+            for product in list(self.m_Quotas):
+                with self.m_Manager.GetProductLock(product):
+                    with self.m_Lock:
+                        quota = self.m_Quotas.pop(product, 0)
+                if quota > 0:
+                    self.Request({'op': 'return', 'product': product, 'count': quota})
+            if self.m_Socket is not None:
+                self.m_Socket.close(linger=0)
+                self.m_Socket = None
+
+    def Quota(self, product: str) -> int:
+        """
+        Returns the node's quota of seats of the product.
+
+        :param product: The name of the product.
+        :returns: The number of seats the node may have in use.
+        """
+        with self.m_Lock:
+            return self.m_Quotas.get(product.lower(), 0)
+
+    def GetSeatLimit(self, product: str, licenceSeats: list) -> list:
+        """
+        Returns the licences of the product with their seats cut down to the node's quota,
+        no seats if the lease has run out. Called under the product lock.
+
+        :param product: The name of the product.
+        :param licenceSeats: The active licences for the product (LicenceSeatStructure), sorted.
+        :returns: The licences to take seats against on this node.
+        """
+        with self.m_Lock:
+            self.m_LicenceSeats[product.lower()] = licenceSeats
+            remaining = self.m_Quotas.get(product.lower(), 0) if self.LeaseValid else 0
+        limited = []
+        for ls in licenceSeats:
+            if remaining <= 0:
+                break
+            seats = min(ls.Seats, remaining)
+            limited.append(LicenceSeatStructure(ls.LicenceID, seats, ls.IsPerpetualLicence))
+            remaining -= seats
+        return limited
+
+    def GetLicenceSeats(self, product: str) -> Optional[list]:
+        """
+        Returns the licences of the product last limited by the node, None if there are none yet.
+
+        :param product: The name of the product.
+        :returns: The active licences for the product (LicenceSeatStructure), sorted.
+        """
+        with self.m_Lock:
+            return self.m_LicenceSeats.get(product.lower())
+
+    def Borrow(self, product: str, totalSeats: int) -> bool:
+        """
+        Borrows more quota of the product from the coordinator. Called without the product lock.
+
+        :param product: The name of the product.
+        :param totalSeats: The licensed seats of the product, the node never asks for more.
+        :returns: True if the node's quota grew, otherwise false.
+        """
+        product = product.lower()
+        with self.m_RequestLock:
+            with self.m_Lock:
+                quota = self.m_Quotas.get(product, 0)
+                count = min(max(self.BorrowSize, quota // 2), totalSeats - quota)
+                if count <= 0 or time.monotonic() < self.m_BorrowAfter.get(product, 0.0):
+                    return False
+            reply = self.Request({'op': 'acquire', 'product': product, 'count': count})
+            if reply is None:
+                return False
+            with self.m_Lock:
+                self.m_Borrows += 1
+                # A restarted coordinator may report less, that is settled when the lease is renewed...
+                granted = reply['granted']
+                self.m_Quotas[product] = self.m_Quotas.get(product, 0) + granted
+                if granted <= 0:
+                    self.m_BorrowAfter[product] = time.monotonic() + self.BorrowBackOff
+                    return False
+                return True
+
+    def RenewLoop(self) -> None:
+        """
+        Returns surplus quota and renews the lease, three times per lease, until closed.
+        """
+        while self.m_Running:
+            self.m_Stop.wait(max(0.1, self.m_LeaseTime / 3))
+            if not self.m_Running:
+                return
+            try:
+                for product in list(self.m_Quotas):
+                    self.ReturnSurplus(product)
+                self.Renew()
+            except Exception as ex:
+                logging.error('Seat pool renewal failed: ' + repr(ex), extra={'EventId': EventId.SeatPoolError})
+
+    def ReturnSurplus(self, product: str) -> None:
+        """
+        Returns the quota of the product beyond the seats in use and the spare seats kept.
+        """
+        # Holding the request lock keeps a renewal from reporting the shrunk quota before it is returned...
+        with self.m_RequestLock:
+            with self.m_Manager.GetProductLock(product):
+                used = self.m_Manager.Storage.CountSeats(product, self.m_Manager.Clock.Now())
+                with self.m_Lock:
+                    surplus = self.m_Quotas.get(product, 0) - used - self.Spare
+                    if surplus > 0:
+                        # Shrink before returning, the seats can then never outgrow the quota...
+                        self.m_Quotas[product] -= surplus
+            if surplus > 0:
+                if self.Request({'op': 'return', 'product': product, 'count': surplus}) is not None:
+                    with self.m_Lock:
+                        self.m_Returns += 1
+
+    def Renew(self) -> None:
+        """
+        Renews the lease, reporting the node's quotas.
+        """
+        with self.m_RequestLock:
+            with self.m_Lock:
+                quotas = dict(self.m_Quotas)
+            reply = self.Request({'op': 'renew', 'quotas': quotas})
+            if reply is not None:
+                with self.m_Lock:
+                    for product, quota in quotas.items():
+                        # The coordinator lost track of quota it could not grant again...
+                        granted = reply['quotas'].get(product, 0)
+                        if granted < quota:
+                            logging.warning('Seat quota of \'' + product + '\' cut from ' + str(quota) + ' to ' +
+                                            str(granted), extra={'EventId': EventId.SeatQuotaCut})
+                            self.m_Quotas[product] = max(0, self.m_Quotas.get(product, 0) - (quota - granted))
+
+    def Request(self, request: dict) -> Optional[dict]:
+        """
+        Sends a request to the coordinator and extends the lease from when it was sent.
+        Called under the request lock, never the node lock or a product lock.
+
+        :returns: The reply, or None if the coordinator did not reply within the timeout.
+        """
+        if self.m_Socket is None:
+            self.m_Socket = zmq.Context.instance().socket(zmq.REQ)
+            self.m_Socket.setsockopt(zmq.LINGER, 0)
+            self.m_Socket.connect(self.m_CoordinatorAddress)
+        request['node'] = self.m_NodeId
+        sent = time.monotonic()
+        self.m_Socket.send(json.dumps(request).encode())
+        if not self.m_Socket.poll(self.m_Timeout * 1000):
+            logging.warning('Seat coordinator \'' + self.m_CoordinatorAddress + '\' did not reply.',
+                            extra={'EventId': EventId.SeatPoolError})
+            # A REQ socket cannot send again until it receives, start afresh...
+            self.m_Socket.close(linger=0)
+            self.m_Socket = None
+            return None
+        reply = json.loads(self.m_Socket.recv())
+        if 'error' in reply:
+            logging.error('Seat coordinator refused ' + request['op'] + ': ' + reply['error'],
+                          extra={'EventId': EventId.SeatPoolError})
+            return None
+        self.m_LeaseTime = reply['lease']
+        self.m_LeaseExpiry = sent + self.m_LeaseTime
+        return reply
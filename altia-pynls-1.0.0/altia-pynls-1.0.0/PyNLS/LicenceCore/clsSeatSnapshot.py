@@ -0,0 +1,212 @@
+from .EventId import EventId
+from typing import List, NamedTuple, Optional, Set, Tuple
+import hashlib
+import logging
+import hmac
+import struct
+import mmap
+import time
+import os
+
+
+class SnapshotSeat(NamedTuple):
+    """
+    A live seat written to the snapshot, its expiry time as a unix time.
+    """
+    Product: str
+    UserName: str
+    Host: str
+    IpAddress: str
+    ExpiryTime: float
+
+
+class SnapshotContents(NamedTuple):
+    """
+    The contents of a trusted snapshot.
+    """
+    Time: float
+    Seats: List[SnapshotSeat]
+    Digests: Set[bytes]
+
+
+class SeatSnapshot:
+    """
+    Compact binary snapshot of the state a licence manager would otherwise
+    re-derive on startup: the live seats, so a restarted server keeps the seats
+    its clients hold, and the digests of the licences already verified, so
+    they are not verified again.
+
+    The file is a header (magic, version, unix time, licence generation, HMAC
+    and the number of seats and digests) followed by the seats, as length
+    prefixed UTF-8 strings and an expiry time, and the 32 byte digests. The
+    HMAC-SHA256 of the header fields and the body is keyed by a secret held by
+    the server, outside the data folder, so a snapshot written by anyone
+    without the key, which could mark a tampered licence as verified, is not
+    trusted. The file is memory-mapped to be read and is only trusted if it is
+    authentic and was written for the same licence generation, a digest of
+    every licence loaded.
+    """
+    Magic = b'NLSS'
+    Version = 3
+    HeaderFormat = struct.Struct('<4sHd32s32sII')
+    SignedFormat = struct.Struct('<4sHd32sII')
+    LengthFormat = struct.Struct('<H')
+    SeatFormat = struct.Struct('<d')
+    DigestSize = 32
+    KeySize = 32
+    DefaultFileName = 'Seats.nlss'
+    DefaultKeyFileName = 'snapshot.key'
+
+    m_FileName = ""
+
+    @property
+    def FileName(self) -> str:
+        """
+        Gets the path of the snapshot file.
+
+        :returns: The path of the snapshot file.
+        """
+        return self.m_FileName
+
+    def __init__(self, fileName: str, key: bytes):
+        """
+        Initializes the snapshot with the path of its file and the key it is authenticated with.
+
+        :param fileName: The path of the snapshot file.
+        :param key: The secret key the snapshot is authenticated with, see LoadKey.
+        """
+        if not key:
+            raise ValueError
+        self.m_FileName = fileName
+        self.m_Key = key
+
+    @staticmethod
+    def LoadKey(fileName: str) -> bytes:
+        """
+        Reads the secret key snapshots are authenticated with, creating a random key, readable
+        by the server's account only, if there is none. Keep the key out of the data folder.
+
+        :param fileName: The path of the key file.
+        :returns: The secret key.
+        """
+        try:
+            descriptor = os.open(fileName, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            with open(fileName, 'rb') as file:
+                key = file.read()
+            if len(key) < SeatSnapshot.KeySize:
+                raise ValueError('Seat snapshot key: \'' + fileName + '\' is too short.')
+            return key
+        key = os.urandom(SeatSnapshot.KeySize)
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(key)
+        return key
+
+    def Write(self, generation: bytes, seats: List[SnapshotSeat], digests: Set[bytes],
+              snapshotTime: float = None) -> None:
+        """
+        Writes the snapshot, replacing the previous one only once it is complete.
+
+        :param generation: The digest of the licences loaded.
+        :param seats: The live seats.
+        :param digests: The digests of the verified licences.
+        :param snapshotTime: The unix time of the snapshot, by default now.
+        """
+        if snapshotTime is None:
+            snapshotTime = time.time()
+        body = bytearray()
+        for seat in seats:
+            for text in (seat.Product, seat.UserName, seat.Host, seat.IpAddress):
+                SeatSnapshot.WriteString(body, text)
+            body += SeatSnapshot.SeatFormat.pack(seat.ExpiryTime)
+        for digest in digests:
+            body += digest
+        mac = self.Sign(snapshotTime, generation, len(seats), len(digests), body)
+        header = SeatSnapshot.HeaderFormat.pack(self.Magic, self.Version, snapshotTime, generation, mac,
+                                                len(seats), len(digests))
+        temporaryName = self.m_FileName + '.tmp'
+        with open(temporaryName, 'wb') as file:
+            file.write(header)
+            file.write(body)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporaryName, self.m_FileName)
+        logging.info('Wrote seat snapshot of ' + str(len(seats)) + ' seat(s) to: \'' + self.m_FileName + '\'',
+                     extra={'EventId': EventId.SeatSnapshotWritten})
+
+    def Read(self, generation: bytes) -> Optional[SnapshotContents]:
+        """
+        Reads the snapshot if it is authentic and was written for the specified licence generation.
+
+        :param generation: The digest of the licences loaded.
+        :returns: The contents of the snapshot, or None if there is no snapshot to trust.
+        """
+        if not os.path.isfile(self.m_FileName) or os.path.getsize(self.m_FileName) < self.HeaderFormat.size:
+            return None
+        with open(self.m_FileName, 'rb') as file, \
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            magic, version, snapshotTime, written, mac, seatCount, digestCount = \
+                SeatSnapshot.HeaderFormat.unpack_from(view, 0)
+            if magic != self.Magic or version != self.Version:
+                logging.warning('Seat snapshot: \'' + self.m_FileName + '\' not recognised.',
+                                extra={'EventId': EventId.SeatSnapshotRejected})
+                return None
+            if written != generation:
+                logging.info('Seat snapshot: \'' + self.m_FileName + '\' is for other licences, not restored.',
+                             extra={'EventId': EventId.SeatSnapshotRejected})
+                return None
+            if not hmac.compare_digest(self.Sign(snapshotTime, written, seatCount, digestCount,
+                                                 view[self.HeaderFormat.size:]), mac):
+                logging.warning('Seat snapshot: \'' + self.m_FileName + '\' is corrupt or not authentic, not restored.',
+                                extra={'EventId': EventId.SeatSnapshotRejected})
+                return None
+            offset = self.HeaderFormat.size
+            seats = []
+            for _ in range(seatCount):
+                texts = []
+                for _ in range(4):
+                    text, offset = SeatSnapshot.ReadString(view, offset)
+                    texts.append(text)
+                expiryTime, = SeatSnapshot.SeatFormat.unpack_from(view, offset)
+                offset += SeatSnapshot.SeatFormat.size
+                seats.append(SnapshotSeat(*texts, expiryTime))
+            digests = set()
+            for _ in range(digestCount):
+                digests.add(bytes(view[offset:offset + SeatSnapshot.DigestSize]))
+                offset += SeatSnapshot.DigestSize
+        return SnapshotContents(snapshotTime, seats, digests)
+
+    def Delete(self) -> None:
+        """
+        Deletes the snapshot, once restored it must not be restored again.
+        """
+        if os.path.isfile(self.m_FileName):
+            os.remove(self.m_FileName)
+
+    def Sign(self, snapshotTime: float, generation: bytes, seatCount: int, digestCount: int, body) -> bytes:
+        """
+        Returns the HMAC of the header fields, seats and digests of a snapshot.
+        """
+        mac = hmac.new(self.m_Key, SeatSnapshot.SignedFormat.pack(self.Magic, self.Version, snapshotTime,
+                                                                   generation, seatCount, digestCount),
+                       hashlib.sha256)
+        mac.update(body)
+        return mac.digest()
+
+    @staticmethod
+    def WriteString(body: bytearray, text: str) -> None:
+        """
+        Appends a length prefixed UTF-8 string.
+        """
+        data = text.encode('utf-8')
+        body += SeatSnapshot.LengthFormat.pack(len(data))
+        body += data
+
+    @staticmethod
+    def ReadString(view, offset: int) -> Tuple[str, int]:
+        """
+        Reads a length prefixed UTF-8 string, returning it and the offset after it.
+        """
+        length, = SeatSnapshot.LengthFormat.unpack_from(view, offset)
+        offset += SeatSnapshot.LengthFormat.size
+        return bytes(view[offset:offset + length]).decode('utf-8'), offset + length
@@ -0,0 +1,290 @@
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple
+from .clsClock import Clock
+import threading
+
+
+class QueueStatistics(NamedTuple):
+    """
+    The wait queue of a product. Depth is the number of clients waiting and
+    Reserved the seats held for granted clients to claim, Granted, Claimed and
+    Expired count the reservations made, taken up and let lapse, Dropped the
+    clients that stopped waiting, and MeanWait the time, in seconds, from
+    joining the queue to being granted a seat.
+    """
+    Depth: int
+    Reserved: int
+    MaximumDepth: int
+    Enqueued: int
+    Granted: int
+    Claimed: int
+    Expired: int
+    Dropped: int
+    MeanWait: float
+
+
+class SeatWaitQueue:
+    """
+    First in, first out queue, per product, of the clients denied a seat.
+
+    Rather than polling with seat requests, a denied client joins the queue
+    and waits to be notified. When a seat is released, or a stale seat is
+    reaped, the licence manager grants it to the client at the head of the
+    queue, which is notified, and the seat is reserved for it for the claim
+    window, so a client that has not queued cannot take it first. A
+    reservation not claimed within the window lapses and the seat is granted
+    to the next client. A client must ask again within the waiter timeout to
+    keep its place, so clients that have gone away leave the queue.
+    """
+    m_ClaimWindow = 10.0
+    m_WaiterTimeout = 30.0
+
+    @property
+    def ClaimWindow(self) -> float:
+        """
+        Gets the time, in seconds, a seat granted to a waiting client is reserved for it.
+
+        :returns: The claim window.
+        """
+        return self.m_ClaimWindow
+
+    @property
+    def WaiterTimeout(self) -> float:
+        """
+        Gets the time, in seconds, a waiting client keeps its place without asking again.
+
+        :returns: The waiter timeout.
+        """
+        return self.m_WaiterTimeout
+
+    @property
+    def Depth(self) -> int:
+        """
+        Gets the number of clients waiting, for every product.
+
+        :returns: The number of clients waiting.
+        """
+        with self.m_Lock:
+            return sum(1 for waiters in self.m_Waiters.values() for w in waiters.values() if w.ClaimDeadline is None)
+
+    @property
+    def Statistics(self) -> Dict[str, QueueStatistics]:
+        """
+        Gets the wait queue of each product a client has waited for.
+
+        :returns: A dictionary of product name to its statistics.
+        """
+        nowTime = self.m_Clock.Monotonic()
+        with self.m_Lock:
+            statistics = {}
+            for product, values in self.m_Statistics.items():
+                waiters = self.m_Waiters.get(product, {}).values()
+                depth = sum(1 for w in waiters if w.ClaimDeadline is None)
+                reserved = sum(1 for w in waiters if w.ClaimDeadline is not None and w.ClaimDeadline > nowTime)
+                statistics[product] = QueueStatistics(depth, reserved, *values[:6],
+                                                      values[6] / values[2] if values[2] else 0.0)
+            return statistics
+
+    def __init__(self, claimWindow: float = 10.0, waiterTimeout: float = 30.0, clock: Clock = None):
+        """
+        Initializes an empty queue.
+
+        :param claimWindow: The time, in seconds, a seat granted to a waiting client is reserved for it.
+        :param waiterTimeout: The time, in seconds, a waiting client keeps its place without asking again.
+        :param clock: The time source of the reservations, by default the system clock.
+        """
+        self.m_ClaimWindow = claimWindow
+        self.m_WaiterTimeout = waiterTimeout
+        self.m_Clock = clock or Clock()
+        self.m_Lock = threading.Lock()
+        self.m_Waiters: Dict[str, OrderedDict] = {}
+        self.m_Statistics: Dict[str, list] = {}
+
+    def Enqueue(self, product: str, userName: str, ipAddress: str) -> 'SeatWaiter':
+        """
+        Adds a client to the end of the queue of the product, a client already queued keeps its place.
+
+        :param product: The name of the product.
+        :param userName: The user name of the client.
+        :param ipAddress: The IP Address of the client.
+        :returns: The waiting client, to wait on.
+        """
+        product = product.lower()
+        nowTime = self.m_Clock.Monotonic()
+        with self.m_Lock:
+            waiters = self.m_Waiters.setdefault(product, OrderedDict())
+            statistics = self.GetStatistics(product)
+            waiter = waiters.get((userName, ipAddress))
+            if waiter is None:
+                waiter = SeatWaiter(product, userName, ipAddress, nowTime)
+                waiters[(userName, ipAddress)] = waiter
+                statistics[1] += 1
+                statistics[0] = max(statistics[0], sum(1 for w in waiters.values() if w.ClaimDeadline is None))
+            waiter.LastSeen = nowTime
+            return waiter
+
+    def Position(self, waiter: 'SeatWaiter') -> int:
+        """
+        Returns the place of a client in the queue of its product.
+
+        :param waiter: The waiting client.
+        :returns: The place of the client, from 1, 0 if it has been granted a seat or is not queued.
+        """
+        with self.m_Lock:
+            position = 0
+            for w in self.m_Waiters.get(waiter.Product, {}).values():
+                if w.ClaimDeadline is None:
+                    position += 1
+                    if w is waiter:
+                        return position
+            return 0
+
+    @staticmethod
+    def Wait(waiter: 'SeatWaiter', timeout: float) -> bool:
+        """
+        Blocks until the client is granted a seat or the timeout passes.
+
+        :param waiter: The waiting client.
+        :param timeout: The longest time, in seconds, to wait.
+        :returns: True if the client has been granted a seat, otherwise false.
+        """
+        return waiter.Granted.wait(max(0.0, timeout))
+
+    def HasWaiters(self, product: str) -> bool:
+        """
+        Returns if a client is waiting for a seat of the product, without taking the lock of the queue.
+
+        :param product: The name of the product.
+        :returns: True if a client is waiting or holds a reservation, otherwise false.
+        """
+        return bool(self.m_Waiters.get(product.lower()))
+
+    def Products(self) -> List[str]:
+        """
+        Returns the products clients are waiting for. Lapsed reservations, clients that have stopped
+        asking, and the queues left empty, are removed first, so they do not wait on a grant.
+
+        :returns: The names of the products, in lower case.
+        """
+        nowTime = self.m_Clock.Monotonic()
+        with self.m_Lock:
+            for product, waiters in list(self.m_Waiters.items()):
+                self.Prune(product, waiters, nowTime)
+                if not waiters:
+                    del self.m_Waiters[product]
+            return list(self.m_Waiters)
+
+    def Grant(self, product: str, seats: int) -> int:
+        """
+        Reserves free seats for the clients at the head of the queue and notifies them. Lapsed
+        reservations, and clients that have stopped asking, are removed first. Called under
+        the product lock of the licence manager.
+
+        :param product: The name of the product.
+        :param seats: The number of seats free, not counting the seats already reserved.
+        :returns: The number of seats granted.
+        """
+        product = product.lower()
+        nowTime = self.m_Clock.Monotonic()
+        granted = 0
+        with self.m_Lock:
+            waiters = self.m_Waiters.get(product)
+            if not waiters:
+                return 0
+            statistics = self.Prune(product, waiters, nowTime)
+            for waiter in waiters.values():
+                if granted >= seats:
+                    break
+                if waiter.ClaimDeadline is None:
+                    waiter.ClaimDeadline = nowTime + self.m_ClaimWindow
+                    waiter.Granted.set()
+                    statistics[2] += 1
+                    statistics[6] += nowTime - waiter.EnqueueTime
+                    granted += 1
+        return granted
+
+    def Reserved(self, product: str, userName: str = None, ipAddress: str = None) -> int:
+        """
+        Returns the number of seats of the product reserved for clients to claim.
+
+        :param product: The name of the product.
+        :param userName: The user name of a client whose own reservation is not counted.
+        :param ipAddress: The IP Address of a client whose own reservation is not counted.
+        :returns: The number of seats reserved.
+        """
+        nowTime = self.m_Clock.Monotonic()
+        with self.m_Lock:
+            return sum(1 for key, w in self.m_Waiters.get(product.lower(), {}).items()
+                       if w.ClaimDeadline is not None and w.ClaimDeadline > nowTime and key != (userName, ipAddress))
+
+    def Claim(self, product: str, userName: str, ipAddress: str) -> bool:
+        """
+        Removes a client that has taken a seat from the queue, taking up its reservation.
+
+        :param product: The name of the product.
+        :param userName: The user name of the client.
+        :param ipAddress: The IP Address of the client.
+        :returns: True if the client held a reservation, otherwise false.
+        """
+        with self.m_Lock:
+            waiters = self.m_Waiters.get(product.lower())
+            waiter = waiters.pop((userName, ipAddress), None) if waiters else None
+            if waiter is None or waiter.ClaimDeadline is None:
+                return False
+            self.GetStatistics(product.lower())[3] += 1
+            return True
+
+    def Cancel(self, product: str, userName: str, ipAddress: str) -> None:
+        """
+        Removes a client from the queue, releasing its reservation, if any.
+
+        :param product: The name of the product.
+        :param userName: The user name of the client.
+        :param ipAddress: The IP Address of the client.
+        """
+        with self.m_Lock:
+            waiters = self.m_Waiters.get(product.lower())
+            if waiters and waiters.pop((userName, ipAddress), None) is not None:
+                self.GetStatistics(product.lower())[5] += 1
+
+    def Prune(self, product: str, waiters: OrderedDict, nowTime: float) -> list:
+        """
+        Removes the lapsed reservations, and the clients that have stopped asking, from the queue
+        of the product, called with the lock held.
+
+        :returns: The counters of the product.
+        """
+        statistics = self.GetStatistics(product)
+        for key, waiter in list(waiters.items()):
+            if waiter.ClaimDeadline is not None and waiter.ClaimDeadline <= nowTime:
+                del waiters[key]
+                statistics[4] += 1
+            elif waiter.ClaimDeadline is None and waiter.LastSeen + self.m_WaiterTimeout <= nowTime:
+                del waiters[key]
+                statistics[5] += 1
+        return statistics
+
+    def GetStatistics(self, product: str) -> list:
+        """
+        Returns the counters of the product, called with the lock held: most waiting, enqueued,
+        granted, claimed, expired, dropped and total wait.
+        """
+        return self.m_Statistics.setdefault(product, [0, 0, 0, 0, 0, 0, 0.0])
+
+
+# Private SeatWaiter (helper) class
+
+class SeatWaiter:
+    """
+    A client waiting for a seat, granted once its claim deadline is set.
+    """
+    __slots__ = ('Product', 'UserName', 'IpAddress', 'EnqueueTime', 'LastSeen', 'ClaimDeadline', 'Granted')
+
+    def __init__(self, product: str, userName: str, ipAddress: str, enqueueTime: float):
+        self.Product = product
+        self.UserName = userName
+        self.IpAddress = ipAddress
+        self.EnqueueTime = enqueueTime
+        self.LastSeen = enqueueTime
+        self.ClaimDeadline = None
+        self.Granted = threading.Event()
@@ -0,0 +1,969 @@
+from .clsStorage import Storage, LicenceRecord, ConnectionRecord, SeatOperation
+from .clsDatabaseSchema import Database, DatabaseSchema
+from .clsQueryProfiler import QueryProfiler, ProfiledConnection
+from contextlib import contextmanager
+from .MessageType import MessageType
+from .EventId import EventId
+from datetime import datetime
+from typing import Dict, List
+import threading
+import logging
+import sqlite3
+import os
+
+
+class SqliteStorage(Storage):
+    """
+    Storage backed by an SQLite database file, optionally held in memory
+    and snapshotted to the database file.
+
+    Licences and seats reference their product by an integer id from the product
+    table. Product rows are never deleted, so the id of each product name is read
+    once and then resolved from an in memory map.
+    """
+    BusyTimeout = 30
+    SupportsReturning = sqlite3.sqlite_version_info >= (3, 35, 0)
+    """
+    DELETE ... RETURNING needs SQLite 3.35, older libraries select the rows and then delete them
+    """
+
+    m_FileName = ""
+    m_InMemory = False
+    m_SnapshotInterval = 60
+    m_MemoryConnection = None
+    m_Profiler = None
+
+    @property
+    def FileName(self) -> str:
+        """
+        Gets the full path to the database file.
+
+        :returns: The full path to the database file.
+        """
+        return self.m_FileName
+
+    @property
+    def InMemory(self) -> bool:
+        """
+        Gets a value to indicate if the database is held in memory.
+
+        :returns: True if the database is held in memory, otherwise false.
+        """
+        return self.m_InMemory
+
+    @property
+    def Profiler(self) -> QueryProfiler:
+        """
+        Gets the profiler every SQL statement is timed by, None if statements are not profiled.
+
+        :returns: The query profiler.
+        """
+        return self.m_Profiler
+
+    @Profiler.setter
+    def Profiler(self, value: QueryProfiler) -> None:
+        """
+        Sets the profiler every SQL statement is timed by, from the next connection opened.
+
+        :param value: The query profiler, or None to stop profiling statements.
+        """
+        self.m_Profiler = value
+
+    def __init__(self, fileName: str, inMemory: bool = False, snapshotInterval: int = 60):
+        """
+        Initializes the storage with the specified database file.
+
+        :param fileName: The full path to the database file.
+        :param inMemory: True to hold the database in memory and snapshot it to the database file.
+        :param snapshotInterval: The interval, in seconds, between snapshots when held in memory.
+        """
+        self.m_FileName = fileName
+        self.m_InMemory = inMemory
+        self.m_SnapshotInterval = snapshotInterval
+        self.m_MemoryLock = threading.RLock()
+        self.m_SnapshotStop = threading.Event()
+        self.m_SnapshotThread = None
+        self.m_ProductIds: Dict[str, int] = {}
+
+    def Open(self) -> None:
+        """
+        Restores the in memory database, if used, and creates the database schema.
+        """
+        if self.m_InMemory:
+            self.RestoreSnapshot()
+        self.CreateDatabase()
+        if self.m_InMemory and self.m_SnapshotInterval > 0:
+            self.m_SnapshotThread = threading.Thread(target=self.SnapshotLoop, name='SnapshotThread', daemon=True)
+            self.m_SnapshotThread.start()
+
+    def Close(self) -> None:
+        """
+        Stops the snapshot thread and, if the database is held in memory,
+        writes a final snapshot to the database file.
+        """
+        self.m_SnapshotStop.set()
+        if self.m_SnapshotThread is not None:
+            self.m_SnapshotThread.join()
+            self.m_SnapshotThread = None
+        self.SaveSnapshot()
+
+    @contextmanager
+    def OpenConnection(self):
+        """
+        Opens a connection to the database for the duration of a with block.
+        When the database is held in memory the shared connection is returned
+        and access is serialized, otherwise a new connection to the database file is
+        opened and closed when the block exits.
+
+        :returns: A context manager yielding a database connection.
+        """
+        if self.m_MemoryConnection is not None:
+            with self.m_MemoryLock:
+                self.m_MemoryConnection.Profiler = self.m_Profiler
+                try:
+                    yield self.m_MemoryConnection
+                except Exception:
+                    self.m_MemoryConnection.rollback()
+                    raise
+            return
+        connection = sqlite3.connect(self.m_FileName, timeout=self.BusyTimeout, factory=ProfiledConnection)
+        connection.Profiler = self.m_Profiler
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def RestoreSnapshot(self) -> None:
+        """
+        Creates the in memory database and restores it from the database file,
+        if one exists, using the SQLite backup API.
+        """
+        self.m_MemoryConnection = sqlite3.connect(':memory:', check_same_thread=False, factory=ProfiledConnection)
+        if not os.path.isfile(self.m_FileName):
+            return
+        try:
+            source = sqlite3.connect(self.m_FileName)
+            try:
+                source.backup(self.m_MemoryConnection)
+            finally:
+                source.close()
+        except Exception as ex:
+            logging.critical('RestoreSnapshot failed: ' + str(ex), extra={'EventId': EventId.DatabaseSnapshotSQLError})
+            raise ex
+        logging.info('Restored snapshot from: \'' + self.m_FileName + '\'',
+                     extra={'EventId': EventId.DatabaseSnapshotRestored})
+
+    def SaveSnapshot(self) -> None:
+        """
+        Copies the in memory database to the database file using the SQLite backup API.
+        Does nothing if the database is held on disk.
+        """
+        if self.m_MemoryConnection is None:
+            return
+        try:
+            target = sqlite3.connect(self.m_FileName)
+            try:
+                with self.m_MemoryLock:
+                    self.m_MemoryConnection.backup(target)
+            finally:
+                target.close()
+        except Exception as ex:
+            logging.critical('SaveSnapshot failed: ' + str(ex), extra={'EventId': EventId.DatabaseSnapshotSQLError})
+            raise ex
+        logging.debug('Saved snapshot to: \'' + self.m_FileName + '\'')
+
+    def SnapshotLoop(self) -> None:
+        """
+        Writes a snapshot of the in memory database every snapshot interval until closed.
+        """
+        while not self.m_SnapshotStop.wait(self.m_SnapshotInterval):
+            try:
+                self.SaveSnapshot()
+            except Exception:
+                # Already logged, we will try again next interval...
+                pass
+
+    def Analyze(self) -> None:
+        """
+        Runs the ANALYZE command on the database.
+        """
+        commandText = "ANALYZE;"
+        try:
+            with self.OpenConnection() as connection:
+                connection.execute(commandText)
+                connection.commit()
+        except Exception as ex:
+            logging.critical(str(ex), extra={'EventId': EventId.AnalyseSQLError})
+            logging.critical('AnalyzeDatabase SQL Command: \'' + commandText + '\'')
+            raise ex
+        finally:
+            logging.debug('AnalyzeDatabase SQL Command: \'' + commandText + '\'')
+
+    def Vacuum(self) -> None:
+        """
+        Runs the VACUUM command on the database.
+        """
+        commandText = "VACUUM;"
+        try:
+            with self.OpenConnection() as connection:
+                connection.execute(commandText)
+                connection.commit()
+        except Exception as ex:
+            logging.critical(str(ex), extra={'EventId': EventId.VacuumSQLError})
+            logging.critical('VacuumDatabase SQL Command: \'' + commandText + '\'')
+            raise ex
+        finally:
+            logging.debug('VacuumDatabase SQL Command: \'' + commandText + '\'')
+
+    def CreateDatabase(self) -> None:
+        """
+        Creates the licence manager database schema.
+        """
+        sql_ProductSchema = DatabaseSchema.GetProductSchema()
+        sql_LicenceSchema = DatabaseSchema.GetLicenceSchema()
+        sql_ConnectionSchema = DatabaseSchema.GetConnectionSchema()
+        sql_SiteLogSchema = DatabaseSchema.GetSiteLogSchema()
+
+        sbSQL = ""
+        sbSQL += "INSERT INTO " + Database.SqlTableSiteLog + " "
+        sbSQL += "(" + Database.SqlFieldInstallDate + ", "
+        sbSQL += Database.SqlFieldVersion + ", "
+        sbSQL += Database.SqlFieldNotes + ", "
+        sbSQL += Database.SqlFieldReleaseDate + ") "
+        sbSQL += "VALUES (" + "?" + ", "
+        sbSQL += "?" + ", "
+        sbSQL += "?" + ", "
+        sbSQL += "?" + "); "
+        parameters = (
+            datetime.now(),
+            Database.Version,
+            "Version " + str(Database.Version) + " installed",
+            datetime.strptime(Database.ReleaseDate, "%d/%b/%Y %H:%M")
+        )
+        sbParameters = Database.ParameterLoggingSeparator.join([str(p) for p in parameters])
+
+        try:
+            with self.OpenConnection() as connection:
+                cursor = connection.cursor()
+                cursor.executescript(sql_ProductSchema)
+                try:
+                    cursor.executescript(sql_LicenceSchema)
+                except sqlite3.OperationalError:
+                    logging.debug('Table \'licence\' already exists')
+                columns = [row[1] for row in cursor.execute("PRAGMA table_info(" + Database.SqlTableLicence + ");")]
+                if Database.SqlTableProduct + Database.SqlFieldForeignKeyId not in columns:
+                    cursor.executescript(DatabaseSchema.GetLicenceProductUpgrade())
+                    logging.info('Upgraded table \'licence\' with product id',
+                                 extra={'EventId': EventId.DatabaseSchemaUpgraded})
+                try:
+                    cursor.executescript(sql_ConnectionSchema)
+                except sqlite3.OperationalError:
+                    logging.debug('Table \'connection\' already exists')
+                columns = [row[1] for row in cursor.execute("PRAGMA table_info(" + Database.SqlTableConnection + ");")]
+                if Database.SqlFieldExpiryTime not in columns:
+                    cursor.executescript(DatabaseSchema.GetConnectionExpiryUpgrade())
+                    logging.info('Upgraded table \'connection\' with seat expiry time',
+                                 extra={'EventId': EventId.DatabaseSchemaUpgraded})
+                if Database.SqlTableProduct + Database.SqlFieldForeignKeyId not in columns:
+                    cursor.executescript(DatabaseSchema.GetConnectionProductUpgrade())
+                    logging.info('Upgraded table \'connection\' with product id',
+                                 extra={'EventId': EventId.DatabaseSchemaUpgraded})
+                try:
+                    cursor.executescript(sql_SiteLogSchema)
+                    cursor.execute(sbSQL, parameters)
+                except sqlite3.OperationalError:
+                    logging.debug('Table \'site_log\' already exists')
+                connection.commit()
+        except Exception as ex:
+            logging.critical(str(ex), extra={'EventId': EventId.CreateDatabaseSQLError})
+            logging.critical('CreateDatabase SQL Command: \'' + sbSQL + '\'')
+            logging.critical('CreateDatabase SQL Parameters: \'' + sbParameters + '\'')
+            raise ex
+        finally:
+            logging.debug('CreateDatabase SQL Command 1: \'' + sql_ProductSchema + '\'')
+            logging.debug('CreateDatabase SQL Command 2: \'' + sql_LicenceSchema + '\'')
+            logging.debug('CreateDatabase SQL Command 3: \'' + sql_ConnectionSchema + '\'')
+            logging.debug('CreateDatabase SQL Command 4: \'' + sql_SiteLogSchema + '\'')
+            logging.debug('CreateDatabase SQL Command 5: \'' + sbSQL + '\'')
+            logging.debug('CreateDatabase SQL Parameters: \'' + sbParameters + '\'')
+
+    def GetProductId(self, connection: sqlite3.Connection, product: str, create: bool = False) -> int:
+        """
+        Returns the id of the product, from the in memory map once it has been read.
+        A product created here is committed at once, so must not be created within a
+        transaction that may be rolled back.
+
+        :param connection: The open database connection, outside of any transaction.
+        :param product: The name of the product, in any case.
+        :param create: True to add the product to the product table if it is not there.
+        :returns: The id of the product, None if it is not in the product table.
+        """
+        name = product.lower()
+        productId = self.m_ProductIds.get(name)
+        if productId is not None:
+            return productId
+        sbSQL = ""
+        try:
+            if create:
+                sbSQL = "INSERT OR IGNORE INTO " + Database.SqlTableProduct + "(" + Database.SqlFieldName + ") "
+                sbSQL += "VALUES (?);"
+                connection.execute(sbSQL, (name,))
+                connection.commit()
+            sbSQL = "SELECT " + Database.SqlFieldId + " "
+            sbSQL += "FROM " + Database.SqlTableProduct + " "
+            sbSQL += "WHERE " + Database.SqlFieldName + " = ?;"
+            row = connection.execute(sbSQL, (name,)).fetchone()
+        except Exception as ex:
+            logging.critical(str(ex), extra={'EventId': EventId.GetProductsSQLError})
+            logging.critical('GetProductId SQL Command: \'' + sbSQL + '\'')
+            logging.critical('GetProductId SQL Parameters: \'0: ' + name + '\'')
+            raise ex
+        if row is None:
+            return None
+        self.m_ProductIds[name] = row[0]
+        return row[0]
+
+    def LoadLicences(self, licences: List[LicenceRecord]) -> int:
+        """
+        Adds the specified licences, ignoring any already loaded (by timestamp),
+        and removes any licence that is not in the specified list.
+
+        :param licences: The verified licences to load.
+        :returns: The number of licences processed.
+        """
+        sbSQL = ""
+        sbSQL += "INSERT OR IGNORE INTO " + Database.SqlTableLicence + "( "
+        sbSQL += Database.SqlFieldCompany + ", "
+        sbSQL += Database.SqlFieldProduct + ", "
+        sbSQL += Database.SqlFieldCustomer + ", "
+        sbSQL += Database.SqlFieldReference + ", "
+        sbSQL += Database.SqlFieldReseller + ", "
+        sbSQL += Database.SqlFieldNumberOfSeats + ", "
+        sbSQL += Database.SqlFieldStartDate + ", "
+        sbSQL += Database.SqlFieldExpiryDate + ", "
+        sbSQL += Database.SqlFieldTimeStamp + ", "
+        sbSQL += Database.SqlFieldCode + ", "
+        sbSQL += Database.SqlFieldVersion + ", "
+        sbSQL += Database.SqlFieldNotes + ", "
+        sbSQL += Database.SqlTableProduct + Database.SqlFieldForeignKeyId + ") "
+        sbSQL += "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);"
+        sbParameters = ""
+
+        count = 0
+        try:
+            with self.OpenConnection() as connection:
+                productIds = {lic.Product: self.GetProductId(connection, lic.Product, True) for lic in licences}
+                cursor = connection.cursor()
+                for lic in licences:
+                    parameters = tuple(lic[1:]) + (productIds[lic.Product],)
+                    sbParameters = Database.ParameterLoggingSeparator.join(
+                        [str(i) + ': ' + str(p) for i, p in enumerate(parameters)]
+                    )
+                    cursor.execute(sbSQL, parameters)
+                    count += 1
+                    logging.debug('LoadLicences SQL Command: \'' + sbSQL + '\'')
+                    logging.debug('LoadLicences SQL Parameters: \'' + sbParameters + '\'')
+                sbSQL = "DELETE FROM " + Database.SqlTableLicence
+                if len(licences) > 0:
+                    sbSQL += " "
+                    sbSQL += "WHERE " + Database.SqlFieldTimeStamp + " "
+                    sbSQL += "NOT IN ("
+                    sbSQL += ",".join([str(int(lic.TimeStamp)) for lic in licences])
+                    sbSQL += ")"
+                sbSQL += ";"
+                cursor.execute(sbSQL)
+                connection.commit()
+        except Exception as ex:
+            logging.critical(str(ex), extra={'EventId': EventId.LoadLicenceSQLError})
+            logging.critical('LoadLicences SQL Command: \'' + sbSQL + '\'')
+            logging.critical('LoadLicences SQL Parameters: \'' + sbParameters + '\'')
+            raise ex
+        return count
+
+    def GetLicences(self, product: str) -> List[LicenceRecord]:
+        """
+        Returns the licences for the specified product, latest timestamp first.
+
+        :param product: The name of the product to get the licences for.
+        :returns: The licences for the product.
+        """
+        sbSQL = ""
+        sbSQL += "SELECT " + Database.SqlFieldId + ", "
+        sbSQL += Database.SqlFieldCompany + ", "
+        sbSQL += Database.SqlFieldProduct + ", "
+        sbSQL += Database.SqlFieldCustomer + ", "
+        sbSQL += Database.SqlFieldReference + ", "
+        sbSQL += Database.SqlFieldReseller + ", "
+        sbSQL += Database.SqlFieldNumberOfSeats + ", "
+        sbSQL += Database.SqlFieldStartDate + ", "
+        sbSQL += Database.SqlFieldExpiryDate + ", "
+        sbSQL += Database.SqlFieldTimeStamp + ", "
+        sbSQL += Database.SqlFieldCode + ", "
+        sbSQL += Database.SqlFieldVersion + ", "
+        sbSQL += Database.SqlFieldNotes + " "
+        sbSQL += "FROM " + Database.SqlTableLicence + " "
+        sbSQL += "WHERE " + Database.SqlTableProduct + Database.SqlFieldForeignKeyId + " = "
+        sbSQL += "?" + " "
+        # We will ensure that licences are read latest to earliest,
+        # to ensure that only the latest perpetual licence is used...
+        sbSQL += "ORDER BY " + Database.SqlFieldTimeStamp + " DESC;"
+        sbParameters = '0: ' + product.lower()
+
+        try:
+            with self.OpenConnection() as connection:
+                productId = self.GetProductId(connection, product)
+                if productId is None:
+                    return []
+                rows = connection.execute(sbSQL, (productId,)).fetchall()
+        except Exception as ex:
+            logging.critical(str(ex), extra={'EventId': EventId.GetLicenceDetailsSQLError})
+            logging.critical('GetLicences SQL Command: \'' + sbSQL + '\'')
+            logging.critical('GetLicences SQL Parameters: \'' + sbParameters + '\'')
+            raise ex
+        finally:
+            logging.debug('GetLicences SQL Command: \'' + sbSQL + '\'')
+            logging.debug('GetLicences SQL Parameters: \'' + sbParameters + '\'')
+        return [LicenceRecord(*row) for row in rows]
+
+    def GetProducts(self) -> List[str]:
+        """
+        Returns the names of the licensed products in ascending order.
+
+        :returns: The names of the licensed products.
+        """
+        sbSQL = ""
+        sbSQL += "SELECT " + Database.SqlFieldProduct + " "
+        sbSQL += "FROM " + Database.SqlTableLicence + " "
+        sbSQL += "GROUP BY " + Database.SqlFieldProduct + " "
+        sbSQL += "ORDER BY " + Database.SqlFieldProduct + " ASC;"
+
+        try:
+            with self.OpenConnection() as connection:
+                rows = connection.execute(sbSQL).fetchall()
+        except Exception as ex:
+            logging.critical(str(ex), extra={'EventId': EventId.GetProductsSQLError})
+            logging.critical('GetProducts SQL Command: \'' + sbSQL + '\'')
+            raise
+        finally:
+            logging.debug('GetProducts SQL Command: \'' + sbSQL + '\'')
+        return [row[0] for row in rows]
+
+    def TakeSeat(self, product: str, ipAddress: str, userName: str, host: str,
+                 licenceSeats: list, nowTime: datetime, expiryTime: datetime) -> int:
+        """
+        Atomically counts the live seats for the product, excluding the caller's own
+        seat, and if one is free takes (or re-takes) the seat against a licence.
+
+        :param product: The name of the product to take the seat for.
+        :param ipAddress: The IP Address to take the seat for.
+        :param userName: The user name to take the seat for.
+        :param host: The host to take the seat for.
+        :param licenceSeats: The active licences for the product (LicenceSeatStructure), sorted.
+        :param nowTime: The time the seat is taken, seats expired by this time are not counted.
+        :param expiryTime: The time the seat expires unless refreshed.
+        :returns: The id of the seat if taken, otherwise 0.
+        """
+        with self.OpenConnection() as connection:
+            productId = self.GetProductId(connection, product)
+            if productId is None:
+                return 0
+            cursor = connection.cursor()
+            # Take the write lock before counting so no other connection
+            # can insert a seat between the count and the insert...
+            cursor.execute("BEGIN IMMEDIATE;")
+            takenSeat = self.TakeSeatCommand(cursor, productId, ipAddress, userName, host,
+                                             licenceSeats, nowTime, expiryTime)
+            if takenSeat:
+                connection.commit()
+            else:
+                connection.rollback()
+        return takenSeat
+
+    def TakeSeatCommand(self, cursor: sqlite3.Cursor, productId: int, ipAddress: str, userName: str, host: str,
+                        licenceSeats: list, nowTime: datetime, expiryTime: datetime) -> int:
+        """
+        Takes a seat within the open transaction of the cursor, see TakeSeat.
+        The seat is taken for the product with the specified id, see GetProductId.
+        The caller commits the transaction.
+        """
+        totalSeats = sum(ls.Seats for ls in licenceSeats)
+        loggingCount = 1
+        sbSQL = "SELECT COUNT (*) "
+        sbSQL += "FROM " + Database.SqlTableConnection + " "
+        sbSQL += "WHERE ( " + Database.SqlTableProduct + Database.SqlFieldForeignKeyId + " = "
+        sbSQL += "?" + " "
+        sbSQL += "AND " + Database.SqlFieldExpiryTime + " > "
+        sbSQL += "?" + ") "
+        sbSQL += "AND NOT (" + Database.SqlFieldUserName + " = "
+        sbSQL += "?" + " "
+        sbSQL += "AND " + Database.SqlFieldIpAddress + " = "
+        sbSQL += "?" + ");"
+        parameters = (productId, nowTime, userName, ipAddress)
+        sbParameters = Database.ParameterLoggingSeparator.join(
+            [str(i) + ': ' + str(p) for i, p in enumerate(parameters)]
+        )
+        try:
+            cursor.execute(sbSQL, parameters)
+            takenSeats = cursor.fetchone()[0]
+            logging.debug('TakeSeat SQL Command #' + str(loggingCount) + ': \'' + sbSQL + '\'')
+            logging.debug('TakeSeat SQL Parameters #' + str(loggingCount) + ': \'' + sbParameters + '\'')
+
+            if takenSeats >= totalSeats:
+                return 0
+            licenceId = licenceSeats[0].LicenceID
+            if len(licenceSeats) > 1:
+                sbSQL = "SELECT COUNT(*) "
+                sbSQL += "FROM " + Database.SqlTableConnection + " "
+                sbSQL += "WHERE (" + Database.SqlTableLicence + Database.SqlFieldForeignKeyId + " = "
+                sbSQL += "?" + " "
+                sbSQL += "AND " + Database.SqlFieldExpiryTime + " > "
+                sbSQL += "?" + ") "
+                sbSQL += "AND NOT (" + Database.SqlFieldUserName + " = "
+                sbSQL += "?" + " "
+                sbSQL += "AND " + Database.SqlFieldIpAddress + " = "
+                sbSQL += "?" + ");"
+                for ls in licenceSeats:
+                    parameters = (ls.LicenceID, nowTime, userName, ipAddress)
+                    sbParameters = Database.ParameterLoggingSeparator.join(
+                        [str(i) + ': ' + str(p) for i, p in enumerate(parameters)]
+                    )
+                    cursor.execute(sbSQL, parameters)
+                    takenSeats = cursor.fetchone()[0]
+
+                    loggingCount += 1
+                    logging.debug('TakeSeat SQL Command #' + str(loggingCount) + ': \'' + sbSQL + '\'')
+                    logging.debug('TakeSeat SQL Parameters #' + str(loggingCount) + ': \'' + sbParameters + '\'')
+
+                    if takenSeats < ls.Seats:
+                        licenceId = ls.LicenceID
+
+            # The seat is updated by its id if the user already has one, otherwise inserted...
+            seatId = self.FindSeatCommand(cursor, productId, ipAddress, userName)
+            if seatId:
+                sbSQL = "UPDATE " + Database.SqlTableConnection + " "
+                sbSQL += "SET " + Database.SqlFieldMachineName + " = "
+                sbSQL += "?" + ", "
+                sbSQL += Database.SqlFieldUpdateTime + " = "
+                sbSQL += "?" + ", "
+                sbSQL += Database.SqlFieldExpiryTime + " = "
+                sbSQL += "?" + ", "
+                sbSQL += Database.SqlTableLicence + Database.SqlFieldForeignKeyId + " = "
+                sbSQL += "?" + " "
+                sbSQL += "WHERE " + Database.SqlFieldId + " = "
+                sbSQL += "?" + ";"
+                parameters = (host, nowTime, expiryTime, licenceId, seatId)
+            else:
+                sbSQL = "INSERT INTO " + Database.SqlTableConnection + "( "
+                sbSQL += Database.SqlTableProduct + Database.SqlFieldForeignKeyId + ", "
+                sbSQL += Database.SqlFieldUserName + ", "
+                sbSQL += Database.SqlFieldIpAddress + ", "
+                sbSQL += Database.SqlFieldMachineName + ", "
+                sbSQL += Database.SqlFieldLogonTime + ", "
+                sbSQL += Database.SqlFieldUpdateTime + ", "
+                sbSQL += Database.SqlFieldExpiryTime + ", "
+                sbSQL += Database.SqlTableLicence + Database.SqlFieldForeignKeyId + ") "
+                sbSQL += "VALUES (?, ?, ?, ?, ?, ?, ?, ?); "
+                parameters = (productId, userName, ipAddress, host, nowTime, nowTime, expiryTime, licenceId)
+            sbParameters = Database.ParameterLoggingSeparator.join(
+                [str(i) + ': ' + str(p) for i, p in enumerate(parameters)]
+            )
+            loggingCount += 1
+            logging.debug('TakeSeat SQL Command #' + str(loggingCount) + ': \'' + sbSQL + '\'')
+            logging.debug('TakeSeat SQL Parameters #' + str(loggingCount) + ': \'' + sbParameters + '\'')
+            cursor.execute(sbSQL, parameters)
+            if not seatId:
+                seatId = cursor.lastrowid
+        except Exception as ex:
+            logging.critical(str(ex), extra={'EventId': EventId.TakeSeatSQLError})
+            logging.critical('TakeSeat SQL Command: \'' + sbSQL + '\'')
+            logging.critical('TakeSeat SQL Parameters: \'' + sbParameters + '\'')
+            raise ex
+        return seatId
+
+    def FindSeatCommand(self, cursor: sqlite3.Cursor, productId: int, ipAddress: str, userName: str) -> int:
+        """
+        Returns the id of the seat of the user, within the open transaction of the cursor.
+
+        :returns: The id of the seat, 0 if the user has no seat.
+        """
+        sbSQL = ""
+        sbSQL += "SELECT " + Database.SqlFieldId + " "
+        sbSQL += "FROM " + Database.SqlTableConnection + " "
+        sbSQL += "WHERE " + Database.SqlTableProduct + Database.SqlFieldForeignKeyId + " = "
+        sbSQL += "?" + " "
+        sbSQL += "AND " + Database.SqlFieldUserName + " = "
+        sbSQL += "?" + " "
+        sbSQL += "AND " + Database.SqlFieldIpAddress + " = "
+        sbSQL += "?" + ";"
+        parameters = (productId, userName, ipAddress)
+        sbParameters = Database.ParameterLoggingSeparator.join(
+            [str(i) + ': ' + str(p) for i, p in enumerate(parameters)]
+        )
+
+        try:
+            row = cursor.execute(sbSQL, parameters).fetchone()
+        except Exception as ex:
+            logging.critical(str(ex), extra={'EventId': EventId.RefreshSeatSQLError})
+            logging.critical('FindSeat SQL Command: \'' + sbSQL + '\'')
+            logging.critical('FindSeat SQL Parameters: \'' + sbParameters + '\'')
+            raise ex
+        finally:
+            logging.debug('FindSeat SQL Command: \'' + sbSQL + '\'')
+            logging.debug('FindSeat SQL Parameters: \'' + sbParameters + '\'')
+        return row[0] if row is not None else 0
+
+    def RefreshSeat(self, product: str, ipAddress: str, userName: str, host: str,
+                    nowTime: datetime, expiryTime: datetime, seatId: int = None) -> int:
+        """
+        Sets the update and expiry time of the seat, creating the seat if it does not exist.
+        Only loading licences adds a product, so a seat of a product not in the product table is not refreshed.
+
+        :param product: The name of the product to refresh the seat for.
+        :param ipAddress: The IP Address to refresh the seat for.
+        :param userName: The user name to refresh the seat for.
+        :param host: The host to refresh the seat for.
+        :param nowTime: The update time.
+        :param expiryTime: The time the seat expires unless refreshed again.
+        :param seatId: The id returned when the seat was taken, None if not known.
+        :returns: The id of the seat, 0 if the product is not in the product table.
+        """
+        with self.OpenConnection() as connection:
+            productId = self.GetProductId(connection, product)
+            if productId is None:
+                return 0
+            cursor = connection.cursor()
+            cursor.execute("BEGIN IMMEDIATE;")
+            seatId = self.RefreshSeatCommand(cursor, productId, ipAddress, userName, host, nowTime, expiryTime, seatId)
+            connection.commit()
+        return seatId
+
+    def RefreshSeatCommand(self, cursor: sqlite3.Cursor, productId: int, ipAddress: str, userName: str, host: str,
+                           nowTime: datetime, expiryTime: datetime, seatId: int = None) -> int:
+        """
+        Refreshes a seat within the open transaction of the cursor, see RefreshSeat.
+        The seat is refreshed for the product with the specified id, see GetProductId.
+        With a seat id the seat is updated by its primary key, otherwise it is found by the
+        product, user name and IP Address, and inserted only if it does not exist.
+        The caller commits the transaction.
+        """
+        sbSQL = ""
+        sbSQL += "UPDATE " + Database.SqlTableConnection + " "
+        sbSQL += "SET " + Database.SqlFieldUpdateTime + " = "
+        sbSQL += "?" + ", "
+        sbSQL += Database.SqlFieldExpiryTime + " = "
+        sbSQL += "?" + " "
+        sbSQL += "WHERE " + Database.SqlFieldId + " = "
+        sbSQL += "?" + " "
+        # The seat must still be the user's, its id may have been reused...
+        sbSQL += "AND " + Database.SqlTableProduct + Database.SqlFieldForeignKeyId + " = "
+        sbSQL += "?" + " "
+        sbSQL += "AND " + Database.SqlFieldUserName + " = "
+        sbSQL += "?" + " "
+        sbSQL += "AND " + Database.SqlFieldIpAddress + " = "
+        sbSQL += "?" + ";"
+        parameters = (nowTime, expiryTime, seatId, productId, userName, ipAddress)
+        sbParameters = Database.ParameterLoggingSeparator.join(
+            [str(i) + ': ' + str(p) for i, p in enumerate(parameters)]
+        )
+
+        try:
+            if seatId and cursor.execute(sbSQL, parameters).rowcount > 0:
+                return seatId
+            seatId = self.FindSeatCommand(cursor, productId, ipAddress, userName)
+            if seatId:
+                parameters = (nowTime, expiryTime, seatId, productId, userName, ipAddress)
+                sbParameters = Database.ParameterLoggingSeparator.join(
+                    [str(i) + ': ' + str(p) for i, p in enumerate(parameters)]
+                )
+                cursor.execute(sbSQL, parameters)
+                return seatId
+            sbSQL = ""
+            sbSQL += "INSERT INTO " + Database.SqlTableConnection + "( "
+            sbSQL += Database.SqlTableProduct + Database.SqlFieldForeignKeyId + ", "
+            sbSQL += Database.SqlFieldUserName + ", "
+            sbSQL += Database.SqlFieldIpAddress + ", "
+            sbSQL += Database.SqlFieldMachineName + ", "
+            sbSQL += Database.SqlFieldLogonTime + ", "
+            sbSQL += Database.SqlFieldUpdateTime + ", "
+            sbSQL += Database.SqlFieldExpiryTime + ") "
+            sbSQL += "VALUES (?, ?, ?, ?, ?, ?, ?); "
+            parameters = (productId, userName, ipAddress, host, nowTime, nowTime, expiryTime)
+            sbParameters = Database.ParameterLoggingSeparator.join(
+                [str(i) + ': ' + str(p) for i, p in enumerate(parameters)]
+            )
+            return cursor.execute(sbSQL, parameters).lastrowid
+        except Exception as ex:
+            logging.critical(str(ex), extra={'EventId': EventId.RefreshSeatSQLError})
+            logging.critical('RefreshSeat SQL Command: \'' + sbSQL + '\'')
+            logging.critical('RefreshSeat SQL Parameters: \'' + sbParameters + '\'')
+            raise ex
+        finally:
+            logging.debug('RefreshSeat SQL Command: \'' + sbSQL + '\'')
+            logging.debug('RefreshSeat SQL Parameters: \'' + sbParameters + '\'')
+
+    def ReleaseSeat(self, product: str, ipAddress: str, userName: str, seatId: int = None) -> int:
+        """
+        Deletes the seat.
+
+        :param product: The name of the product to release the seat for.
+        :param ipAddress: The IP Address to release the seat for.
+        :param userName: The user name to release the seat for.
+        :param seatId: The id returned when the seat was taken, None if not known.
+        :returns: The number of seats deleted.
+        """
+        with self.OpenConnection() as connection:
+            productId = self.GetProductId(connection, product)
+            if productId is None:
+                return 0
+            deleted = self.ReleaseSeatCommand(connection.cursor(), productId, ipAddress, userName, seatId)
+            connection.commit()
+        return deleted
+
+    def ReleaseSeatCommand(self, cursor: sqlite3.Cursor, productId: int, ipAddress: str, userName: str,
+                           seatId: int = None) -> int:
+        """
+        Deletes a seat within the open transaction of the cursor, see ReleaseSeat.
+        The seat is deleted for the product with the specified id, see GetProductId.
+        With a seat id the seat is deleted by its primary key, falling back to the
+        product, user name and IP Address if it is not found.
+        The caller commits the transaction.
+        """
+        sbSQL = ""
+        sbSQL += "DELETE FROM " + Database.SqlTableConnection + " "
+        sbSQL += "WHERE " + Database.SqlTableProduct + Database.SqlFieldForeignKeyId + " = "
+        sbSQL += "?" + " "
+        sbSQL += "AND " + Database.SqlFieldUserName + " = "
+        sbSQL += "?" + " "
+        sbSQL += "AND " + Database.SqlFieldIpAddress + " = "
+        sbSQL += "?" + ";"
+        parameters = (productId, userName, ipAddress)
+        if seatId:
+            sbSQL = sbSQL[:-1] + " AND " + Database.SqlFieldId + " = ?;"
+            parameters += (seatId,)
+        sbParameters = Database.ParameterLoggingSeparator.join(
+            [str(i) + ': ' + str(p) for i, p in enumerate(parameters)]
+        )
+
+        try:
+            deleted = cursor.execute(sbSQL, parameters).rowcount
+            if seatId and deleted == 0:
+                return self.ReleaseSeatCommand(cursor, productId, ipAddress, userName)
+        except Exception as ex:
+            logging.critical(str(ex), extra={'EventId': EventId.ReleaseSeatSQLError})
+            logging.critical('ReleaseSeat SQL Command: \'' + sbSQL + '\'')
+            logging.critical('ReleaseSeat SQL Parameters: \'' + sbParameters + '\'')
+            raise ex
+        finally:
+            logging.debug('ReleaseSeat SQL Command: \'' + sbSQL + '\'')
+            logging.debug('ReleaseSeat SQL Parameters: \'' + sbParameters + '\'')
+        return deleted
+
+    def ReleaseSeats(self, product: str = None, host: str = None, ipAddress: str = None, userName: str = None,
+                     updatedBefore: datetime = None) -> List[ConnectionRecord]:
+        """
+        Deletes every seat matching all of the specified filters in a single DELETE
+        statement, returning the deleted rows, committed as one transaction. Before
+        SQLite 3.35 the rows are selected and then deleted in the same transaction.
+
+        :param product: The name of the product to release the seats for, None for every product.
+        :param host: The host to release the seats for, None for every host.
+        :param ipAddress: The IP Address to release the seats for, None for every IP Address.
+        :param userName: The user name to release the seats for, None for every user.
+        :param updatedBefore: Seats not refreshed since this time are released, None for every seat.
+        :returns: The seats deleted.
+        """
+        if product is None and host is None and ipAddress is None and userName is None and updatedBefore is None:
+            raise ValueError
+        sbWhere = "WHERE 1 = 1"
+        parameters = ()
+        for field, value in ((Database.SqlTableProduct + Database.SqlFieldForeignKeyId, product),
+                             (Database.SqlFieldMachineName, host),
+                             (Database.SqlFieldIpAddress, ipAddress),
+                             (Database.SqlFieldUserName, userName)):
+            if value is not None:
+                sbWhere += " AND " + field + " = ?"
+                parameters += (value,)
+        if updatedBefore is not None:
+            sbWhere += " AND " + Database.SqlFieldUpdateTime + " < ?"
+            parameters += (updatedBefore,)
+        sbColumns = Database.SqlFieldId + ", "
+        sbColumns += "(SELECT " + Database.SqlFieldName + " FROM " + Database.SqlTableProduct + " "
+        sbColumns += "WHERE " + Database.SqlTableProduct + "." + Database.SqlFieldId + " = "
+        sbColumns += Database.SqlTableConnection + "."
+        sbColumns += Database.SqlTableProduct + Database.SqlFieldForeignKeyId + "), "
+        sbColumns += Database.SqlFieldUserName + ", " + Database.SqlFieldMachineName + ", "
+        sbColumns += Database.SqlFieldIpAddress + ", " + Database.SqlFieldLogonTime + ", "
+        sbColumns += Database.SqlFieldUpdateTime + ", "
+        sbColumns += Database.SqlTableLicence + Database.SqlFieldForeignKeyId + ", "
+        sbColumns += Database.SqlFieldExpiryTime
+        sbSelect = ""
+        sbSQL = "DELETE FROM " + Database.SqlTableConnection + " " + sbWhere
+        if self.SupportsReturning:
+            sbSQL += " RETURNING " + sbColumns + ";"
+        else:
+            sbSelect = "SELECT " + sbColumns + " FROM " + Database.SqlTableConnection + " " + sbWhere + ";"
+            sbSQL += ";"
+        sbParameters = ''
+
+        try:
+            with self.OpenConnection() as connection:
+                if product is not None:
+                    productId = self.GetProductId(connection, product)
+                    if productId is None:
+                        return []
+                    parameters = (productId,) + parameters[1:]
+                sbParameters = Database.ParameterLoggingSeparator.join(
+                    [str(i) + ': ' + str(p) for i, p in enumerate(parameters)]
+                )
+                if sbSelect:
+                    # No other writer can change the rows between the select and the delete...
+                    cursor = connection.cursor()
+                    cursor.execute("BEGIN IMMEDIATE;")
+                    rows = cursor.execute(sbSelect, parameters).fetchall()
+                    cursor.execute(sbSQL, parameters)
+                else:
+                    rows = connection.execute(sbSQL, parameters).fetchall()
+                connection.commit()
+        except Exception as ex:
+            logging.critical(str(ex), extra={'EventId': EventId.ReleaseSeatsSQLError})
+            logging.critical('ReleaseSeats SQL Command: \'' + (sbSelect + ' ' + sbSQL).strip() + '\'')
+            logging.critical('ReleaseSeats SQL Parameters: \'' + sbParameters + '\'')
+            raise ex
+        finally:
+            logging.debug('ReleaseSeats SQL Command: \'' + (sbSelect + ' ' + sbSQL).strip() + '\'')
+            logging.debug('ReleaseSeats SQL Parameters: \'' + sbParameters + '\'')
+        return [ConnectionRecord(*row) for row in rows]
+
+    def ExecuteBatch(self, operations: List[SeatOperation], nowTime: datetime, expiryTime: datetime) -> List[int]:
+        """
+        Performs the seat operations in order as one transaction, with a single commit.
+        An operation on a product not in the product table holds no seat, and has a result of 0.
+
+        :param operations: The takes, refreshes and releases to perform.
+        :param nowTime: The time of the operations, seats expired by this time are not counted.
+        :param expiryTime: The time taken and refreshed seats expire unless refreshed again.
+        :returns: For each take or refresh, the id of the seat, 0 if not taken,
+                  and for each release, the number of seats deleted.
+        """
+        results = []
+        with self.OpenConnection() as connection:
+            # Products are resolved before the transaction, only loading licences adds one...
+            productIds = {op.Product: self.GetProductId(connection, op.Product) for op in operations}
+            cursor = connection.cursor()
+            cursor.execute("BEGIN IMMEDIATE;")
+            for op in operations:
+                productId = productIds[op.Product]
+                if productId is None and op.Type in (MessageType.TakeSeat, MessageType.RefreshSeat,
+                                                     MessageType.ReleaseSeat):
+                    results.append(0)
+                elif op.Type == MessageType.TakeSeat:
+                    results.append(self.TakeSeatCommand(cursor, productId, op.IpAddress, op.UserName, op.Host,
+                                                        op.LicenceSeats, nowTime, expiryTime))
+                elif op.Type == MessageType.RefreshSeat:
+                    results.append(self.RefreshSeatCommand(cursor, productId, op.IpAddress, op.UserName, op.Host,
+                                                           nowTime, expiryTime, op.SeatId))
+                elif op.Type == MessageType.ReleaseSeat:
+                    results.append(self.ReleaseSeatCommand(cursor, productId, op.IpAddress, op.UserName, op.SeatId))
+                else:
+                    raise ValueError('Unsupported batch operation: ' + str(op.Type))
+            connection.commit()
+        return results
+
+    def CountSeats(self, product: str, nowTime: datetime) -> int:
+        """
+        Returns the number of live seats for the product.
+
+        :param product: The name of the product to count the seats for.
+        :param nowTime: Seats expired by this time are not counted.
+        :returns: The number of live seats.
+        """
+        sbSQL = "SELECT COUNT(*) "
+        sbSQL += "FROM " + Database.SqlTableConnection + " "
+        sbSQL += "WHERE " + Database.SqlTableProduct + Database.SqlFieldForeignKeyId + " = "
+        sbSQL += "?" + " "
+        sbSQL += "AND " + Database.SqlFieldExpiryTime + " > "
+        sbSQL += "?" + ";"
+        sbParameters = '0: ' + product.lower() + Database.ParameterLoggingSeparator + '1: ' + str(nowTime)
+
+        try:
+            with self.OpenConnection() as connection:
+                productId = self.GetProductId(connection, product)
+                if productId is None:
+                    return 0
+                count = connection.execute(sbSQL, (productId, nowTime)).fetchone()[0]
+        except Exception as ex:
+            logging.critical(str(ex), extra={'EventId': EventId.TotalSeatSQLError})
+            logging.critical('CountSeats SQL Command: \'' + sbSQL + '\'')
+            logging.critical('CountSeats SQL Parameters: \'' + sbParameters + '\'')
+            raise ex
+        finally:
+            logging.debug('CountSeats SQL Command: \'' + sbSQL + '\'')
+            logging.debug('CountSeats SQL Parameters: \'' + sbParameters + '\'')
+        return count
+
+    def GetConnections(self, product: str, nowTime: datetime) -> List[ConnectionRecord]:
+        """
+        Returns the live seats for the product.
+
+        :param product: The name of the product to get the seats for.
+        :param nowTime: Seats expired by this time are not returned.
+        :returns: The live seats.
+        """
+        sbSQL = ""
+        sbSQL += "SELECT " + Database.SqlFieldId + ", "
+        sbSQL += Database.SqlFieldUserName + ", " + Database.SqlFieldMachineName + ", "
+        sbSQL += Database.SqlFieldIpAddress + ", " + Database.SqlFieldLogonTime + ", "
+        sbSQL += Database.SqlFieldUpdateTime + ", "
+        sbSQL += Database.SqlTableLicence + Database.SqlFieldForeignKeyId + ", "
+        sbSQL += Database.SqlFieldExpiryTime + " "
+        sbSQL += "FROM " + Database.SqlTableConnection + " "
+        sbSQL += "WHERE " + Database.SqlTableProduct + Database.SqlFieldForeignKeyId + " = "
+        sbSQL += "?" + " "
+        sbSQL += "AND " + Database.SqlFieldExpiryTime + " > "
+        sbSQL += "?" + ";"
+        name = product.lower()
+        sbParameters = '0: ' + name + Database.ParameterLoggingSeparator + '1: ' + str(nowTime)
+
+        try:
+            with self.OpenConnection() as connection:
+                productId = self.GetProductId(connection, product)
+                if productId is None:
+                    return []
+                rows = connection.execute(sbSQL, (productId, nowTime)).fetchall()
+        except Exception as ex:
+            logging.critical(str(ex), extra={'EventId': EventId.GetConnectionsSQLError})
+            logging.critical('GetConnections SQL Command: \'' + sbSQL + '\'')
+            logging.critical('GetConnections SQL Parameters: \'' + sbParameters + '\'')
+            raise ex
+        finally:
+            logging.debug('GetConnections SQL Command: \'' + sbSQL + '\'')
+            logging.debug('GetConnections SQL Parameters: \'' + sbParameters + '\'')
+        # Seats carry the product name in lower case, as they did when it was stored with them...
+        return [ConnectionRecord(row[0], name, *row[1:]) for row in rows]
+
+    def DeleteStaleSeats(self, nowTime: datetime) -> int:
+        """
+        Deletes all seats expired by the specified time.
+
+        :param nowTime: Seats expired by this time are deleted.
+        :returns: The number of seats deleted.
+        """
+        sbSQL = ""
+        sbSQL += "DELETE FROM " + Database.SqlTableConnection + " "
+        sbSQL += "WHERE " + Database.SqlFieldExpiryTime + " < "
+        sbSQL += "?" + ";"
+        sbParameters = '0: ' + str(nowTime)
+
+        try:
+            with self.OpenConnection() as connection:
+                deleted = connection.execute(sbSQL, (nowTime,)).rowcount
+                connection.commit()
+        except Exception as ex:
+            logging.critical(str(ex), extra={'EventId': EventId.DeleteStaleSeatSQLError})
+            logging.critical('DeleteStaleSeats SQL Command: \'' + sbSQL + '\'')
+            logging.critical('DeleteStaleSeats SQL Parameters: \'' + sbParameters + '\'')
+            raise ex
+        finally:
+            logging.debug('DeleteStaleSeats SQL Command: \'' + sbSQL + '\'')
+            logging.debug('DeleteStaleSeats SQL Parameters: \'' + sbParameters + '\'')
+        return deleted
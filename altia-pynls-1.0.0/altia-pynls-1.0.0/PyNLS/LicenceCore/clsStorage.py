@@ -0,0 +1,231 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from .MessageType import MessageType
+from typing import List, NamedTuple, Optional
+
+
+class LicenceRecord(NamedTuple):
+    """
+    A licence as held by a storage backend.
+    """
+    Id: Optional[int]
+    Company: str
+    Product: str
+    Customer: str
+    Reference: Optional[str]
+    Reseller: Optional[str]
+    NumberOfSeats: int
+    StartDate: Optional[str]
+    ExpiryDate: Optional[str]
+    TimeStamp: int
+    Code: str
+    Version: int
+    Notes: Optional[str]
+
+
+class ConnectionRecord(NamedTuple):
+    """
+    A seat (connection) as held by a storage backend.
+    LogonTime, UpdateTime and ExpiryTime are formatted as the SQLite backend stores them.
+    """
+    Id: int
+    Product: str
+    UserName: str
+    Host: str
+    IpAddress: str
+    LogonTime: str
+    UpdateTime: str
+    LicenceId: Optional[int]
+    ExpiryTime: Optional[str] = None
+
+
+class SeatOperation(NamedTuple):
+    """
+    A seat take, refresh or release performed as one item of a batch.
+    LicenceSeats, the sorted active licences of the product, is only used by takes,
+    SeatId, the id returned when the seat was taken, by refreshes and releases.
+    """
+    Type: MessageType
+    Product: str
+    IpAddress: str
+    UserName: str
+    Host: str
+    LicenceSeats: Optional[list] = None
+    SeatId: Optional[int] = None
+
+
+class Storage(ABC):
+    """
+    Interface for the licence and seat storage used by the licence manager.
+    Products are matched case insensitively, seats are identified by
+    product, user name and IP Address. Each seat carries its own expiry time,
+    set from the heartbeat advertised to its client, after which it is stale.
+
+    Taking a seat returns its id, which the client sends back with its refreshes
+    and release so the seat is found by its id. The id is checked against the
+    product, user name and IP Address of the request, and a seat that is not
+    found by its id, e.g. one re-created after it went stale, is found by those.
+    """
+
+    @abstractmethod
+    def Open(self) -> None:
+        """
+        Creates or restores the storage, must be called before any other method.
+        """
+
+    def Close(self) -> None:
+        """
+        Releases any resources held by the storage.
+        """
+
+    def Analyze(self) -> None:
+        """
+        Gathers statistics used to optimise queries, where supported.
+        """
+
+    def Vacuum(self) -> None:
+        """
+        Compacts the storage, where supported.
+        """
+
+    @abstractmethod
+    def LoadLicences(self, licences: List[LicenceRecord]) -> int:
+        """
+        Adds the specified licences, ignoring any already loaded (by timestamp),
+        and removes any licence that is not in the specified list.
+
+        :param licences: The verified licences to load.
+        :returns: The number of licences processed.
+        """
+
+    @abstractmethod
+    def GetLicences(self, product: str) -> List[LicenceRecord]:
+        """
+        Returns the licences for the specified product, latest timestamp first.
+
+        :param product: The name of the product to get the licences for.
+        :returns: The licences for the product.
+        """
+
+    @abstractmethod
+    def GetProducts(self) -> List[str]:
+        """
+        Returns the names of the licensed products in ascending order.
+
+        :returns: The names of the licensed products.
+        """
+
+    @abstractmethod
+    def TakeSeat(self, product: str, ipAddress: str, userName: str, host: str,
+                 licenceSeats: list, nowTime: datetime, expiryTime: datetime) -> int:
+        """
+        Atomically counts the live seats for the product, excluding the caller's own
+        seat, and if one is free takes (or re-takes) the seat against a licence.
+
+        :param product: The name of the product to take the seat for.
+        :param ipAddress: The IP Address to take the seat for.
+        :param userName: The user name to take the seat for.
+        :param host: The host to take the seat for.
+        :param licenceSeats: The active licences for the product (LicenceSeatStructure), sorted.
+        :param nowTime: The time the seat is taken, seats expired by this time are not counted.
+        :param expiryTime: The time the seat expires unless refreshed.
+        :returns: The id of the seat if taken, otherwise 0.
+        """
+
+    @abstractmethod
+    def RefreshSeat(self, product: str, ipAddress: str, userName: str, host: str,
+                    nowTime: datetime, expiryTime: datetime, seatId: int = None) -> int:
+        """
+        Sets the update and expiry time of the seat, creating the seat if it does not exist.
+
+        :param product: The name of the product to refresh the seat for.
+        :param ipAddress: The IP Address to refresh the seat for.
+        :param userName: The user name to refresh the seat for.
+        :param host: The host to refresh the seat for.
+        :param nowTime: The update time.
+        :param expiryTime: The time the seat expires unless refreshed again.
+        :param seatId: The id returned when the seat was taken, None if not known.
+        :returns: The id of the seat, 0 if the storage does not refresh seats of a product it holds no licence for.
+        """
+
+    @abstractmethod
+    def ReleaseSeat(self, product: str, ipAddress: str, userName: str, seatId: int = None) -> int:
+        """
+        Deletes the seat.
+
+        :param product: The name of the product to release the seat for.
+        :param ipAddress: The IP Address to release the seat for.
+        :param userName: The user name to release the seat for.
+        :param seatId: The id returned when the seat was taken, None if not known.
+        :returns: The number of seats deleted.
+        """
+
+    @abstractmethod
+    def ReleaseSeats(self, product: str = None, host: str = None, ipAddress: str = None, userName: str = None,
+                     updatedBefore: datetime = None) -> List[ConnectionRecord]:
+        """
+        Deletes every seat matching all of the specified filters as one set-based
+        operation, e.g. every seat of a host whose machines were rebooted.
+
+        :param product: The name of the product to release the seats for, None for every product.
+        :param host: The host to release the seats for, None for every host.
+        :param ipAddress: The IP Address to release the seats for, None for every IP Address.
+        :param userName: The user name to release the seats for, None for every user.
+        :param updatedBefore: Seats not refreshed since this time are released, None for every seat.
+        :returns: The seats deleted.
+        :raises ValueError: No filter is specified.
+        """
+
+    @abstractmethod
+    def CountSeats(self, product: str, nowTime: datetime) -> int:
+        """
+        Returns the number of live seats for the product.
+
+        :param product: The name of the product to count the seats for.
+        :param nowTime: Seats expired by this time are not counted.
+        :returns: The number of live seats.
+        """
+
+    @abstractmethod
+    def GetConnections(self, product: str, nowTime: datetime) -> List[ConnectionRecord]:
+        """
+        Returns the live seats for the product.
+
+        :param product: The name of the product to get the seats for.
+        :param nowTime: Seats expired by this time are not returned.
+        :returns: The live seats.
+        """
+
+    @abstractmethod
+    def DeleteStaleSeats(self, nowTime: datetime) -> int:
+        """
+        Deletes all seats expired by the specified time.
+
+        :param nowTime: Seats expired by this time are deleted.
+        :returns: The number of seats deleted.
+        """
+
+    def ExecuteBatch(self, operations: List[SeatOperation], nowTime: datetime, expiryTime: datetime) -> List[int]:
+        """
+        Performs the seat operations in order. Backends override this to perform
+        them as one transaction, by default each operation is performed on its own.
+
+        :param operations: The takes, refreshes and releases to perform.
+        :param nowTime: The time of the operations, seats expired by this time are not counted.
+        :param expiryTime: The time taken and refreshed seats expire unless refreshed again.
+        :returns: For each take or refresh, the id of the seat, 0 if not taken,
+                  and for each release, the number of seats deleted.
+        """
+        results = []
+        for op in operations:
+            if op.Type == MessageType.TakeSeat:
+                results.append(self.TakeSeat(op.Product, op.IpAddress, op.UserName, op.Host,
+                                             op.LicenceSeats, nowTime, expiryTime))
+            elif op.Type == MessageType.RefreshSeat:
+                results.append(self.RefreshSeat(op.Product, op.IpAddress, op.UserName, op.Host,
+                                                nowTime, expiryTime, op.SeatId))
+            elif op.Type == MessageType.ReleaseSeat:
+                results.append(self.ReleaseSeat(op.Product, op.IpAddress, op.UserName, op.SeatId))
+            else:
+                raise ValueError('Unsupported batch operation: ' + str(op.Type))
+        return results
@@ -0,0 +1,255 @@
+from .clsClock import Clock
+from .clsDatabaseSchema import Database, DatabaseSchema
+from .EventId import EventId
+from contextlib import closing
+from typing import Callable, Dict, List, Tuple
+import threading
+import logging
+import sqlite3
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class UsageRollup:
+    """
+    Samples per product seat concurrency and denials into a minute rollup table,
+    downsampled as it is written into hour and day tables, each with its own retention.
+    Reports pick the finest tier still covering the requested period.
+    """
+    MinuteSeconds = 60
+    HourSeconds = 3600
+    DaySeconds = 86400
+
+    m_FileName = ""
+    m_SampleInterval = 60
+    m_MinuteRetention = 7 * DaySeconds
+    m_HourRetention = 92 * DaySeconds
+    m_DayRetention = 5 * 366 * DaySeconds
+
+    @property
+    def FileName(self) -> str:
+        """
+        Gets the full path to the usage database file.
+
+        :returns: The full path to the usage database file.
+        """
+        return self.m_FileName
+
+    def __init__(self, fileName: str, sampler: Callable[[], Dict[str, Tuple[int, int]]] = None,
+                 sampleInterval: int = 60, clock: Clock = None):
+        """
+        Opens, creating if required, the usage database.
+
+        :param fileName: The full path to the usage database file.
+        :param sampler: Returns the current seats in use and the denials since the last call, per product.
+        :param sampleInterval: The interval, in seconds, between samples.
+        :param clock: The time source samples are recorded at, by default the system clock.
+        """
+        self.m_FileName = fileName
+        self.m_Sampler = sampler
+        self.m_SampleInterval = sampleInterval
+        self.m_Clock = clock if clock is not None else Clock()
+        self.m_Stop = threading.Event()
+        self.m_Thread = None
+        self.m_Tiers = [
+            (Database.SqlTableUsageMinute, self.MinuteSeconds),
+            (Database.SqlTableUsageHour, self.HourSeconds),
+            (Database.SqlTableUsageDay, self.DaySeconds),
+        ]
+        with self.OpenConnection() as connection:
+            for tableName, _ in self.m_Tiers:
+                connection.executescript(DatabaseSchema.GetUsageSchema(tableName))
+
+    def OpenConnection(self):
+        """
+        Opens a connection to the usage database, closed when the with block exits.
+
+        :returns: A context manager yielding a database connection.
+        """
+        return closing(sqlite3.connect(self.m_FileName))
+
+    def SetRetention(self, minutes: int, hours: int, days: int) -> None:
+        """
+        Sets the retention of each tier.
+
+        :param minutes: The number of days minute samples are kept.
+        :param hours: The number of days hourly rollups are kept.
+        :param days: The number of days daily rollups are kept.
+        """
+        self.m_MinuteRetention = minutes * self.DaySeconds
+        self.m_HourRetention = hours * self.DaySeconds
+        self.m_DayRetention = days * self.DaySeconds
+
+    def Start(self) -> None:
+        """
+        Starts sampling every sample interval on a background thread.
+        """
+        if self.m_Sampler is None or self.m_Thread is not None:
+            return
+        self.m_Stop.clear()
+        self.m_Thread = threading.Thread(target=self.SampleLoop, name='UsageRollup', daemon=True)
+        self.m_Thread.start()
+
+    def Stop(self) -> None:
+        """
+        Stops sampling.
+        """
+        self.m_Stop.set()
+        if self.m_Thread is not None:
+            self.m_Thread.join()
+            self.m_Thread = None
+
+    def SampleLoop(self) -> None:
+        """
+        Samples every sample interval until stopped.
+        """
+        while not self.m_Stop.wait(self.m_SampleInterval):
+            try:
+                self.Sample()
+            except Exception as ex:
+                logging.critical('UsageRollup sample failed: ' + str(ex), extra={'EventId': EventId.UsageRollupError})
+
+    def Sample(self) -> None:
+        """
+        Takes a sample from the sampler and records it at the current time of the clock.
+        """
+        now = self.m_Clock.Time()
+        self.Record(self.m_Sampler(), now)
+        self.Prune(now)
+
+    def Record(self, samples: Dict[str, Tuple[int, int]], sampleTime: float) -> None:
+        """
+        Records one sample of each product into every tier.
+
+        :param samples: The seats in use and denials, per product.
+        :param sampleTime: The unix time of the sample.
+        """
+        with self.OpenConnection() as connection:
+            for tableName, seconds in self.m_Tiers:
+                bucket = int(sampleTime) // seconds * seconds
+                sbSQL = "INSERT INTO " + tableName + "("
+                sbSQL += Database.SqlFieldProduct + ", " + Database.SqlFieldBucket + ", "
+                sbSQL += Database.SqlFieldPeak + ", " + Database.SqlFieldTotal + ", "
+                sbSQL += Database.SqlFieldSamples + ", " + Database.SqlFieldDenials + ") "
+                sbSQL += "VALUES (?, ?, ?, ?, 1, ?) "
+                sbSQL += "ON CONFLICT(" + Database.SqlFieldProduct + ", " + Database.SqlFieldBucket + ") DO UPDATE SET "
+                sbSQL += Database.SqlFieldPeak + " = MAX(" + Database.SqlFieldPeak + ", excluded." + Database.SqlFieldPeak + "), "
+                sbSQL += Database.SqlFieldTotal + " = " + Database.SqlFieldTotal + " + excluded." + Database.SqlFieldTotal + ", "
+                sbSQL += Database.SqlFieldSamples + " = " + Database.SqlFieldSamples + " + 1, "
+                sbSQL += Database.SqlFieldDenials + " = " + Database.SqlFieldDenials + " + excluded." + Database.SqlFieldDenials + ";"
+                connection.executemany(sbSQL, [
+                    (product.lower(), bucket, inUse, inUse, denials)
+                    for product, (inUse, denials) in samples.items()
+                ])
+            connection.commit()
+
+    def Prune(self, now: float) -> None:
+        """
+        Deletes rollups older than the retention of their tier.
+
+        :param now: The current unix time.
+        """
+        retentions = [self.m_MinuteRetention, self.m_HourRetention, self.m_DayRetention]
+        with self.OpenConnection() as connection:
+            for (tableName, _), retention in zip(self.m_Tiers, retentions):
+                connection.execute("DELETE FROM " + tableName + " WHERE " + Database.SqlFieldBucket + " < ?;",
+                                   (int(now - retention),))
+            connection.commit()
+
+    def GetTier(self, start: float, now: float = None) -> str:
+        """
+        Returns the finest tier whose retention still covers the start time.
+
+        :param start: The unix time the report starts at.
+        :param now: The current unix time, by default the time of the clock.
+        :returns: The name of the rollup table to query.
+        """
+        if now is None:
+            now = self.m_Clock.Time()
+        if start >= now - self.m_MinuteRetention:
+            return Database.SqlTableUsageMinute
+        if start >= now - self.m_HourRetention:
+            return Database.SqlTableUsageHour
+        return Database.SqlTableUsageDay
+
+    def GetSeries(self, product: str, start: float, end: float, tableName: str = None):
+        """
+        Returns the rollups of a product between two times.
+
+        :param product: The name of the product.
+        :param start: The unix time to start from (inclusive).
+        :param end: The unix time to end at (exclusive).
+        :param tableName: The tier to read, by default the finest covering the start time.
+        :returns: Columns of bucket, peak, average and denials, as numpy arrays when numpy is available.
+        """
+        if tableName is None:
+            tableName = self.GetTier(start)
+        sbSQL = "SELECT " + Database.SqlFieldBucket + ", " + Database.SqlFieldPeak + ", "
+        sbSQL += Database.SqlFieldTotal + ", " + Database.SqlFieldSamples + ", " + Database.SqlFieldDenials + " "
+        sbSQL += "FROM " + tableName + " "
+        sbSQL += "WHERE " + Database.SqlFieldProduct + " = ? "
+        sbSQL += "AND " + Database.SqlFieldBucket + " >= ? AND " + Database.SqlFieldBucket + " < ? "
+        sbSQL += "ORDER BY " + Database.SqlFieldBucket + ";"
+        with self.OpenConnection() as connection:
+            rows = connection.execute(sbSQL, (product.lower(), int(start), int(end))).fetchall()
+        if numpy is not None:
+            data = numpy.array(rows, dtype=numpy.int64).reshape(-1, 5)
+            return data[:, 0], data[:, 1], data[:, 2] / numpy.maximum(data[:, 3], 1), data[:, 4]
+        return ([r[0] for r in rows], [r[1] for r in rows],
+                [r[2] / max(r[3], 1) for r in rows], [r[4] for r in rows])
+
+    def Peak(self, product: str, start: float, end: float) -> int:
+        """
+        Returns the peak concurrent seats of a product between two times.
+
+        :param product: The name of the product.
+        :param start: The unix time to start from (inclusive).
+        :param end: The unix time to end at (exclusive).
+        :returns: The peak number of seats in use, 0 if there are no samples.
+        """
+        peaks = self.GetSeries(product, start, end)[1]
+        if len(peaks) == 0:
+            return 0
+        return int(peaks.max()) if numpy is not None else max(peaks)
+
+    def Percentile(self, product: str, start: float, end: float, percentile: float) -> float:
+        """
+        Returns a percentile of the per bucket peak concurrent seats of a product between two times.
+
+        :param product: The name of the product.
+        :param start: The unix time to start from (inclusive).
+        :param end: The unix time to end at (exclusive).
+        :param percentile: The percentile, between 0 and 100.
+        :returns: The percentile, using linear interpolation, 0 if there are no samples.
+        """
+        peaks = self.GetSeries(product, start, end)[1]
+        if len(peaks) == 0:
+            return 0.0
+        if numpy is not None:
+            return float(numpy.percentile(peaks, percentile))
+        return UsageRollup.Interpolate(sorted(peaks), percentile)
+
+    def Denials(self, product: str, start: float, end: float) -> int:
+        """
+        Returns the number of denied seat requests of a product between two times.
+
+        :param product: The name of the product.
+        :param start: The unix time to start from (inclusive).
+        :param end: The unix time to end at (exclusive).
+        :returns: The number of denied seat requests.
+        """
+        return int(sum(self.GetSeries(product, start, end)[3]))
+
+    @staticmethod
+    def Interpolate(values: List[float], percentile: float) -> float:
+        """
+        Returns a percentile of sorted values using linear interpolation, as numpy.percentile.
+        """
+        position = (len(values) - 1) * percentile / 100.0
+        lower = int(position)
+        upper = min(lower + 1, len(values) - 1)
+        return float(values[lower] + (values[upper] - values[lower]) * (position - lower))
+
@@ -4,12 +4,18 @@ import socket
 import getpass
 import platform
 from datetime import datetime
+from .clsResolverCache import ResolverCache
 
 
 class Utils:
     """
     Provides static utility methods for the network licence app
+
+    The identity of the local computer and resolved addresses are cached by
+    Resolver, so only the first lookup blocks on name resolution.
     """
+    Resolver = ResolverCache()
+
     @staticmethod
     def GetExecutingFilePath() -> str:
         """
@@ -30,8 +36,9 @@ class Utils:
         :returns: The IP Address of the local computer.
         """
         if not server and not port:
-            return socket.gethostbyname(socket.gethostname())
-        return socket.getaddrinfo(server, port, socket.AF_INET6)[0][4][0]
+            return Utils.Resolver.Get('address', lambda: socket.gethostbyname(Utils.GetHostName()))
+        return Utils.Resolver.Get('address:' + str(server) + ':' + str(port),
+                                  lambda: socket.getaddrinfo(server, port, socket.AF_INET6)[0][4][0])
 
     @staticmethod
     def GetHostName() -> str:
@@ -40,23 +47,23 @@ class Utils:
 
         :returns: The host name of the local computer.
         """
-        return socket.gethostname()
+        return Utils.Resolver.Get('hostname', socket.gethostname)
 
     @staticmethod
     def GetPlatform() -> str:
         """
         Returns the platform of the local computer.
         """
-        return platform.system()
+        return Utils.Resolver.Get('platform', platform.system)
 
     @staticmethod
     def GetPlatformVersion() -> str:
         """
         Returns the platform version of the local computer.
         """
-        if platform.system() == 'Windows':
-            return platform.version()
-        return platform.release()
+        if Utils.GetPlatform() == 'Windows':
+            return Utils.Resolver.Get('platformversion', platform.version)
+        return Utils.Resolver.Get('platformversion', platform.release)
 
     @staticmethod
     def GetPlatformArchitecture() -> str:
@@ -72,7 +79,7 @@ class Utils:
 
         :returns: Tur user name of the person who is current logged into the local computer.
         """
-        return getpass.getuser()
+        return Utils.Resolver.Get('username', getpass.getuser)
 
     @staticmethod
     def IsPortAvailable(port: int) -> bool:
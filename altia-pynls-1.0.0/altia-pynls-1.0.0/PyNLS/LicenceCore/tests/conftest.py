@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+import pytest
+import zmq
+from PyNLS.LicenceCore.clsLicenceManager import LicenceManager
+from PyNLS.LicenceCore.clsMemoryStorage import MemoryStorage
+from PyNLS.LicenceCore.clsRequestHandler import RequestHandler
+from PyNLS.LicenceCore.clsStorage import LicenceRecord
+
+ADMIN_SECRET = 'admin-secret'
+
+
+def create_licence(product='Product', seats=5, timestamp=1, expiryDate=None, code='code'):
+    """
+    Returns a licence record of the product, as loaded from a licence file.
+    """
+    return LicenceRecord(None, 'Altia', product, 'Customer', None, None, seats, None, expiryDate, timestamp, code, 1,
+                         None)
+
+
+def create_manager(seats=5, products=('Product',), storage=None, code='code', doubleValidation=False, folder=None,
+                   **kwargs):
+    """
+    Returns a licence manager with a licence of the seats of each product, in memory unless another storage is given.
+    A folder is made the working directory, as a server run from it, e.g. for each process of a multi-process test.
+    """
+    if folder is not None:
+        os.makedirs(folder, exist_ok=True)
+        os.chdir(folder)
+    manager = LicenceManager('', '', None, storage=storage or MemoryStorage(), **kwargs)
+    manager.DoubleValidation = doubleValidation
+    manager.Storage.LoadLicences([create_licence(product, seats, timestamp + 1, code=code)
+                                  for timestamp, product in enumerate(products)])
+    return manager
+
+
+def wait_for(condition, timeout=5.0):
+    """
+    Returns true once the condition holds, false if it does not within the timeout.
+    """
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+class Server:
+    """
+    A single threaded REP server, as run by each server worker.
+    """
+    def __init__(self, manager, port=None):
+        self.handler = RequestHandler(manager, '1.0.0', adminSecret=ADMIN_SECRET)
+        self.requests = []
+        self.socket = zmq.Context.instance().socket(zmq.REP)
+        if port is None:
+            self.port = self.socket.bind_to_random_port('tcp://127.0.0.1')
+        else:
+            self.port = port
+            # The previous server socket is closed asynchronously...
+            assert wait_for(lambda: self.bind(port)), "Port not released"
+        self.running = True
+        self.thread = threading.Thread(target=self.loop, daemon=True)
+        self.thread.start()
+
+    def bind(self, port):
+        try:
+            self.socket.bind('tcp://127.0.0.1:' + str(port))
+            return True
+        except zmq.ZMQError:
+            return False
+
+    @property
+    def address(self):
+        return 'tcp://127.0.0.1:' + str(self.port)
+
+    def loop(self):
+        while self.running:
+            if self.socket.poll(20):
+                data = self.socket.recv()
+                reply = self.handler.Handle(data)
+                self.requests.append(data)
+                self.socket.send(reply)
+        self.socket.close(linger=0)
+
+    def stop(self):
+        if self.running:
+            self.running = False
+            self.thread.join()
+
+
+@pytest.fixture
+def admin_secret():
+    return ADMIN_SECRET
+
+
+@pytest.fixture(name='wait_for')
+def wait_for_fixture():
+    return wait_for
+
+
+@pytest.fixture
+def make_licence():
+    return create_licence
+
+
+@pytest.fixture
+def make_manager(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return create_manager
+
+
+@pytest.fixture
+def make_handler(make_manager):
+    def make(seats=5, **kwargs):
+        return RequestHandler(make_manager(seats, **kwargs), '1.0.0', adminSecret=ADMIN_SECRET)
+    return make
+
+
+@pytest.fixture
+def make_server(make_manager):
+    servers = []
+
+    def make(manager=None, port=None):
+        servers.append(Server(manager or make_manager(2, ('Product', 'Other')), port))
+        return servers[-1]
+    yield make
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def server(make_server):
+    return make_server()
@@ -0,0 +1,43 @@
+import pytest
+from PyNLS.LicenceCore.clsCapacitySimulator import CapacitySimulator, Population
+
+
+def test_enough_seats_are_never_denied(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    simulator = CapacitySimulator({'Product': 10}, [Population('user', 'Product', 10, 1.0, 3600)], seed=1)
+    result = simulator.Run(86400)
+    simulator.Close()
+    product = result.Products['Product']
+    assert result.SimulatedTime == 86400
+    assert product.Requests > 100 and product.Denials == 0, "Seats denied with a seat for every user"
+    assert 0 < product.MeanSeatsInUse <= product.MaximumSeatsInUse <= 10
+    assert product.MeanStaleSeats == 0 and product.LateRefreshes == 0
+
+
+def test_crashed_sessions_leave_stale_seats_that_cause_denials(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    results = []
+    for crashRate in (0.0, 1.0):
+        simulator = CapacitySimulator({'Product': 5}, [Population('user', 'Product', 10, 2.0, 600, crashRate)],
+                                      heartBeat=900, seed=2)
+        results.append(simulator.Run(2 * 86400).Products['Product'])
+        simulator.Close()
+    assert results[0].MeanStaleSeats == 0 and results[1].MeanStaleSeats > 1, "Crashed seats not stale"
+    assert results[1].DenialProbability > results[0].DenialProbability, "Stale seats did not cause denials"
+
+
+def test_network_delay_beyond_the_fudge_factor_makes_refreshes_late(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    simulator = CapacitySimulator({'Product': 5}, [Population('user', 'Product', 5, 1.0, 7200, 0.0, 120)],
+                                  heartBeat=60, fudgeFactor=5, seed=3)
+    first = simulator.Run(3600)
+    second = simulator.Run(3600)
+    simulator.Close()
+    assert second.SimulatedTime == 7200 and second.DatabaseWrites > first.DatabaseWrites, "Run did not carry on"
+    assert second.Products['Product'].LateRefreshes > 0, "Delayed refreshes not late"
+
+
+def test_population_of_unlicensed_product_is_refused(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(ValueError):
+        CapacitySimulator({'Product': 1}, [Population('user', 'Other', 1, 1.0, 60)])
@@ -0,0 +1,35 @@
+import time
+from datetime import datetime, timedelta
+import pytest
+from PyNLS.LicenceCore.clsClock import Clock, SimulatedClock
+from PyNLS.LicenceCore.clsConfig import Config
+
+
+def test_now_is_cached_for_a_tick():
+    clock = Clock(60)
+    first = clock.Now()
+    time.sleep(0.01)
+    assert clock.Now() is first, "Current time not cached within the tick"
+    uncached = Clock(0)
+    first = uncached.Now()
+    time.sleep(0.01)
+    assert uncached.Now() > first, "Current time cached without a resolution"
+
+
+def test_simulated_clock_only_moves_when_advanced():
+    start = datetime(2030, 1, 1, 12, 0, 0)
+    clock = SimulatedClock(start)
+    assert clock.Now() == start and clock.Monotonic() == 0.0
+    clock.Advance(90)
+    assert clock.Now() == start + timedelta(seconds=90) and clock.Monotonic() == 90.0
+    clock.Set(datetime(2030, 1, 2))
+    assert clock.Today().day == 2 and clock.Monotonic() == 43200.0
+    with pytest.raises(ValueError):
+        clock.Advance(-1)
+
+
+def test_reload_time_from_simulated_now():
+    config = Config()
+    config.Clock = SimulatedClock(datetime(2030, 1, 1, 3, 0, 0))
+    config.ReloadTime = '02:30:00'
+    assert config.GetReloadTimeFromNow() == timedelta(hours=23, minutes=30), "Next reload not tomorrow"
@@ -0,0 +1,37 @@
+import logging
+from PyNLS.LicenceCore.clsEventRing import EventRing
+from PyNLS.LicenceCore.EventId import EventId
+
+
+def test_ring_overwrites_oldest_events():
+    ring = EventRing(3)
+    for i in range(5):
+        ring.Record(EventId.SeatTaken, 'Product', 'user' + str(i), '10.0.0.1')
+    events = ring.Query()
+    assert [e.UserName for e in events] == ['user4', 'user3', 'user2'], "Oldest events not overwritten"
+    assert ring.Count == 5 and ring.Capacity == 3
+
+
+def test_query_filters_by_event_product_and_user():
+    ring = EventRing()
+    ring.Record(EventId.SeatTaken, 'Product', 'alice', '10.0.0.1')
+    ring.Record(EventId.SeatNotTaken, 'Product', 'bob', '10.0.0.2')
+    ring.Record(EventId.SeatTaken, 'Other', 'bob', '10.0.0.2')
+    assert [e.UserName for e in ring.Query([EventId.SeatTaken])] == ['bob', 'alice']
+    assert [e.EventId for e in ring.Query(product='PRODUCT')] == [EventId.SeatNotTaken, EventId.SeatTaken], \
+        "Product not matched case insensitively"
+    assert [e.Product for e in ring.Query(userName='bob', limit=1)] == ['Other'], "Newest event not first"
+    ring.Clear()
+    assert ring.Query() == []
+
+
+def test_attached_ring_records_tagged_log_records():
+    logger = logging.getLogger('test_clsEventRing')
+    logger.setLevel(logging.INFO)
+    ring = EventRing()
+    ring.Attach(logger)
+    logger.critical('no such table', extra={'EventId': EventId.TakeSeatSQLError})
+    logger.info('untagged')
+    ring.Detach()
+    logger.critical('detached', extra={'EventId': EventId.TakeSeatSQLError})
+    assert [e.EventId for e in ring.Query()] == [EventId.TakeSeatSQLError], "Tagged log records not recorded"
@@ -0,0 +1,58 @@
+from datetime import timedelta
+from PyNLS.LicenceCore.clsClock import SimulatedClock
+from PyNLS.LicenceCore.clsHeartBeatAdvisor import HeartBeatAdvisor
+
+
+def run_interval(advisor, start, utilisation, writes=100, interval=10):
+    for i in range(1, writes + 1):
+        advisor.Record(utilisation * interval / writes, start + i * interval / writes)
+    return start + interval
+
+
+def test_idle_keeps_configured_heartbeat():
+    advisor = HeartBeatAdvisor(300, 1200, 0.5, 10)
+    run_interval(advisor, advisor.m_Start, 0.05)
+    assert advisor.Recommended == timedelta(seconds=300), "Heartbeat shrunk below configured"
+    assert abs(advisor.Utilisation - 0.05) < 1e-9
+    assert abs(advisor.WriteRate - 10) < 1e-9
+
+
+def test_load_stretches_heartbeat_up_to_maximum():
+    advisor = HeartBeatAdvisor(300, 1200, 0.5, 10)
+    now = run_interval(advisor, advisor.m_Start, 1.0)
+    assert abs(advisor.Recommended.total_seconds() - 300 * 2 ** 0.5) < 1e-6, "Heartbeat not stretched under load"
+    for _ in range(10):
+        now = run_interval(advisor, now, 1.0)
+    assert advisor.Recommended == timedelta(seconds=1200), "Heartbeat not capped at maximum"
+    for _ in range(10):
+        now = run_interval(advisor, now, 0.01)
+    assert advisor.Recommended == timedelta(seconds=300), "Heartbeat not restored when load falls"
+
+
+def test_no_maximum_keeps_heartbeat_fixed():
+    advisor = HeartBeatAdvisor(300, 0, 0.5, 10)
+    run_interval(advisor, advisor.m_Start, 1.0)
+    assert advisor.Recommended == timedelta(seconds=300), "Heartbeat adapted without a maximum"
+    advisor.HeartBeat = 60
+    assert advisor.Recommended == timedelta(seconds=60), "Recommendation not following configured heartbeat"
+
+
+def test_lowering_maximum_clamps_recommendation():
+    advisor = HeartBeatAdvisor(300, 1200, 0.5, 10)
+    now = advisor.m_Start
+    for _ in range(5):
+        now = run_interval(advisor, now, 1.0)
+    advisor.MaximumHeartBeat = 600
+    assert advisor.Recommended == timedelta(seconds=600), "Recommendation not clamped to new maximum"
+
+
+def test_writes_timed_by_the_clock(make_manager):
+    manager = make_manager(5)
+    manager.Clock = SimulatedClock()
+    assert manager.HeartBeatAdvisor.Clock is manager.Clock, "Advisor not given the clock of the manager"
+    for user in ('alice', 'bob', 'carol', 'dave'):
+        manager.TakeSeat('Product', '10.0.0.1', user, 'host')
+    manager.Clock.Advance(10)
+    manager.TakeSeat('Product', '10.0.0.1', 'erin', 'host')
+    assert manager.HeartBeatAdvisor.WriteRate == 0.5, "Measurement interval not timed by the clock"
+    manager.Shutdown()
@@ -0,0 +1,78 @@
+import base64
+import os
+from xml.etree import ElementTree
+from Crypto.Hash import SHA1
+from Crypto.PublicKey import RSA
+from Crypto.Signature import pkcs1_15
+from PyNLS.LicenceCore.clsLicenceBundle import LicenceBundle
+from PyNLS.LicenceCore.clsLicenceManager import LicenceManager
+from PyNLS.LicenceCore.clsMemoryStorage import MemoryStorage
+from PyNLS.LicenceCore.clsRSA import RSAVerify
+from PyNLS.LicenceCore.clsStorage import LicenceRecord
+from PyNLS.LicenceCore.clsUtils import Utils
+
+
+def record(product, timeStamp, seats=5, expiryDate=None):
+    return LicenceRecord(None, 'Altia', product, 'Customer', None, 'Reseller', seats, None, expiryDate,
+                         timeStamp, 'code' + str(timeStamp), 1, None)
+
+
+def write_licence(key, product, timeStamp, seats=5):
+    lic = ElementTree.Element('Licence1')
+    for tag, text in (('Company', 'Altia'), ('Product', product), ('Customer', 'Customer'), ('Reference', None),
+                      ('Reseller', None), ('NumberOfSeats', str(seats)), ('StartDate', None), ('ExpiryDate', None),
+                      ('TimeStamp', str(timeStamp)), ('Code', ''), ('Comments', None)):
+        ElementTree.SubElement(lic, tag).text = text
+    Utils.enforce_licence_newline(lic)
+    digest = SHA1.new(ElementTree.tostring(lic, encoding='utf-8', method='xml', xml_declaration=False))
+    lic.find('Code').text = base64.b64encode(pkcs1_15.new(key).sign(digest)).decode('ascii')
+    ElementTree.ElementTree(lic).write(os.path.join('Licences', product + str(timeStamp) + '.nls1'), encoding='utf-8')
+
+
+def test_bundle_round_trip(tmp_path):
+    fileName = str(tmp_path / LicenceBundle.DefaultFileName)
+    licences = [record('Other', 3), record('Product', 1, expiryDate='01/Jan/2099'), record('Product', 2, 7)]
+    LicenceBundle.Write(fileName, b'f' * 32, licences)
+
+    with LicenceBundle.Open(fileName, b'f' * 32) as bundle:
+        assert bundle.Count == 3
+        assert [lic.TimeStamp for lic in bundle.GetLicences('PRODUCT')] == [2, 1], "Licences not found by product"
+        assert bundle.GetLicences('Product')[1] == licences[1], "Licence not read back as written"
+        assert bundle.GetLicences('Missing') == [], "Licences found for a missing product"
+        assert sorted(lic.TimeStamp for lic in bundle.GetAllLicences()) == [1, 2, 3]
+    assert LicenceBundle.Open(fileName, b'g' * 32) is None, "Bundle of another licence folder trusted"
+
+    with open(fileName, 'r+b') as file:
+        file.seek(-1, os.SEEK_END)
+        file.write(b'\x00')
+    assert LicenceBundle.Open(fileName, b'f' * 32) is None, "Corrupt bundle trusted"
+
+
+def test_licences_loaded_from_bundle(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    key = RSA.generate(1024)
+    (tmp_path / 'public_key.pem').write_bytes(key.publickey().export_key())
+    os.mkdir('Licences')
+    write_licence(key, 'Product', 1)
+    write_licence(key, 'Product', 2, 3)
+
+    def load():
+        manager = LicenceManager('Licences', '', None, storage=MemoryStorage())
+        manager.UseLicenceBundle = True
+        manager.LoadLicences()
+        return manager
+
+    assert load().TotalSeats('Product') == 3
+    assert os.path.isfile(LicenceBundle.DefaultFileName), "Bundle not built"
+
+    verified = []
+    verify = RSAVerify.Verify
+    monkeypatch.setattr(RSAVerify, 'Verify', lambda self, *args: verified.append(args) or verify(self, *args))
+    manager = load()
+    assert verified == [], "Bundled licences verified at startup"
+    assert manager.TotalSeats('Product') == 3, "Bundled licences not loaded"
+    assert len(verified) == 2, "Bundled licences not verified lazily"
+
+    # A new licence file rebuilds the bundle...
+    write_licence(key, 'Other', 3)
+    assert load().TotalSeats('Other') == 5, "Bundle not rebuilt"
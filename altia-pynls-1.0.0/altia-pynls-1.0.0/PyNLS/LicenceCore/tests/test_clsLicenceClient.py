@@ -0,0 +1,135 @@
+from datetime import datetime, timedelta
+import time
+import pytest
+from PyNLS.LicenceCore.clsInvalidProductException import InvalidProductException
+from PyNLS.LicenceCore.clsLicenceClient import LicenceClient
+from PyNLS.LicenceCore.clsLicenceClientException import LicenceClientException
+from PyNLS.LicenceCore.clsMessage_pb2 import Message
+from PyNLS.LicenceCore.MessageType import MessageType
+
+
+def test_round_trip(server):
+    with LicenceClient(server.address, 'alice', 'host1', '10.0.0.1') as client:
+        assert client.ServerVersion() == '1.0.0', "Server version not returned"
+        assert client.QueryProducts() == ['Other', 'Product'], "Products not returned"
+        assert client.NumberOfSeats('Product') == 2, "Number of seats not returned"
+        assert client.TakeSeat('Product'), "Seat not taken"
+        assert client.HeldSeats == ['Product'], "Taken seat not held"
+        assert [u.User for u in client.QueryConnections('Product')] == ['alice'], "Connection not returned"
+        assert client.ReleaseSeat('Product'), "Seat not released"
+        assert client.HeldSeats == [], "Released seat still held"
+        with pytest.raises(InvalidProductException):
+            client.NumberOfSeats('Missing')
+
+
+def test_seat_id_sent_with_refresh_and_release(server):
+    with LicenceClient(server.address, 'alice', 'host1', '10.0.0.1') as client:
+        assert client.TakeSeat('Product')
+        seatId = client.m_SeatIds['Product']
+        assert seatId > 0, "Seat id not kept"
+        assert client.RefreshSeat('Product')
+        assert client.ReleaseSeat('Product')
+        sent = [Message.FromString(r) for r in list(server.requests)[-2:]]
+        assert [m.SeatId for m in sent] == [seatId, seatId], "Seat id not sent"
+        assert client.m_SeatIds == {}, "Released seat id kept"
+
+
+def test_pipelined_requests_share_one_connection(server):
+    with LicenceClient(server.address, 'alice', 'host1', '10.0.0.1') as client:
+        futures = [client.Request(client.CreateMessage(MessageType.NumberOfSeats, 'Product')) for _ in range(200)]
+        assert all(f.result().Content == '2' for f in futures), "Pipelined reply mismatched"
+
+
+def test_requests_not_left_waiting_after_close(server):
+    client = LicenceClient(server.address, 'alice', 'host1', '10.0.0.1', timeout=0.5)
+    client.Connect()
+    client.Close()
+    with pytest.raises(LicenceClientException):
+        client.Request(client.CreateMessage(MessageType.NumberOfSeats, 'Product'))
+
+    # Closed while a request is being made, after it has checked the client is connected...
+    client = LicenceClient(server.address, 'alice', 'host1', '10.0.0.1', timeout=0.5)
+    client.Connect()
+    requestIds = client.m_RequestIds
+
+    def close_then_number():
+        client.Close(release=False)
+        yield from requestIds
+    client.m_RequestIds = close_then_number()
+    message = client.CreateMessage(MessageType.NumberOfSeats, 'Product')
+    with pytest.raises(LicenceClientException):
+        client.Wait(client.Request(message))
+    assert client.m_Pending == {}, "Request left pending after the client stopped"
+
+
+def test_heartbeat_refreshes_held_seats(server, wait_for):
+    server.handler.Manager.HeartBeat = 1
+    with LicenceClient(server.address, 'alice', 'host1', '10.0.0.1') as client:
+        assert client.TakeSeat('Product')
+        assert client.TakeSeat('Other')
+        seen = len(server.requests)
+        assert wait_for(lambda: len(server.requests) >= seen + 4, 5), "Held seats not refreshed"
+    assert server.handler.Manager.GetConnections('Product') == [], "Seat not released on close"
+
+
+def test_batch(server):
+    with LicenceClient(server.address, 'alice', 'host1', '10.0.0.1') as client:
+        assert client.TakeSeat('Product')
+        results = client.Batch([
+            (MessageType.ReleaseSeat, 'Product'),
+            (MessageType.TakeSeat, 'Other'),
+            (MessageType.RefreshSeat, 'Other'),
+            (MessageType.TakeSeat, 'Missing'),
+        ])
+        assert results == [True, True, True, False], "Batch results not returned per item"
+        assert client.HeldSeats == ['Other'], "Batch seats not held"
+        assert len(server.requests) == 2, "Batch not sent as one request"
+
+
+def test_due_refreshes_are_batched(server, wait_for):
+    server.handler.Manager.HeartBeat = 1
+    with LicenceClient(server.address, 'alice', 'host1', '10.0.0.1') as client:
+        client.Batch([(MessageType.TakeSeat, 'Product'), (MessageType.TakeSeat, 'Other')])
+        # Put both seats on the same schedule, overdue, so they fall due together...
+        client.Hold('Product', 0.2)
+        client.Hold('Other', 0.2)
+        with client.m_Condition:
+            client.m_Schedule = [(time.monotonic() - 10, client.m_Seats[p][0], p) for p in client.HeldSeats]
+            client.m_Condition.notify()
+        assert wait_for(lambda: any(len(Message.FromString(r).Items) == 2 and
+                                    Message.FromString(r).Items[0].Type == MessageType.RefreshSeat.value
+                                    for r in list(server.requests))), "Due refreshes not batched"
+
+
+def test_retake_after_server_restart(make_manager, make_server, wait_for):
+    first = make_server(make_manager(1, ('Product', 'Other')))
+    lost = []
+    client = LicenceClient(first.address, 'alice', 'host1', '10.0.0.1')
+    client.OnSeatLost = lost.append
+    client.Connect()
+    assert client.TakeSeat('Product')
+    assert client.TakeSeat('Other')
+    first.stop()
+
+    # The restarted server has lost every seat and another user takes the only Other seat...
+    manager = make_manager(1, ('Product', 'Other'))
+    assert manager.TakeSeat('Other', '10.0.0.2', 'bob', 'host2')
+    make_server(manager, first.port)
+    try:
+        assert wait_for(lambda: len(manager.GetConnections('Product')) == 1), "Seat not re-taken after restart"
+        assert wait_for(lambda: lost == ['Other']), "Lost seat not reported"
+        assert client.HeldSeats == ['Product'], "Lost seat still held"
+    finally:
+        client.Close()
+
+
+def test_release_and_expire_seats_in_bulk(server, admin_secret):
+    with LicenceClient(server.address, 'alice', 'lab1', '10.0.0.1') as alice, \
+            LicenceClient(server.address, 'bob', 'lab1', '10.0.0.2', adminSecret=admin_secret) as bob:
+        assert alice.TakeSeat('Product') and alice.TakeSeat('Other') and bob.TakeSeat('Product')
+        assert bob.ReleaseSeats(host='lab1', product='Product') == {'product': 2}, "Host seats not released"
+        assert bob.ExpireSeats(datetime.now() + timedelta(seconds=1)) == {'other': 1}, "Old seats not expired"
+        with pytest.raises(LicenceClientException):
+            bob.ReleaseSeats()
+        with pytest.raises(LicenceClientException):
+            alice.ReleaseSeats(host='lab1')
@@ -0,0 +1,181 @@
+import os
+from datetime import datetime, timedelta
+import logging
+import socket
+import threading
+import pytest
+from PyNLS.LicenceCore.clsLicenceManager import LicenceManager
+from PyNLS.LicenceCore.clsClock import SimulatedClock
+from PyNLS.LicenceCore.clsConfig import Config
+from PyNLS.LicenceCore.clsLicenceReader import LicenceReader
+from PyNLS.LicenceCore.clsMemoryStorage import MemoryStorage
+from PyNLS.LicenceCore.EventId import EventId
+
+
+def test_in_memory_snapshot_restore(tmp_path, monkeypatch, make_licence):
+    monkeypatch.chdir(tmp_path)
+    manager = LicenceManager('', '', None, inMemory=True, snapshotInterval=0)
+    manager.DoubleValidation = False
+    manager.Storage.LoadLicences([make_licence('Product', 2)])
+    assert manager.TakeSeat('Product', '10.0.0.1', 'alice', 'host1')
+    assert manager.TakeSeat('Product', '10.0.0.2', 'bob', 'host2')
+    assert not manager.TakeSeat('Product', '10.0.0.3', 'carol', 'host3'), "Seat taken beyond licence limit"
+    assert not os.path.isfile(manager.DataFile), "Data file written before snapshot"
+    manager.Shutdown()
+    assert os.path.isfile(manager.DataFile), "Shutdown did not snapshot the seat store"
+
+    restored = LicenceManager('', '', None, inMemory=True, snapshotInterval=0)
+    assert len(restored.GetConnections('Product')) == 2, "Seats not restored from snapshot"
+    restored.Shutdown()
+
+
+@pytest.mark.parametrize('inMemory', [False, True], ids=['sqlite', 'sqlite-memory'])
+def test_concurrent_take_seat_never_oversubscribes(tmp_path, monkeypatch, inMemory, make_licence):
+    monkeypatch.chdir(tmp_path)
+    manager = LicenceManager('', '', None, inMemory=inMemory, snapshotInterval=0)
+    manager.DoubleValidation = False
+    manager.Storage.LoadLicences([make_licence('Product', 5, 1), make_licence('Other', 3, 2)])
+    threads = 16
+    barrier = threading.Barrier(threads)
+    taken = {'Product': [], 'Other': []}
+
+    def worker(index):
+        barrier.wait()
+        for product in ('Product', 'Other'):
+            for attempt in range(4):
+                user = 'user' + str(index) + '_' + str(attempt)
+                if manager.TakeSeat(product, '10.0.' + str(index) + '.' + str(attempt), user, 'host'):
+                    taken[product].append(user)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    assert len(taken['Product']) == 5, "Product seats taken: " + str(len(taken['Product']))
+    assert len(taken['Other']) == 3, "Other seats taken: " + str(len(taken['Other']))
+    assert len(manager.GetConnections('Product')) == 5, "Product oversubscribed in storage"
+    assert len(manager.GetConnections('Other')) == 3, "Other oversubscribed in storage"
+    manager.Shutdown()
+
+
+def test_seat_expires_by_advertised_heartbeat(tmp_path, monkeypatch, make_licence):
+    monkeypatch.chdir(tmp_path)
+    manager = LicenceManager('', '', None)
+    manager.DoubleValidation = False
+    manager.Storage.LoadLicences([make_licence('Product', 2)])
+    assert manager.RecommendedHeartBeat == manager.HeartBeat, "Idle server advertised a stretched heartbeat"
+    assert manager.TakeSeat('Product', '10.0.0.1', 'alice', 'host1')
+    assert manager.TakeSeat('Product', '10.0.0.2', 'bob', 'host2', timedelta(seconds=1200))
+    later = datetime.now() + timedelta(seconds=600)
+    assert [c.UserName for c in manager.Storage.GetConnections('Product', later)] == ['bob'], \
+        "Seat not kept alive by its advertised heartbeat"
+    manager.Shutdown()
+
+
+def test_simulated_clock_drives_seats_and_licence_expiry(tmp_path, monkeypatch, make_licence):
+    monkeypatch.chdir(tmp_path)
+    clock = SimulatedClock(datetime(2030, 1, 1, 12, 0, 0))
+    manager = LicenceManager('', '', None, clock=clock)
+    manager.DoubleValidation = False
+    manager.Storage.LoadLicences([make_licence('Product', 1, expiryDate='02/Jan/2030')])
+    assert manager.TakeSeat('Product', '10.0.0.1', 'alice', 'host1')
+    assert not manager.TakeSeat('Product', '10.0.0.2', 'bob', 'host2'), "Seat taken beyond licence limit"
+    clock.Advance(manager.HeartBeat.total_seconds() + manager.FudgeFactor + 1)
+    assert manager.TakeSeat('Product', '10.0.0.2', 'bob', 'host2'), "Stale seat not freed by the clock"
+    clock.Advance(86400)
+    assert manager.TotalSeats('Product') == 0, "Expired licence still active"
+    manager.Shutdown()
+
+
+def test_public_key_read_once(tmp_path, monkeypatch, make_licence):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'public_key.pem').write_text('key')
+    monkeypatch.setattr(LicenceReader, 'VerifyWithFile', lambda key, lic: key == 'key')
+    manager = LicenceManager('', '', None, storage=MemoryStorage())
+    manager.Storage.LoadLicences([make_licence('Product', 2), make_licence('Other', 1, timestamp=2)])
+    assert manager.TotalSeats('Product') == 2
+    os.remove(str(tmp_path / 'public_key.pem'))
+    assert manager.TotalSeats('Other') == 1, "Public key read again for each licence"
+    manager.Shutdown()
+
+
+def test_services_built_from_configuration(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config = Config()
+    config.Clock = SimulatedClock()
+    config.InMemoryDatabase = True
+    config.SnapshotInterval = 5
+    config.HeartBeat = 60
+    config.MaximumHeartBeat = 600
+    config.LicenceBundle = True
+    config.SlowQueryThreshold = 50
+    config.SeatJournal = True
+    config.ClaimWindow = 5
+    config.WarmRestart = True
+    manager = LicenceManager('', '', None, config=config)
+    assert manager.Clock is config.Clock, "Clock not taken from the configuration"
+    assert manager.Storage.InMemory and manager.Storage.m_SnapshotInterval == 5, "Seat store not held in memory"
+    assert manager.HeartBeat == timedelta(seconds=60) and manager.MaximumHeartBeat == timedelta(seconds=600)
+    assert manager.UseLicenceBundle, "Licence bundle not used"
+    assert manager.QueryProfiler is not None and manager.Storage.Profiler is manager.QueryProfiler
+    assert manager.Journal.Folder == os.path.join(str(tmp_path), 'Journal'), "Seat journal not opened"
+    assert manager.WaitQueue.ClaimWindow == 5, "Seat wait queue not built"
+    assert manager.SeatSnapshot.FileName == os.path.join(str(tmp_path), 'Seats.nlss'), "Seat snapshot not kept"
+    manager.Shutdown()
+
+    manager = LicenceManager('', '', None, inMemory=False, config=config)
+    assert not manager.Storage.InMemory, "Argument overridden by the configuration"
+    manager.Shutdown()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def test_replication_and_seat_pool_built_from_configuration(tmp_path, make_manager, wait_for):
+    config = Config()
+    config.ReplicationPort = free_port()
+    config.CoordinatorPort = free_port()
+    primary = make_manager(5, config=config, folder=str(tmp_path / 'primary'))
+    assert primary.Replication is not None, "Seat changes not replicated"
+    assert primary.Coordinator.Port == config.CoordinatorPort, "Seat pool not coordinated"
+
+    standbyConfig = Config()
+    standbyConfig.PrimaryAddress = 'tcp://127.0.0.1:' + str(config.ReplicationPort)
+    standby = make_manager(5, config=standbyConfig, folder=str(tmp_path / 'standby'))
+    # The standby is started by the server once its licences are loaded...
+    standby.Standby.Start()
+    assert wait_for(lambda: standby.Standby.Synced), "Standby not following the primary"
+    assert primary.TakeSeat('Product', '10.0.0.1', 'alice', 'host1')
+    assert wait_for(lambda: len(standby.GetConnections('Product')) == 1), "Seat not replicated to the standby"
+
+    nodeConfig = Config()
+    nodeConfig.CoordinatorAddress = 'tcp://127.0.0.1:' + str(config.CoordinatorPort)
+    node = make_manager(5, config=nodeConfig, folder=str(tmp_path / 'node'))
+    assert node.SeatPool is not None and len(primary.Coordinator.m_Leases) == 1, "Node not registered"
+
+    for manager in (node, standby, primary):
+        manager.Shutdown()
+    assert primary.Replication is None and primary.Coordinator is None
+    assert standby.Standby is None and node.SeatPool is None
+
+
+def test_recent_events_kept_as_configured(make_manager):
+    config = Config()
+    config.RecentEvents = 8
+    manager = make_manager(2, config=config)
+    assert manager.RecentEvents.Capacity == 8, "Recent events ring not built from the configuration"
+    manager.TakeSeat('Product', '10.0.0.1', 'alice', 'host1')
+    logging.getLogger().critical('no such table', extra={'EventId': EventId.TakeSeatSQLError})
+    assert [e.EventId for e in manager.RecentEvents.Query()] == [EventId.TakeSeatSQLError, EventId.SeatTaken], \
+        "Recent events ring not attached to the log"
+    manager.Shutdown()
+    logging.getLogger().critical('no such table', extra={'EventId': EventId.TakeSeatSQLError})
+    assert manager.RecentEvents.Count == 2, "Recent events ring not detached on shutdown"
+
+    config.RecentEvents = 0
+    assert make_manager(2, config=config).RecentEvents is None, "Recent events kept when disabled"
+    assert make_manager(2).RecentEvents is None, "Recent events kept without a configuration"
@@ -0,0 +1,69 @@
+import base64
+import os
+from xml.etree import ElementTree
+from Crypto.Hash import SHA1
+from Crypto.PublicKey import RSA
+from Crypto.Signature import pkcs1_15
+from PyNLS.LicenceCore.clsLicenceManager import LicenceManager
+from PyNLS.LicenceCore.clsLicenceReader import LicenceReader
+from PyNLS.LicenceCore.clsMemoryStorage import MemoryStorage
+from PyNLS.LicenceCore.clsUtils import Utils
+
+
+def signed_licence(key, product, timeStamp, seats=5):
+    lic = ElementTree.Element('Licence1')
+    for tag, text in (('Company', 'Altia'), ('Product', product), ('Customer', 'Customer'), ('Reference', None),
+                      ('Reseller', None), ('NumberOfSeats', str(seats)), ('StartDate', None), ('ExpiryDate', None),
+                      ('TimeStamp', str(timeStamp)), ('Code', ''), ('Comments', None)):
+        ElementTree.SubElement(lic, tag).text = text
+    Utils.enforce_licence_newline(lic)
+    digest = SHA1.new(ElementTree.tostring(lic, encoding='utf-8', method='xml', xml_declaration=False))
+    lic.find('Code').text = base64.b64encode(pkcs1_15.new(key).sign(digest)).decode('ascii')
+    return lic
+
+
+def write_container(path, licences):
+    container = ElementTree.Element('Licences')
+    container.text = '\n  '
+    for lic in licences:
+        lic.tail = '\n  '
+        container.append(lic)
+    ElementTree.ElementTree(container).write(path, encoding='utf-8')
+
+
+def test_container_licences_streamed(tmp_path):
+    key = RSA.generate(1024)
+    write_container(str(tmp_path / 'many.nls1'), [signed_licence(key, 'Product', t) for t in range(1, 4)])
+    public_key = key.publickey().export_key().decode('ascii')
+
+    timeStamps = []
+    previous = None
+    for lic in LicenceReader().ReadLicences('many.nls1', str(tmp_path)):
+        assert previous is None or len(previous) == 0, "Previous licence not cleared"
+        assert LicenceReader.VerifyWithFile(public_key, lic), "Container licence not verified"
+        timeStamps.append(lic.find('TimeStamp').text)
+        previous = lic
+    assert timeStamps == ['1', '2', '3'], "Container licences not read"
+
+    reader = LicenceReader()
+    reader.Read('many.nls1', str(tmp_path))
+    assert reader.Licence1.find('TimeStamp').text == '1', "First container licence not read"
+
+
+def test_licences_read_from_licence_folder(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    key = RSA.generate(1024)
+    (tmp_path / 'public_key.pem').write_bytes(key.publickey().export_key())
+    os.mkdir('Customer')
+    write_container(os.path.join('Customer', 'many.nls1'),
+                    [signed_licence(key, 'Product', 1), signed_licence(key, 'Other', 2, 3)])
+    ElementTree.ElementTree(signed_licence(key, 'Single', 3, 2)).write(os.path.join('Customer', 'one.nls1'),
+                                                                      encoding='utf-8')
+    forged = signed_licence(key, 'Forged', 4)
+    forged.find('NumberOfSeats').text = '500'
+    ElementTree.ElementTree(forged).write(os.path.join('Customer', 'forged.nls1'), encoding='utf-8')
+
+    manager = LicenceManager('Customer', '', None, storage=MemoryStorage())
+    manager.LoadLicences()
+    assert manager.GetProducts() == ['Other', 'Product', 'Single'], "Licences not read from the licence folder"
+    assert manager.TotalSeats('Other') == 3
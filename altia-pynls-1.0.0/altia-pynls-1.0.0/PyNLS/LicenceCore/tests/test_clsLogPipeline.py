@@ -0,0 +1,66 @@
+import logging
+import os
+from PyNLS.LicenceCore.clsConfig import Config
+from PyNLS.LicenceCore.clsLogPipeline import LogPipeline
+from PyNLS.LicenceCore.EventId import EventId
+
+
+def test_records_tagged_with_event_id(tmp_path):
+    logger = logging.getLogger('test.pipeline.tagged')
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    pipeline = LogPipeline(str(tmp_path / 'nls.log'), logger=logger)
+    logger.info('Loaded %d licence(s)', 3, extra={'EventId': EventId.LicenceLoad})
+    logger.debug('Not logged')
+    logger.warning('Untagged')
+    pipeline.Close()
+
+    lines = [line.split('\t') for line in (tmp_path / 'nls.log').read_text(encoding='utf-8').splitlines()]
+    assert [line[1:4] + line[5:] for line in lines] == [
+        ['INFO', '1030', 'LicenceLoad', 'Loaded 3 licence(s)'],
+        ['WARNING', '0', '-', 'Untagged'],
+    ], "Records not written with their event id"
+    assert logger.handlers == [], "Queue handler not removed on close"
+
+
+def test_log_rotated_by_size(tmp_path):
+    logger = logging.getLogger('test.pipeline.rotated')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    pipeline = LogPipeline(str(tmp_path / 'nls.log'), maximumFileSize=1, numberOfLogs=3, logger=logger)
+    for i in range(200):
+        logger.info('Record %d', i)
+    pipeline.Close()
+
+    assert sorted(os.listdir(tmp_path)) == ['nls.log', 'nls.log.1', 'nls.log.2'], "Log not rotated to NumberOfLogs"
+    assert all(os.path.getsize(tmp_path / name) <= 1024 for name in os.listdir(tmp_path)), "Log exceeds its size"
+    assert 'Record 199' in (tmp_path / 'nls.log').read_text(encoding='utf-8'), "Latest record not in the log"
+
+
+def test_log_rotated_by_size_in_bytes(tmp_path):
+    logger = logging.getLogger('test.pipeline.bytes')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    pipeline = LogPipeline(str(tmp_path / 'nls.log'), maximumFileSize=1, numberOfLogs=3, logger=logger)
+    for i in range(50):
+        logger.info('Licence für Jürgen Müller %d', i)
+    pipeline.Close()
+
+    assert all(os.path.getsize(tmp_path / name) <= 1024 for name in os.listdir(tmp_path)), \
+        "Log size counted in characters rather than bytes"
+
+
+def test_manager_logs_as_configured(make_manager, tmp_path):
+    config = Config()
+    config.LogFile = 'nls.log'
+    handlers = list(logging.getLogger().handlers)
+    level = logging.getLogger().level
+    manager = make_manager(1, config=config)
+    assert manager.LogPipeline.FileName == str(tmp_path / 'nls.log'), "Log not written to the data folder"
+    assert logging.getLogger().level == level, "Level of the application's root logger changed"
+    logging.getLogger().warning('Configured', extra={'EventId': EventId.LicenceLoad})
+    manager.Shutdown()
+
+    assert 'LicenceLoad' in (tmp_path / 'nls.log').read_text(encoding='utf-8'), "Log not written to the log file"
+    assert logging.getLogger().handlers == handlers, "Log pipeline not closed on shutdown"
+    assert make_manager(1).LogPipeline is None, "Log written to a file without a configuration"
@@ -0,0 +1,109 @@
+import logging
+import sqlite3
+import pytest
+from PyNLS.LicenceCore.clsLicenceManager import LicenceManager
+from PyNLS.LicenceCore.clsMessage_pb2 import Message
+from PyNLS.LicenceCore.clsQueryProfiler import QueryProfiler, ProfiledConnection, ProfiledCursor
+from PyNLS.LicenceCore.clsRequestHandler import RequestHandler
+from PyNLS.LicenceCore.clsStorage import SeatOperation
+from PyNLS.LicenceCore.MessageType import MessageType
+
+
+@pytest.fixture(params=[False, True], ids=['sqlite', 'sqlite-memory'])
+def manager(request, tmp_path, monkeypatch, make_licence):
+    monkeypatch.chdir(tmp_path)
+    manager = LicenceManager('', '', None, inMemory=request.param, snapshotInterval=0)
+    manager.DoubleValidation = False
+    manager.Storage.LoadLicences([make_licence('Product', 50)])
+    yield manager
+    manager.Shutdown()
+
+
+def test_seat_calls_stay_within_budget(manager):
+    profiler = QueryProfiler(slowThreshold=0)
+    manager.QueryProfiler = profiler
+    for user in range(10):
+        manager.TakeSeat('Product', '10.0.0.' + str(user), 'user' + str(user), 'host')
+    # Taking a seat costs the same however many seats are taken...
+    with profiler.Measure('TakeSeat') as take:
+        manager.TakeSeat('Product', '10.0.0.99', 'user99', 'host')
+    assert take.Statements <= 5, "TakeSeat ran " + str(take.Statements) + " statements: " + str(take.Sql)
+    with profiler.Measure('RefreshSeat') as refresh:
+        manager.RefreshSeat('Product', '10.0.0.1', 'user1', 'host')
+    assert refresh.Statements <= 3, "RefreshSeat ran " + str(refresh.Statements) + " statements"
+    with profiler.Measure('ReleaseSeat') as release:
+        manager.ReleaseSeat('Product', '10.0.0.1', 'user1')
+    assert release.Statements == 1, "ReleaseSeat ran " + str(release.Statements) + " statements"
+    with profiler.Measure('QueryConnections') as query:
+        manager.GetConnections('Product')
+    assert query.Statements == 1, "Connections read a query per seat"
+    # A batch shares its licence reads and transaction between its items...
+    operations = [SeatOperation(MessageType.RefreshSeat, 'Product', '10.0.0.' + str(u), 'user' + str(u), 'host')
+                  for u in range(2, 10)]
+    with profiler.Measure('Batch') as batch:
+        manager.ExecuteBatch(operations)
+    assert batch.Statements <= 1 + 2 * len(operations), "Batch ran " + str(batch.Statements) + " statements"
+    assert profiler.Calls['TakeSeat'] == (1, take.Statements, take.Statements), "Call statistics not recorded"
+    assert sum(s.Count for s in profiler.Statements.values()) >= 10 * take.Statements, "Statements not timed"
+
+
+def test_seat_id_hits_primary_key(manager, tmp_path):
+    seatId = manager.TakeSeat('Product', '10.0.0.1', 'alice', 'host')
+    fileName = str(tmp_path / 'SlowQuery.log')
+    profiler = QueryProfiler(slowThreshold=1e-9, fileName=fileName)
+    manager.QueryProfiler = profiler
+    with profiler.Measure('RefreshSeat') as refresh:
+        assert manager.RefreshSeat('Product', '10.0.0.1', 'alice', 'host', seatId=seatId) == seatId
+    assert refresh.Statements == 2, "Refresh by seat id ran " + str(refresh.Sql)
+    with profiler.Measure('ReleaseSeat') as release:
+        manager.ReleaseSeat('Product', '10.0.0.1', 'alice', seatId)
+    assert release.Statements == 1, "Release by seat id ran " + str(release.Sql)
+    assert manager.GetConnections('Product') == [], "Seat not released by its id"
+    with open(fileName, encoding='utf-8') as log:
+        plans = log.read()
+    assert plans.count('USING INTEGER PRIMARY KEY') >= 2, "Seat not found by its primary key: " + plans
+
+
+def test_requests_measured_by_message_type(manager):
+    profiler = QueryProfiler(slowThreshold=0)
+    manager.QueryProfiler = profiler
+    handler = RequestHandler(manager, '1.0.0')
+    message = Message()
+    message.Type = MessageType.TakeSeat.value
+    message.Licence.Product = 'Product'
+    message.Body.add(User='alice', Host='host', IP='10.0.0.1')
+    handler.Handle(message.SerializeToString())
+    assert profiler.Calls['TakeSeat'].Calls == 1, "Request not measured"
+
+
+def test_slow_statements_logged_with_plan(manager, tmp_path):
+    fileName = str(tmp_path / 'SlowQuery.log')
+    profiler = QueryProfiler(slowThreshold=1e-9, fileName=fileName)
+    manager.QueryProfiler = profiler
+    manager.GetConnections('Product')
+    assert profiler.SlowQueries >= 1, "Slow statement not counted"
+    with open(fileName, encoding='utf-8') as log:
+        text = log.read()
+    assert 'FROM connection' in text, "Slow statement not logged"
+    assert 'USING INDEX' in text, "Query plan not logged"
+
+
+def test_budget_overrun_logged(manager, caplog):
+    manager.QueryProfiler = QueryProfiler(slowThreshold=0, budgets={'TakeSeat': 1})
+    with caplog.at_level(logging.WARNING):
+        with manager.MeasureQueries('TakeSeat'):
+            manager.TakeSeat('Product', '10.0.0.1', 'alice', 'host')
+    assert any('its budget is 1' in r.getMessage() for r in caplog.records), "Budget overrun not logged"
+
+
+def test_plain_cursors_without_profiler(tmp_path):
+    connection = sqlite3.connect(str(tmp_path / 'test.db3'), factory=ProfiledConnection)
+    try:
+        assert type(connection.cursor()) is sqlite3.Cursor, "Cursor profiled without a profiler"
+        connection.Profiler = QueryProfiler(slowThreshold=0)
+        assert type(connection.cursor()) is ProfiledCursor, "Cursor not profiled"
+        with connection.Profiler.Measure('Select') as measure:
+            assert connection.execute('SELECT 1;').fetchone() == (1,)
+        assert measure.Statements == 1, "Connection shortcut not profiled"
+    finally:
+        connection.close()
@@ -0,0 +1,78 @@
+from PyNLS.LicenceCore import clsRateLimiter
+from PyNLS.LicenceCore.clsRateLimiter import RateLimit, RateLimiter
+from PyNLS.LicenceCore.MessageType import MessageType
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_burst_then_refill(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(clsRateLimiter.time, 'monotonic', clock)
+    limiter = RateLimiter({MessageType.TakeSeat: RateLimit(2.0, 3)})
+    admitted = [limiter.Admit(MessageType.TakeSeat, '10.0.0.1') for _ in range(5)]
+    assert admitted == [True, True, True, False, False], "Burst not enforced"
+    clock.now += 0.5
+    assert limiter.Admit(MessageType.TakeSeat, '10.0.0.1'), "Bucket not refilled at the rate"
+    assert not limiter.Admit(MessageType.TakeSeat, '10.0.0.1'), "Bucket refilled beyond the rate"
+    clock.now += 60
+    assert [limiter.Admit(MessageType.TakeSeat, '10.0.0.1') for _ in range(4)] == [True] * 3 + [False], \
+        "Bucket refilled beyond the burst"
+    assert limiter.Throttled == {'TakeSeat': 4}, "Throttled requests not counted"
+    assert limiter.ThrottledClients == {'ip:10.0.0.1': 4}, "Throttled clients not counted"
+
+
+def test_each_ip_address_limited_separately(monkeypatch):
+    monkeypatch.setattr(clsRateLimiter.time, 'monotonic', Clock())
+    limiter = RateLimiter({MessageType.QueryConnections: RateLimit(1.0, 2)})
+    assert limiter.Admit(MessageType.QueryConnections, '10.0.0.1')
+    assert limiter.Admit(MessageType.QueryConnections, '10.0.0.1')
+    assert not limiter.Admit(MessageType.QueryConnections, '10.0.0.1'), "IP Address not limited"
+    assert limiter.Admit(MessageType.QueryConnections, '10.0.0.2'), "Another IP Address limited"
+    assert limiter.ThrottledClients == {'ip:10.0.0.1': 1}, "Wrong client counted"
+    assert limiter.Admit(MessageType.ReleaseSeat, '10.0.0.1'), "Unlimited message type throttled"
+
+
+def test_users_limited_by_ip_address_and_user(monkeypatch):
+    monkeypatch.setattr(clsRateLimiter.time, 'monotonic', Clock())
+    limiter = RateLimiter({MessageType.TakeSeat: RateLimit(1.0, 2)})
+    assert limiter.Admit(MessageType.TakeSeat, '10.0.0.1', 'alice')
+    assert limiter.Admit(MessageType.TakeSeat, '10.0.0.2', 'alice')
+    assert not limiter.Admit(MessageType.TakeSeat, '10.0.0.3', 'alice'), "User not limited across IP Addresses"
+    assert limiter.Admit(MessageType.TakeSeat, '10.0.0.1', 'bob')
+    assert not limiter.Admit(MessageType.TakeSeat, '10.0.0.1', 'carol'), "IP Address not limited across users"
+    assert limiter.ThrottledClients == {'user:alice': 1, 'ip:10.0.0.1': 1}, "Wrong clients counted"
+    # Without a peer address only the user is limited, rather than a bucket shared by every such request...
+    assert limiter.Admit(MessageType.TakeSeat, '', 'dave') and limiter.Admit(MessageType.TakeSeat, '', 'dave')
+    assert not limiter.Admit(MessageType.TakeSeat, '', 'dave'), "User without an IP Address not limited"
+    assert limiter.Admit(MessageType.TakeSeat, '', 'erin'), "Users without an IP Address share a bucket"
+
+
+def test_least_recently_used_bucket_forgotten(monkeypatch):
+    monkeypatch.setattr(clsRateLimiter.time, 'monotonic', Clock())
+    monkeypatch.setattr(RateLimiter, 'MaximumBuckets', 3)
+    limiter = RateLimiter({MessageType.TakeSeat: RateLimit(1.0, 1)})
+    for client in range(3):
+        assert limiter.Admit(MessageType.TakeSeat, '10.0.0.' + str(client))
+    assert not limiter.Admit(MessageType.TakeSeat, '10.0.0.0'), "Bucket not kept"
+    assert limiter.Admit(MessageType.TakeSeat, '10.0.1.1')
+    assert len(limiter.m_Buckets) == 3, "Buckets not capped"
+    assert not limiter.Admit(MessageType.TakeSeat, '10.0.0.0'), "Recently used bucket forgotten"
+    assert limiter.Admit(MessageType.TakeSeat, '10.0.0.1'), "Least recently used bucket kept"
+
+
+def test_throttled_clients_capped(monkeypatch):
+    monkeypatch.setattr(clsRateLimiter.time, 'monotonic', Clock())
+    monkeypatch.setattr(RateLimiter, 'MaximumBuckets', 3)
+    limiter = RateLimiter({MessageType.TakeSeat: RateLimit(0.001, 1)})
+    # A client cycling its user name must not grow the counts without end...
+    for user in ('alice', 'bob', 'carol', 'dave', 'erin'):
+        limiter.Admit(MessageType.TakeSeat, '', user)
+        assert not limiter.Admit(MessageType.TakeSeat, '', user)
+    assert limiter.ThrottledClients == {'user:carol': 1, 'user:dave': 1, 'user:erin': 1}, "Throttled clients not capped"
+    assert limiter.Throttled == {'TakeSeat': 5}
@@ -0,0 +1,97 @@
+import multiprocessing
+import time
+from datetime import datetime, timedelta
+from PyNLS.LicenceCore.clsClock import SimulatedClock
+from PyNLS.LicenceCore.clsReplicationPrimary import ReplicationPrimary, SeatChange
+from PyNLS.LicenceCore.clsReplicationStandby import ReplicationStandby
+from PyNLS.LicenceCore.MessageType import MessageType
+
+USERS = 200
+
+
+def run_primary(make_manager, folder, messages, start):
+    """
+    Runs a primary in its own process, taking every user's seat and releasing the even users' seats.
+    """
+    manager = make_manager(USERS, folder=folder)
+    primary = ReplicationPrimary(manager.Storage, 'tcp://127.0.0.1:0', manager.Clock)
+    manager.Replication = primary
+    # Seats taken before the standby joins arrive in its snapshot...
+    for user in range(0, USERS, 4):
+        manager.TakeSeat('Product', '10.0.0.' + str(user), 'user' + str(user), 'host')
+    primary.Start()
+    messages.put(primary.Port)
+    start.wait()
+    for user in range(USERS):
+        manager.TakeSeat('Product', '10.0.0.' + str(user), 'user' + str(user), 'host')
+        manager.RefreshSeat('Product', '10.0.0.' + str(user), 'user' + str(user), 'host')
+    for user in range(0, USERS, 2):
+        manager.ReleaseSeat('Product', '10.0.0.' + str(user), 'user' + str(user))
+    messages.put(primary.Sequence)
+    # Wait to be killed, as a failed host would be...
+    time.sleep(60)
+
+
+def test_encode_decode():
+    change = SeatChange(7, MessageType.TakeSeat, 1600000000.25, 1600000330.5, 'product', 'üser', '10.0.0.1', 'host')
+    data = ReplicationPrimary.Encode(change) + ReplicationPrimary.Encode(change._replace(Sequence=8))
+    first, offset = ReplicationPrimary.Decode(data)
+    second, end = ReplicationPrimary.Decode(data, offset)
+    assert first == change and second.Sequence == 8 and end == len(data), "Seat change not round tripped"
+
+
+def test_snapshot_and_lag_timed_by_the_manager_clocks(make_manager, wait_for):
+    start = datetime(2000, 1, 1)
+    manager = make_manager(5, clock=SimulatedClock(start))
+    manager.Replication = ReplicationPrimary(manager.Storage, 'tcp://127.0.0.1:0', manager.Clock)
+    manager.TakeSeat('Product', '10.0.0.1', 'alice', 'host')
+    manager.Replication.Start()
+    # The standby's clock is two seconds ahead of the primary's...
+    standby = ReplicationStandby(make_manager(5, clock=SimulatedClock(start + timedelta(seconds=2))),
+                                 'tcp://127.0.0.1:' + str(manager.Replication.Port))
+    try:
+        standby.Start()
+        assert wait_for(lambda: standby.Synced), "Snapshot not applied"
+        assert len(standby.Manager.GetConnections('Product')) == 1, "Live seat left out of the snapshot"
+        manager.TakeSeat('Product', '10.0.0.2', 'bob', 'host')
+        assert wait_for(lambda: standby.Sequence == manager.Replication.Sequence), "Change not applied"
+        assert standby.Lag == 2.0, "Replication lag not measured by the clocks of the managers"
+    finally:
+        standby.Takeover()
+        manager.Shutdown()
+
+
+def test_standby_takes_over_with_seats_intact(tmp_path, make_manager, wait_for):
+    context = multiprocessing.get_context('spawn')
+    messages = context.Queue()
+    start = context.Event()
+    process = context.Process(target=run_primary, args=(make_manager, str(tmp_path / 'primary'), messages, start),
+                              daemon=True)
+    process.start()
+    standby = None
+    try:
+        port = messages.get(timeout=30)
+        manager = make_manager(USERS, folder=str(tmp_path / 'standby'))
+        lost = []
+        standby = ReplicationStandby(manager, 'tcp://127.0.0.1:' + str(port), takeoverTimeout=1.0)
+        standby.OnPrimaryLost = lambda: lost.append(True)
+        standby.Start()
+        assert wait_for(lambda: standby.Synced, 10), "Snapshot not applied"
+        assert len(manager.GetConnections('Product')) == USERS // 4, "Snapshot seats not restored"
+
+        start.set()
+        sequence = messages.get(timeout=30)
+        assert wait_for(lambda: standby.Sequence == sequence, 10), "Standby did not catch up"
+        assert 0 < standby.MaximumLag < 5, "Replication lag not measured"
+
+        process.kill()
+        assert wait_for(lambda: lost, 10), "Primary loss not reported"
+        standby.Takeover()
+        users = sorted(int(c.User[4:]) for c in manager.GetConnections('Product'))
+        assert users == list(range(1, USERS, 2)), "Seats not intact after takeover"
+        assert manager.TakeSeat('Product', '10.0.0.1', 'user1', 'host'), "Own seat not re-taken after takeover"
+    finally:
+        if standby is not None:
+            standby.Takeover()
+        process.kill()
+        process.join()
@@ -0,0 +1,224 @@
+import os
+import threading
+from PyNLS.LicenceCore.clsConfig import Config
+from PyNLS.LicenceCore.clsEventRing import EventRing
+from PyNLS.LicenceCore.clsMessage_pb2 import Message
+from PyNLS.LicenceCore.clsRateLimiter import RateLimit, RateLimiter
+from PyNLS.LicenceCore.clsRequestHandler import RequestHandler
+from PyNLS.LicenceCore.clsSeatSnapshot import SeatSnapshot
+from PyNLS.LicenceCore.clsSeatWaitQueue import SeatWaitQueue
+from PyNLS.LicenceCore.MessageType import MessageType
+from PyNLS.LicenceCore.ErrorCode import ErrorCode
+
+def request(messageType, product='Product', user='alice', secret=''):
+    message = Message()
+    message.Type = messageType.value
+    message.Licence.Product = product
+    message.Body.add(User=user, Host='host', IP='10.0.0.1')
+    message.Comments = secret
+    return message.SerializeToString()
+
+
+def test_reused_messages_do_not_leak_between_requests(make_handler):
+    handler = make_handler()
+    for user in ('alice', 'bob'):
+        assert Message.FromString(handler.Handle(request(MessageType.TakeSeat, user=user))).Content == 'True'
+
+    reply = Message.FromString(handler.Handle(request(MessageType.QueryConnections)))
+    assert reply.Content == '2'
+    assert sorted(u.User for u in reply.Body) == ['alice', 'bob'], "Connections not written to the body"
+    assert all(u.LogonTime and u.UpdateTime for u in reply.Body), "Connection times not written"
+
+    reply = Message.FromString(handler.Handle(request(MessageType.NumberOfSeats)))
+    assert reply.Content == '5'
+    assert len(reply.Body) == 0 and not reply.HasField('HeartBeat'), "Previous reply leaked into the next"
+
+    reply = Message.FromString(handler.Handle(b'\xff'))
+    assert reply.Code == ErrorCode.UnknownError.value
+    assert reply.Content == '', "Previous reply leaked into the error reply"
+
+
+def test_throttled_requests_do_not_reach_the_manager(make_handler):
+    handler = RequestHandler(make_handler().Manager, '1.0.0', RateLimiter({MessageType.TakeSeat: RateLimit(0.001, 2)}))
+    for user in ('alice', 'bob'):
+        assert Message.FromString(handler.Handle(request(MessageType.TakeSeat, user=user), '10.0.0.1')).Content == 'True'
+
+    message = Message.FromString(request(MessageType.TakeSeat, user='carol'))
+    message.Body[0].IP = '10.0.0.3'
+    reply = Message.FromString(handler.Handle(message.SerializeToString(), '10.0.0.1'))
+    assert reply.Code == ErrorCode.Throttled.value and reply.Content == 'False', "Reported IP Address not ignored"
+    assert len(handler.Manager.GetConnections('Product')) == 2, "Throttled request reached the manager"
+    # The source address of the connection is limited rather than the address the client reports...
+    reply = Message.FromString(handler.Handle(request(MessageType.TakeSeat, user='dave'), '10.0.0.9'))
+    assert reply.Code == ErrorCode.NoError.value and reply.Content == 'True', "Source address not limited"
+
+    batch = Message()
+    batch.Type = MessageType.Batch.value
+    for messageType in (MessageType.TakeSeat, MessageType.ReleaseSeat):
+        item = batch.Items.add()
+        item.Type = messageType.value
+        item.Licence.Product = 'Product'
+        item.Body.add(User='alice', Host='host', IP='10.0.0.1')
+    reply = Message.FromString(handler.Handle(batch.SerializeToString(), '10.0.0.1'))
+    assert [item.Code for item in reply.Items] == [ErrorCode.Throttled.value, ErrorCode.NoError.value], \
+        "Batch items not limited as requests of their own type"
+    assert handler.RateLimiter.Throttled == {'TakeSeat': 2}, "Throttled requests not counted"
+
+
+def test_requests_without_an_address_limited_by_user(make_handler):
+    handler = RequestHandler(make_handler().Manager, '1.0.0', RateLimiter({MessageType.TakeSeat: RateLimit(0.001, 2)}))
+    for _ in range(2):
+        assert Message.FromString(handler.Handle(request(MessageType.TakeSeat, user='alice'))).Content == 'True'
+    reply = Message.FromString(handler.Handle(request(MessageType.TakeSeat, user='alice')))
+    assert reply.Code == ErrorCode.Throttled.value, "User not limited"
+    # Clients without a peer address do not share one bucket...
+    reply = Message.FromString(handler.Handle(request(MessageType.TakeSeat, user='bob')))
+    assert reply.Code == ErrorCode.NoError.value and reply.Content == 'True', "Another user throttled"
+    assert handler.RateLimiter.ThrottledClients == {'user:alice': 1}, "Throttled request not counted to its user"
+
+
+def test_handler_built_from_configuration(make_manager, admin_secret):
+    config = Config()
+    config.RateLimits = {MessageType.TakeSeat: RateLimit(0.001, 1)}
+    config.AdminSecret = admin_secret
+    handler = RequestHandler.FromConfig(make_manager(5), '1.0.0', config)
+    assert handler.RateLimiter.Limits == config.RateLimits, "Rate limits not taken from the configuration"
+    assert Message.FromString(handler.Handle(request(MessageType.TakeSeat), '10.0.0.1')).Content == 'True'
+    reply = Message.FromString(handler.Handle(request(MessageType.TakeSeat, user='bob'), '10.0.0.1'))
+    assert reply.Code == ErrorCode.Throttled.value, "Configured rate limit not enforced"
+    reply = Message.FromString(handler.Handle(request(MessageType.QueryEvents, user='', secret=admin_secret)))
+    assert reply.Code != ErrorCode.NotAuthorised.value, "Configured admin secret not accepted"
+
+    handler = RequestHandler.FromConfig(handler.Manager, '1.0.0', Config())
+    assert handler.RateLimiter is None, "Requests limited without configured limits"
+    reply = Message.FromString(handler.Handle(request(MessageType.QueryEvents, user='', secret=admin_secret)))
+    assert reply.Code == ErrorCode.NotAuthorised.value, "Admin request performed without a configured secret"
+
+
+def test_incomplete_batch_items_fail_on_their_own(make_handler):
+    handler = make_handler()
+    batch = Message()
+    batch.Type = MessageType.Batch.value
+    for messageType, user, host, ip in ((MessageType.TakeSeat, 'alice', 'host', '10.0.0.1'),
+                                        (MessageType.TakeSeat, 'bob', '', '10.0.0.2'),
+                                        (MessageType.RefreshSeat, '', 'host', '10.0.0.3'),
+                                        (MessageType.ReleaseSeat, 'carol', '', ''),
+                                        (MessageType.TakeSeat, 'dave', 'host', '10.0.0.4')):
+        item = batch.Items.add()
+        item.Type = messageType.value
+        item.Licence.Product = 'Product'
+        item.Body.add(User=user, Host=host, IP=ip)
+    reply = Message.FromString(handler.Handle(batch.SerializeToString()))
+    assert reply.Code == ErrorCode.NoError.value, "Batch failed for its incomplete items"
+    assert [item.Code for item in reply.Items] == [ErrorCode.NoError.value] + [ErrorCode.UnknownError.value] * 3 + \
+        [ErrorCode.NoError.value], "Incomplete items not failed on their own"
+    assert [item.Content for item in reply.Items] == ['True', 'False', 'False', 'False', 'True']
+    assert sorted(c.User for c in handler.Manager.GetConnections('Product')) == ['alice', 'dave']
+
+
+def test_seat_id_returned_and_honoured(make_handler):
+    handler = make_handler()
+    reply = Message.FromString(handler.Handle(request(MessageType.TakeSeat)))
+    assert reply.Content == 'True' and reply.SeatId > 0, "Seat id not returned"
+    refresh = Message.FromString(request(MessageType.RefreshSeat))
+    refresh.SeatId = reply.SeatId
+    assert Message.FromString(handler.Handle(refresh.SerializeToString())).SeatId == reply.SeatId
+    # A legacy client sends no seat id...
+    legacy = Message.FromString(handler.Handle(request(MessageType.RefreshSeat)))
+    assert legacy.Content == 'True' and legacy.SeatId == reply.SeatId, "Legacy refresh not performed"
+    release = Message.FromString(request(MessageType.ReleaseSeat))
+    release.SeatId = reply.SeatId
+    assert Message.FromString(handler.Handle(release.SerializeToString())).Content == 'True'
+    assert handler.Manager.GetConnections('Product') == [], "Seat not released by its id"
+
+
+def test_kill_writes_seat_snapshot(make_handler, admin_secret, tmp_path):
+    handler = make_handler()
+    handler.Manager.SeatSnapshot = SeatSnapshot(str(tmp_path / SeatSnapshot.DefaultFileName),
+                                                SeatSnapshot.LoadKey(str(tmp_path / SeatSnapshot.DefaultKeyFileName)))
+    killed = []
+    handler.OnKill = lambda: killed.append(True)
+    assert Message.FromString(handler.Handle(request(MessageType.TakeSeat))).Content == 'True'
+
+    reply = Message.FromString(handler.Handle(request(MessageType.Kill, secret=admin_secret)))
+    assert reply.Code == ErrorCode.NoError.value and killed == [True], "Server not stopped"
+    assert os.path.isfile(handler.Manager.SeatSnapshot.FileName), "Seat snapshot not written"
+
+
+def test_query_events_returns_recent_seat_events(make_handler, admin_secret):
+    handler = make_handler()
+    handler.Manager.RecentEvents = EventRing()
+    for user in ('alice', 'bob'):
+        handler.Handle(request(MessageType.TakeSeat, user=user))
+    handler.Handle(request(MessageType.ReleaseSeat, user='alice'))
+
+    reply = Message.FromString(handler.Handle(request(MessageType.QueryEvents, user='', secret=admin_secret)))
+    assert [line.split('\t')[2] for line in reply.Content.split('\n')] == ['SeatReleased', 'SeatTaken', 'SeatTaken']
+
+    message = Message.FromString(request(MessageType.QueryEvents, secret=admin_secret))
+    message.Content = 'SeatTaken'
+    reply = Message.FromString(handler.Handle(message.SerializeToString()))
+    assert reply.Content.split('\t')[4] == 'alice' and '\n' not in reply.Content, "Events not filtered"
+
+    message.Content = 'NoSuchEvent'
+    reply = Message.FromString(handler.Handle(message.SerializeToString()))
+    assert reply.Code == ErrorCode.UnknownError.value
+
+
+def test_release_seats_of_a_host(make_handler, admin_secret):
+    handler = make_handler()
+    for user in ('alice', 'bob'):
+        handler.Handle(request(MessageType.TakeSeat, user=user))
+
+    message = Message()
+    message.Type = MessageType.ReleaseSeats.value
+    message.Comments = admin_secret
+    message.Body.add()
+    reply = Message.FromString(handler.Handle(message.SerializeToString()))
+    assert reply.Code == ErrorCode.UnknownError.value, "Every seat released without a filter"
+
+    message.Body[0].Host = 'host'
+    reply = Message.FromString(handler.Handle(message.SerializeToString()))
+    assert reply.Content == 'product\t2' and handler.Manager.GetConnections('Product') == []
+
+    handler.Handle(request(MessageType.TakeSeat))
+    message.Body[0].Host = ''
+    message.Content = '2000-01-01T00:00:00'
+    assert Message.FromString(handler.Handle(message.SerializeToString())).Content == '', "Live seat expired"
+
+
+def test_admin_requests_need_the_admin_secret(make_handler, admin_secret):
+    handler = make_handler()
+    killed = []
+    handler.OnKill = lambda: killed.append(True)
+    handler.Handle(request(MessageType.TakeSeat))
+    for messageType in (MessageType.QueryEvents, MessageType.ReleaseSeats, MessageType.Kill):
+        reply = Message.FromString(handler.Handle(request(messageType, secret='guess')))
+        assert reply.Code == ErrorCode.NotAuthorised.value, messageType.name + " performed without the admin secret"
+    assert not killed and len(handler.Manager.GetConnections('Product')) == 1, "Refused request reached the manager"
+
+    # Without an admin secret every administrative request is refused...
+    handler = RequestHandler(handler.Manager, '1.0.0')
+    reply = Message.FromString(handler.Handle(request(MessageType.Kill, secret=admin_secret)))
+    assert reply.Code == ErrorCode.NotAuthorised.value and not killed, "Server stopped without an admin secret"
+
+
+def test_wait_seat_notified_when_a_seat_is_released(make_handler):
+    handler = make_handler()
+    handler.Manager.WaitQueue = SeatWaitQueue()
+    for user in ('alice', 'bob', 'carol', 'dave', 'erin'):
+        handler.Handle(request(MessageType.TakeSeat, user=user))
+
+    message = Message.FromString(request(MessageType.WaitSeat, user='frank'))
+    reply = Message.FromString(handler.Handle(message.SerializeToString()))
+    assert reply.Content == 'False' and reply.Comments.endswith(': 1'), "Denied client not queued"
+
+    message.Content = '2'
+    replies = []
+    waiter = threading.Thread(target=lambda: replies.append(
+        Message.FromString(handler.Handle(message.SerializeToString()))))
+    waiter.start()
+    handler.Handle(request(MessageType.ReleaseSeat, user='alice'))
+    waiter.join()
+    assert replies[0].Content == 'True' and replies[0].SeatId, "Waiting client not given the released seat"
+    assert handler.Manager.WaitQueue.Depth == 0
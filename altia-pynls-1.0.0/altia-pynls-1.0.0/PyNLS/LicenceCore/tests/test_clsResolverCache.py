@@ -0,0 +1,78 @@
+import socket
+import time
+import pytest
+from PyNLS.LicenceCore.clsResolverCache import ResolverCache
+from PyNLS.LicenceCore.clsUtils import Utils
+
+
+def wait_for(condition, timeout=5.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_results_cached():
+    cache = ResolverCache()
+    calls = []
+    for _ in range(3):
+        assert cache.Get('host', lambda: calls.append(1) or '10.0.0.1') == '10.0.0.1'
+    assert len(calls) == 1, "Cached result looked up again"
+    statistics = cache.Statistics['host']
+    assert (statistics.Hits, statistics.Lookups, statistics.Failures) == (2, 1, 0), "Lookups not counted"
+
+
+def test_failed_lookups_cached():
+    cache = ResolverCache(negativeTimeToLive=60)
+    calls = []
+
+    def fail():
+        calls.append(1)
+        raise socket.gaierror('Name or service not known')
+
+    for _ in range(2):
+        with pytest.raises(socket.gaierror):
+            cache.Get('missing', fail)
+    assert len(calls) == 1, "Failed lookup not cached"
+    assert cache.Statistics['missing'].Failures == 1
+
+
+def test_results_refreshed_in_background():
+    cache = ResolverCache(timeToLive=0.1, refreshFraction=0.5)
+    assert cache.Get('host', lambda: 'old') == 'old'
+    time.sleep(0.1)
+
+    def slow():
+        time.sleep(0.5)
+        return 'new'
+
+    start = time.monotonic()
+    assert cache.Get('host', slow) == 'old', "Expired result not returned while refreshed"
+    assert time.monotonic() - start < 0.25, "Refresh blocked the caller"
+    assert wait_for(lambda: cache.Get('host', slow) == 'new'), "Result not refreshed"
+
+
+def test_failed_refresh_keeps_result():
+    cache = ResolverCache(timeToLive=0.05, refreshFraction=0.5)
+    assert cache.Get('host', lambda: '10.0.0.1') == '10.0.0.1'
+    time.sleep(0.05)
+
+    def fail():
+        raise socket.gaierror('Temporary failure in name resolution')
+
+    assert cache.Get('host', fail) == '10.0.0.1'
+    assert wait_for(lambda: cache.Statistics['host'].Failures == 1), "Refresh not attempted"
+    assert cache.Get('host', fail) == '10.0.0.1', "Failed refresh dropped the result"
+
+
+def test_local_identity_cached(monkeypatch):
+    Utils.Resolver.Clear()
+    calls = []
+    monkeypatch.setattr(socket, 'gethostname', lambda: calls.append(1) or 'host1')
+    try:
+        assert [Utils.GetHostName() for _ in range(3)] == ['host1'] * 3
+        assert len(calls) == 1, "Host name looked up again"
+    finally:
+        Utils.Resolver.Clear()
@@ -0,0 +1,74 @@
+import os
+from PyNLS.LicenceCore.EventId import EventId
+from PyNLS.LicenceCore.clsSeatJournal import SeatJournal
+
+
+def test_record_and_replay(tmp_path):
+    journal = SeatJournal(str(tmp_path))
+    journal.Record(EventId.SeatTaken, 'Product', 'alice', '10.0.0.1')
+    journal.Record(EventId.SeatRefreshed, 'PRODUCT', 'alice', '10.0.0.1')
+    journal.Record(EventId.SeatReleased, 'Other', 'bob', '10.0.0.2')
+    journal.Close()
+    events = list(SeatJournal.Replay(str(tmp_path)))
+    assert [(e.EventId, e.Product, e.UserName, e.IpAddress) for e in events] == [
+        (EventId.SeatTaken, 'product', 'alice', '10.0.0.1'),
+        (EventId.SeatRefreshed, 'product', 'alice', '10.0.0.1'),
+        (EventId.SeatReleased, 'other', 'bob', '10.0.0.2'),
+    ]
+    assert events[0].Time <= events[2].Time
+
+
+def test_rotation_keeps_number_of_files(tmp_path):
+    recordSize = SeatJournal.RecordFormat.size
+    journal = SeatJournal(str(tmp_path), maximumFileSize=10 * recordSize, numberOfFiles=3)
+    for i in range(100):
+        journal.Record(EventId.SeatRefreshed, 'Product', 'user' + str(i), '10.0.0.1')
+        if i % 7 == 0:
+            journal.Flush()
+    journal.Close()
+    assert len(SeatJournal.GetSegments(str(tmp_path))) == 3, "Old segments not deleted"
+    for name in os.listdir(str(tmp_path)):
+        if name.endswith(SeatJournal.RecordExtension):
+            assert os.path.getsize(str(tmp_path / name)) <= 10 * recordSize
+    events = list(SeatJournal.Replay(str(tmp_path)))
+    assert events[-1].UserName == 'user99'
+    assert [e.UserName for e in events] == ['user' + str(i) for i in range(100 - len(events), 100)]
+
+
+def test_reopen_starts_new_segment(tmp_path):
+    journal = SeatJournal(str(tmp_path))
+    journal.Record(EventId.SeatTaken, 'Product', 'alice', '10.0.0.1')
+    journal.Close()
+    journal = SeatJournal(str(tmp_path))
+    journal.Record(EventId.SeatReleased, 'Product', 'alice', '10.0.0.1')
+    journal.Close()
+    assert [e.EventId for e in SeatJournal.Replay(str(tmp_path))] == [EventId.SeatTaken, EventId.SeatReleased]
+
+
+def test_failed_write_does_not_corrupt_the_journal(tmp_path):
+    journal = SeatJournal(str(tmp_path))
+    writeSegment = journal.WriteSegment
+
+    def fail(strings, records):
+        journal.WriteSegment = writeSegment
+        raise OSError('Disk full')
+    journal.WriteSegment = fail
+    journal.Record(EventId.SeatTaken, 'Product', 'alice', '10.0.0.1')
+    journal.Flush()
+    journal.Record(EventId.SeatTaken, 'Product', 'alice', '10.0.0.1')
+    journal.Record(EventId.SeatReleased, 'Product', 'bob', '10.0.0.2')
+    journal.Close()
+    assert [(e.EventId, e.UserName) for e in SeatJournal.Replay(str(tmp_path))] == [
+        (EventId.SeatTaken, 'alice'), (EventId.SeatReleased, 'bob')], "Events after a failed write not readable"
+
+
+def test_licence_manager_journals_seat_events(tmp_path, make_manager):
+    manager = make_manager(1)
+    manager.Journal = SeatJournal(str(tmp_path / 'Journal'))
+    manager.TakeSeat('Product', '10.0.0.1', 'alice', 'host1')
+    manager.TakeSeat('Product', '10.0.0.2', 'bob', 'host2')
+    manager.RefreshSeat('Product', '10.0.0.1', 'alice', 'host1')
+    manager.ReleaseSeat('Product', '10.0.0.1', 'alice')
+    manager.Shutdown()
+    assert [e.EventId for e in SeatJournal.Replay(str(tmp_path / 'Journal'))] == [
+        EventId.SeatTaken, EventId.SeatNotTaken, EventId.SeatRefreshed, EventId.SeatReleased]
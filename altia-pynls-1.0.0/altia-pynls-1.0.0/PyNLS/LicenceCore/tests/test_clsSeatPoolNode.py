@@ -0,0 +1,227 @@
+import json
+import multiprocessing
+import random
+import threading
+import time
+from PyNLS.LicenceCore.clsMemoryStorage import MemoryStorage
+from PyNLS.LicenceCore.clsSeatCoordinator import SeatCoordinator
+from PyNLS.LicenceCore.clsSeatPoolNode import SeatPoolNode
+import zmq
+
+SEATS = 10
+NODES = 3
+THREADS = 4
+USERS_PER_THREAD = 3
+
+
+class CountingStorage(MemoryStorage):
+    """
+    Counts the seats in use on every node in a shared counter, changed under the
+    storage lock in step with the seats themselves.
+    """
+    def __init__(self, inUse, peak, violations):
+        super().__init__()
+        self.inUse = inUse
+        self.peak = peak
+        self.violations = violations
+
+    def TakeSeat(self, product, ipAddress, userName, host, licenceSeats, nowTime, expiryTime):
+        with self.m_Lock:
+            seat = self.m_Seats.get(product.lower(), {}).get((userName, ipAddress))
+            new = seat is None or seat.ExpiryTime <= nowTime
+            taken = super().TakeSeat(product, ipAddress, userName, host, licenceSeats, nowTime, expiryTime)
+            if taken and new:
+                with self.inUse.get_lock():
+                    self.inUse.value += 1
+                    self.peak.value = max(self.peak.value, self.inUse.value)
+                    if self.inUse.value > SEATS:
+                        self.violations.value += 1
+            return taken
+
+    def ReleaseSeat(self, product, ipAddress, userName, seatId=None):
+        with self.m_Lock:
+            deleted = super().ReleaseSeat(product, ipAddress, userName, seatId)
+            if deleted:
+                with self.inUse.get_lock():
+                    self.inUse.value -= 1
+            return deleted
+
+
+def run_node(make_manager, folder, port, name, inUse, peak, violations, results, start, stop):
+    """
+    Runs a pool node in its own process, its users taking and releasing seats at random until stopped.
+    """
+    manager = make_manager(SEATS, storage=CountingStorage(inUse, peak, violations), folder=folder)
+    pool = SeatPoolNode(manager, 'tcp://127.0.0.1:' + str(port), name)
+    pool.BorrowSize = 2
+    pool.Spare = 0
+    manager.SeatPool = pool
+    pool.Start()
+    counts = {'takes': 0, 'denials': 0}
+    lock = threading.Lock()
+
+    def Worker(index):
+        users = [(name + '-' + str(index) + '-' + str(u), '10.0.' + str(index) + '.' + str(u))
+                 for u in range(USERS_PER_THREAD)]
+        held = set()
+        generator = random.Random(name + str(index))
+        while not stop.is_set():
+            user = generator.choice(users)
+            if user in held:
+                manager.ReleaseSeat('Product', user[1], user[0])
+                held.discard(user)
+            elif manager.TakeSeat('Product', user[1], user[0], 'host'):
+                held.add(user)
+                with lock:
+                    counts['takes'] += 1
+            else:
+                with lock:
+                    counts['denials'] += 1
+            time.sleep(generator.random() * 0.002)
+        for user in held:
+            manager.ReleaseSeat('Product', user[1], user[0])
+
+    start.wait()
+    workers = [threading.Thread(target=Worker, args=(t,)) for t in range(THREADS)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    results.put((counts['takes'], counts['denials'], pool.Borrows, pool.Returns))
+    manager.Shutdown()
+
+
+def test_coordinator_never_grants_more_than_licensed(make_manager):
+    coordinator = SeatCoordinator(make_manager(SEATS), leaseTime=10.0, seatHorizon=0.0)
+    coordinator.m_GraceUntil = 0.0
+    assert coordinator.Handle({'op': 'acquire', 'node': 'a', 'product': 'Product', 'count': 6})['quota'] == 6, \
+        "Quota not granted"
+    assert coordinator.Handle({'op': 'acquire', 'node': 'b', 'product': 'Product', 'count': 6})['quota'] == 4, \
+        "Quota granted beyond the licensed seats"
+    assert coordinator.Handle({'op': 'acquire', 'node': 'c', 'product': 'Product', 'count': 1})['quota'] == 0, \
+        "Quota granted beyond the licensed seats"
+    assert coordinator.Handle({'op': 'acquire', 'node': 'c', 'product': 'Unknown', 'count': 1})['quota'] == 0, \
+        "Quota granted for an unlicensed product"
+    coordinator.Handle({'op': 'return', 'node': 'a', 'product': 'Product', 'count': 3})
+    assert coordinator.Handle({'op': 'acquire', 'node': 'c', 'product': 'Product', 'count': 5})['quota'] == 3, \
+        "Returned quota not granted again"
+    # A node reporting more than the coordinator knows of only gets what is free...
+    reply = coordinator.Handle({'op': 'renew', 'node': 'a', 'quotas': {'product': 8}})
+    assert reply['quotas']['product'] == 3, "Renewal re-registered quota beyond the licensed seats"
+    assert coordinator.PeakGranted['product'] == SEATS, "Peak quota not recorded"
+
+    coordinator.m_Leases['b'] = time.monotonic() - 1
+    coordinator.ReclaimExpired()
+    assert coordinator.Handle({'op': 'acquire', 'node': 'a', 'product': 'Product', 'count': 9})['quota'] == 7, \
+        "Quota of an expired lease not reclaimed"
+
+
+def test_grace_period_grants_nothing(make_manager):
+    coordinator = SeatCoordinator(make_manager(SEATS), leaseTime=10.0, seatHorizon=0.0)
+    assert coordinator.Handle({'op': 'acquire', 'node': 'a', 'product': 'Product', 'count': 1})['quota'] == 0, \
+        "Quota granted before the leases of a previous run could have expired"
+    reply = coordinator.Handle({'op': 'renew', 'node': 'b', 'quotas': {'product': 4}})
+    assert reply['quotas']['product'] == 4, "Quota held by a node not re-registered"
+
+
+def test_no_seats_without_a_lease(make_manager):
+    manager = make_manager(SEATS)
+    # Nothing listens at the coordinator address...
+    pool = SeatPoolNode(manager, 'tcp://127.0.0.1:9', 'node', timeout=0.2)
+    manager.SeatPool = pool
+    assert not manager.TakeSeat('Product', '10.0.0.1', 'user', 'host'), "Seat taken without a lease"
+    assert not manager.RefreshSeat('Product', '10.0.0.1', 'user', 'host'), "Seat refreshed without a lease"
+    assert manager.GetConnections('Product') == [], "Seat stored without a lease"
+    manager.Shutdown()
+
+
+def test_coordinator_survives_malformed_messages(make_manager):
+    coordinator = SeatCoordinator(make_manager(SEATS), 'tcp://127.0.0.1:0', leaseTime=10.0)
+    coordinator.Start(grace=False)
+    context = zmq.Context()
+    dealer = context.socket(zmq.DEALER)
+    request = context.socket(zmq.REQ)
+    try:
+        dealer.connect('tcp://127.0.0.1:' + str(coordinator.Port))
+        dealer.send(b'hello')
+        dealer.send_multipart([b'one', b'two', b'three'])
+        request.connect('tcp://127.0.0.1:' + str(coordinator.Port))
+        request.send(json.dumps({'op': 'acquire', 'node': 'a', 'product': 'Product', 'count': 2}).encode())
+        assert request.poll(5000), "Coordinator stopped by a malformed message"
+        assert json.loads(request.recv())['quota'] == 2
+    finally:
+        dealer.close(linger=0)
+        request.close(linger=0)
+        context.term()
+        coordinator.Close()
+
+
+def test_pool_never_exceeds_licensed_seats(tmp_path, make_manager):
+    coordinator = SeatCoordinator(make_manager(SEATS, folder=str(tmp_path / 'coordinator')), 'tcp://127.0.0.1:0',
+                                  leaseTime=0.6)
+    coordinator.Start(grace=False)
+    context = multiprocessing.get_context('spawn')
+    inUse = context.Value('i', 0)
+    peak = context.Value('i', 0)
+    violations = context.Value('i', 0)
+    results = context.Queue()
+    start = context.Event()
+    stop = context.Event()
+    processes = [context.Process(target=run_node, daemon=True,
+                                 args=(make_manager, str(tmp_path / ('node' + str(n))), coordinator.Port,
+                                       'node' + str(n), inUse, peak, violations, results, start, stop))
+                 for n in range(NODES)]
+    try:
+        for process in processes:
+            process.start()
+        start.set()
+        time.sleep(3)
+        stop.set()
+        runs = [results.get(timeout=30) for _ in processes]
+        for process in processes:
+            process.join(timeout=30)
+    finally:
+        for process in processes:
+            process.kill()
+            process.join()
+        coordinator.Close()
+
+    takes = sum(run[0] for run in runs)
+    borrows = sum(run[2] for run in runs)
+    returns = sum(run[3] for run in runs)
+    assert violations.value == 0, "Seats in use exceeded the licensed seats " + str(violations.value) + " time(s)"
+    assert peak.value == SEATS, "Seat pool never filled, peak " + str(peak.value)
+    assert inUse.value == 0, "Seats left in use"
+    assert coordinator.PeakGranted['product'] <= SEATS, "Quota granted beyond the licensed seats"
+    assert all(run[0] > 0 for run in runs), "A node took no seats"
+    assert borrows > 0 and returns > 0, "Quota did not move between nodes"
+    assert borrows < takes, "Most takes crossed the network"
+
+
+def test_slow_coordinator_does_not_block_takes(make_manager):
+    manager = make_manager(SEATS)
+    pool = SeatPoolNode(manager, 'tcp://127.0.0.1:9', 'node')
+    pool.m_Quotas['product'] = 1
+    pool.m_LeaseExpiry = time.monotonic() + 60
+    sent = threading.Event()
+    release = threading.Event()
+
+    def SlowRequest(request):
+        sent.set()
+        release.wait(10)
+        return None
+
+    pool.Request = SlowRequest
+    manager.SeatPool = pool
+    borrower = threading.Thread(target=pool.Borrow, args=('Product', SEATS))
+    borrower.start()
+    assert sent.wait(5), "Borrow not sent"
+    try:
+        started = time.monotonic()
+        assert manager.TakeSeat('Product', '10.0.0.1', 'user', 'host'), "Seat not taken against the quota held"
+        assert time.monotonic() - started < 1, "Seat take waited on the coordinator"
+    finally:
+        release.set()
+        borrower.join()
+    pool.Request = lambda request: None
+    manager.Shutdown()
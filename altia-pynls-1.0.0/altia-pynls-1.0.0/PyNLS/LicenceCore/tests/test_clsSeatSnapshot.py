@@ -0,0 +1,100 @@
+import logging
+import os
+from datetime import datetime
+from PyNLS.LicenceCore.clsLicenceReader import LicenceReader
+from PyNLS.LicenceCore.clsSeatSnapshot import SeatSnapshot
+from PyNLS.LicenceCore.EventId import EventId
+
+
+def make_snapshot_manager(make_manager, tmp_path, code='code', doubleValidation=False, key=None):
+    manager = make_manager(2, code=code, doubleValidation=doubleValidation)
+    key = key or SeatSnapshot.LoadKey(str(tmp_path / SeatSnapshot.DefaultKeyFileName))
+    manager.SeatSnapshot = SeatSnapshot(str(tmp_path / SeatSnapshot.DefaultFileName), key)
+    return manager
+
+
+def test_seats_restored_after_warm_restart(tmp_path, make_manager, caplog):
+    first = make_snapshot_manager(make_manager, tmp_path)
+    assert first.TakeSeat('Product', '10.0.0.1', 'alice', 'host1')
+    assert first.TakeSeat('Product', '10.0.0.2', 'bob', 'host2')
+    expiry = max(c.ExpiryTime for c in first.Storage.GetConnections('Product', datetime.now()))
+    first.Shutdown()
+    assert os.path.isfile(first.SeatSnapshot.FileName), "Snapshot not written on shutdown"
+
+    second = make_snapshot_manager(make_manager, tmp_path)
+    with caplog.at_level(logging.INFO):
+        assert second.RestoreSnapshot(), "Snapshot not restored"
+    assert [getattr(r, 'EventId', None) for r in caplog.records if r.getMessage().startswith('Restored')] == \
+        [EventId.SeatSnapshotRestored], "Restore not logged with its event id"
+    connections = second.Storage.GetConnections('Product', datetime.now())
+    assert sorted(c.UserName for c in connections) == ['alice', 'bob'], "Seats not restored"
+    assert min(c.ExpiryTime for c in connections) >= expiry, "Seat expiry not kept"
+    assert not second.TakeSeat('Product', '10.0.0.3', 'carol', 'host3'), "Restored seats not counted"
+    assert not os.path.isfile(second.SeatSnapshot.FileName), "Restored snapshot not deleted"
+    assert not second.RestoreSnapshot(), "Snapshot restored twice"
+
+
+def test_snapshot_not_trusted_for_other_licences(tmp_path, make_manager):
+    first = make_snapshot_manager(make_manager, tmp_path)
+    assert first.TakeSeat('Product', '10.0.0.1', 'alice', 'host1')
+    first.Shutdown()
+
+    second = make_snapshot_manager(make_manager, tmp_path, code='other')
+    assert not second.RestoreSnapshot(), "Snapshot of other licences restored"
+    assert second.GetConnections('Product') == [], "Seats of other licences restored"
+
+
+def test_corrupt_snapshot_not_trusted(tmp_path, make_manager):
+    first = make_snapshot_manager(make_manager, tmp_path)
+    assert first.TakeSeat('Product', '10.0.0.1', 'alice', 'host1')
+    first.Shutdown()
+    with open(first.SeatSnapshot.FileName, 'r+b') as file:
+        file.seek(-1, os.SEEK_END)
+        last = file.read(1)
+        file.seek(-1, os.SEEK_END)
+        file.write(bytes([last[0] ^ 0xFF]))
+
+    second = make_snapshot_manager(make_manager, tmp_path)
+    assert not second.RestoreSnapshot(), "Corrupt snapshot restored"
+    assert second.GetConnections('Product') == [], "Seats of a corrupt snapshot restored"
+
+
+def test_forged_snapshot_not_trusted(tmp_path, make_manager):
+    first = make_snapshot_manager(make_manager, tmp_path, key=b'k' * SeatSnapshot.KeySize)
+    assert first.TakeSeat('Product', '10.0.0.1', 'alice', 'host1')
+    first.Shutdown()
+
+    second = make_snapshot_manager(make_manager, tmp_path)
+    assert not second.RestoreSnapshot(), "Snapshot written without the server's key restored"
+    assert second.GetConnections('Product') == [], "Seats of a forged snapshot restored"
+
+
+def test_snapshot_key_kept_across_restarts(tmp_path):
+    fileName = str(tmp_path / SeatSnapshot.DefaultKeyFileName)
+    key = SeatSnapshot.LoadKey(fileName)
+    assert len(key) == SeatSnapshot.KeySize and SeatSnapshot.LoadKey(fileName) == key, "Key not kept"
+    if os.name == 'posix':
+        assert os.stat(fileName).st_mode & 0o077 == 0, "Key readable by other accounts"
+
+
+def test_verified_licences_trusted_after_warm_restart(tmp_path, monkeypatch, make_manager):
+    (tmp_path / 'public_key.pem').write_text('key')
+    verified = []
+    monkeypatch.setattr(LicenceReader, 'VerifyWithFile', lambda key, lic: verified.append(lic) or True)
+    first = make_snapshot_manager(make_manager, tmp_path, doubleValidation=True)
+    assert first.TotalSeats('Product') == 2
+    assert first.TakeSeat('Product', '10.0.0.1', 'alice', 'host1')
+    assert len(verified) == 1, "Licence verified more than once"
+    first.Shutdown()
+
+    second = make_snapshot_manager(make_manager, tmp_path, doubleValidation=True)
+    assert second.RestoreSnapshot()
+    assert second.TotalSeats('Product') == 2
+    assert len(verified) == 1, "Verified licence verified again after a warm restart"
+    second.Shutdown()
+
+    # A snapshot not written with the server's key must not mark a licence as verified...
+    third = make_snapshot_manager(make_manager, tmp_path, doubleValidation=True, key=b'k' * SeatSnapshot.KeySize)
+    assert not third.RestoreSnapshot()
+    assert third.TotalSeats('Product') == 2
+    assert len(verified) == 2, "Licence trusted from a snapshot that is not authentic"
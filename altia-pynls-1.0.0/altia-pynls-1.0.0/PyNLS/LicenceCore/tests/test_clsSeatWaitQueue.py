@@ -0,0 +1,88 @@
+from datetime import datetime
+from PyNLS.LicenceCore.clsClock import SimulatedClock
+from PyNLS.LicenceCore.clsSeatWaitQueue import SeatWaitQueue
+
+
+def make_queued_manager(make_manager, seats=1):
+    clock = SimulatedClock(datetime(2030, 1, 1, 12, 0, 0))
+    manager = make_manager(seats, clock=clock)
+    manager.WaitQueue = SeatWaitQueue(claimWindow=10, waiterTimeout=30, clock=clock)
+    return manager, clock
+
+
+def test_seats_granted_first_in_first_out():
+    clock = SimulatedClock(datetime(2030, 1, 1))
+    queue = SeatWaitQueue(claimWindow=10, waiterTimeout=30, clock=clock)
+    bob = queue.Enqueue('Product', 'bob', '10.0.0.2')
+    carol = queue.Enqueue('Product', 'carol', '10.0.0.3')
+    assert queue.Enqueue('product', 'bob', '10.0.0.2') is bob, "Client queued twice"
+    assert queue.Position(bob) == 1 and queue.Position(carol) == 2
+
+    assert queue.Grant('Product', 1) == 1
+    assert queue.Wait(bob, 0) and not queue.Wait(carol, 0), "Seat not granted to the head of the queue"
+    assert queue.Reserved('Product') == 1 and queue.Reserved('Product', 'bob', '10.0.0.2') == 0
+    assert queue.Position(carol) == 1
+
+    # Bob does not claim his seat in the claim window, it goes to carol...
+    clock.Advance(11)
+    queue.Enqueue('Product', 'carol', '10.0.0.3')
+    assert queue.Grant('Product', 1) == 1 and queue.Wait(carol, 0)
+    assert queue.Claim('Product', 'carol', '10.0.0.3') and not queue.HasWaiters('Product')
+
+    statistics = queue.Statistics['product']
+    assert (statistics.Enqueued, statistics.Granted, statistics.Claimed, statistics.Expired) == (2, 2, 1, 1)
+    assert statistics.MaximumDepth == 2 and statistics.Depth == 0 and statistics.MeanWait == 5.5
+
+
+def test_waiters_that_stop_asking_leave_the_queue():
+    clock = SimulatedClock(datetime(2030, 1, 1))
+    queue = SeatWaitQueue(claimWindow=10, waiterTimeout=30, clock=clock)
+    bob = queue.Enqueue('Product', 'bob', '10.0.0.2')
+    clock.Advance(31)
+    carol = queue.Enqueue('Product', 'carol', '10.0.0.3')
+    assert queue.Grant('Product', 1) == 1
+    assert not queue.Wait(bob, 0) and queue.Wait(carol, 0), "Seat granted to a client that stopped waiting"
+    assert queue.Statistics['product'].Dropped == 1
+
+
+def test_released_seat_reserved_for_the_waiting_client(make_manager):
+    manager, clock = make_queued_manager(make_manager)
+    assert manager.TakeSeat('Product', '10.0.0.1', 'alice', 'host1')
+    assert manager.WaitSeat('Product', '10.0.0.2', 'bob', 'host2') == (0, 1)
+    assert manager.WaitSeat('Product', '10.0.0.3', 'carol', 'host3') == (0, 2)
+
+    manager.ReleaseSeat('Product', '10.0.0.1', 'alice')
+    assert manager.WaitQueue.Reserved('Product') == 1, "Released seat not granted to the queue"
+    assert not manager.TakeSeat('Product', '10.0.0.4', 'dave', 'host4'), "Reserved seat taken by a client not queued"
+    assert not manager.TakeSeat('Product', '10.0.0.3', 'carol', 'host3'), "Reserved seat taken out of turn"
+    assert manager.TakeSeat('Product', '10.0.0.2', 'bob', 'host2'), "Granted seat not claimed"
+    assert manager.WaitQueue.Statistics['product'].Claimed == 1
+    manager.Shutdown()
+
+
+def test_reaped_seat_offered_to_the_waiting_client(make_manager):
+    manager, clock = make_queued_manager(make_manager)
+    assert manager.TakeSeat('Product', '10.0.0.1', 'alice', 'host1')
+    assert manager.WaitSeat('Product', '10.0.0.2', 'bob', 'host2') == (0, 1)
+    clock.Advance(manager.HeartBeat.total_seconds() + manager.FudgeFactor + 1)
+    manager.WaitQueue.Enqueue('Product', 'bob', '10.0.0.2')
+    manager.DeleteStaleSeats()
+    assert manager.WaitQueue.Reserved('Product') == 1, "Reaped seat not granted to the queue"
+    seatId, position = manager.WaitSeat('Product', '10.0.0.2', 'bob', 'host2')
+    assert seatId and position == 0
+    manager.Shutdown()
+
+
+def test_clients_not_queued_for_an_unlicensed_product(make_manager):
+    manager, clock = make_queued_manager(make_manager)
+    for index in range(10):
+        assert manager.WaitSeat('NoSuchProduct' + str(index), '10.0.0.2', 'bob', 'host2') == (0, 0)
+    assert manager.WaitQueue.Products() == [] and manager.WaitQueue.Statistics == {}, "Unlicensed product queued"
+
+    assert manager.TakeSeat('Product', '10.0.0.1', 'alice', 'host1')
+    assert manager.WaitSeat('Product', '10.0.0.2', 'bob', 'host2') == (0, 1)
+    # Bob stops asking while alice holds the only seat, so no seat is granted to prune the queue...
+    clock.Advance(31)
+    assert manager.WaitQueue.Products() == [] and manager.WaitQueue.Depth == 0, "Waiter kept past the waiter timeout"
+    assert manager.WaitQueue.Statistics['product'].Dropped == 1
+    manager.Shutdown()
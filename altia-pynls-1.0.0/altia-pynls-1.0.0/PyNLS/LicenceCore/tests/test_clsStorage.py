@@ -0,0 +1,259 @@
+import sqlite3
+import pytest
+from datetime import datetime, timedelta
+from PyNLS.LicenceCore.clsLicenceManager import LicenceSeatStructure
+from PyNLS.LicenceCore.clsMemoryStorage import MemoryStorage
+from PyNLS.LicenceCore.clsSqliteStorage import SqliteStorage
+from PyNLS.LicenceCore.clsStorage import SeatOperation
+from PyNLS.LicenceCore.MessageType import MessageType
+from PyNLS.LicenceCore.clsDatabaseSchema import Database
+
+NOW = datetime(2021, 3, 5, 12, 0, 0, 1)
+EXPIRY = NOW + timedelta(seconds=330)
+EARLIER = NOW - timedelta(seconds=400)
+
+
+def seats_for(storage, product):
+    return [LicenceSeatStructure(lic.Id, lic.NumberOfSeats, not lic.ExpiryDate) for lic in storage.GetLicences(product)]
+
+
+@pytest.fixture(params=['sqlite', 'sqlite-memory', 'memory'])
+def storage(request, tmp_path):
+    if request.param == 'memory':
+        store = MemoryStorage()
+    else:
+        store = SqliteStorage(str(tmp_path / 'Data.db3'), request.param == 'sqlite-memory', 0)
+    store.Open()
+    yield store
+    store.Close()
+
+
+def test_load_licences(storage, make_licence):
+    storage.LoadLicences([make_licence('Beta', 2, 10), make_licence('Alpha', 1, 20), make_licence('alpha', 3, 30)])
+    assert storage.GetProducts() == ['Alpha', 'Beta', 'alpha']
+    assert [lic.TimeStamp for lic in storage.GetLicences('ALPHA')] == [30, 20], "Licences not latest first"
+    assert storage.GetLicences('Gamma') == []
+
+    storage.LoadLicences([make_licence('Beta', 2, 10)])
+    assert storage.GetProducts() == ['Beta'], "Licences missing from the load were not removed"
+    storage.LoadLicences([make_licence('Beta', 2, 10)])
+    assert len(storage.GetLicences('Beta')) == 1, "Licence loaded twice"
+
+
+def test_take_seat_limit(storage, make_licence):
+    storage.LoadLicences([make_licence('Product', 2, 1)])
+    ls = seats_for(storage, 'Product')
+    assert storage.TakeSeat('Product', '10.0.0.1', 'alice', 'host1', ls, NOW, EXPIRY)
+    assert storage.TakeSeat('product', '10.0.0.2', 'bob', 'host2', ls, NOW, EXPIRY)
+    assert not storage.TakeSeat('Product', '10.0.0.3', 'carol', 'host3', ls, NOW, EXPIRY)
+    assert storage.TakeSeat('Product', '10.0.0.1', 'alice', 'host9', ls, NOW, EXPIRY), "Own seat counted on re-take"
+    assert storage.CountSeats('PRODUCT', NOW) == 2
+    hosts = sorted(c.Host for c in storage.GetConnections('Product', NOW))
+    assert hosts == ['host2', 'host9']
+
+
+def test_stale_seats_are_free(storage, make_licence):
+    storage.LoadLicences([make_licence('Product', 1, 1)])
+    ls = seats_for(storage, 'Product')
+    assert storage.TakeSeat('Product', '10.0.0.1', 'alice', 'host1', ls, EARLIER, NOW - timedelta(seconds=1))
+    assert storage.CountSeats('Product', NOW) == 0
+    assert storage.TakeSeat('Product', '10.0.0.2', 'bob', 'host2', ls, NOW, EXPIRY)
+    assert storage.DeleteStaleSeats(NOW) == 1
+    assert [c.UserName for c in storage.GetConnections('Product', NOW)] == ['bob']
+
+
+def test_seats_expire_by_their_own_heartbeat(storage, make_licence):
+    storage.LoadLicences([make_licence('Product', 2, 1)])
+    ls = seats_for(storage, 'Product')
+    assert storage.TakeSeat('Product', '10.0.0.1', 'alice', 'host1', ls, NOW, NOW + timedelta(seconds=330))
+    assert storage.TakeSeat('Product', '10.0.0.2', 'bob', 'host2', ls, NOW, NOW + timedelta(seconds=1230))
+    later = NOW + timedelta(seconds=600)
+    assert [c.UserName for c in storage.GetConnections('Product', later)] == ['bob'], "Seat expiry not per seat"
+    assert storage.TakeSeat('Product', '10.0.0.3', 'carol', 'host3', ls, later, later + timedelta(seconds=330))
+    assert not storage.TakeSeat('Product', '10.0.0.4', 'dave', 'host4', ls, later, later + timedelta(seconds=330))
+
+
+def test_refresh_and_release(storage, make_licence):
+    storage.LoadLicences([make_licence('Product', 1, 1)])
+    storage.RefreshSeat('Product', '10.0.0.1', 'alice', 'host1', EARLIER, NOW - timedelta(seconds=1))
+    assert storage.CountSeats('Product', NOW) == 0
+    storage.RefreshSeat('Product', '10.0.0.1', 'alice', 'host1', NOW, EXPIRY)
+    connections = storage.GetConnections('Product', NOW)
+    assert len(connections) == 1
+    assert connections[0].UpdateTime == str(NOW)
+    assert connections[0].LogonTime == str(EARLIER)
+    assert storage.ReleaseSeat('PRODUCT', '10.0.0.1', 'alice') == 1
+    assert storage.ReleaseSeat('Product', '10.0.0.1', 'alice') == 0
+    assert storage.CountSeats('Product', NOW) == 0
+
+
+def test_take_seat_across_licences(storage, make_licence):
+    storage.LoadLicences([make_licence('Product', 1, 1, '01/Jan/2099'), make_licence('Product', 2, 2, '01/Jan/2099')])
+    ls = seats_for(storage, 'Product')
+    ids = set()
+    for i in range(3):
+        assert storage.TakeSeat('Product', '10.0.0.' + str(i), 'user' + str(i), 'host', ls, NOW, EXPIRY)
+    for c in storage.GetConnections('Product', NOW):
+        ids.add(c.LicenceId)
+    assert ids == set(s.LicenceID for s in ls), "Seats not spread across licences"
+    assert not storage.TakeSeat('Product', '10.0.0.9', 'user9', 'host', ls, NOW, EXPIRY)
+
+
+def test_execute_batch(storage, make_licence):
+    storage.LoadLicences([make_licence('Product', 1, 1)])
+    ls = seats_for(storage, 'Product')
+    assert storage.TakeSeat('Product', '10.0.0.1', 'alice', 'host1', ls, NOW, EXPIRY)
+    results = storage.ExecuteBatch([
+        SeatOperation(MessageType.TakeSeat, 'Product', '10.0.0.2', 'bob', 'host2', ls),
+        SeatOperation(MessageType.ReleaseSeat, 'Product', '10.0.0.1', 'alice', 'host1'),
+        SeatOperation(MessageType.TakeSeat, 'Product', '10.0.0.2', 'bob', 'host2', ls),
+        SeatOperation(MessageType.RefreshSeat, 'Product', '10.0.0.2', 'bob', 'host2'),
+        SeatOperation(MessageType.ReleaseSeat, 'Product', '10.0.0.3', 'carol', 'host3'),
+    ], NOW, EXPIRY)
+    assert [bool(r) for r in results] == [False, True, True, True, False], "Batch items not performed in order"
+    assert results[2] == results[3], "Refresh did not return the id of the seat taken"
+    assert [c.UserName for c in storage.GetConnections('Product', NOW)] == ['bob']
+
+
+def test_failed_batch_rolled_back(storage, make_licence):
+    storage.LoadLicences([make_licence('Product', 2, 1)])
+    ls = seats_for(storage, 'Product')
+    alice = storage.TakeSeat('Product', '10.0.0.1', 'alice', 'host1', ls, NOW, EXPIRY)
+    later = NOW + timedelta(seconds=60)
+    with pytest.raises(ValueError):
+        storage.ExecuteBatch([
+            SeatOperation(MessageType.TakeSeat, 'Product', '10.0.0.2', 'bob', 'host2', ls),
+            SeatOperation(MessageType.RefreshSeat, 'Product', '10.0.0.1', 'alice', 'host1'),
+            SeatOperation(MessageType.ReleaseSeat, 'Product', '10.0.0.1', 'alice', 'host1'),
+            SeatOperation(MessageType.QueryConnections, 'Product', '10.0.0.3', 'carol', 'host3'),
+        ], later, later + timedelta(seconds=330))
+    connections = storage.GetConnections('Product', NOW)
+    assert [(c.UserName, c.UpdateTime) for c in connections] == [('alice', str(NOW))], "Failed batch not rolled back"
+    assert storage.TakeSeat('Product', '10.0.0.1', 'alice', 'host1', ls, NOW, EXPIRY) == alice
+
+
+def test_connection_table_upgraded_with_expiry_time(tmp_path):
+    fileName = str(tmp_path / 'Data.db3')
+    connection = sqlite3.connect(fileName)
+    connection.execute("CREATE TABLE connection(id INTEGER PRIMARY KEY, ip VARCHAR(64) NOT NULL, "
+                       "host VARCHAR(32) NOT NULL, user VARCHAR(128) NOT NULL, logon_time DATETIME NOT NULL, "
+                       "update_time DATETIME NOT NULL, product VARCHAR(32) NOT NULL, licence_id INTEGER NULL)")
+    connection.execute("INSERT INTO connection(ip, host, user, logon_time, update_time, product) "
+                       "VALUES ('10.0.0.1', 'host1', 'alice', ?, ?, 'product')", (NOW, NOW))
+    connection.commit()
+    connection.close()
+    storage = SqliteStorage(fileName)
+    storage.Open()
+    with storage.OpenConnection() as connection:
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(connection);")]
+    assert Database.SqlFieldExpiryTime in columns, "Expiry time column not added"
+    assert storage.DeleteStaleSeats(NOW) == 1, "Seat without an expiry time not stale"
+
+
+def test_tables_upgraded_with_product_id(tmp_path):
+    fileName = str(tmp_path / 'Data.db3')
+    connection = sqlite3.connect(fileName)
+    connection.execute("CREATE TABLE licence(id INTEGER PRIMARY KEY, company VARCHAR(32) NOT NULL, "
+                       "product VARCHAR(32) NOT NULL, customer VARCHAR(128) NOT NULL, reference VARCHAR(32) NULL, "
+                       "reseller VARCHAR(128) NULL, seats INTEGER NOT NULL, start_date DATETIME, "
+                       "expiry_date DATETIME, timestamp INTEGER NOT NULL, code VARCHAR(256) NOT NULL, "
+                       "version INTEGER NOT NULL, notes TEXT)")
+    connection.execute("CREATE INDEX idx_licence_product_timestamp ON licence(product COLLATE NOCASE, timestamp DESC)")
+    connection.execute("CREATE TABLE connection(id INTEGER PRIMARY KEY, ip VARCHAR(64) NOT NULL, "
+                       "host VARCHAR(32) NOT NULL, user VARCHAR(128) NOT NULL, logon_time DATETIME NOT NULL, "
+                       "update_time DATETIME NOT NULL, expiry_time DATETIME NOT NULL, product VARCHAR(32) NOT NULL, "
+                       "licence_id INTEGER NULL)")
+    connection.execute("CREATE UNIQUE INDEX idx_connection_product_user_ip ON connection(product COLLATE NOCASE, user, ip)")
+    connection.execute("INSERT INTO licence(company, product, customer, seats, timestamp, code, version) "
+                       "VALUES ('Altia', 'Product', 'Customer', 2, 1, 'code', 1)")
+    connection.execute("INSERT INTO connection(ip, host, user, logon_time, update_time, expiry_time, product, licence_id) "
+                       "VALUES ('10.0.0.1', 'host1', 'alice', ?, ?, ?, 'product', 1)", (NOW, NOW, EXPIRY))
+    connection.commit()
+    connection.close()
+    storage = SqliteStorage(fileName)
+    storage.Open()
+    with storage.OpenConnection() as connection:
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(connection);")]
+    assert 'product_id' in columns and Database.SqlFieldProduct not in columns, "Connection table not rebuilt"
+    assert [lic.TimeStamp for lic in storage.GetLicences('PRODUCT')] == [1], "Licence not given its product id"
+    assert [c.UserName for c in storage.GetConnections('Product', NOW)] == ['alice'], "Seat not kept"
+    ls = seats_for(storage, 'Product')
+    assert storage.TakeSeat('Product', '10.0.0.2', 'bob', 'host2', ls, NOW, EXPIRY)
+    assert not storage.TakeSeat('Product', '10.0.0.3', 'carol', 'host3', ls, NOW, EXPIRY), "Upgraded seat not counted"
+    storage.Close()
+
+
+def test_products_resolved_to_ids(tmp_path, make_licence):
+    storage = SqliteStorage(str(tmp_path / 'Data.db3'))
+    storage.Open()
+    storage.LoadLicences([make_licence('Product', 1, 1)])
+    ls = seats_for(storage, 'product')
+    assert storage.TakeSeat('PRODUCT', '10.0.0.1', 'alice', 'host', ls, NOW, EXPIRY)
+    assert storage.CountSeats('Product', NOW) == 1, "Product names not matched whatever their case"
+    assert storage.CountSeats('Unknown', NOW) == 0 and storage.GetConnections('Unknown', NOW) == []
+    assert storage.ReleaseSeat('Unknown', '10.0.0.1', 'alice') == 0
+    # Only loading licences creates a product, a client's made up product name does not...
+    assert storage.RefreshSeat('Other', '10.0.0.1', 'alice', 'host', NOW, EXPIRY) == 0
+    results = storage.ExecuteBatch([SeatOperation(MessageType.RefreshSeat, 'Junk', '10.0.0.1', 'alice', 'host'),
+                                    SeatOperation(MessageType.TakeSeat, 'Junk', '10.0.0.1', 'alice', 'host', ls)],
+                                   NOW, EXPIRY)
+    assert results == [0, 0] and storage.CountSeats('other', NOW) == 0
+    storage.LoadLicences([make_licence('Product', 1, 1), make_licence('Other', 1, 2)])
+    storage.RefreshSeat('Other', '10.0.0.1', 'alice', 'host', NOW, EXPIRY)
+    with storage.OpenConnection() as connection:
+        names = [row[0] for row in connection.execute("SELECT name FROM product ORDER BY id;")]
+    assert names == ['product', 'other'], "Product table not keyed by lower case name"
+    assert sorted(storage.m_ProductIds) == ['other', 'product'], "Unknown products kept in the product map"
+    storage.Close()
+    # A new storage reads the ids the products were given...
+    storage = SqliteStorage(str(tmp_path / 'Data.db3'))
+    storage.Open()
+    assert storage.CountSeats('Product', NOW) == 1 and storage.CountSeats('Other', NOW) == 1
+    storage.Close()
+
+
+def test_seats_found_by_id(storage, make_licence):
+    storage.LoadLicences([make_licence('Product', 3, 1)])
+    ls = seats_for(storage, 'Product')
+    alice = storage.TakeSeat('Product', '10.0.0.1', 'alice', 'host1', ls, NOW, EXPIRY)
+    bob = storage.TakeSeat('Product', '10.0.0.2', 'bob', 'host2', ls, NOW, EXPIRY)
+    assert alice and bob and alice != bob, "Seat ids not returned"
+    assert storage.TakeSeat('Product', '10.0.0.1', 'alice', 'host1', ls, NOW, EXPIRY) == alice, "Re-take changed the id"
+    later = EXPIRY + timedelta(seconds=1)
+    assert storage.RefreshSeat('Product', '10.0.0.1', 'alice', 'host1', NOW, later, alice) == alice
+    # An id that is not the user's seat does not refresh that seat, the user's own seat is found...
+    assert storage.RefreshSeat('Product', '10.0.0.1', 'alice', 'host1', NOW, later, bob) == alice
+    assert {c.UserName: c.ExpiryTime for c in storage.GetConnections('Product', NOW)}['bob'] == str(EXPIRY), \
+        "Seat of another user refreshed by its id"
+    assert storage.ReleaseSeat('Product', '10.0.0.1', 'alice', bob) == 1, "Stale id did not fall back to the seat key"
+    assert storage.ReleaseSeat('Product', '10.0.0.2', 'bob', bob) == 1, "Seat not released by its id"
+    assert storage.GetConnections('Product', NOW) == []
+    # A legacy refresh creates the seat, and returns its id...
+    carol = storage.RefreshSeat('Product', '10.0.0.3', 'carol', 'host3', NOW, EXPIRY)
+    assert carol and storage.RefreshSeat('Product', '10.0.0.3', 'carol', 'host3', NOW, EXPIRY) == carol
+
+
+@pytest.mark.parametrize('returning', [True, False], ids=['returning', 'select-delete'])
+def test_release_seats_in_bulk(storage, make_licence, returning, monkeypatch):
+    if not returning:
+        monkeypatch.setattr(SqliteStorage, 'SupportsReturning', False)
+    elif not SqliteStorage.SupportsReturning:
+        pytest.skip('SQLite ' + sqlite3.sqlite_version + ' has no DELETE ... RETURNING')
+    storage.LoadLicences([make_licence('Product', 10, 1), make_licence('Other', 10, 2)])
+    for product in ('Product', 'Other'):
+        seats = seats_for(storage, product)
+        assert storage.TakeSeat(product, '10.0.0.1', 'alice', 'lab1', seats, EARLIER, EXPIRY)
+        assert storage.TakeSeat(product, '10.0.0.2', 'bob', 'lab1', seats, NOW, EXPIRY)
+        assert storage.TakeSeat(product, '10.0.0.3', 'carol', 'lab2', seats, NOW, EXPIRY)
+
+    released = storage.ReleaseSeats(host='lab1', product='PRODUCT')
+    assert sorted(s.UserName for s in released) == ['alice', 'bob'], "Host seats not released"
+    assert {s.Product for s in released} == {'product'} and all(s.Id for s in released)
+    assert storage.CountSeats('Other', NOW) == 3, "Seats of another product released"
+
+    released = storage.ReleaseSeats(updatedBefore=NOW)
+    assert [(s.Product, s.UserName) for s in released] == [('other', 'alice')], "Old seats not expired"
+    assert sorted(s.UserName for s in storage.ReleaseSeats(userName='carol')) == ['carol', 'carol']
+    assert storage.ReleaseSeats(product='Missing') == []
+    with pytest.raises(ValueError):
+        storage.ReleaseSeats()
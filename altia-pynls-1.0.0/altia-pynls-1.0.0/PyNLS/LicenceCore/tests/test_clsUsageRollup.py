@@ -0,0 +1,74 @@
+from datetime import datetime
+import time
+import pytest
+from PyNLS.LicenceCore import clsUsageRollup
+from PyNLS.LicenceCore.clsClock import SimulatedClock
+from PyNLS.LicenceCore.clsConfig import Config
+from PyNLS.LicenceCore.clsDatabaseSchema import Database
+from PyNLS.LicenceCore.clsUsageRollup import UsageRollup
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def rollup(request, tmp_path, monkeypatch):
+    if request.param == 'python':
+        monkeypatch.setattr(clsUsageRollup, 'numpy', None)
+    elif clsUsageRollup.numpy is None:
+        pytest.skip('numpy is not installed')
+    return UsageRollup(str(tmp_path / 'Usage.db3'))
+
+
+def test_peak_and_percentile(rollup):
+    start = int(time.time()) // 3600 * 3600 - 3600
+    for minute in range(60):
+        rollup.Record({'Product': (minute, 1), 'Other': (5, 0)}, start + minute * 60)
+    end = start + 3600
+    assert rollup.Peak('product', start, end) == 59
+    assert rollup.Percentile('Product', start, end, 50) == pytest.approx(29.5)
+    assert rollup.Denials('Product', start, end) == 60
+    assert rollup.Peak('Other', start, end) == 5
+    assert rollup.Peak('Missing', start, end) == 0
+
+    buckets, peaks, averages, denials = rollup.GetSeries('Product', start, end, Database.SqlTableUsageHour)
+    assert list(buckets) == [start], "Minutes not rolled up into one hour"
+    assert list(peaks) == [59]
+    assert list(averages) == [pytest.approx(29.5)]
+    assert list(denials) == [60]
+
+
+def test_retention_and_tier(rollup):
+    now = time.time()
+    old = now - 30 * UsageRollup.DaySeconds
+    rollup.Record({'Product': (3, 0)}, old)
+    rollup.Record({'Product': (1, 0)}, now)
+    rollup.Prune(now)
+    assert rollup.GetTier(old, now) == Database.SqlTableUsageHour
+    assert rollup.Peak('Product', old - 3600, now + 60) == 3, "Hourly rollup lost"
+    assert len(rollup.GetSeries('Product', old - 3600, now + 60, Database.SqlTableUsageMinute)[0]) == 1, \
+        "Minute samples kept beyond retention"
+
+
+def test_licence_manager_sample_usage(make_manager):
+    manager = make_manager(1)
+    manager.TakeSeat('Product', '10.0.0.1', 'alice', 'host1')
+    manager.TakeSeat('Product', '10.0.0.2', 'bob', 'host2')
+    manager.TakeSeat('Product', '10.0.0.3', 'carol', 'host3')
+    assert manager.SampleUsage() == {'product': (1, 2)}
+    assert manager.SampleUsage() == {'product': (1, 0)}, "Denials not reset after sampling"
+
+
+def test_usage_sampled_as_configured(make_manager, tmp_path):
+    clock = SimulatedClock(datetime(2040, 1, 1, 8, 0, 0))
+    config = Config()
+    config.UsageRollup = True
+    manager = make_manager(1, clock=clock, config=config)
+    assert manager.UsageRollup.FileName == str(tmp_path / 'Usage.db3'), "Usage not sampled to the data folder"
+    manager.TakeSeat('Product', '10.0.0.1', 'alice', 'host1')
+    manager.TakeSeat('Product', '10.0.0.2', 'bob', 'host2')
+    manager.UsageRollup.Sample()
+    now = clock.Time()
+    assert manager.UsageRollup.Peak('Product', now - 60, now + 60) == 1, "Usage not sampled at the manager's clock"
+    assert manager.UsageRollup.Denials('Product', now - 60, now + 60) == 1
+    manager.Shutdown()
+    assert manager.UsageRollup.m_Thread is None, "Sampling not stopped on shutdown"
+
+    assert make_manager(1).UsageRollup is None, "Usage sampled without a configuration"
@@ -0,0 +1,47 @@
+from datetime import datetime
+import pytest
+from PyNLS import nls_seat_admin
+from PyNLS.LicenceCore.clsClock import SimulatedClock
+
+
+def test_release_seats_of_a_host(make_manager, make_server, admin_secret, capsys):
+    server = make_server(make_manager(2, ('Product', 'Other')))
+    manager = server.handler.Manager
+    assert manager.TakeSeat('Product', '10.0.0.1', 'alice', 'lab1')
+    assert manager.TakeSeat('Other', '10.0.0.1', 'alice', 'lab1')
+    assert manager.TakeSeat('Product', '10.0.0.2', 'bob', 'lab2')
+
+    assert nls_seat_admin.main(['--server', server.address, '--secret', admin_secret, 'release', '--host', 'lab1']) == 0
+    assert capsys.readouterr().out.split('\n') == ['other\t1', 'product\t1', 'Total\t2', '']
+    assert [c.User for c in manager.GetConnections('Product')] == ['bob'], "Seats of other hosts released"
+
+
+def test_expire_by_the_server_clock(make_manager, make_server, admin_secret, capsys):
+    # The server's clock is years ahead of this host's...
+    clock = SimulatedClock(datetime(2040, 1, 1, 8, 0, 0))
+    server = make_server(make_manager(2, clock=clock))
+    manager = server.handler.Manager
+    assert manager.TakeSeat('Product', '10.0.0.1', 'alice', 'host1')
+    clock.Advance(3600)
+    assert manager.TakeSeat('Product', '10.0.0.2', 'bob', 'host2')
+
+    assert nls_seat_admin.main(['--server', server.address, '--secret', admin_secret, 'expire', '--minutes', '30']) == 0
+    assert capsys.readouterr().out.split('\n') == ['product\t1', 'Total\t1', ''], "Not expired by the server's clock"
+    assert [c.User for c in manager.GetConnections('Product')] == ['bob']
+
+
+def test_refused_without_the_admin_secret(server, monkeypatch, capsys):
+    monkeypatch.delenv('NLS_ADMIN_SECRET', raising=False)
+    assert server.handler.Manager.TakeSeat('Product', '10.0.0.1', 'alice', 'host1')
+    assert nls_seat_admin.main(['--server', server.address, 'release', '--user', 'alice']) == 1
+    assert 'Not authorised' in capsys.readouterr().err
+    assert len(server.handler.Manager.GetConnections('Product')) == 1, "Seat released without the admin secret"
+
+
+def test_arguments_checked():
+    with pytest.raises(SystemExit):
+        nls_seat_admin.ParseArguments(['release'])
+    with pytest.raises(SystemExit):
+        nls_seat_admin.ParseArguments(['expire', '--minutes', '-5'])
+    arguments = nls_seat_admin.ParseArguments(['--secret', 's', 'expire', '--minutes', '5', '--product', 'Product'])
+    assert (arguments.secret, arguments.minutes, arguments.product) == ('s', 5.0, 'Product')
@@ -0,0 +1,83 @@
+"""
+Administers the seats of a running licence server: releases every seat of a
+host, IP Address, user or product at once, e.g. after a lab of machines is
+rebooted or a user has changed machines, or expires every seat not refreshed
+since a given time. Each command is performed by the server as one storage
+transaction and prints the number of seats released for each product.
+
+The commands are administrative requests, sent with the admin secret of the
+server, read from the NLS_ADMIN_SECRET environment variable unless --secret
+is given.
+
+Run from the package root with, e.g.:
+    python -m PyNLS.nls_seat_admin --server tcp://server:3180 release --host LAB-PC-042
+    python -m PyNLS.nls_seat_admin expire --older-than 2030-01-01T08:00:00 --product Product
+    python -m PyNLS.nls_seat_admin expire --minutes 90
+"""
+from PyNLS.LicenceCore.clsLicenceClient import LicenceClient
+from PyNLS.LicenceCore.clsLicenceClientException import LicenceClientException
+from datetime import datetime, timedelta
+import argparse
+import sys
+import os
+
+
+def ParseArguments(argv: list) -> argparse.Namespace:
+    """
+    Returns the parsed command line arguments.
+
+    :param argv: The command line arguments, without the program name.
+    :returns: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(prog='nls_seat_admin', description='Releases seats of a licence server in bulk.')
+    parser.add_argument('--server', default='tcp://localhost:3180', help='the address of the licence server')
+    parser.add_argument('--timeout', type=float, default=30.0, help='the time, in seconds, to wait for the server')
+    parser.add_argument('--secret', default=os.environ.get('NLS_ADMIN_SECRET', ''),
+                        help='the admin secret of the server, by default $NLS_ADMIN_SECRET')
+    commands = parser.add_subparsers(dest='command', required=True)
+    release = commands.add_parser('release', help='release every seat matching all of the filters')
+    release.add_argument('--product', help='the product to release the seats of')
+    release.add_argument('--host', help='the host to release the seats of')
+    release.add_argument('--ip', help='the IP Address to release the seats of')
+    release.add_argument('--user', help='the user to release the seats of')
+    expire = commands.add_parser('expire', help='release every seat not refreshed since a time')
+    since = expire.add_mutually_exclusive_group(required=True)
+    since.add_argument('--older-than', type=datetime.fromisoformat,
+                       help='the time, in the server\'s local time, e.g. 2030-01-01T08:00:00')
+    since.add_argument('--minutes', type=float, help='the number of minutes before now, by the server\'s clock')
+    expire.add_argument('--product', help='the product to expire the seats of')
+    arguments = parser.parse_args(argv)
+    if arguments.command == 'release' and not (arguments.product or arguments.host or arguments.ip or arguments.user):
+        parser.error('release needs at least one of --product, --host, --ip or --user')
+    if arguments.command == 'expire' and arguments.minutes is not None and not arguments.minutes >= 0:
+        parser.error('--minutes must not be negative')
+    return arguments
+
+
+def main(argv: list) -> int:
+    """
+    Performs the command and prints the number of seats released for each product.
+
+    :param argv: The command line arguments, without the program name.
+    :returns: The exit code, 0 on success.
+    """
+    arguments = ParseArguments(argv)
+    with LicenceClient(arguments.server, timeout=arguments.timeout, adminSecret=arguments.secret) as client:
+        try:
+            if arguments.command == 'release':
+                counts = client.ReleaseSeats(arguments.product, arguments.host, arguments.ip, arguments.user)
+            else:
+                # An age is sent as such, for the server to take from its own clock...
+                olderThan = arguments.older_than or timedelta(minutes=arguments.minutes)
+                counts = client.ExpireSeats(olderThan, arguments.product)
+        except LicenceClientException as ex:
+            print('Error: ' + str(ex), file=sys.stderr)
+            return 1
+    for product, count in sorted(counts.items()):
+        print(product + '\t' + str(count))
+    print('Total\t' + str(sum(counts.values())))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))